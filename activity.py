@@ -0,0 +1,221 @@
+"""User Activity Module
+
+Backs the profile and "My feedback" pages. A user's feedback is listed in
+keyset-paginated pages (newest first, walking the ``(user_id,
+date_created, id)`` index), with status and vote counts joined from
+``feedback_rank`` in the same query. Per-status counts and vote totals
+come from one aggregate query.
+
+The summary and the first page are cached per user. Each cache entry is
+tagged with the user's row in ``user_activity``, a counter bumped by
+``touch`` in the same transaction as every write that changes what the
+user sees (submission, moderation, sentiment scoring, votes on their
+feedback, archiving). Checking an entry is a primary-key lookup, so a
+profile with thousands of items loads in constant time, and every
+worker process sees the invalidation.
+
+When the app is sharded, a user's feedback can sit on every shard: the
+version is the tuple of the per-shard versions, summaries are added up and
+pages are merged newest first.
+"""
+
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+
+from sharding import each_shard, merge_sorted
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DEFAULT_MAX_ENTRIES = 1024
+STATUSES = ('pending', 'approved', 'rejected')
+
+TOUCH_SQL = text('''
+    INSERT INTO user_activity (user_id, version)
+    SELECT DISTINCT user_id, 1 FROM feedback
+    WHERE id IN :ids AND user_id IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+''').bindparams(bindparam('ids', expanding=True))
+VERSION_SQL = text('SELECT version FROM user_activity WHERE user_id = :user_id')
+SUMMARY_SQL = text('''
+    SELECT f.status, COUNT(*), COALESCE(SUM(r.upvotes), 0), COALESCE(SUM(r.downvotes), 0)
+    FROM feedback f LEFT JOIN feedback_rank r ON r.feedback_id = f.id
+    WHERE f.user_id = :user_id
+    GROUP BY f.status
+''')
+PAGE_COLUMNS = '''
+    SELECT f.id, f.company_name, f.company_logo, f.comment, f.sentiment,
+           f.status, f.date_created, COALESCE(r.upvotes, 0), COALESCE(r.downvotes, 0)
+    FROM feedback f LEFT JOIN feedback_rank r ON r.feedback_id = f.id
+'''
+FIRST_PAGE_SQL = text(PAGE_COLUMNS + '''
+    WHERE f.user_id = :user_id
+    ORDER BY f.date_created DESC, f.id DESC
+    LIMIT :limit
+''').columns(date_created=DateTime)
+NEXT_PAGE_SQL = text(PAGE_COLUMNS + '''
+    WHERE f.user_id = :user_id
+      AND (f.date_created < :before OR (f.date_created = :before AND f.id < :before_id))
+    ORDER BY f.date_created DESC, f.id DESC
+    LIMIT :limit
+''').bindparams(bindparam('before', type_=DateTime)).columns(date_created=DateTime)
+
+
+def touch(session, *feedback_ids):
+    """Invalidate the cached activity of the feedback items' authors.
+
+    Call inside the transaction that changes the items, before they are
+    deleted.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        *feedback_ids: IDs of the changed feedback items
+    """
+    if feedback_ids:
+        session.execute(TOUCH_SQL, {'ids': list(feedback_ids)})
+
+
+def encode_cursor(item):
+    """Build the cursor that continues after a listed item."""
+    return '%s_%d' % (item['date_created'], item['id'])
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from ``encode_cursor``.
+
+    Returns:
+        tuple: (date_created, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    created, _, feedback_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created), int(feedback_id)
+
+
+class UserActivity:
+    """Per-user feedback listing and summary with a versioned cache."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, page_size=DEFAULT_PAGE_SIZE):
+        """Initialize the UserActivity service.
+
+        Args:
+            max_entries (int): Users whose summary and first page are kept
+            page_size (int): Default number of items per page
+        """
+        self.max_entries = max_entries
+        self.page_size = page_size
+        self.stats = Counter()
+        self._entries = OrderedDict()  # user_id -> (version, overview)
+        self._lock = threading.Lock()
+
+    def overview(self, session, user_id):
+        """Get a user's summary and first page, from the cache if current.
+
+        Returns:
+            dict: ``summary`` (``total``, ``by_status``, ``upvotes``,
+            ``downvotes``, ``vote_score``), ``feedbacks`` and
+            ``next_cursor`` (None on the last page)
+        """
+        version = tuple(session.execute(VERSION_SQL, {'user_id': user_id}).scalar() or 0
+                        for _ in each_shard())
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[1]
+
+        overview = {'summary': self.summary(session, user_id),
+                    **self.page(session, user_id)}
+        self.stats['computed'] += 1
+        with self._lock:
+            self._entries[user_id] = (version, overview)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return overview
+
+    def summary(self, session, user_id):
+        """Count a user's feedback per status and total their votes."""
+        by_status = dict.fromkeys(STATUSES, 0)
+        upvotes = downvotes = 0
+        for _ in each_shard():
+            for status, count, ups, downs in session.execute(SUMMARY_SQL, {'user_id': user_id}):
+                by_status[status or 'pending'] = by_status.get(status or 'pending', 0) + count
+                upvotes += ups
+                downvotes += downs
+        return {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'upvotes': upvotes,
+            'downvotes': downvotes,
+            'vote_score': upvotes - downvotes,
+        }
+
+    def page(self, session, user_id, cursor=None, limit=None):
+        """List one page of a user's feedback, newest first.
+
+        Args:
+            session: SQLAlchemy session to execute on
+            user_id (int): Author
+            cursor (str, optional): ``next_cursor`` of the previous page
+            limit (int, optional): Page size (defaults to ``page_size``)
+
+        Returns:
+            dict: ``feedbacks`` and ``next_cursor``
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        limit = min(max(limit or self.page_size, 1), MAX_PAGE_SIZE)
+        params = {'user_id': user_id, 'limit': limit + 1}
+        if cursor:
+            params['before'], params['before_id'] = decode_cursor(cursor)
+        sql = NEXT_PAGE_SQL if cursor else FIRST_PAGE_SQL
+        rows = list(merge_sorted(
+            [session.execute(sql, params).all() for _ in each_shard()],
+            key=lambda row: (row[6] or datetime.min, row[0]), reverse=True
+        ))
+
+        feedbacks = [{
+            'id': row[0],
+            'company_name': row[1],
+            'company_logo': row[2],
+            'comment': row[3],
+            'sentiment': row[4],
+            'status': row[5],
+            'date_created': row[6].isoformat() if row[6] else None,
+            'upvotes': row[7],
+            'downvotes': row[8],
+            'vote_score': row[7] - row[8],
+        } for row in rows[:limit]]
+        next_cursor = encode_cursor(feedbacks[-1]) if len(rows) > limit else None
+        return {'feedbacks': feedbacks, 'next_cursor': next_cursor}
+
+    def clear(self):
+        """Drop every cached overview."""
+        with self._lock:
+            self._entries.clear()
+
+
+def init_user_activity(app):
+    """Create the app's user activity service.
+
+    Reads ``ACTIVITY_PAGE_SIZE`` and ``ACTIVITY_CACHE_SIZE``.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        UserActivity: The installed service
+    """
+    service = UserActivity(
+        max_entries=app.config.get('ACTIVITY_CACHE_SIZE', DEFAULT_MAX_ENTRIES),
+        page_size=app.config.get('ACTIVITY_PAGE_SIZE', DEFAULT_PAGE_SIZE),
+    )
+    app.extensions['user_activity'] = service
+    return service
@@ -1,33 +1,106 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, send_file
 from flask_sqlalchemy import SQLAlchemy
-from auth import auth_bp, login_required, admin_required
+from auth import auth_bp, get_db_connection, init_auth_db, login_required, admin_required
+from availability import init_availability
+from profiler import init_profiler
+from json_provider import init_json
+from compression import conditional, init_compression
+from passwords import DEFAULT_METHOD as DEFAULT_HASH_METHOD, init_password_hasher
+from ratelimit import init_login_limits
+from dbrouting import DEFAULT_READERS, RoutingSession, init_db_routing, writer_engine_options
+from sharding import (each_shard, feedback_scope, group_by_shard, init_sharding, merge_sorted,
+                      select_shard, use_shard)
+from singleflight import init_listing_cache
+from snapshots import init_snapshots
+from activity import init_user_activity
+from terms import init_trending_cache
+from sessions import DEFAULT_EXPIRE_BATCH, DEFAULT_EXPIRE_INTERVAL, init_sessions
+from warmup import DEFAULT_TABLES as DEFAULT_WARMUP_TABLES, init_warmup, prime_sqlite
+from companies import COMPANIES, get_company_logo
+from sentiment import analyze_sentiment
+from ingest import BulkIngestor, content_hash, iter_records, VALID_STATUSES
+from jobs import JobQueue
+from export_feedback import FeedbackExporter
+import rollups
+import ranking
+import sync
+import votes
+import archive
+import dedupe
+import activity
+import terms
+import outbox
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'openfeed-secret'  # Keep your existing secret key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///openfeed.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('OPENFEED_DATABASE_URI', 'sqlite:///openfeed.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+# Sampling profiler is opt-in; see profiler.py
+app.config['PROFILER_ENABLED'] = os.environ.get('OPENFEED_PROFILER') == '1'
+app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('OPENFEED_PROFILER_RATE', '0.01'))
+# JSON encoder for API responses: auto (orjson if installed), orjson or default
+app.config['JSON_PROVIDER'] = os.environ.get('OPENFEED_JSON_PROVIDER', 'auto')
+# Password hashing cost and pool size; see passwords.py
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('OPENFEED_PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('OPENFEED_PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+# Login attempts allowed as (requests, per seconds); see ratelimit.py
+app.config['LOGIN_RATE_PER_IP'] = (30, 60)
+app.config['LOGIN_RATE_PER_ACCOUNT'] = (10, 300)
+app.config['AVAILABILITY_RATE_PER_IP'] = (120, 60)
+# Server-side sessions in their own SQLite file; expired rows are deleted
+# in batches by a periodic job (see sessions.py)
+app.config['SESSION_DATABASE'] = os.environ.get('OPENFEED_SESSION_DATABASE')
+app.config['SESSION_EXPIRE_INTERVAL'] = DEFAULT_EXPIRE_INTERVAL
+app.config['SESSION_EXPIRE_BATCH'] = DEFAULT_EXPIRE_BATCH
+# Acknowledged outbox events are deleted in batches by a periodic job (see outbox.py)
+app.config['OUTBOX_COMPACT_INTERVAL'] = outbox.DEFAULT_COMPACT_INTERVAL
+app.config['OUTBOX_COMPACT_BATCH'] = outbox.DEFAULT_COMPACT_BATCH
+# Feedback cards rendered with the home page; the rest load on scroll
+app.config['INDEX_PAGE_SIZE'] = 60
+# Largest page /api/feedback/filter serves when a limit is given
+app.config['LISTING_MAX_PAGE_SIZE'] = 1000
+# Set to a shared directory to coalesce listing queries across worker
+# processes; see singleflight.py
+app.config['LISTING_CACHE_DIR'] = os.environ.get('OPENFEED_LISTING_CACHE_DIR')
+# Startup warmup before serving; see warmup.py
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('OPENFEED_TEMPLATE_CACHE_DIR',
+                                                  os.path.join(app.instance_path, 'jinja_cache'))
+app.config['WARMUP_TABLES'] = DEFAULT_WARMUP_TABLES
+app.config['WARMUP_LISTING_PAGES'] = 2  # first pages of each sort put in the listing cache
+# Pre-rendered public listing pages are opt-in; see snapshots.py
+app.config['SNAPSHOTS_ENABLED'] = os.environ.get('OPENFEED_SNAPSHOTS') == '1'
+app.config['SNAPSHOT_DIR'] = os.environ.get('OPENFEED_SNAPSHOT_DIR',
+                                            os.path.join(app.instance_path, 'snapshots'))
+# Single writer connection plus query_only WAL readers; see dbrouting.py
+app.config['DB_READERS'] = int(os.environ.get('OPENFEED_DB_READERS', DEFAULT_READERS))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = writer_engine_options(app.config)
+# Companies spread over this many shard databases (0 = no sharding); see sharding.py
+app.config['SHARD_COUNT'] = int(os.environ.get('OPENFEED_SHARDS', '0'))
+app.config['SHARD_DIR'] = os.environ.get('OPENFEED_SHARD_DIR',
+                                         os.path.join(app.instance_path, 'shards'))
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+init_db_routing(app, db)
+shards = init_sharding(app, db)
+profiler = init_profiler(app)
+init_json(app)
+init_compression(app)
+init_password_hasher(app)
+init_login_limits(app)
+init_availability(app, get_db_connection)
+session_store = init_sessions(app)
+listing_cache = init_listing_cache(app)
+snapshot_store = init_snapshots(app)
+user_activity = init_user_activity(app)
+trending_cache = init_trending_cache(app)
+warmup = init_warmup(app)
 
 # Register the authentication blueprint
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
-# Companies list with local logo paths
-COMPANIES = [
-    {"name": "Google", "domain": "google.com", "logo": "static/logos/google.png"},
-    {"name": "Apple", "domain": "apple.com", "logo": "static/logos/apple.png"},
-    {"name": "Microsoft", "domain": "microsoft.com", "logo": "static/logos/microsoft.png"},
-    {"name": "Amazon", "domain": "amazon.com", "logo": "static/logos/amazon.png"},
-    {"name": "Netflix", "domain": "netflix.com", "logo": "static/logos/netflix.png"},
-    {"name": "Tesla", "domain": "tesla.com", "logo": "static/logos/tesla.png"},
-    {"name": "Meta", "domain": "meta.com", "logo": "static/logos/meta.png"},
-    {"name": "Twitter", "domain": "twitter.com", "logo": "static/logos/twitter.png"},
-    {"name": "Uber", "domain": "uber.com", "logo": "static/logos/uber.png"},
-    {"name": "Adobe", "domain": "adobe.com", "logo": "static/logos/adobe.png"}
-]
-
 # User model for authentication
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -50,6 +123,11 @@ class Feedback(db.Model):
     sentiment = db.Column(db.String(20), nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Keyset pages of a user's feedback (see activity.py)
+    __table_args__ = (
+        db.Index('ix_feedback_user_created', 'user_id', 'date_created', 'id'),
+    )
 
 # Vote model for feedback voting system
 class Vote(db.Model):
@@ -70,6 +148,314 @@ class Vote(db.Model):
         db.UniqueConstraint('user_id', 'feedback_id', name='unique_user_feedback_vote'),
     )
 
+# Content hashes used to deduplicate feedback (see ingest.py)
+class FeedbackHash(db.Model):
+    """Maps a normalized content hash to the feedback it was first seen on"""
+    content_hash = db.Column(db.String(64), primary_key=True)
+    feedback_id = db.Column(db.Integer, db.ForeignKey('feedback.id', ondelete='CASCADE'), nullable=False)
+
+# Shard directory, kept in the main database (see sharding.py)
+class FeedbackDirectory(db.Model):
+    """Allocates feedback IDs across shards and records their company"""
+    __tablename__ = 'feedback_directory'
+    id = db.Column(db.Integer, primary_key=True)
+    company_name = db.Column(db.String(100), nullable=False)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class CompanyShard(db.Model):
+    """Shard a company was moved to, overriding the hash placement"""
+    __tablename__ = 'company_shard'
+    company_name = db.Column(db.String(100), primary_key=True)
+    shard = db.Column(db.Integer, nullable=False)
+
+# Persistent background jobs (see jobs.py)
+class Job(db.Model):
+    """A unit of deferred work processed by the job queue"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text)
+    worker = db.Column(db.String(100))  # ID of the process running the job (see jobs.py)
+    lease_expires_at = db.Column(db.DateTime)  # renewed by the worker while running
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+# Per-company daily rollups (see rollups.py)
+class CompanyDailyStats(db.Model):
+    """Feedback counts and vote sums per company, day and sentiment"""
+    __tablename__ = 'company_daily_stats'
+    company_name = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD
+    sentiment = db.Column(db.String(20), primary_key=True)
+    feedback_count = db.Column(db.Integer, nullable=False, default=0)
+    approved_count = db.Column(db.Integer, nullable=False, default=0)
+    upvotes = db.Column(db.Integer, nullable=False, default=0)
+    downvotes = db.Column(db.Integer, nullable=False, default=0)
+    # Votes on approved feedback only; the public figures
+    approved_upvotes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_downvotes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Precomputed hot/best ranking scores (see ranking.py)
+class FeedbackRank(db.Model):
+    """Vote counts and ranking scores for one feedback item"""
+    __tablename__ = 'feedback_rank'
+    feedback_id = db.Column(db.Integer, db.ForeignKey('feedback.id', ondelete='CASCADE'), primary_key=True)
+    company_name = db.Column(db.String(100), nullable=False)
+    sentiment = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    date_created = db.Column(db.DateTime, nullable=False)
+    upvotes = db.Column(db.Integer, nullable=False, default=0)
+    downvotes = db.Column(db.Integer, nullable=False, default=0)
+    hot = db.Column(db.Float, nullable=False, default=0)
+    best = db.Column(db.Float, nullable=False, default=0)
+    
+    # Every filter combination of the listing API is an index range scan
+    __table_args__ = (
+        db.Index('ix_feedback_rank_status_hot', 'status', 'hot', 'date_created'),
+        db.Index('ix_feedback_rank_status_best', 'status', 'best', 'date_created'),
+        db.Index('ix_feedback_rank_company_hot', 'status', 'company_name', 'hot', 'date_created'),
+        db.Index('ix_feedback_rank_company_best', 'status', 'company_name', 'best', 'date_created'),
+        db.Index('ix_feedback_rank_sentiment_hot', 'status', 'sentiment', 'hot', 'date_created'),
+        db.Index('ix_feedback_rank_sentiment_best', 'status', 'sentiment', 'best', 'date_created'),
+    )
+
+# Change tokens for delta sync (see sync.py)
+class FeedbackChange(db.Model):
+    """Latest change token of a feedback item"""
+    __tablename__ = 'feedback_change'
+    version = db.Column(db.Integer, primary_key=True)
+    feedback_id = db.Column(db.Integer, nullable=False, unique=True)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Recreating the table restarts the change tokens that key the listing cache
+for _event in ('after_create', 'after_drop'):
+    db.event.listen(FeedbackChange.__table__, _event,
+                    lambda *args, **kwargs: listing_cache.clear())
+
+# Archived feedback and votes (see archive.py)
+class FeedbackArchive(db.Model):
+    """A feedback item moved out of the live table"""
+    __tablename__ = 'feedback_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer)
+    company_name = db.Column(db.String(100), nullable=False)
+    company_logo = db.Column(db.String(500))
+    comment = db.Column(db.Text, nullable=False)
+    sentiment = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20))
+    date_created = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    archive_reason = db.Column(db.String(20), nullable=False)  # rejected, aged, manual
+    # Votes are frozen once archived, so counts and scores are stored (see archive.py)
+    upvotes = db.Column(db.Integer, nullable=False, server_default='0')
+    downvotes = db.Column(db.Integer, nullable=False, server_default='0')
+    hot = db.Column(db.Float, nullable=False, server_default='0')
+    best = db.Column(db.Float, nullable=False, server_default='0')
+
+class VoteArchive(db.Model):
+    """A vote on an archived feedback item"""
+    __tablename__ = 'vote_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    feedback_id = db.Column(db.Integer, nullable=False, index=True)
+    vote_type = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+# Near-duplicate detection index (see dedupe.py)
+class FeedbackMinhash(db.Model):
+    """MinHash signature and near-duplicate cluster of a feedback item"""
+    __tablename__ = 'feedback_minhash'
+    feedback_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    cluster_id = db.Column(db.Integer, nullable=False, index=True)
+
+class FeedbackLsh(db.Model):
+    """LSH band bucket of a feedback item's signature"""
+    __tablename__ = 'feedback_lsh'
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    feedback_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+# Per-user activity versions (see activity.py)
+class UserActivityVersion(db.Model):
+    """Counter bumped whenever a user's feedback or its votes change"""
+    __tablename__ = 'user_activity'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Recreating the table restarts the versions that key the activity cache
+for _event in ('after_create', 'after_drop'):
+    db.event.listen(UserActivityVersion.__table__, _event,
+                    lambda *args, **kwargs: user_activity.clear())
+
+# Term statistics (see terms.py)
+class FeedbackTerm(db.Model):
+    """Inverted index posting: a feedback item contains a term"""
+    __tablename__ = 'feedback_term'
+    term = db.Column(db.String(100), primary_key=True)
+    feedback_id = db.Column(db.Integer, primary_key=True, autoincrement=False, index=True)
+
+class CompanyTermDaily(db.Model):
+    """Approved feedback containing a term, per company and day"""
+    __tablename__ = 'company_term_daily'
+    company_name = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD
+    term = db.Column(db.String(100), primary_key=True)
+    doc_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_company_term_daily_term_day', 'term', 'day'),
+    )
+
+for _event in ('after_create', 'after_drop'):
+    db.event.listen(CompanyTermDaily.__table__, _event,
+                    lambda *args, **kwargs: trending_cache.clear())
+
+# Change events for downstream consumers (see outbox.py)
+class OutboxEvent(db.Model):
+    """An event recorded with the change it describes; the ID is its offset"""
+    __tablename__ = 'outbox_event'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.SmallInteger, nullable=False)
+    feedback_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer)
+    data = db.Column(db.Text)  # positional JSON array of the kind's fields
+    created_at = db.Column(db.BigInteger, nullable=False)  # milliseconds since the epoch
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class OutboxCheckpoint(db.Model):
+    """Last event offset a consumer acknowledged"""
+    __tablename__ = 'outbox_checkpoint'
+    consumer = db.Column(db.String(100), primary_key=True)
+    offset = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.BigInteger, nullable=False)
+
+job_queue = JobQueue(app, db, workers=int(os.environ.get('OPENFEED_JOB_WORKERS', '2')))
+
+@job_queue.handler('score_sentiment')
+def score_sentiment_job(feedback_id):
+    """Analyze the sentiment of a submitted feedback item"""
+    with feedback_scope(feedback_id):
+        feedback = db.session.get(Feedback, feedback_id)
+        if feedback is None:
+            return
+        old_sentiment = feedback.sentiment
+        feedback.sentiment = analyze_sentiment(feedback.comment)
+        outbox.emit(db.session, 'feedback.scored', feedback.id, feedback.user_id,
+                    sentiment=feedback.sentiment, old_sentiment=old_sentiment)
+        rollups.record_sentiment_change(
+            db.session, feedback, old_sentiment,
+            upvotes=Vote.query.filter_by(feedback_id=feedback_id, vote_type='upvote').count(),
+            downvotes=Vote.query.filter_by(feedback_id=feedback_id, vote_type='downvote').count()
+        )
+        ranking.sync_feedback(db.session, feedback)
+        sync.touch(db.session, feedback.id)
+        activity.touch(db.session, feedback.id)
+        db.session.commit()
+
+@job_queue.handler('export_feedback')
+def export_feedback_job(filename, sentiment=None, company=None):
+    """Write approved feedback to a CSV file under instance/exports"""
+    query = Feedback.query.filter_by(status='approved')
+    if sentiment:
+        query = query.filter_by(sentiment=sentiment)
+    if company:
+        query = query.filter_by(company_name=company)
+    
+    # One pass per shard, merged back into ID order
+    records = [[(f.id, {
+        'company': f.company_name,
+        'sentiment': f.sentiment,
+        'message': f.comment,
+        'created_at': f.date_created.isoformat() if f.date_created else ''
+    }) for f in query.order_by(Feedback.id).yield_per(1000)] for _ in each_shard()]
+    exporter = FeedbackExporter([record for _, record in
+                                 merge_sorted(records, key=lambda pair: pair[0])])
+    
+    export_dir = os.path.join(app.instance_path, 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    exporter.export_to_csv(os.path.join(export_dir, os.path.basename(filename)))
+
+@job_queue.handler('publish_snapshots')
+def publish_snapshots_job():
+    """Re-render the public listing snapshots"""
+    if snapshot_store is not None:
+        publish_snapshots(snapshot_store)
+
+@job_queue.handler('expire_sessions')
+def expire_sessions_job():
+    """Delete expired sessions, then schedule the next run"""
+    session_store.expire(app.config['SESSION_EXPIRE_BATCH'])
+    schedule_session_expiry()
+    db.session.commit()
+
+def schedule_session_expiry():
+    """Queue the next expire_sessions run unless one is queued"""
+    queued = db.session.query(Job.id).filter_by(kind='expire_sessions', status='queued').first()
+    if queued is None:
+        job_queue.enqueue('expire_sessions',
+                          delay=timedelta(seconds=app.config['SESSION_EXPIRE_INTERVAL']))
+
+@job_queue.handler('compact_outbox')
+def compact_outbox_job():
+    """Delete acknowledged outbox events, then schedule the next run"""
+    for _ in each_shard():
+        outbox.compact(db.session, app.config['OUTBOX_COMPACT_BATCH'])
+    schedule_outbox_compaction()
+    db.session.commit()
+
+def schedule_outbox_compaction():
+    """Queue the next compact_outbox run unless one is queued"""
+    queued = db.session.query(Job.id).filter_by(kind='compact_outbox', status='queued').first()
+    if queued is None:
+        job_queue.enqueue('compact_outbox',
+                          delay=timedelta(seconds=app.config['OUTBOX_COMPACT_INTERVAL']))
+
+def publish_snapshots(store):
+    """Render every public listing sort into a new snapshot generation"""
+    started = store.clock()
+    # Change tokens only grow, so their sum identifies the data across shards
+    version = sum(sync.current_token(db.session) for _ in each_shard())
+    listings = {
+        sort_by: feedback_listing(listing_params(sort_by=sort_by))['feedbacks']
+        for sort_by in LISTING_SORTS
+    }
+    return store.publish(listings, version, lambda result: app.json.response(result).get_data(),
+                         started=started)
+
+def schedule_snapshot_publish(invalidate=False):
+    """Queue a snapshot publish with the current transaction.
+
+    With invalidate, the current snapshot also stops being served once the
+    transaction commits, for changes that must show at once (moderation).
+    """
+    if snapshot_store is None:
+        return
+    queued = db.session.query(Job.id).filter_by(kind='publish_snapshots', status='queued').first()
+    if queued is None:
+        job_queue.enqueue('publish_snapshots')
+    if invalidate:
+        db.session.info['snapshot_invalidate'] = True
+
+def _invalidate_snapshot_after_commit(session):
+    if session.info.pop('snapshot_invalidate', False) and snapshot_store is not None:
+        snapshot_store.invalidate()
+
+db.event.listen(db.session, 'after_commit', _invalidate_snapshot_after_commit)
+db.event.listen(db.session, 'after_rollback',
+                lambda session: session.info.pop('snapshot_invalidate', None))
+
 def get_vote_score(feedback_id):
     """Calculate vote score for a feedback item (upvotes - downvotes)"""
     upvotes = db.session.query(Vote).filter_by(
@@ -84,46 +470,36 @@ def get_vote_score(feedback_id):
     
     return upvotes - downvotes
 
-def get_company_logo(company_name):
-    """Get company logo from static folder"""
-    company = next((c for c in COMPANIES if c['name'] == company_name), None)
-    if company and os.path.exists(company['logo']):
-        return f"/{company['logo']}"
-    return "/static/logos/placeholder.png"
-
-def analyze_sentiment(text):
-    """Simple sentiment analysis"""
-    positive_words = [
-        'great', 'excellent', 'amazing', 'love', 'perfect', 'awesome',
-        'good', 'fantastic'
-    ]
-    negative_words = [
-        'bad', 'terrible', 'awful', 'hate', 'worst', 'poor',
-        'disappointing'
-    ]
+def data_version():
+    """Cheap version of the feedback and votes the listing views show"""
+    tokens = tuple(sync.current_token(db.session) for _ in each_shard())
+    return tokens if shards is not None else tokens[0]
 
-    text_lower = text.lower()
-    pos_score = sum(1 for word in positive_words if word in text_lower)
-    neg_score = sum(1 for word in negative_words if word in text_lower)
-
-    if pos_score > neg_score:
-        return "positive"
-    elif neg_score > pos_score:
-        return "negative"
-    else:
-        return "neutral"
+def newest_first(feedback):
+    return feedback.date_created or datetime.min
 
 @app.route('/')
+@conditional(data_version)
 def index():
     # Only show approved feedback or all feedback if user is admin
-    if session.get('is_admin'):
-        feedbacks = Feedback.query.order_by(Feedback.date_created.desc()).all()
-    else:
-        feedbacks = Feedback.query.filter_by(status='approved').order_by(Feedback.date_created.desc()).all()
+    query = Feedback.query
+    if not session.get('is_admin'):
+        query = query.filter_by(status='approved')
+    # Only the first page is rendered; search-filter.js pages in the rest
+    # from /api/feedback/filter as the visitor scrolls
+    page_size = app.config['INDEX_PAGE_SIZE']
+    feedback_total = 0
+    pages = []
+    for _ in each_shard():
+        feedback_total += query.count()
+        pages.append(query.order_by(Feedback.date_created.desc()).limit(page_size).all())
+    feedbacks = list(merge_sorted(pages, key=newest_first, reverse=True))[:page_size]
     
-    return render_template('index.html', feedbacks=feedbacks, companies=COMPANIES)
+    return render_template('index.html', feedbacks=feedbacks, feedback_total=feedback_total,
+                           companies=COMPANIES)
 
 @app.route('/api/feedback/filter', methods=['GET'])
+@conditional(data_version)
 def filter_feedback():
     """API endpoint to get filtered feedback"""
     # Get query parameters
@@ -131,37 +507,171 @@ def filter_feedback():
     sentiment = request.args.get('sentiment', '')
     company = request.args.get('company', '')
     sort_by = request.args.get('sort', 'recent')
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    preview = request.args.get('preview', type=int)
+    with_count = request.args.get('count') in ('1', 'true')
+    include_archived = request.args.get('include_archived') in ('1', 'true')
+    # Bound what reaches SQLite (and the per-shard offset + limit windows)
+    if offset > LISTING_MAX_OFFSET or (preview or 0) > LISTING_MAX_OFFSET:
+        return jsonify({'success': False, 'error': 'Invalid offset or preview'}), 400
+    if limit:
+        limit = min(limit, app.config['LISTING_MAX_PAGE_SIZE'])
+    
+    # Normalize so equivalent requests share one cache entry and one query
+    params = listing_params(
+        search=search,
+        sentiment=sentiment,
+        company=company,
+        sort_by=sort_by if sort_by in LISTING_SORTS else 'recent',
+        limit=limit if limit and limit > 0 else None,
+        offset=offset,
+        preview=preview if preview and preview > 0 else None,
+        with_count=with_count,
+        include_archived=include_archived,
+        is_admin=bool(session.get('is_admin')),
+    )
+    # Public pages are served pre-rendered when published; see snapshots.py
+    if snapshot_store is not None:
+        snapshot = snapshot_store.lookup(params, gzip_ok=request.accept_encodings['gzip'] > 0)
+        if snapshot is not None:
+            path, encoding = snapshot
+            response = send_file(path, mimetype='application/json', max_age=0)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    # Concurrent identical requests run the query once; see singleflight.py
+    result = listing_cache.get(
+        tuple(sorted(params.items())),
+        data_version(),
+        lambda: feedback_listing(params)
+    )
+    return jsonify(result)
+
+LISTING_SORTS = ('recent', 'oldest', 'helpful', 'hot', 'best')
+LISTING_MAX_OFFSET = 10 ** 9
+
+def listing_params(search='', sentiment='', company='', sort_by='recent', limit=None,
+                   offset=0, preview=None, with_count=False, include_archived=False,
+                   is_admin=False):
+    """Normalized parameters of build_feedback_listing"""
+    return {
+        'search': search,
+        'sentiment': sentiment,
+        'company': company,
+        'sort_by': sort_by,
+        'limit': limit,
+        'offset': offset,
+        'preview': preview,
+        'with_count': with_count,
+        'include_archived': include_archived,
+        'is_admin': is_admin,
+    }
+
+def feedback_listing(params):
+    """Build a listing on the company's shard, or merged from every shard"""
+    if shards is None:
+        return build_feedback_listing(**params)
+    if params['company']:
+        with use_shard(shards.shard_for(params['company'])):
+            return build_feedback_listing(**params)
+    
+    # Each shard lists its first offset + limit items with their sort keys;
+    # the merged listing is sliced afterwards
+    limit, offset = params['limit'], params['offset']
+    window = dict(params, limit=limit + offset if limit else None, offset=0)
+    results = [build_feedback_listing(**window, keyed=True) for _ in each_shard()]
+    merged = merge_sorted([result['feedbacks'] for result in results],
+                          key=lambda item: item['_key'],
+                          reverse=params['sort_by'] != 'oldest')
+    feedback_list = list(merged)[offset:offset + limit if limit else None]
+    for item in feedback_list:
+        del item['_key']
+    listing = {
+        'success': True,
+        'feedbacks': feedback_list,
+        'total': len(feedback_list)
+    }
+    if params['with_count']:
+        listing['matched'] = sum(result['matched'] for result in results)
+    return listing
+
+def listing_sort_key(sort_by, date_created, score=None):
+    """Key of a listing item in its sort order (descending except 'oldest')"""
+    date_created = date_created or datetime.min
+    if sort_by == 'helpful':
+        return (score is not None, score or 0, date_created)
+    if sort_by in ('hot', 'best'):
+        return (score, date_created)
+    return date_created
+
+def build_feedback_listing(search, sentiment, company, sort_by, limit, offset,
+                           preview, with_count, include_archived, is_admin, keyed=False):
+    """Run the feedback listing query for normalized filter parameters.
     
+    With keyed, each item carries its sort key as '_key' for merging.
+    """
+    # Select only the columns the listing needs; rows come back as plain
+    # tuples instead of hydrated ORM objects
+    columns = [
+        Feedback.id,
+        Feedback.company_name,
+        Feedback.company_logo,
+        db.func.substr(Feedback.comment, 1, preview) if preview else Feedback.comment,
+        Feedback.sentiment,
+        Feedback.date_created,
+        Feedback.user_id
+    ]
+    if preview:
+        columns.append(db.func.length(Feedback.comment))
+    query = db.select(*columns)
+    
+    # hot/best read the precomputed ranking table; filtering on its
+    # columns lets SQLite walk the matching score index in order
+    ranked = sort_by in ('hot', 'best')
+    sort_column = None  # score column needed to merge archived rows
+    if ranked:
+        score = FeedbackRank.hot if sort_by == 'hot' else FeedbackRank.best
+        query = query.join(FeedbackRank, FeedbackRank.feedback_id == Feedback.id)
+        if not is_admin:
+            query = query.where(FeedbackRank.status == 'approved')
+        if sentiment:
+            query = query.where(FeedbackRank.sentiment == sentiment)
+        if company:
+            query = query.where(FeedbackRank.company_name == company)
+        query = query.order_by(score.desc(), FeedbackRank.date_created.desc())
+        sort_column = score
     # Base query - only show approved feedback unless admin
-    if session.get('is_admin'):
-        query = Feedback.query
-    else:
-        query = Feedback.query.filter_by(status='approved')
+    elif not is_admin:
+        query = query.where(Feedback.status == 'approved')
     
     # Apply filters
     if search:
-        query = query.filter(
+        query = query.where(
             db.or_(
                 Feedback.company_name.ilike(f'%{search}%'),
                 Feedback.comment.ilike(f'%{search}%')
             )
         )
     
-    if sentiment:
-        query = query.filter_by(sentiment=sentiment)
+    if sentiment and not ranked:
+        query = query.where(Feedback.sentiment == sentiment)
     
-    if company:
-        query = query.filter_by(company_name=company)
+    if company and not ranked:
+        query = query.where(Feedback.company_name == company)
     
     # Apply sorting
-    if sort_by == 'oldest':
+    if ranked:
+        pass  # already ordered by the ranking index
+    elif sort_by == 'oldest':
         query = query.order_by(Feedback.date_created.asc())
     elif sort_by == 'helpful':
         # Sort by vote score (upvotes - downvotes) in descending order
         # Use a subquery to calculate vote scores
         from sqlalchemy import func, case
         
-        vote_score_subquery = db.session.query(
+        vote_score_subquery = db.select(
             Vote.feedback_id,
             func.sum(
                 case(
@@ -180,27 +690,153 @@ def filter_feedback():
             vote_score_subquery.c.vote_score.desc().nullslast(),
             Feedback.date_created.desc()
         )
+        sort_column = vote_score_subquery.c.vote_score
     else:  # recent (default)
         query = query.order_by(Feedback.date_created.desc())
     
-    feedbacks = query.all()
+    # Total matches for paging clients, counted before limit/offset
+    matched = None
+    if with_count:
+        matched = db.session.execute(
+            db.select(db.func.count()).select_from(query.order_by(None).subquery())
+        ).scalar()
+        if include_archived:
+            matched += archive.count_archived(db.session, is_admin, search, sentiment, company)
     
-    # Convert to JSON
-    feedback_list = []
-    for feedback in feedbacks:
-        feedback_list.append({
-            'id': feedback.id,
-            'company_name': feedback.company_name,
-            'company_logo': feedback.company_logo,
-            'comment': feedback.comment,
-            'sentiment': feedback.sentiment,
-            'date_created': feedback.date_created.isoformat() if feedback.date_created else None
-        })
+    # Archived rows are merged in Python, so paging is applied after merging
+    # the first offset + limit rows of both
+    window = limit + offset if limit else None
+    if include_archived:
+        if window:
+            query = query.limit(window)
+    else:
+        if limit:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+    if (include_archived or keyed) and sort_column is not None:
+        query = query.add_columns(sort_column)
     
-    return jsonify({
+    # Map tuples straight to the output shape
+    rows = db.session.execute(query).all()
+    feedback_list = [{
+        'id': row[0],
+        'company_name': row[1],
+        'company_logo': row[2],
+        'comment': row[3],
+        'sentiment': row[4],
+        'date_created': row[5].isoformat() if row[5] else None,
+        'user_id': row[6]
+    } for row in rows]
+    
+    if preview:
+        for item, row in zip(feedback_list, rows):
+            item['comment_truncated'] = row[7] > preview
+    
+    if include_archived:
+        feedback_list = merge_archived_feedback(
+            feedback_list, rows, sort_by, search, sentiment, company, preview, window,
+            is_admin, keyed
+        )
+        end = offset + limit if limit else None
+        feedback_list = feedback_list[offset:end]
+    elif keyed:
+        for item, row in zip(feedback_list, rows):
+            score = row[-1] if sort_column is not None else None
+            item['_key'] = listing_sort_key(sort_by, row[5], score)
+    
+    result = {
         'success': True,
         'feedbacks': feedback_list,
         'total': len(feedback_list)
+    }
+    if matched is not None:
+        result['matched'] = matched
+    return result
+
+def merge_archived_feedback(feedback_list, rows, sort_by, search, sentiment,
+                            company, preview, limit, is_admin, keyed=False):
+    """Merge archived feedback into a listing in the requested sort order"""
+    def sort_key(date_created, score=None):
+        return listing_sort_key(sort_by, date_created, score)
+    
+    merged = []
+    for item, row in zip(feedback_list, rows):
+        item['archived'] = False
+        score = row[-1] if sort_by in ('hot', 'best', 'helpful') else None
+        merged.append((sort_key(row[5], score), item))
+    
+    for row in archive.archived_feedback(db.session, is_admin, search, sentiment,
+                                         company, sort_by, limit):
+        comment = row.comment[:preview] if preview else row.comment
+        item = {
+            'id': row.id,
+            'company_name': row.company_name,
+            'company_logo': row.company_logo,
+            'comment': comment,
+            'sentiment': row.sentiment,
+            'date_created': row.date_created.isoformat() if row.date_created else None,
+            'user_id': row.user_id,
+            'archived': True
+        }
+        if preview:
+            item['comment_truncated'] = len(row.comment) > preview
+        if sort_by in ('hot', 'best'):
+            score = row.hot if sort_by == 'hot' else row.best
+        elif sort_by == 'helpful':
+            # Match the live query: items without votes sort last
+            score = row.upvotes - row.downvotes if row.upvotes or row.downvotes else None
+        else:
+            score = None
+        merged.append((sort_key(row.date_created, score), item))
+    
+    merged.sort(key=lambda pair: pair[0], reverse=sort_by != 'oldest')
+    if keyed:
+        for key, item in merged:
+            item['_key'] = key
+    feedback_list = [item for _, item in merged]
+    return feedback_list[:limit] if limit and limit > 0 else feedback_list
+
+@app.route('/api/feedback/<int:feedback_id>', methods=['GET'])
+def get_feedback(feedback_id):
+    """Get a single feedback item with its full comment"""
+    # Archived items are only looked up when explicitly requested
+    models = [Feedback]
+    if request.args.get('include_archived') in ('1', 'true'):
+        models.append(FeedbackArchive)
+    for model in models:
+        row = db.session.execute(db.select(
+            model.id,
+            model.user_id,
+            model.company_name,
+            model.company_logo,
+            model.comment,
+            model.sentiment,
+            model.status,
+            model.date_created
+        ).where(model.id == feedback_id)).first()
+        if row is not None:
+            break
+    
+    is_owner = 'user_id' in session and row is not None and row.user_id == session['user_id']
+    if row is None or (row.status != 'approved' and not session.get('is_admin') and not is_owner):
+        return jsonify({
+            'success': False,
+            'error': 'Feedback not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'feedback': {
+            'id': row.id,
+            'company_name': row.company_name,
+            'company_logo': row.company_logo,
+            'comment': row.comment,
+            'sentiment': row.sentiment,
+            'status': row.status,
+            'date_created': row.date_created.isoformat() if row.date_created else None,
+            'archived': model is FeedbackArchive
+        }
     })
 
 @app.route('/submit_feedback', methods=['POST'])
@@ -213,8 +849,8 @@ def submit_feedback():
     # Get company logo from static folder
     logo = get_company_logo(company_name)
 
-    # Analyze sentiment
-    sentiment = analyze_sentiment(comment)
+    # Sentiment is scored by a background job after the response is sent
+    sentiment = 'pending'
 
     # Save feedback with user_id
     feedback = Feedback(
@@ -225,7 +861,28 @@ def submit_feedback():
         sentiment=sentiment,
         status='pending'  # Set to pending for moderation
     )
+    if shards is not None:
+        # IDs come from the main database so they are unique across shards
+        feedback.id = shards.allocate_ids([company_name])[0]
+        select_shard(shards.shard_for(company_name))
     db.session.add(feedback)
+    db.session.flush()
+    
+    # Remember the content hash so bulk imports can skip this comment
+    db.session.execute(
+        db.insert(FeedbackHash).prefix_with('OR IGNORE'),
+        {'content_hash': content_hash(company_name, comment), 'feedback_id': feedback.id}
+    )
+    rollups.record_feedback(db.session, feedback)
+    ranking.insert_feedback(db.session, feedback)
+    sync.touch(db.session, feedback.id)
+    activity.touch(db.session, feedback.id)
+    terms.index_feedback(db.session, feedback)
+    outbox.emit(db.session, 'feedback.submitted', feedback.id, feedback.user_id,
+                company=company_name, status=feedback.status, sentiment=sentiment)
+    # Group with near-duplicates so moderators can handle them together
+    dedupe.index_feedback(db.session, feedback.id, comment)
+    job_queue.enqueue('score_sentiment', {'feedback_id': feedback.id})
     db.session.commit()
 
     return jsonify({
@@ -240,19 +897,138 @@ def submit_feedback():
         }
     })
 
+@app.route('/admin/feedback/bulk', methods=['POST'])
+@admin_required
+def bulk_ingest_feedback():
+    """Bulk import feedback from a JSON array or NDJSON request body"""
+    status = request.args.get('status', 'pending')
+    if status not in VALID_STATUSES:
+        return jsonify({'success': False, 'error': 'Invalid status'}), 400
+    
+    try:
+        batch_size = int(request.args.get('batch_size', 5000))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid batch_size'}), 400
+    
+    ingestor = BulkIngestor(db, status=status, batch_size=max(1, batch_size))
+    summary = ingestor.ingest(iter_records(request.stream))
+    if status == 'approved' and summary['inserted']:
+        schedule_snapshot_publish(invalidate=True)
+        db.session.commit()
+    
+    return jsonify({'success': True, **summary})
+
+@app.route('/admin/jobs', methods=['GET'])
+@admin_required
+def job_queue_stats():
+    """Report background job queue depth and failures"""
+    failed = Job.query.filter_by(status='failed').order_by(Job.updated_at.desc()).limit(20).all()
+    return jsonify({
+        'success': True,
+        'stats': job_queue.stats(),
+        'recent_failures': [{
+            'id': job.id,
+            'kind': job.kind,
+            'attempts': job.attempts,
+            'last_error': job.last_error
+        } for job in failed]
+    })
+
+@app.route('/admin/export', methods=['POST'])
+@admin_required
+def export_feedback():
+    """Queue a CSV export of approved feedback"""
+    data = request.get_json(silent=True) or {}
+    filename = 'feedback-%s.csv' % datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    job_queue.enqueue('export_feedback', {
+        'filename': filename,
+        'sentiment': data.get('sentiment'),
+        'company': data.get('company')
+    })
+    db.session.commit()
+    
+    return jsonify({'success': True, 'filename': filename}), 202
+
+@app.route('/admin/archive', methods=['POST'])
+@admin_required
+def run_archive():
+    """Move rejected and aged-out feedback to the archive tables"""
+    data = request.get_json(silent=True) or {}
+    try:
+        rejected_days = int(data.get('rejected_days', archive.DEFAULT_REJECTED_DAYS))
+        max_age_days = int(data.get('max_age_days', archive.DEFAULT_MAX_AGE_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid rejected_days or max_age_days'}), 400
+    
+    archived = Counter()
+    shard_stats = []
+    for _ in each_shard():
+        archived.update(archive.run(db.session, rejected_days, max_age_days,
+                                    dry_run=bool(data.get('dry_run'))))
+        shard_stats.append(archive.stats(db.session))
+    if archived and not data.get('dry_run'):
+        schedule_snapshot_publish(invalidate=True)
+        db.session.commit()
+    stats = {key: sum(counts[key] for counts in shard_stats)
+             for key in shard_stats[0] if key != 'archived_by_reason'}
+    stats['archived_by_reason'] = dict(sum(
+        (Counter(counts['archived_by_reason']) for counts in shard_stats), Counter()))
+    return jsonify({'success': True, 'archived': dict(archived), 'stats': stats})
+
+@app.route('/admin/archive/restore', methods=['POST'])
+@admin_required
+def restore_archived():
+    """Move archived feedback items back to the live tables"""
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return jsonify({'success': False, 'error': 'ids must be a list of feedback IDs'}), 400
+    
+    restored = []
+    for shard, shard_ids in group_by_shard(ids):
+        with use_shard(shard):
+            restored += archive.restore(db.session, shard_ids)
+    if restored:
+        schedule_snapshot_publish(invalidate=True)
+        db.session.commit()
+    return jsonify({'success': True, 'restored': restored})
+
+@app.route('/admin/users/<int:user_id>/revoke-sessions', methods=['POST'])
+@admin_required
+def revoke_user_sessions(user_id):
+    """Log a user out everywhere, e.g. after changing their privileges"""
+    return jsonify({'success': True, 'revoked': session_store.revoke_user(user_id)})
+
 # New routes for user features
 @app.route('/my-feedback')
 @login_required
 def my_feedback():
     """View logged-in user's feedback submissions"""
-    user_feedbacks = Feedback.query.filter_by(user_id=session.get('user_id')).order_by(Feedback.date_created.desc()).all()
-    return render_template('my_feedback.html', feedbacks=user_feedbacks, companies=COMPANIES)
+    # The profile page lists them page by page
+    return redirect(url_for('auth.profile', **request.args))
+
+@app.route('/api/my-feedback', methods=['GET'])
+@login_required
+def my_feedback_api():
+    """Page through the logged-in user's feedback with status and votes"""
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+    if not cursor and not limit:
+        # Summary and first page come from the per-user cache
+        return jsonify({'success': True,
+                        **user_activity.overview(db.session, session['user_id'])})
+    try:
+        page = user_activity.page(db.session, session['user_id'], cursor, limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    return jsonify({'success': True, **page})
 
 @app.route('/admin/moderate')
 @admin_required
 def moderate_feedback():
     """Admin page to moderate pending feedback"""
-    pending_feedbacks = Feedback.query.filter_by(status='pending').order_by(Feedback.date_created.desc()).all()
+    query = Feedback.query.filter_by(status='pending').order_by(Feedback.date_created.desc())
+    pending_feedbacks = list(merge_sorted([query.all() for _ in each_shard()],
+                                          key=newest_first, reverse=True))
     return render_template('moderate.html', feedbacks=pending_feedbacks)
 
 @app.route('/admin/moderate/<int:feedback_id>/<action>', methods=['POST'])
@@ -263,7 +1039,7 @@ def moderate_action(feedback_id, action):
         return jsonify({'success': False, 'message': 'Invalid action'}), 400
     
     feedback = Feedback.query.get_or_404(feedback_id)
-    feedback.status = 'approved' if action == 'approve' else 'rejected'
+    apply_moderation(feedback, action)
     db.session.commit()
     
     return jsonify({
@@ -272,6 +1048,49 @@ def moderate_action(feedback_id, action):
         'status': feedback.status
     })
 
+def apply_moderation(feedback, action):
+    """Set a moderation decision and update the derived tables"""
+    old_status = feedback.status
+    feedback.status = 'approved' if action == 'approve' else 'rejected'
+    rollups.record_status_change(db.session, feedback, old_status)
+    terms.record_status_change(db.session, feedback, old_status)
+    ranking.sync_feedback(db.session, feedback)
+    sync.touch(db.session, feedback.id)
+    activity.touch(db.session, feedback.id)
+    outbox.emit(db.session, 'feedback.moderated', feedback.id, feedback.user_id,
+                status=feedback.status, old_status=old_status)
+    schedule_snapshot_publish(invalidate=True)
+
+@app.route('/admin/moderate/clusters', methods=['GET'])
+@admin_required
+def moderation_clusters():
+    """List groups of near-duplicate feedback awaiting moderation"""
+    # Near-duplicates are only detected within a shard
+    clusters = [cluster for _ in each_shard() for cluster in dedupe.pending_clusters(db.session)]
+    clusters.sort(key=lambda cluster: (-cluster['pending'], cluster['cluster_id']))
+    return jsonify({'success': True, 'clusters': clusters[:100]})
+
+@app.route('/admin/moderate/cluster/<int:cluster_id>/<action>', methods=['POST'])
+@admin_required
+def moderate_cluster(cluster_id, action):
+    """Approve or reject every pending item of a near-duplicate cluster"""
+    if action not in ['approve', 'reject']:
+        return jsonify({'success': False, 'message': 'Invalid action'}), 400
+    
+    ids = dedupe.cluster_members(db.session, cluster_id, status='pending')
+    if not ids:
+        return jsonify({'success': False, 'message': 'No pending feedback in cluster'}), 404
+    
+    for feedback in Feedback.query.filter(Feedback.id.in_(ids)):
+        apply_moderation(feedback, action)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(ids)} feedback items {"approved" if action == "approve" else "rejected"}',
+        'feedback_ids': ids
+    })
+
 # Vote submission endpoint
 @app.route('/api/vote', methods=['POST'])
 @login_required
@@ -295,6 +1114,9 @@ def submit_vote():
                 'error': 'Invalid vote_type. Must be "upvote" or "downvote"'
             }), 400
         
+        if shards is not None:
+            select_shard(shards.shard_of(feedback_id))
+        
         # Check if feedback exists
         feedback = Feedback.query.get(feedback_id)
         if not feedback:
@@ -316,6 +1138,14 @@ def submit_vote():
             feedback_id=feedback_id
         ).first()
         
+        old_vote_type = existing_vote.vote_type if existing_vote else None
+        rollups.record_vote(db.session, feedback, old_vote_type, vote_type)
+        ranking.record_vote(db.session, feedback, old_vote_type, vote_type)
+        sync.touch(db.session, feedback.id)
+        activity.touch(db.session, feedback.id)
+        outbox.emit(db.session, 'vote.cast', feedback.id, session.get('user_id'),
+                    vote=vote_type, old_vote=old_vote_type)
+        
         if existing_vote:
             # Update existing vote
             existing_vote.vote_type = vote_type
@@ -329,6 +1159,8 @@ def submit_vote():
             )
             db.session.add(new_vote)
         
+        if snapshot_store is not None and snapshot_store.count_votes():
+            schedule_snapshot_publish()
         db.session.commit()
         
         # Calculate updated vote score
@@ -369,7 +1201,16 @@ def remove_vote(feedback_id):
             }), 404
         
         # Delete the vote
+        feedback = db.session.get(Feedback, feedback_id)
+        rollups.record_vote(db.session, feedback, vote.vote_type, None)
+        ranking.record_vote(db.session, feedback, vote.vote_type, None)
+        sync.touch(db.session, feedback_id)
+        activity.touch(db.session, feedback_id)
+        outbox.emit(db.session, 'vote.removed', feedback_id, vote.user_id,
+                    old_vote=vote.vote_type)
         db.session.delete(vote)
+        if snapshot_store is not None and snapshot_store.count_votes():
+            schedule_snapshot_publish()
         db.session.commit()
         
         # Calculate updated vote score
@@ -387,8 +1228,192 @@ def remove_vote(feedback_id):
             'error': 'An error occurred while removing your vote'
         }), 500
 
+# Batched vote endpoint used by the client-side vote queue
+@app.route('/api/votes/batch', methods=['POST'])
+@login_required
+def submit_vote_batch():
+    """Apply several vote/unvote operations in one transaction"""
+    try:
+        operations = votes.parse_operations(request.get_json(silent=True))
+    except votes.BatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        # Each shard's votes are applied in a transaction of its own
+        by_id = {}
+        for shard, ids in group_by_shard(operations):
+            with use_shard(shard):
+                by_id.update((result['feedback_id'], result) for result in votes.apply_batch(
+                    db.session, session.get('user_id'), {i: operations[i] for i in ids}))
+        results = [by_id[feedback_id] for feedback_id in operations]
+        if snapshot_store is not None and snapshot_store.count_votes(len(results)):
+            schedule_snapshot_publish()
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'An error occurred while processing your votes'
+        }), 500
+    
+    return jsonify({'success': True, 'results': results})
+
+@app.route('/api/companies/<company_name>/stats', methods=['GET'])
+def company_stats(company_name):
+    """Sentiment breakdown and daily volume for a company, served from rollups"""
+    try:
+        days = int(request.args.get('days', rollups.DEFAULT_WINDOW_DAYS))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid days'}), 400
+    days = min(max(days, 1), 3650)
+    
+    stats = rollups.company_stats(db.session, company_name, days=days,
+                                  include_unapproved=bool(session.get('is_admin')))
+    return jsonify({'success': True, 'stats': stats})
+
+@app.route('/api/companies/<company_name>/trending', methods=['GET'])
+def company_trending(company_name):
+    """Most distinctive terms in a company's recent feedback, served from term rollups"""
+    try:
+        days = int(request.args.get('days', terms.DEFAULT_WINDOW_DAYS))
+        baseline_days = int(request.args.get('baseline_days', terms.DEFAULT_BASELINE_DAYS))
+        limit = int(request.args.get('limit', terms.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid days, baseline_days or limit'}), 400
+    scoring = request.args.get('scoring', 'llr')
+    if scoring not in terms.SCORINGS:
+        return jsonify({'success': False, 'error': 'Invalid scoring'}), 400
+    
+    days = min(max(days, 1), 365)
+    baseline_days = min(max(baseline_days, 0), 365)
+    limit = min(max(limit, 1), 100)
+    today = datetime.utcnow().date()
+    trending = trending_cache.get(
+        (company_name, days, baseline_days, scoring, limit), today.toordinal(),
+        lambda: terms.trending(db.session, company_name, days=days,
+                               baseline_days=baseline_days, scoring=scoring,
+                               limit=limit, today=today))
+    return jsonify({'success': True, 'trending': trending})
+
+@app.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """Return feedback items and vote scores changed since a change token"""
+    try:
+        # Sharded apps use one token per shard, joined with dots
+        tokens = [max(int(token), 0) for token in request.args.get('since', '0').split('.')]
+        limit = int(request.args.get('limit', sync.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since or limit'}), 400
+    
+    def collect(tokens):
+        return [sync.changes_since(
+            db.session,
+            tokens[index],
+            user_id=session.get('user_id'),
+            is_admin=bool(session.get('is_admin')),
+            limit=min(max(limit, 1), sync.MAX_PAGE_SIZE)
+        ) for index, _ in enumerate(each_shard())]
+    
+    count = len(shards) if shards is not None else 1
+    reset = len(tokens) != count
+    pages = collect([0] * count if reset else tokens)
+    if not reset and count > 1 and any(page['reset'] for page in pages):
+        # The client's cache is discarded, so every shard starts over
+        reset = True
+        pages = collect([0] * count)
+    feedbacks = [item for page in pages for item in page['feedbacks']]
+    present = {item['id'] for item in feedbacks}
+    changes = {
+        # Tokens are opaque to clients
+        'token': '.'.join(str(page['token']) for page in pages),
+        'feedbacks': feedbacks,
+        # A company moved between shards is removed from one and added to another
+        'removed': [i for page in pages for i in page['removed'] if i not in present],
+        'has_more': any(page['has_more'] for page in pages),
+        'reset': reset or any(page['reset'] for page in pages),
+    }
+    return jsonify({'success': True, **changes})
+
+def parse_offsets(token):
+    """Split an outbox token into one offset per database; None if malformed"""
+    count = len(shards) if shards is not None else 1
+    try:
+        offsets = [max(int(offset), 0) for offset in str(token).split('.')]
+    except ValueError:
+        return None
+    return offsets if len(offsets) == count else None
+
+@app.route('/admin/outbox', methods=['GET'])
+@admin_required
+def outbox_status():
+    """Outbox size and the lag of every consumer"""
+    logs = [outbox.status(db.session) for _ in each_shard()]
+    offsets = {}
+    for index, log in enumerate(logs):
+        for consumer in log['consumers']:
+            offsets.setdefault(consumer['consumer'], [0] * len(logs))[index] = consumer['offset']
+    return jsonify({
+        'success': True,
+        'head': '.'.join(str(log['head']) for log in logs),
+        'events': sum(log['events'] for log in logs),
+        'consumers': [{
+            'consumer': consumer,
+            'token': '.'.join(map(str, consumer_offsets)),
+            'lag': sum(log['head'] - offset for log, offset in zip(logs, consumer_offsets)),
+        } for consumer, consumer_offsets in sorted(offsets.items())],
+    })
+
+@app.route('/admin/outbox/<consumer>', methods=['GET'])
+@admin_required
+def outbox_events(consumer):
+    """Events after a consumer's checkpoint (or ``since``), without acknowledging them"""
+    try:
+        limit = int(request.args.get('limit', outbox.DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid limit'}), 400
+    limit = min(max(limit, 1), outbox.MAX_BATCH_SIZE)
+    since = None
+    if 'since' in request.args:
+        since = parse_offsets(request.args['since'])
+        if since is None:
+            return jsonify({'success': False, 'error': 'Invalid since'}), 400
+    
+    pages = []
+    for index, shard in enumerate(each_shard()):
+        after = since[index] if since is not None else outbox.checkpoint(db.session, consumer)
+        page = outbox.read(db.session, after, limit)
+        if shard is not None:
+            for event in page['events']:
+                event['shard'] = shard
+        pages.append(page)
+    return jsonify({
+        'success': True,
+        'events': [event for page in pages for event in page['events']],
+        # Acknowledge this token once the events are processed
+        'token': '.'.join(str(page['offset']) for page in pages),
+        'has_more': any(page['has_more'] for page in pages),
+        'lost': any(page['lost'] for page in pages),
+    })
+
+@app.route('/admin/outbox/<consumer>/ack', methods=['POST'])
+@admin_required
+def outbox_acknowledge(consumer):
+    """Move a consumer's checkpoint to a token returned by outbox_events"""
+    data = request.get_json(silent=True) or {}
+    offsets = parse_offsets(data.get('token', ''))
+    if offsets is None:
+        return jsonify({'success': False, 'error': 'Invalid token'}), 400
+    
+    checkpoints = []
+    for index, _ in enumerate(each_shard()):
+        outbox.acknowledge(db.session, consumer, offsets[index])
+        checkpoints.append(outbox.checkpoint(db.session, consumer))
+    db.session.commit()
+    return jsonify({'success': True, 'token': '.'.join(map(str, checkpoints))})
+
 # Get vote data for a specific feedback item
 @app.route('/api/feedback/<int:feedback_id>/votes', methods=['GET'])
+@conditional(data_version)
 def get_feedback_votes(feedback_id):
     """Get vote information for a specific feedback item"""
     try:
@@ -442,54 +1467,56 @@ def get_feedback_votes(feedback_id):
 
 # Get vote data for all feedback items
 @app.route('/api/feedback/votes', methods=['GET'])
+@conditional(data_version)
 def get_all_feedback_votes():
     """Get vote information for all feedback items"""
     try:
         # Get all feedback IDs from the current page
         # In a real implementation, you might want to filter by status or other criteria
         if session.get('is_admin'):
-            feedbacks = Feedback.query.all()
+            query = Feedback.query
         else:
-            feedbacks = Feedback.query.filter_by(status='approved').all()
+            query = Feedback.query.filter_by(status='approved')
         
         votes_data = {}
         user_id = session.get('user_id')
         
-        for feedback in feedbacks:
-            try:
-                # Calculate vote counts
-                upvotes = db.session.query(Vote).filter_by(
-                    feedback_id=feedback.id,
-                    vote_type='upvote'
-                ).count()
-                
-                downvotes = db.session.query(Vote).filter_by(
-                    feedback_id=feedback.id,
-                    vote_type='downvote'
-                ).count()
-                
-                vote_score = upvotes - downvotes
-                
-                # Get user's vote if authenticated
-                user_vote = None
-                if user_id:
-                    user_vote_record = db.session.query(Vote).filter_by(
-                        user_id=user_id,
-                        feedback_id=feedback.id
-                    ).first()
-                    if user_vote_record:
-                        user_vote = user_vote_record.vote_type
-                
-                votes_data[str(feedback.id)] = {
-                    'vote_score': vote_score,
-                    'upvotes': upvotes,
-                    'downvotes': downvotes,
-                    'user_vote': user_vote
-                }
-            except Exception as feedback_error:
-                # Log error but continue with other feedback
-                print(f"Error processing feedback {feedback.id}: {feedback_error}")
-                continue
+        for _ in each_shard():
+            for feedback in query.all():
+                try:
+                    # Calculate vote counts
+                    upvotes = db.session.query(Vote).filter_by(
+                        feedback_id=feedback.id,
+                        vote_type='upvote'
+                    ).count()
+                    
+                    downvotes = db.session.query(Vote).filter_by(
+                        feedback_id=feedback.id,
+                        vote_type='downvote'
+                    ).count()
+                    
+                    vote_score = upvotes - downvotes
+                    
+                    # Get user's vote if authenticated
+                    user_vote = None
+                    if user_id:
+                        user_vote_record = db.session.query(Vote).filter_by(
+                            user_id=user_id,
+                            feedback_id=feedback.id
+                        ).first()
+                        if user_vote_record:
+                            user_vote = user_vote_record.vote_type
+                    
+                    votes_data[str(feedback.id)] = {
+                        'vote_score': vote_score,
+                        'upvotes': upvotes,
+                        'downvotes': downvotes,
+                        'user_vote': user_vote
+                    }
+                except Exception as feedback_error:
+                    # Log error but continue with other feedback
+                    print(f"Error processing feedback {feedback.id}: {feedback_error}")
+                    continue
         
         return jsonify({
             'success': True,
@@ -505,6 +1532,66 @@ def get_all_feedback_votes():
             'error': 'An error occurred while fetching vote data'
         }), 500
 
+# Profiler endpoints (admin only, available when PROFILER_ENABLED is set)
+@app.route('/admin/profiler', methods=['GET'])
+@admin_required
+def profiler_stacks():
+    """Return sampled stacks in flamegraph collapsed-stack format"""
+    if profiler is None:
+        return jsonify({'success': False, 'error': 'Profiler is disabled'}), 404
+    
+    if request.args.get('format') == 'summary':
+        return jsonify({'success': True, 'routes': profiler.summary()})
+    
+    body = profiler.collapsed(route=request.args.get('route'))
+    return app.response_class(body, mimetype='text/plain')
+
+@app.route('/admin/profiler/reset', methods=['POST'])
+@admin_required
+def profiler_reset():
+    """Discard all collected profiler samples"""
+    if profiler is None:
+        return jsonify({'success': False, 'error': 'Profiler is disabled'}), 404
+    
+    profiler.reset()
+    return jsonify({'success': True})
+
+@app.route('/healthz/ready', methods=['GET'])
+def readiness():
+    """Readiness check: 503 until the startup warmup has finished"""
+    status = warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@warmup.step('database pages')
+def prime_database_pages():
+    """Read the hot tables and indexes through every pooled connection"""
+    if shards is not None:
+        engines = shards.writers + shards.readers
+    else:
+        engines = [db.engine, app.extensions['db_reader']]
+    scanned = sum(prime_sqlite(engine, app.config['WARMUP_TABLES'])
+                  for engine in engines if engine is not None)
+    return f'{scanned} scans'
+
+@warmup.step('listings')
+def warm_listings():
+    """Cache the listing pages visitors load first and render the home page once"""
+    version = data_version()
+    page_size = app.config['INDEX_PAGE_SIZE']
+    pages = 0
+    for sort_by in LISTING_SORTS:
+        for page in range(app.config['WARMUP_LISTING_PAGES']):
+            # The parameters search-filter.js sends for a public listing page
+            params = listing_params(sort_by=sort_by, limit=page_size,
+                                    offset=page * page_size, with_count=True)
+            listing_cache.get(tuple(sorted(params.items())), version,
+                              lambda: feedback_listing(params))
+            pages += 1
+    # Also warms URL building, the ORM's statement cache and the first render
+    with app.test_client() as client:
+        client.get('/')
+    return f'{pages} listing pages'
+
 # Template context processor to make user info available in all templates
 @app.context_processor
 def inject_user():
@@ -522,6 +1609,8 @@ def inject_user():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        if shards is not None:
+            shards.create_all()
         
         # Create default admin user if not exists
         admin = User.query.filter_by(username='admin').first()
@@ -536,5 +1625,15 @@ if __name__ == '__main__':
             db.session.commit()
             print(" Default admin user created (username: admin, password: admin123)")
             print("  IMPORTANT: Change this password after first login!")
+        
+        # Load registered usernames/emails for availability checks
+        init_auth_db()
+        app.extensions['availability'].rebuild()
+        schedule_session_expiry()
+        schedule_outbox_compaction()
+        db.session.commit()
     
+    # Compile templates and fill caches before the first request
+    warmup.run(log=print)
+    job_queue.start()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
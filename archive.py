@@ -0,0 +1,378 @@
+"""Feedback Archival Module
+
+Moves rejected and aged-out feedback, together with its votes, out of the
+live ``feedback``/``vote`` tables into ``feedback_archive`` and
+``vote_archive``. Listing, moderation and vote aggregation queries then
+only touch the small live tables and their indexes.
+
+Rows are moved in batches, one transaction per batch. Each batch also
+removes the items' ranking rows and near-duplicate index entries,
+subtracts them from the company rollups and records a delta-sync change
+so clients drop them. An archived item's votes are frozen, so its vote
+counts and hot/best scores are stored with it, and listings that include
+the archive sort and page it in SQL. ``restore`` reverses
+all of this. Archived rows keep their IDs; the newest live row is never
+archived so SQLite does not hand its ID out again.
+
+Usage:
+    python archive.py run [--rejected-days 7] [--max-age-days 730] [--dry-run]
+    python archive.py restore 12 15 40
+    python archive.py stats
+"""
+
+import argparse
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+import activity
+import dedupe
+import outbox
+import ranking
+import rollups
+import sync
+import terms
+
+
+DEFAULT_REJECTED_DAYS = 7
+DEFAULT_MAX_AGE_DAYS = 730
+DEFAULT_BATCH_SIZE = 500
+
+FEEDBACK_COLUMNS = ('id, user_id, company_name, company_logo, comment, '
+                    'sentiment, status, date_created')
+VOTE_COLUMNS = 'id, user_id, feedback_id, vote_type, created_at, updated_at'
+
+CANDIDATES_SQL = text('''
+    SELECT id, CASE WHEN status = 'rejected' AND date_created < :rejected_before
+                    THEN 'rejected' ELSE 'aged' END
+    FROM feedback
+    WHERE id > :after
+      AND id < (SELECT MAX(id) FROM feedback)
+      AND ((status = 'rejected' AND date_created < :rejected_before)
+           OR date_created < :aged_before)
+    ORDER BY id
+    LIMIT :limit
+''').bindparams(bindparam('rejected_before', type_=DateTime),
+                bindparam('aged_before', type_=DateTime))
+SCORES_SQL = text('''
+    UPDATE feedback_archive SET upvotes = :upvotes, downvotes = :downvotes,
+        hot = :hot, best = :best
+    WHERE id = :feedback_id
+''')
+# Archived listing order per sort, matching the live listing's
+ORDER_BY = {
+    'recent': 'f.date_created DESC',
+    'oldest': 'f.date_created ASC',
+    'helpful': '(f.upvotes + f.downvotes > 0) DESC, f.upvotes - f.downvotes DESC, '
+               'f.date_created DESC',
+    'hot': 'f.hot DESC, f.date_created DESC',
+    'best': 'f.best DESC, f.date_created DESC',
+}
+VOTE_COUNTS_SQL = '''
+    SELECT f.id, f.company_name, f.sentiment, f.status, f.date_created,
+           COALESCE(SUM(v.vote_type = 'upvote'), 0),
+           COALESCE(SUM(v.vote_type = 'downvote'), 0)
+    FROM {feedback} f LEFT JOIN {vote} v ON v.feedback_id = f.id
+    WHERE f.id IN :ids
+    GROUP BY f.id
+'''
+
+
+def _expanding(sql):
+    return text(sql).bindparams(bindparam('ids', expanding=True))
+
+
+def _item_counts(session, ids, feedback_table, vote_table):
+    """Load the rollup/ranking inputs of feedback items."""
+    return session.execute(
+        _expanding(VOTE_COUNTS_SQL.format(feedback=feedback_table, vote=vote_table))
+        .columns(date_created=DateTime),
+        {'ids': ids}
+    ).all()
+
+
+def _adjust_rollups(session, items, sign):
+    """Add (sign=1) or subtract (sign=-1) items from the company rollups."""
+    deltas = Counter()
+    for _, company_name, sentiment, status, date_created, upvotes, downvotes in items:
+        key = (company_name, date_created.date(), sentiment)
+        deltas[key + ('feedback_count',)] += sign
+        deltas[key + ('approved_count',)] += sign * int(status == 'approved')
+        deltas[key + ('upvotes',)] += sign * upvotes
+        deltas[key + ('downvotes',)] += sign * downvotes
+        deltas[key + ('approved_upvotes',)] += sign * upvotes * int(status == 'approved')
+        deltas[key + ('approved_downvotes',)] += sign * downvotes * int(status == 'approved')
+    for key in {key[:3] for key in deltas}:
+        rollups.adjust(session, *key, **{
+            field: deltas[key + (field,)]
+            for field in ('feedback_count', 'approved_count', 'upvotes', 'downvotes',
+                          'approved_upvotes', 'approved_downvotes')
+        })
+
+
+def archive_batch(session, ids, reasons, now=None):
+    """Move feedback items and their votes to the archive tables.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        ids (list): Feedback IDs to archive
+        reasons (dict): Archive reason ('rejected' or 'aged') by ID
+        now (datetime, optional): Archive timestamp
+
+    Returns:
+        int: Number of feedback items archived
+    """
+    if not ids:
+        return 0
+    now = now or datetime.utcnow()
+    items = _item_counts(session, ids, 'feedback', 'vote')
+    try:
+        insert_archive = _expanding(f'''
+            INSERT INTO feedback_archive ({FEEDBACK_COLUMNS}, archived_at, archive_reason)
+            SELECT {FEEDBACK_COLUMNS}, :now, :reason FROM feedback WHERE id IN :ids
+        ''').bindparams(bindparam('now', type_=DateTime))
+        for reason, group in _group_by_reason(ids, reasons).items():
+            session.execute(insert_archive, {'ids': group, 'now': now, 'reason': reason})
+        session.execute(SCORES_SQL, [ranking._row(*item) for item in items])
+        session.execute(_expanding(f'''
+            INSERT INTO vote_archive ({VOTE_COLUMNS})
+            SELECT {VOTE_COLUMNS} FROM vote WHERE feedback_id IN :ids
+        '''), {'ids': ids})
+        _adjust_rollups(session, items, -1)
+        activity.touch(session, *ids)
+        for reason, group in _group_by_reason(ids, reasons).items():
+            outbox.emit_feedback(session, 'feedback.archived', group, reason=reason)
+        dedupe.remove(session, ids)
+        terms.remove(session, ids)
+        for statement in ('DELETE FROM feedback_rank WHERE feedback_id IN :ids',
+                          'DELETE FROM vote WHERE feedback_id IN :ids',
+                          'DELETE FROM feedback WHERE id IN :ids'):
+            session.execute(_expanding(statement), {'ids': ids})
+        sync.touch(session, *ids)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(items)
+
+
+def _group_by_reason(ids, reasons):
+    groups = {}
+    for feedback_id in ids:
+        groups.setdefault(reasons.get(feedback_id, 'manual'), []).append(feedback_id)
+    return groups
+
+
+def find_candidates(session, rejected_days=DEFAULT_REJECTED_DAYS,
+                    max_age_days=DEFAULT_MAX_AGE_DAYS, after=0,
+                    limit=DEFAULT_BATCH_SIZE, now=None):
+    """Find live feedback due for archival.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        rejected_days (int): Archive rejected items older than this
+        max_age_days (int): Archive any item older than this
+        after (int): Only consider IDs greater than this
+        limit (int): Maximum number of candidates
+        now (datetime, optional): Reference time
+
+    Returns:
+        list: (feedback id, reason) pairs in ID order
+    """
+    now = now or datetime.utcnow()
+    return [tuple(row) for row in session.execute(CANDIDATES_SQL, {
+        'rejected_before': now - timedelta(days=rejected_days),
+        'aged_before': now - timedelta(days=max_age_days),
+        'after': after,
+        'limit': limit,
+    })]
+
+
+def run(session, rejected_days=DEFAULT_REJECTED_DAYS,
+        max_age_days=DEFAULT_MAX_AGE_DAYS, batch_size=DEFAULT_BATCH_SIZE,
+        dry_run=False, now=None):
+    """Archive every due feedback item in batches.
+
+    Returns:
+        Counter: Number of items archived (or due, in dry-run mode) per reason
+    """
+    now = now or datetime.utcnow()
+    archived = Counter()
+    after = 0
+    while True:
+        candidates = find_candidates(session, rejected_days, max_age_days,
+                                     after, batch_size, now)
+        if not candidates:
+            return archived
+        after = candidates[-1][0]
+        archived.update(reason for _, reason in candidates)
+        if not dry_run:
+            archive_batch(session, [c[0] for c in candidates],
+                          dict(candidates), now)
+
+
+def restore(session, ids):
+    """Move archived feedback items and their votes back to the live tables.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        ids (list): Feedback IDs to restore
+
+    Returns:
+        list: IDs that were restored (unknown IDs are skipped)
+    """
+    items = _item_counts(session, list(ids), 'feedback_archive', 'vote_archive') if ids else []
+    restored = [item[0] for item in items]
+    if not restored:
+        return []
+    try:
+        session.execute(_expanding(f'''
+            INSERT INTO feedback ({FEEDBACK_COLUMNS})
+            SELECT {FEEDBACK_COLUMNS} FROM feedback_archive WHERE id IN :ids
+        '''), {'ids': restored})
+        # Vote IDs may have been reused meanwhile, so restored votes get new ones
+        session.execute(_expanding('''
+            INSERT INTO vote (user_id, feedback_id, vote_type, created_at, updated_at)
+            SELECT user_id, feedback_id, vote_type, created_at, updated_at
+            FROM vote_archive WHERE feedback_id IN :ids
+        '''), {'ids': restored})
+        _adjust_rollups(session, items, 1)
+        session.execute(ranking.UPSERT_SQL, [
+            ranking._row(feedback_id, company_name, sentiment, status,
+                         date_created, upvotes, downvotes)
+            for (feedback_id, company_name, sentiment, status, date_created,
+                 upvotes, downvotes) in items
+        ])
+        for feedback_id, comment in session.execute(_expanding(
+                'SELECT id, comment FROM feedback WHERE id IN :ids'), {'ids': restored}).all():
+            dedupe.index_feedback(session, feedback_id, comment)
+        terms.index_ids(session, restored)
+        for statement in ('DELETE FROM vote_archive WHERE feedback_id IN :ids',
+                          'DELETE FROM feedback_archive WHERE id IN :ids'):
+            session.execute(_expanding(statement), {'ids': restored})
+        sync.touch(session, *restored)
+        activity.touch(session, *restored)
+        outbox.emit_feedback(session, 'feedback.restored', restored)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return restored
+
+
+def stats(session):
+    """Count live and archived rows.
+
+    Returns:
+        dict: Row counts per table and archived items per reason
+    """
+    counts = {table: session.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+              for table in ('feedback', 'vote', 'feedback_archive', 'vote_archive')}
+    counts['archived_by_reason'] = dict(session.execute(text(
+        'SELECT archive_reason, COUNT(*) FROM feedback_archive GROUP BY archive_reason'
+    )).all())
+    return counts
+
+
+def _archived_filter(is_admin, search, sentiment, company):
+    """Build the WHERE clause and parameters of an archived listing."""
+    conditions = ['1 = 1']
+    params = {}
+    if not is_admin:
+        conditions.append("f.status = 'approved'")
+    if search:
+        conditions.append('(lower(f.company_name) LIKE :search OR lower(f.comment) LIKE :search)')
+        params['search'] = f'%{search.lower()}%'
+    if sentiment:
+        conditions.append('f.sentiment = :sentiment')
+        params['sentiment'] = sentiment
+    if company:
+        conditions.append('f.company_name = :company')
+        params['company'] = company
+    return ' AND '.join(conditions), params
+
+
+def archived_feedback(session, is_admin=False, search='', sentiment='',
+                      company='', sort_by='recent', limit=None):
+    """Query archived feedback for listings that pass ``include_archived``.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        is_admin (bool): Whether non-approved items are visible
+        search (str): Case-insensitive substring of company or comment
+        sentiment (str): Sentiment filter
+        company (str): Company filter
+        sort_by (str): Listing sort, a key of ``ORDER_BY``
+        limit (int, optional): Return only the first rows in that order
+
+    Returns:
+        list: Rows with the feedback columns, vote counts and scores
+    """
+    where, params = _archived_filter(is_admin, search, sentiment, company)
+    sql = f'''
+        SELECT f.id, f.user_id, f.company_name, f.company_logo, f.comment,
+               f.sentiment, f.status, f.date_created, f.upvotes, f.downvotes,
+               f.hot, f.best
+        FROM feedback_archive f
+        WHERE {where}
+        ORDER BY {ORDER_BY[sort_by]}, f.id DESC
+    '''
+    if limit:
+        sql += ' LIMIT :limit'
+        params['limit'] = limit
+    return session.execute(text(sql).columns(date_created=DateTime), params).all()
+
+
+def count_archived(session, is_admin=False, search='', sentiment='', company=''):
+    """Count the archived feedback ``archived_feedback`` would list."""
+    where, params = _archived_filter(is_admin, search, sentiment, company)
+    return session.execute(text(f'SELECT COUNT(*) FROM feedback_archive f WHERE {where}'),
+                           params).scalar()
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Archive old feedback')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Archive due feedback')
+    run_parser.add_argument('--rejected-days', type=int, default=DEFAULT_REJECTED_DAYS)
+    run_parser.add_argument('--max-age-days', type=int, default=DEFAULT_MAX_AGE_DAYS)
+    run_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    run_parser.add_argument('--dry-run', action='store_true')
+    restore_parser = subparsers.add_parser('restore', help='Restore archived feedback')
+    restore_parser.add_argument('ids', type=int, nargs='+')
+    subparsers.add_parser('stats', help='Show live and archived row counts')
+    args = parser.parse_args(argv)
+
+    from app import app, db, schedule_snapshot_publish
+
+    with app.app_context():
+        db.create_all()
+        if args.command == 'run':
+            archived = run(db.session, args.rejected_days, args.max_age_days,
+                           args.batch_size, args.dry_run)
+            if archived and not args.dry_run:
+                schedule_snapshot_publish(invalidate=True)
+                db.session.commit()
+            verb = 'Would archive' if args.dry_run else 'Archived'
+            print(f"✓ {verb} {sum(archived.values())} feedback items")
+            for reason, count in sorted(archived.items()):
+                print(f"  - {reason}: {count}")
+        elif args.command == 'restore':
+            restored = restore(db.session, args.ids)
+            if restored:
+                schedule_snapshot_publish(invalidate=True)
+                db.session.commit()
+            print(f"✓ Restored {len(restored)} feedback items")
+            for feedback_id in sorted(set(args.ids) - set(restored)):
+                print(f"✗ Feedback {feedback_id} is not archived")
+        else:
+            for key, value in stats(db.session).items():
+                print(f"  {key}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,9 @@ Authentication Blueprint for User Management
 Handles user registration, login, logout, and session management
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, flash, session
 from functools import wraps
+from passwords import HasherBusy
 import sqlite3
 import re
 
@@ -14,7 +14,9 @@ auth_bp = Blueprint('auth', __name__)
 # Database helper functions
 def get_db_connection():
     """Create database connection"""
-    conn = sqlite3.connect('instance/openfeed.db')
+    # Shares the file with the app's writer; wait for its lock instead of failing
+    conn = sqlite3.connect(current_app.config.get('AUTH_DATABASE', 'instance/openfeed.db'),
+                           timeout=current_app.config.get('DB_BUSY_TIMEOUT', 5000) / 1000)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -67,6 +69,7 @@ def admin_required(f):
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('auth.login'))
         
+        # Checked on every request: a demoted admin's session stays valid
         conn = get_db_connection()
         user = conn.execute('SELECT is_admin FROM users WHERE id = ?', 
                           (session['user_id'],)).fetchone()
@@ -96,6 +99,37 @@ def validate_password(password):
         return False, "Password must contain at least one number"
     return True, "Valid password"
 
+def password_hasher():
+    """Get the app's password hashing pool (see passwords.py)"""
+    return current_app.extensions['password_hasher']
+
+def check_login_rate(username):
+    """Take a login attempt from the client IP and account buckets
+
+    Returns:
+        float: Seconds until the next attempt is allowed, 0 if allowed now
+    """
+    limits = current_app.extensions['login_limits']
+    ip_allowed, ip_retry = limits['ip'].hit(request.remote_addr or 'unknown')
+    if not ip_allowed:
+        return ip_retry
+    account_allowed, account_retry = limits['account'].hit(username.lower())
+    return 0 if account_allowed else account_retry
+
+def availability_checker():
+    """Get the app's Bloom-filter backed availability checker (see availability.py)"""
+    return current_app.extensions['availability']
+
+def rate_limited_response(template, retry_after):
+    """Render a form page with 429 Too Many Requests"""
+    flash('Too many login attempts. Please wait a moment and try again.', 'danger')
+    return render_template(template), 429, {'Retry-After': str(int(retry_after) + 1)}
+
+def busy_response(template):
+    """Render a form page with 503 when the hashing pool is saturated"""
+    flash('The server is busy. Please try again in a moment.', 'danger')
+    return render_template(template), 503, {'Retry-After': '1'}
+
 # Routes
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -131,20 +165,21 @@ def register():
             flash(message, 'danger')
             return render_template('register.html')
         
-        # Check if user already exists
+        # Check if user already exists; definite misses skip the database
         conn = get_db_connection()
-        existing_user = conn.execute(
-            'SELECT id FROM users WHERE username = ? OR email = ?',
-            (username, email)
-        ).fetchone()
-        
-        if existing_user:
+        checker = availability_checker()
+        if (checker.is_taken(conn, 'username', username)
+                or checker.is_taken(conn, 'email', email)):
             conn.close()
             flash('Username or email already exists.', 'danger')
             return render_template('register.html')
         
         # Create new user
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher().hash(password)
+        except HasherBusy:
+            conn.close()
+            return busy_response('register.html')
         try:
             conn.execute(
                 'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
@@ -152,8 +187,15 @@ def register():
             )
             conn.commit()
             conn.close()
+            checker.add(username, email)
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
+        except sqlite3.IntegrityError:
+            # Registered concurrently, or by a process the filter hasn't seen yet
+            conn.close()
+            checker.add(username, email)
+            flash('Username or email already exists.', 'danger')
+            return render_template('register.html')
         except Exception as e:
             conn.close()
             flash('An error occurred during registration. Please try again.', 'danger')
@@ -161,6 +203,48 @@ def register():
     
     return render_template('register.html')
 
+@auth_bp.route('/check-availability', methods=['GET'])
+def check_availability():
+    """Live form validation: report whether a username and/or email is free"""
+    username = request.args.get('username', '').strip()
+    email = request.args.get('email', '').strip()
+    if not username and not email:
+        return jsonify({
+            'success': False,
+            'error': 'Provide a username and/or email to check'
+        }), 400
+    
+    allowed, retry_after = current_app.extensions['login_limits']['availability'].hit(
+        request.remote_addr or 'unknown'
+    )
+    if not allowed:
+        return jsonify({
+            'success': False,
+            'error': 'Too many requests'
+        }), 429, {'Retry-After': str(int(retry_after) + 1)}
+    
+    result = {'success': True}
+    conn = get_db_connection()
+    try:
+        checker = availability_checker()
+        if username:
+            valid = len(username) >= 3
+            result['username'] = {
+                'value': username,
+                'valid': valid,
+                'available': valid and not checker.is_taken(conn, 'username', username)
+            }
+        if email:
+            valid = validate_email(email)
+            result['email'] = {
+                'value': email,
+                'valid': valid,
+                'available': valid and not checker.is_taken(conn, 'email', email)
+            }
+    finally:
+        conn.close()
+    return jsonify(result)
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login page"""
@@ -175,14 +259,34 @@ def login():
             flash('Please enter both username and password.', 'danger')
             return render_template('login.html')
         
+        # Reject brute-force traffic before it costs a password hash
+        retry_after = check_login_rate(username)
+        if retry_after:
+            return rate_limited_response('login.html', retry_after)
+        
         conn = get_db_connection()
         user = conn.execute(
             'SELECT * FROM users WHERE username = ? OR email = ?',
             (username, username)
         ).fetchone()
+        
+        valid, new_hash = False, None
+        if user:
+            try:
+                valid, new_hash = password_hasher().verify(user['password_hash'], password)
+            except HasherBusy:
+                conn.close()
+                return busy_response('login.html')
+        if new_hash:
+            # Hash parameters changed since this password was stored
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                         (new_hash, user['id']))
+            conn.commit()
         conn.close()
         
-        if user and check_password_hash(user['password_hash'], password):
+        if valid:
+            # New session ID, so one seen before login can't be reused
+            session.regenerate()
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['is_admin'] = user['is_admin']
@@ -198,6 +302,7 @@ def login():
 def logout():
     """Log out the current user"""
     session.clear()
+    session.regenerate()
     flash('You have been logged out successfully.', 'info')
     return redirect(url_for('index'))
 
@@ -213,12 +318,18 @@ def profile():
         (session['user_id'],)
     ).fetchone()
     
-    # Get user's feedback submissions (update this based on your feedback table structure)
-    feedback_list = conn.execute(
-        'SELECT * FROM feedback_new WHERE user_id = ? ORDER BY created_at DESC',
-        (session['user_id'],)
-    ).fetchall()
-    
     conn.close()
     
-    return render_template('profile.html', user=user, feedback_list=feedback_list)
\ No newline at end of file
+    # Feedback lives in the app database; see activity.py
+    db_session = current_app.extensions['sqlalchemy'].session
+    service = current_app.extensions['user_activity']
+    overview = service.overview(db_session, session['user_id'])
+    page = overview
+    if request.args.get('cursor'):
+        try:
+            page = service.page(db_session, session['user_id'], request.args['cursor'])
+        except ValueError:
+            return redirect(url_for('auth.profile'))
+    
+    return render_template('profile.html', user=user, summary=overview['summary'],
+                           feedback_list=page['feedbacks'], next_cursor=page['next_cursor'])
\ No newline at end of file
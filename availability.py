@@ -0,0 +1,173 @@
+"""Username/Email Availability Module
+
+Answers "is this username or email taken?" without a database round trip
+for the common case. Every existing username and email is added to an
+in-memory Bloom filter. A value the filter has never seen is definitely
+available; only possible hits fall through to an indexed point lookup on
+the ``users`` table (both columns are UNIQUE, so SQLite keeps an index on
+each).
+
+The filter is built from the database on first use, updated as users
+register, and rebuilt after ``max_age`` seconds to pick up accounts
+created by other processes.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_ERROR_RATE = 0.01
+DEFAULT_MAX_AGE = 300
+FIELDS = ('username', 'email')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        """Initialize the BloomFilter.
+
+        Args:
+            capacity (int): Expected number of items
+            error_rate (float): Target false positive rate at capacity
+        """
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        """Derive bit positions by double hashing one 128-bit digest."""
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        """Add a value to the filter."""
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+
+class AvailabilityChecker:
+    """Bloom-filter prefiltered availability checks against ``users``."""
+
+    def __init__(self, connect, capacity=DEFAULT_CAPACITY,
+                 error_rate=DEFAULT_ERROR_RATE, max_age=DEFAULT_MAX_AGE):
+        """Initialize the AvailabilityChecker.
+
+        Args:
+            connect: Function returning a new sqlite3 connection to the
+                auth database
+            capacity (int): Minimum expected number of users
+            error_rate (float): Target false positive rate of the filter
+            max_age (float): Seconds before the filter is rebuilt
+        """
+        self.connect = connect
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self.stats = {'filtered': 0, 'lookups': 0, 'false_positives': 0}
+        self._filters = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self, conn=None):
+        """Load every username and email from the database.
+
+        Args:
+            conn: Open sqlite3 connection, or None to open one
+
+        Returns:
+            int: Number of users loaded
+        """
+        own = conn is None
+        conn = conn or self.connect()
+        try:
+            users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+            capacity = max(self.capacity, users * 2)
+            filters = {field: BloomFilter(capacity, self.error_rate)
+                       for field in FIELDS}
+            for username, email in conn.execute('SELECT username, email FROM users'):
+                filters['username'].add(username)
+                filters['email'].add(email)
+        finally:
+            if own:
+                conn.close()
+        with self._lock:
+            self._filters = filters
+            self._built_at = time.monotonic()
+        return users
+
+    def _current_filters(self, conn):
+        if (self._filters is None
+                or time.monotonic() - self._built_at > self.max_age):
+            self.rebuild(conn)
+        return self._filters
+
+    def add(self, username, email):
+        """Record a newly registered user."""
+        with self._lock:
+            if self._filters is None:
+                return  # built from the database on first use
+            for field, value in (('username', username), ('email', email)):
+                bloom = self._filters[field]
+                bloom.add(value)
+                if bloom.count > bloom.capacity:
+                    self._built_at = 0.0  # grow on the next check
+
+    def is_taken(self, conn, field, value):
+        """Check whether a username or email is already registered.
+
+        Args:
+            conn: Open sqlite3 connection to the auth database
+            field (str): 'username' or 'email'
+            value (str): Value to check
+
+        Returns:
+            bool: True if a user already has the value
+        """
+        if field not in FIELDS:
+            raise ValueError('Unknown field: %s' % field)
+        if value not in self._current_filters(conn)[field]:
+            self.stats['filtered'] += 1
+            return False
+        self.stats['lookups'] += 1
+        taken = conn.execute(
+            'SELECT 1 FROM users WHERE %s = ?' % field, (value,)
+        ).fetchone() is not None
+        if not taken:
+            self.stats['false_positives'] += 1
+        return taken
+
+
+def init_availability(app, connect):
+    """Create the app's availability checker from its config.
+
+    Reads ``AVAILABILITY_BLOOM_CAPACITY``, ``AVAILABILITY_BLOOM_ERROR_RATE``
+    and ``AVAILABILITY_BLOOM_MAX_AGE``.
+
+    Args:
+        app: Flask application
+        connect: Function returning a sqlite3 connection to the auth database
+
+    Returns:
+        AvailabilityChecker: The installed checker
+    """
+    checker = AvailabilityChecker(
+        connect,
+        capacity=app.config.get('AVAILABILITY_BLOOM_CAPACITY', DEFAULT_CAPACITY),
+        error_rate=app.config.get('AVAILABILITY_BLOOM_ERROR_RATE', DEFAULT_ERROR_RATE),
+        max_age=app.config.get('AVAILABILITY_BLOOM_MAX_AGE', DEFAULT_MAX_AGE),
+    )
+    app.extensions['availability'] = checker
+    return checker
@@ -0,0 +1,186 @@
+"""Benchmark: mixed read/write load against one SQLite file
+
+Starts several app processes (like a multi-worker server) on one
+database. Each runs reader threads (full ``helpful`` listings, which
+aggregate every vote) next to writer threads (``POST /api/vote``) and
+counts "database is locked" errors raised by SQLite. The engine layout is
+fixed when the app is imported, so every mode gets fresh processes and a
+fresh database:
+
+- ``shared``: routing disabled (``OPENFEED_DB_READERS=0``), i.e. one
+  read-write pool shared by every request, as before the split.
+- ``split``: single queued writer plus ``query_only`` WAL readers.
+
+Usage:
+    python benchmarks/bench_db_contention.py [--processes 4] [--readers 4]
+        [--writers 4] [--rows 20000] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODES = ('shared', 'split')
+
+
+def import_app(args):
+    os.environ['OPENFEED_DATABASE_URI'] = 'sqlite:///' + args.database
+    os.environ['OPENFEED_DB_READERS'] = '0' if args.mode == 'shared' else str(args.readers)
+    sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def populate(args):
+    """Create the schema, one user per writer thread and the feedback rows."""
+    module = import_app(args)
+    app, db = module.app, module.db
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(module.User), [{
+            'username': f'writer{i}', 'email': f'writer{i}@example.com',
+            'password_hash': 'x',
+        } for i in range(args.processes * args.writers)])
+        db.session.execute(db.insert(module.Feedback), [{
+            'company_name': 'Google',
+            'comment': 'The service was good but the app could be faster. ' * 4,
+            'sentiment': 'positive',
+            'status': 'approved',
+        } for _ in range(args.rows)])
+        db.session.commit()
+
+
+def load(args):
+    """Run one process worth of load and print its results as JSON."""
+    from sqlalchemy import event
+
+    module = import_app(args)
+    app, db = module.app, module.db
+    locked = Counter()
+    lock = threading.Lock()
+
+    def count_lock_errors(context):
+        if 'locked' in str(context.original_exception):
+            with lock:
+                locked['errors'] += 1
+
+    with app.app_context():
+        engines = [db.engine]
+    if app.extensions['db_reader'] is not None:
+        engines.append(app.extensions['db_reader'])
+    for engine in engines:
+        event.listen(engine, 'handle_error', count_lock_errors)
+
+    counts = Counter()
+    deadline = time.perf_counter() + args.seconds
+
+    def reader():
+        local = Counter()
+        with app.test_client() as client:
+            while time.perf_counter() < deadline:
+                response = client.get('/api/feedback/filter?sort=helpful&limit=50')
+                local[f'read {response.status_code}'] += 1
+        with lock:
+            counts.update(local)
+
+    def writer(user_id):
+        local = Counter()
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+            i = 0
+            while time.perf_counter() < deadline:
+                response = client.post('/api/vote', json={
+                    'feedback_id': (user_id * 7919 + i) % args.rows + 1,
+                    'vote_type': 'upvote' if i % 2 else 'downvote',
+                })
+                local[f'write {response.status_code}'] += 1
+                i += 1
+        with lock:
+            counts.update(local)
+
+    first_user = args.process * args.writers + 1
+    threads = ([threading.Thread(target=reader) for _ in range(args.readers)]
+               + [threading.Thread(target=writer, args=(first_user + i,))
+                  for i in range(args.writers)])
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({'counts': dict(counts), 'locked': locked['errors'],
+                      'elapsed': time.perf_counter() - started}))
+
+
+def child(args, role, **extra):
+    command = [sys.executable, __file__, '--role', role, '--mode', args.mode,
+               '--database', args.database]
+    for name in ('processes', 'readers', 'writers', 'rows', 'seconds'):
+        command += ['--' + name, str(getattr(args, name))]
+    for name, value in extra.items():
+        command += ['--' + name, str(value)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def run_mode(args):
+    args.database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    if child(args, 'populate').wait() != 0:
+        raise SystemExit('populate failed')
+    workers = [child(args, 'load', process=i) for i in range(args.processes)]
+    counts = Counter()
+    locked = 0
+    elapsed = 0.0
+    for worker in workers:
+        output, _ = worker.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        counts.update(result['counts'])
+        locked += result['locked']
+        elapsed = max(elapsed, result['elapsed'])
+    return counts, locked, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--role', choices=('populate', 'load'), help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--process', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'populate':
+        populate(args)
+        return
+    if args.role == 'load':
+        load(args)
+        return
+
+    print(f"{args.processes} processes x ({args.readers} readers + {args.writers} writers), "
+          f"{args.rows} rows, {args.seconds:g} s per mode")
+    for mode in MODES:
+        args.mode = mode
+        counts, locked, elapsed = run_mode(args)
+        reads = counts.get('read 200', 0)
+        writes = counts.get('write 200', 0)
+        failed = sum(n for key, n in counts.items() if not key.endswith(' 200'))
+        print(f"{mode}:")
+        print(f"  reads/s:       {reads / elapsed:>8.1f}")
+        print(f"  writes/s:      {writes / elapsed:>8.1f}")
+        print(f"  failed:        {failed:>8}")
+        print(f"  lock errors:   {locked:>8}")
+
+
+if __name__ == '__main__':
+    main()
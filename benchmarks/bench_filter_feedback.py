@@ -0,0 +1,106 @@
+"""Benchmark: per-row cost of the feedback listing endpoint
+
+Compares the previous ORM path of ``/api/feedback/filter`` (hydrate full
+Feedback objects, copy them into dicts, encode with Flask's default JSON
+provider) against the current lean path (Core select of the needed
+columns, tuples mapped to dicts, pluggable fast JSON provider). The
+listing cache is cleared before every request and no ``If-None-Match``
+is sent, so each one runs the query and encodes the whole response.
+
+Usage:
+    python benchmarks/bench_filter_feedback.py [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.mkdtemp()
+os.environ['OPENFEED_DATABASE_URI'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from app import app, db, Feedback, listing_cache
+
+
+def legacy_filter_feedback():
+    """The listing path before the lean projection (recent sort)."""
+    feedbacks = Feedback.query.filter_by(status='approved').order_by(
+        Feedback.date_created.desc()
+    ).all()
+    feedback_list = []
+    for feedback in feedbacks:
+        feedback_list.append({
+            'id': feedback.id,
+            'company_name': feedback.company_name,
+            'company_logo': feedback.company_logo,
+            'comment': feedback.comment,
+            'sentiment': feedback.sentiment,
+            'date_created': feedback.date_created.isoformat() if feedback.date_created else None
+        })
+    return jsonify({'success': True, 'feedbacks': feedback_list,
+                    'total': len(feedback_list)})
+
+
+def populate(rows):
+    now = datetime.utcnow()
+    comment = 'The service was good but the app could be a lot faster. ' * 8
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Feedback), [{
+            'company_name': 'Google',
+            'company_logo': '/static/logos/google.png',
+            'comment': comment,
+            'sentiment': 'positive',
+            'status': 'approved',
+            'date_created': now - timedelta(seconds=i)
+        } for i in range(rows)])
+        db.session.commit()
+
+
+def measure(client, url, repeat):
+    client.get(url)  # warm up
+    best = float('inf')
+    for _ in range(repeat):
+        listing_cache.clear()  # measure the query, not a cache hit
+        started = time.perf_counter()
+        response = client.get(url)
+        best = min(best, time.perf_counter() - started)
+        assert response.status_code == 200
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    populate(args.rows)
+    fast_json = app.json
+    app.add_url_rule('/bench/legacy', 'bench_legacy', legacy_filter_feedback)
+    client = app.test_client()
+
+    app.json = DefaultJSONProvider(app)
+    legacy = measure(client, '/bench/legacy', args.repeat)
+    app.json = fast_json
+    lean = measure(client, '/api/feedback/filter', args.repeat)
+    preview = measure(client, '/api/feedback/filter?preview=140', args.repeat)
+
+    print(f"Rows: {args.rows} (best of {args.repeat}, JSON provider: {type(fast_json).__name__})")
+    for label, seconds in (('before (ORM + default JSON)', legacy),
+                           ('after (Core select + fast JSON)', lean),
+                           ('after, preview=140', preview)):
+        per_row = seconds / args.rows * 1e6
+        print(f"  {label:<34}{seconds * 1000:>9.1f} ms {per_row:>8.2f} us/row")
+    print(f"  speedup: {legacy / lean:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
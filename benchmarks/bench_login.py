@@ -0,0 +1,130 @@
+"""Benchmark: login throughput per core
+
+Drives ``POST /auth/login`` from concurrent client threads against a
+throwaway users database and reports successful logins per second, per
+hashing core. A second phase replays a brute-force burst against one
+account to show how many attempts the rate limiter rejects before they
+reach the hashing pool.
+
+Usage:
+    python benchmarks/bench_login.py [--method scrypt:32768:8:1]
+        [--workers 4] [--clients 16] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.mkdtemp()
+os.environ['OPENFEED_DATABASE_URI'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from auth import get_db_connection, init_auth_db
+from passwords import DEFAULT_METHOD, PasswordHasher
+from ratelimit import init_login_limits
+
+PASSWORD = 'BenchPassword1'
+
+
+def populate(hasher, users):
+    with app.app_context():
+        init_auth_db()
+        conn = get_db_connection()
+        password_hash = hasher.hash(PASSWORD)
+        conn.executemany(
+            'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+            [(f'user{i}', f'user{i}@example.com', password_hash)
+             for i in range(users)]
+        )
+        conn.commit()
+        conn.close()
+
+
+def run_clients(clients, seconds, make_request):
+    """Call make_request(client, thread index, iteration) until time is up."""
+    counts = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        local = Counter()
+        # No cookies: a logged-in session would skip the password check
+        with app.test_client(use_cookies=False) as client:
+            i = 0
+            while time.perf_counter() < deadline:
+                local[make_request(client, index, i)] += 1
+                i += 1
+        with lock:
+            counts.update(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', default=DEFAULT_METHOD)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = os.path.join(_tmpdir, 'auth.db')
+    # Every simulated client shares one address, so lift the limits for
+    # the throughput phase
+    app.config['LOGIN_RATE_PER_IP'] = (10 ** 9, 1)
+    app.config['LOGIN_RATE_PER_ACCOUNT'] = (10 ** 9, 1)
+    init_login_limits(app)
+    hasher = PasswordHasher(args.method, workers=args.workers)
+    app.extensions['password_hasher'] = hasher
+    populate(hasher, args.users)
+
+    def login(client, index, i):
+        user = (index * 7919 + i) % args.users
+        response = client.post('/auth/login', data={
+            'username': f'user{user}', 'password': PASSWORD,
+        })
+        return response.status_code
+
+    counts, elapsed = run_clients(args.clients, args.seconds, login)
+    ok = counts[302]
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"Method: {args.method}, {args.workers} hash workers, "
+          f"{args.clients} clients, {elapsed:.1f} s")
+    print(f"  logins:        {ok:>8} ({dict(counts)})")
+    print(f"  logins/s:      {ok / elapsed:>8.1f}")
+    print(f"  logins/s/core: {ok / elapsed / cores:>8.1f}")
+
+    app.config['LOGIN_RATE_PER_IP'] = (30, 60)
+    app.config['LOGIN_RATE_PER_ACCOUNT'] = (10, 300)
+    init_login_limits(app)
+
+    def brute_force(client, index, i):
+        response = client.post('/auth/login', data={
+            'username': 'user0', 'password': f'guess{index}-{i}',
+        })
+        return response.status_code
+
+    counts, elapsed = run_clients(args.clients, min(args.seconds, 2), brute_force)
+    attempts = sum(counts.values())
+    print(f"Brute force on one account: {attempts} attempts in {elapsed:.1f} s")
+    print(f"  hashed:   {counts[200]:>8}")
+    print(f"  rejected: {counts[429]:>8} (429 before hashing)")
+    hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
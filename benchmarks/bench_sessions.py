@@ -0,0 +1,90 @@
+"""Benchmark: per-request session overhead
+
+Times Flask's signed-cookie sessions against the server-side store in
+sessions.py on a minimal app, so only session loading and saving is
+measured. Each backend serves a logged-in session (``user_id``,
+``username``, ``is_admin``) for a read-only request, and for a request
+that changes the session. The server-side store is measured with a warm
+cache and with the cache disabled (every request reads SQLite).
+
+Usage:
+    python benchmarks/bench_sessions.py [--requests 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, session
+from flask.sessions import SecureCookieSessionInterface
+
+from sessions import init_sessions
+
+
+def make_app(backend, directory):
+    app = Flask(__name__)
+    app.secret_key = 'bench-secret'
+    if backend != 'cookie':
+        app.config['SESSION_DATABASE'] = os.path.join(directory, f'{backend}.db')
+        app.config['SESSION_CACHE_SIZE'] = 0 if backend == 'server, no cache' else 10000
+        init_sessions(app)
+    else:
+        app.session_interface = SecureCookieSessionInterface()
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 42
+        session['username'] = 'benchmark-user'
+        session['is_admin'] = False
+        return ''
+
+    @app.route('/read')
+    def read():
+        return str(session.get('user_id'))
+
+    @app.route('/write')
+    def write():
+        session['last_seen'] = time.time()
+        return ''
+
+    return app
+
+
+def measure(app, path, requests):
+    """Return microseconds per request to ``path`` with a logged-in client."""
+    client = app.test_client()
+    client.get('/login')
+    for _ in range(min(requests // 10, 1000)):
+        client.get(path)
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    baseline_app = Flask(__name__)
+    baseline_app.route('/read')(lambda: '')
+    baseline = measure(baseline_app, '/read', args.requests)
+
+    print(f"{args.requests} requests per case; request without a session: {baseline:.1f} µs")
+    print(f"{'backend':<20} {'read µs':>10} {'overhead':>10} {'write µs':>10} {'overhead':>10}")
+    for backend in ('cookie', 'server', 'server, no cache'):
+        app = make_app(backend, directory)
+        read = measure(app, '/read', args.requests)
+        write = measure(app, '/write', args.requests)
+        print(f"{backend:<20} {read:>10.1f} {read - baseline:>10.1f} "
+              f"{write:>10.1f} {write - baseline:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
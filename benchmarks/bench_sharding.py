@@ -0,0 +1,148 @@
+"""Benchmark: vote write throughput by shard count
+
+Starts several app processes (like a multi-worker server) and has writer
+threads in each post ``/api/vote`` as fast as they can, spread evenly over
+the feedback of many companies. Every shard count gets fresh processes and
+fresh databases; ``0`` is the unsharded app. With one database every vote
+queues for the same write lock; with N shards, votes on companies of
+different shards commit in parallel, so throughput grows with the shard
+count until the CPUs (or the disk's fsyncs) are saturated.
+
+Usage:
+    python benchmarks/bench_sharding.py [--shards 0 1 2 4 8] [--processes 4]
+        [--writers 4] [--companies 64] [--rows 4000] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def import_app(args):
+    os.environ['OPENFEED_DATABASE_URI'] = 'sqlite:///' + os.path.join(args.directory, 'main.db')
+    os.environ['OPENFEED_SHARDS'] = str(args.shard_count)
+    os.environ['OPENFEED_SHARD_DIR'] = args.directory
+    sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def populate(args):
+    """Create the schema and import the feedback rows for every company."""
+    module = import_app(args)
+    from ingest import BulkIngestor
+
+    app, db = module.app, module.db
+    with app.app_context():
+        db.create_all()
+        if module.shards is not None:
+            module.shards.create_all()
+        BulkIngestor(db, status='approved').ingest((i + 1, {
+            'company': f'Company {i % args.companies}',
+            'comment': f'Feedback number {i}: the service could be faster.',
+        }, None) for i in range(args.rows))
+
+
+def load(args):
+    """Run one process worth of writers and print the results as JSON."""
+    module = import_app(args)
+    app = module.app
+    counts = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def writer(user_id):
+        local = Counter()
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+            i = 0
+            while time.perf_counter() < deadline:
+                response = client.post('/api/vote', json={
+                    'feedback_id': (user_id * 7919 + i * 104729) % args.rows + 1,
+                    'vote_type': 'upvote' if i % 2 else 'downvote',
+                })
+                local[f'write {response.status_code}'] += 1
+                i += 1
+        with lock:
+            counts.update(local)
+
+    first_user = 10 ** 6 + args.process * args.writers
+    threads = [threading.Thread(target=writer, args=(first_user + i,))
+               for i in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps({'counts': dict(counts), 'elapsed': time.perf_counter() - started}))
+
+
+def child(args, role, **extra):
+    command = [sys.executable, __file__, '--role', role, '--directory', args.directory,
+               '--shard-count', str(args.shard_count)]
+    for name in ('processes', 'writers', 'companies', 'rows', 'seconds'):
+        command += ['--' + name, str(getattr(args, name))]
+    for name, value in extra.items():
+        command += ['--' + name, str(value)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def run(args):
+    args.directory = tempfile.mkdtemp()
+    if child(args, 'populate').wait() != 0:
+        raise SystemExit('populate failed')
+    workers = [child(args, 'load', process=i) for i in range(args.processes)]
+    counts = Counter()
+    elapsed = 0.0
+    for worker in workers:
+        output, _ = worker.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        counts.update(result['counts'])
+        elapsed = max(elapsed, result['elapsed'])
+    return counts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[0, 1, 2, 4, 8])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--companies', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=4000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--role', choices=('populate', 'load'), help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    parser.add_argument('--shard-count', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--process', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'populate':
+        populate(args)
+        return
+    if args.role == 'load':
+        load(args)
+        return
+
+    print(f"{args.processes} processes x {args.writers} writers, {args.companies} companies, "
+          f"{args.rows} rows, {args.seconds:g} s per shard count ({os.cpu_count()} CPUs)")
+    print(f"{'shards':>8} {'votes/s':>10} {'failed':>8}")
+    for shard_count in args.shards:
+        args.shard_count = shard_count
+        counts, elapsed = run(args)
+        writes = counts.get('write 200', 0)
+        failed = sum(n for key, n in counts.items() if key != 'write 200')
+        label = shard_count or 'none'
+        print(f"{label:>8} {writes / elapsed:>10.1f} {failed:>8}")
+
+
+if __name__ == '__main__':
+    main()
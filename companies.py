@@ -0,0 +1,52 @@
+"""Company Registry Module
+
+The list of known companies and cached lookups for their logos.
+"""
+
+import os
+from functools import lru_cache
+
+# Companies list with local logo paths
+COMPANIES = [
+    {"name": "Google", "domain": "google.com", "logo": "static/logos/google.png"},
+    {"name": "Apple", "domain": "apple.com", "logo": "static/logos/apple.png"},
+    {"name": "Microsoft", "domain": "microsoft.com", "logo": "static/logos/microsoft.png"},
+    {"name": "Amazon", "domain": "amazon.com", "logo": "static/logos/amazon.png"},
+    {"name": "Netflix", "domain": "netflix.com", "logo": "static/logos/netflix.png"},
+    {"name": "Tesla", "domain": "tesla.com", "logo": "static/logos/tesla.png"},
+    {"name": "Meta", "domain": "meta.com", "logo": "static/logos/meta.png"},
+    {"name": "Twitter", "domain": "twitter.com", "logo": "static/logos/twitter.png"},
+    {"name": "Uber", "domain": "uber.com", "logo": "static/logos/uber.png"},
+    {"name": "Adobe", "domain": "adobe.com", "logo": "static/logos/adobe.png"}
+]
+
+PLACEHOLDER_LOGO = "/static/logos/placeholder.png"
+
+# Case-insensitive index over the registry
+_COMPANIES_BY_KEY = {c['name'].lower(): c for c in COMPANIES}
+
+
+@lru_cache(maxsize=1024)
+def get_company_logo(company_name):
+    """Get company logo from static folder"""
+    company = _COMPANIES_BY_KEY.get(company_name.lower())
+    if company and company['name'] == company_name and os.path.exists(company['logo']):
+        return f"/{company['logo']}"
+    return PLACEHOLDER_LOGO
+
+
+@lru_cache(maxsize=1024)
+def resolve_company(company_name):
+    """Resolve a free-form company name against the registry.
+
+    Args:
+        company_name (str): Company name as supplied by the user
+
+    Returns:
+        tuple: (canonical company name, logo path)
+    """
+    name = company_name.strip()
+    company = _COMPANIES_BY_KEY.get(name.lower())
+    if company:
+        name = company['name']
+    return name, get_company_logo(name)
@@ -0,0 +1,232 @@
+"""Response Compression and Conditional Request Module
+
+Two pieces that cut what polling clients download:
+
+- ``init_compression`` compresses text and JSON responses with brotli
+  (when the optional ``brotli`` package is installed) or gzip, whichever
+  the client prefers in ``Accept-Encoding``. Bodies below
+  ``COMPRESS_MIN_SIZE`` are sent as is. Streamed responses are compressed
+  chunk by chunk and flushed after each chunk, so clients still receive
+  data as it is produced. Files sent with ``send_file`` and responses that
+  are already encoded are left alone.
+- ``conditional`` gives a view a strong ETag derived from a cheap data
+  version (such as the delta-sync change token), the request URL and the
+  session's identity. The version is checked before the view runs, so a
+  client that already has the current representation gets a ``304`` and
+  the view's queries never execute.
+
+Each content encoding is a different representation, so compressed
+responses get the encoding appended to their ETag (``"<tag>-gzip"``);
+``conditional`` accepts any encoding's variant of the current tag.
+"""
+
+import hashlib
+import os
+import sys
+import zlib
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from werkzeug.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+DEFAULT_MIN_SIZE = 500  # bytes
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4  # fast enough for dynamic responses
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def available_encodings():
+    """Get the content encodings this server can produce, best first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """Pick the encoding the client rates highest.
+
+    Args:
+        accept_encodings: Parsed ``Accept-Encoding`` header
+
+    Returns:
+        str: ``br`` or ``gzip``, or None to send the body unencoded
+    """
+    best, best_quality = None, 0
+    for name in available_encodings():
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def _encoder(app, encoding):
+    if encoding == 'br':
+        return _BrotliEncoder(app.config.get('COMPRESS_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+    return _GzipEncoder(app.config.get('COMPRESS_GZIP_LEVEL', DEFAULT_GZIP_LEVEL))
+
+
+def _stream(chunks, encoder):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def _tag_encoding(response, encoding):
+    """Give an encoded response its own strong ETag."""
+    etag, weak = response.get_etag()
+    if etag and not weak and not etag.endswith('-' + encoding):
+        response.set_etag('%s-%s' % (etag, encoding))
+
+
+def init_compression(app):
+    """Compress eligible responses of an app.
+
+    Reads ``COMPRESS_MIN_SIZE`` (bytes), ``COMPRESS_GZIP_LEVEL`` and
+    ``COMPRESS_BROTLI_QUALITY``.
+
+    Args:
+        app: Flask application
+    """
+    @app.after_request
+    def compress_response(response):
+        if not is_compressible(response.mimetype) or response.direct_passthrough:
+            return response
+        response.vary.add('Accept-Encoding')
+        if ('Content-Encoding' in response.headers or response.cache_control.no_transform
+                or not 200 <= response.status_code < 300
+                or response.status_code in (204, 206)):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        encoder = _encoder(app, encoding)
+        if response.is_streamed:
+            response.response = _stream(response.response, encoder)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE):
+                return response
+            response.set_data(encoder.compress(data) + encoder.finish())
+        response.headers['Content-Encoding'] = encoding
+        _tag_encoding(response, encoding)
+        return response
+
+
+def _default_salt(app):
+    """Derive an ETag salt that changes when templates or the app change.
+
+    Every worker of one deployment computes the same salt, so their ETags
+    agree with each other.
+    """
+    paths = [sys.modules[app.import_name].__file__]
+    if app.template_folder:
+        for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+            paths.extend(os.path.join(root, name) for name in files)
+    return '%d' % max(os.stat(path).st_mtime_ns for path in paths)
+
+
+def _base_etag(tag):
+    for encoding in ('br', 'gzip'):
+        if tag.endswith('-' + encoding):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+
+def conditional(version):
+    """Answer a GET view with 304 when the client's copy is current.
+
+    The ETag covers the data version, the path and query string, the
+    logged-in user and the ``ETAG_SALT`` config value (by default derived
+    from the app and template files). Responses with pending flash
+    messages are never conditional, and responses that already carry an
+    ETag (``send_file``) keep it.
+
+    Args:
+        version: Function returning the current data version; must be
+            much cheaper than the view
+
+    Returns:
+        callable: View decorator
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return f(*args, **kwargs)
+            app = current_app._get_current_object()
+            salt = app.config.get('ETAG_SALT')
+            if salt is None:
+                salt = app.config['ETAG_SALT'] = _default_salt(app)
+            key = repr((salt, version(), request.path,
+                        sorted(request.args.items(multi=True)),
+                        session.get('user_id'), session.get('username'),
+                        bool(session.get('is_admin'))))
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+            if_none_match = parse_etags(request.headers.get('If-None-Match'))
+            if if_none_match.star_tag:
+                matched = etag
+            else:
+                matched = next((tag for tag in if_none_match.as_set(include_weak=True)
+                                if _base_etag(tag) == etag), None)
+            if matched is not None:
+                response = app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code not in (200, 304):
+                    return response
+                # Files sent with send_file keep their own ETag and checks
+                if response.get_etag()[0] is None:
+                    response.set_etag(etag)
+                    if 'Content-Encoding' in response.headers:
+                        _tag_encoding(response, response.headers['Content-Encoding'])
+            response.cache_control.no_cache = True
+            if session.get('user_id'):
+                response.cache_control.private = True
+            response.vary.update(('Cookie', 'Accept-Encoding'))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,175 @@
+"""SQLite Reader/Writer Routing Module
+
+SQLite allows one writer at a time. Letting every request thread open its
+own read-write connection makes long listings and vote writes fight over
+the database lock, and under load some of them give up with "database is
+locked". This module splits the app's connections in two:
+
+- The writer is the Flask-SQLAlchemy engine, limited to a single pooled
+  connection. Threads that need to write queue for it in the pool, and
+  each transaction starts with ``BEGIN IMMEDIATE`` so it holds the write
+  lock from the start and never fails while upgrading a read lock.
+- Readers are a separate pool of ``query_only`` connections. The database
+  runs in WAL mode, so readers see the last committed data and neither
+  block the writer nor wait for it.
+
+``RoutingSession`` sends a request's queries to a reader when the request
+is read-only (GET/HEAD/OPTIONS). Flushes always go to the writer, and
+anything else that tries to write from a reader fails loudly instead of
+taking the lock.
+
+Routing is only enabled for file-backed SQLite databases; in-memory and
+other databases keep Flask-SQLAlchemy's defaults. When the app is sharded
+(see sharding.py), the shard set picks the shard's writer or reader for
+tenant tables the same way.
+"""
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+
+DEFAULT_READERS = 4
+DEFAULT_BUSY_TIMEOUT = 5000  # milliseconds
+DEFAULT_POOL_TIMEOUT = 30  # seconds to wait for a pooled connection
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def routing_enabled(config):
+    """Check whether a config describes a routable database.
+
+    Args:
+        config: Flask config with SQLALCHEMY_DATABASE_URI and DB_READERS
+
+    Returns:
+        bool: True for file-backed SQLite with at least one reader
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return (url.get_backend_name() == 'sqlite'
+            and url.database not in (None, '', ':memory:')
+            and config.get('DB_READERS', DEFAULT_READERS) > 0)
+
+
+def writer_engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for the single writer connection.
+
+    Must be applied before Flask-SQLAlchemy creates its engine.
+
+    Returns:
+        dict: Engine options (empty when routing is disabled)
+    """
+    if not routing_enabled(config):
+        return {}
+    return {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+    }
+
+
+def _configure_writer(engine, busy_timeout):
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy's begin event issue BEGIN instead of pysqlite
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute('PRAGMA busy_timeout = %d' % busy_timeout)
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def _configure_reader(engine, busy_timeout):
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA query_only = ON')
+        cursor.execute('PRAGMA busy_timeout = %d' % busy_timeout)
+        cursor.close()
+
+
+def create_engines(url, readers=DEFAULT_READERS, busy_timeout=DEFAULT_BUSY_TIMEOUT,
+                   pool_timeout=DEFAULT_POOL_TIMEOUT):
+    """Create a single-connection writer and a reader pool for a SQLite file.
+
+    Used for databases other than the app's own, such as shards.
+
+    Args:
+        url: SQLAlchemy URL of a file-backed SQLite database
+        readers (int): Reader pool size
+        busy_timeout (int): Milliseconds to wait for a lock
+        pool_timeout (int): Seconds to wait for a pooled connection
+
+    Returns:
+        tuple: (writer, reader) engines
+    """
+    writer = create_engine(url, pool_size=1, max_overflow=0, pool_timeout=pool_timeout)
+    _configure_writer(writer, busy_timeout)
+    reader = create_engine(url, pool_size=max(readers, 1), max_overflow=0,
+                           pool_timeout=pool_timeout)
+    _configure_reader(reader, busy_timeout)
+    return writer, reader
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from a reader during read-only requests."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            read_only = not self._flushing and g.get('db_read_only', False)
+            shards = current_app.extensions.get('shards')
+            if shards is not None:
+                engine = shards.get_bind(mapper, clause, read_only)
+                if engine is not None:
+                    return engine
+            reader = current_app.extensions.get('db_reader')
+            if reader is not None and read_only:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_db_routing(app, db):
+    """Attach the reader pool and request routing to an app.
+
+    Reads ``DB_READERS`` (reader pool size), ``DB_BUSY_TIMEOUT``
+    (milliseconds) and ``DB_POOL_TIMEOUT`` (seconds). The app's ``db``
+    must have been created with ``session_options={'class_':
+    RoutingSession}`` and ``writer_engine_options`` for the writer to be
+    exclusive.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+
+    Returns:
+        Engine: The reader engine, or None when routing is disabled
+    """
+    app.extensions['db_reader'] = None
+    if not routing_enabled(app.config):
+        return None
+
+    busy_timeout = app.config.get('DB_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)
+    with app.app_context():
+        writer = db.engine
+    _configure_writer(writer, busy_timeout)
+    readers = app.config.get('DB_READERS', DEFAULT_READERS)
+    reader = create_engine(writer.url, pool_size=readers, max_overflow=0,
+                           pool_timeout=app.config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT))
+    _configure_reader(reader, busy_timeout)
+    app.extensions['db_reader'] = reader
+
+    @app.before_request
+    def route_request():
+        g.db_read_only = request.method in READ_METHODS
+
+    @app.teardown_request
+    def end_routing(exc):
+        # The app context (and g) can outlive the request in tests and CLIs
+        g.pop('db_read_only', None)
+
+    return reader
@@ -0,0 +1,296 @@
+"""Near-Duplicate Detection Module
+
+Groups copy-pasted and lightly edited comments so moderators can review
+them as one cluster. Each comment is reduced to character shingles, the
+shingle set to a MinHash signature, and the signature to LSH band keys:
+
+- ``feedback_minhash`` holds each item's signature and cluster ID (the
+  lowest feedback ID in the cluster).
+- ``feedback_lsh`` maps every band key to the items that produced it.
+  Finding candidates is a single ``bucket IN (...)`` index lookup, so the
+  cost does not grow with the number of stored comments.
+
+Candidates are confirmed by the Jaccard similarity estimated from their
+signatures; a match at or above ``SIMILARITY_THRESHOLD`` joins the new
+item to the candidate's cluster.
+
+Usage:
+    python dedupe.py rebuild    # recompute signatures, buckets and clusters
+    python dedupe.py clusters   # list clusters with pending feedback
+"""
+
+import argparse
+import hashlib
+import re
+import struct
+import sys
+from array import array
+
+from sqlalchemy import bindparam, text
+
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# With 16 bands of 4 rows, pairs above ~0.5 similarity usually collide
+SIMILARITY_THRESHOLD = 0.7
+# Cap on candidate rows read per lookup, so boilerplate text that lands
+# in huge buckets cannot make a lookup slow
+MAX_CANDIDATES = 2000
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def _permutations():
+    """Fixed (a, b) pairs so signatures are stable across processes."""
+    seed = hashlib.sha256(b'openfeed-minhash').digest()
+    params = []
+    counter = 0
+    while len(params) < NUM_PERM:
+        block = hashlib.sha256(seed + struct.pack('<I', counter)).digest()
+        counter += 1
+        a, b = struct.unpack('<QQ', block[:16])
+        params.append((a % (_PRIME - 1) + 1, b % _PRIME))
+    return params
+
+
+PERMUTATIONS = _permutations()
+
+CANDIDATES_SQL = text('''
+    SELECT l.feedback_id, m.signature, m.cluster_id
+    FROM feedback_lsh l JOIN feedback_minhash m ON m.feedback_id = l.feedback_id
+    WHERE l.bucket IN :buckets AND l.feedback_id != :feedback_id
+    LIMIT :limit
+''').bindparams(bindparam('buckets', expanding=True))
+
+
+def normalize(comment):
+    """Lowercase and strip punctuation/extra whitespace."""
+    return ' '.join(_NON_WORD.sub(' ', comment.lower()).split())
+
+
+def shingles(comment, size=SHINGLE_SIZE):
+    """Hash the overlapping character n-grams of a comment.
+
+    Returns:
+        set: 32-bit shingle hashes
+    """
+    normalized = normalize(comment)
+    if len(normalized) <= size:
+        grams = [normalized]
+    else:
+        grams = (normalized[i:i + size] for i in range(len(normalized) - size + 1))
+    return {int.from_bytes(hashlib.blake2b(g.encode('utf-8'), digest_size=4).digest(), 'little')
+            for g in grams}
+
+
+def signature(comment):
+    """Compute the MinHash signature of a comment.
+
+    Returns:
+        tuple: NUM_PERM minimum hash values
+    """
+    hashes = shingles(comment) or {0}
+    return tuple(min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+                 for a, b in PERMUTATIONS)
+
+
+def band_keys(sig):
+    """Derive one LSH bucket key per band of a signature.
+
+    Returns:
+        list: Signed 64-bit bucket keys (SQLite INTEGER range)
+    """
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack('<I%dI' % ROWS_PER_BAND, band, *rows),
+                                 digest_size=8).digest()
+        keys.append(struct.unpack('<q', digest)[0])
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def pack(sig):
+    return array('I', sig).tobytes()
+
+
+def unpack(blob):
+    values = array('I')
+    values.frombytes(blob)
+    return tuple(values)
+
+
+def find_similar(session, sig, feedback_id=0, threshold=SIMILARITY_THRESHOLD):
+    """Find stored comments similar to a signature.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        sig (tuple): MinHash signature
+        feedback_id (int): ID to exclude (the item itself)
+        threshold (float): Minimum estimated similarity
+
+    Returns:
+        list: (similarity, feedback id, cluster id), most similar first
+    """
+    rows = session.execute(CANDIDATES_SQL, {
+        'buckets': band_keys(sig),
+        'feedback_id': feedback_id,
+        'limit': MAX_CANDIDATES,
+    }).all()
+    matches = {}
+    for candidate_id, blob, cluster_id in rows:
+        if candidate_id not in matches:
+            score = similarity(sig, unpack(blob))
+            if score >= threshold:
+                matches[candidate_id] = (score, candidate_id, cluster_id)
+    return sorted(matches.values(), reverse=True)
+
+
+def index_feedback(session, feedback_id, comment):
+    """Store a comment's signature and buckets and assign its cluster.
+
+    Runs inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        feedback_id (int): Feedback ID
+        comment (str): Feedback comment
+
+    Returns:
+        int: Cluster ID; equals feedback_id when no near-duplicate exists
+    """
+    sig = signature(comment)
+    matches = find_similar(session, sig, feedback_id)
+    cluster_id = min([feedback_id] + [m[2] for m in matches])
+    session.execute(text('''
+        INSERT OR REPLACE INTO feedback_minhash (feedback_id, signature, cluster_id)
+        VALUES (:feedback_id, :signature, :cluster_id)
+    '''), {'feedback_id': feedback_id, 'signature': pack(sig), 'cluster_id': cluster_id})
+    session.execute(text(
+        'INSERT OR IGNORE INTO feedback_lsh (bucket, feedback_id) VALUES (:bucket, :feedback_id)'
+    ), [{'bucket': key, 'feedback_id': feedback_id} for key in band_keys(sig)])
+    # A new item can bridge two existing clusters; fold them together
+    merged = {m[2] for m in matches} - {cluster_id}
+    if merged:
+        session.execute(text(
+            'UPDATE feedback_minhash SET cluster_id = :cluster_id WHERE cluster_id IN :merged'
+        ).bindparams(bindparam('merged', expanding=True)),
+            {'cluster_id': cluster_id, 'merged': list(merged)})
+    return cluster_id
+
+
+def remove(session, feedback_ids):
+    """Drop items (e.g. archived ones) from the index."""
+    if not feedback_ids:
+        return
+    for table in ('feedback_lsh', 'feedback_minhash'):
+        session.execute(text(
+            f'DELETE FROM {table} WHERE feedback_id IN :ids'
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': list(feedback_ids)})
+
+
+def cluster_members(session, cluster_id, status=None):
+    """Get the feedback IDs in a cluster.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        cluster_id (int): Cluster ID
+        status (str, optional): Only members with this moderation status
+
+    Returns:
+        list: Feedback IDs in ID order
+    """
+    sql = '''
+        SELECT m.feedback_id FROM feedback_minhash m
+        JOIN feedback f ON f.id = m.feedback_id
+        WHERE m.cluster_id = :cluster_id
+    '''
+    params = {'cluster_id': cluster_id}
+    if status:
+        sql += ' AND f.status = :status'
+        params['status'] = status
+    return list(session.execute(text(sql + ' ORDER BY m.feedback_id'), params).scalars())
+
+
+def pending_clusters(session, min_size=2, limit=100):
+    """List clusters of near-duplicates that still need moderation.
+
+    Returns:
+        list: Dicts with cluster_id, size, pending count, company and a
+        sample comment, largest clusters first
+    """
+    rows = session.execute(text('''
+        SELECT m.cluster_id, COUNT(*) AS size,
+               SUM(f.status = 'pending') AS pending,
+               MIN(f.company_name), MIN(f.comment)
+        FROM feedback_minhash m JOIN feedback f ON f.id = m.feedback_id
+        GROUP BY m.cluster_id
+        HAVING size >= :min_size AND pending > 0
+        ORDER BY pending DESC, m.cluster_id
+        LIMIT :limit
+    '''), {'min_size': min_size, 'limit': limit}).all()
+    return [{
+        'cluster_id': cluster_id,
+        'size': size,
+        'pending': pending,
+        'company_name': company_name,
+        'sample': sample,
+    } for cluster_id, size, pending, company_name, sample in rows]
+
+
+def rebuild(session, batch_size=1000):
+    """Recompute every signature, bucket and cluster in feedback ID order.
+
+    Returns:
+        int: Number of feedback items indexed
+    """
+    session.execute(text('DELETE FROM feedback_lsh'))
+    session.execute(text('DELETE FROM feedback_minhash'))
+    session.commit()
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = session.execute(text(
+            'SELECT id, comment FROM feedback WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            return indexed
+        for feedback_id, comment in rows:
+            index_feedback(session, feedback_id, comment)
+        session.commit()
+        last_id = rows[-1][0]
+        indexed += len(rows)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Near-duplicate detection')
+    parser.add_argument('command', choices=('rebuild', 'clusters'))
+    args = parser.parse_args(argv)
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        if args.command == 'rebuild':
+            print(f"✓ Indexed {rebuild(db.session)} feedback items")
+        else:
+            clusters = pending_clusters(db.session)
+            for cluster in clusters:
+                print(f"  #{cluster['cluster_id']}: {cluster['pending']} pending of "
+                      f"{cluster['size']} ({cluster['company_name']}) "
+                      f"{cluster['sample'][:60]!r}")
+            print(f"✓ {len(clusters)} clusters need moderation")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
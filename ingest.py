@@ -0,0 +1,505 @@
+"""Bulk Feedback Ingestion Module
+
+This module loads large volumes of feedback (e.g. a partner's backlog)
+without going through ``submit_feedback`` one comment at a time. Input is
+streamed as NDJSON or a JSON array, sentiment is analyzed per batch,
+companies are resolved from the cached registry and rows are inserted with
+``executemany`` inside one transaction per batch. Records are deduplicated
+by a content hash of company and comment. In a sharded app each batch is
+split by shard, with one transaction per shard.
+
+Usage:
+    python ingest.py backlog.ndjson [--status approved] [--batch-size 5000]
+"""
+
+import argparse
+import codecs
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+import ranking
+import dedupe
+import outbox
+import rollups
+import sync
+import terms
+from companies import resolve_company
+from sentiment import analyze_batch
+from sharding import current_shards, use_shard
+
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+# Keep IN (...) lists below SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 900
+_READ_SIZE = 64 * 1024
+# Characters a JSON array element may span before it is reported as malformed
+MAX_ELEMENT_SIZE = 1024 * 1024
+VALID_STATUSES = ('pending', 'approved', 'rejected')
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetime the app stores.
+
+    Accepts a ``Z`` suffix (which ``fromisoformat`` rejects before Python
+    3.11) and converts values with an offset to UTC.
+
+    Raises:
+        TypeError, ValueError: If the value is not an ISO 8601 string
+    """
+    if isinstance(value, str) and value[-1:] in ('Z', 'z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def content_hash(company_name, comment):
+    """Compute the dedupe hash of a feedback item.
+
+    Whitespace and case are normalized so trivially reformatted copies of
+    the same comment hash identically.
+
+    Args:
+        company_name (str): Company name
+        comment (str): Feedback comment
+
+    Returns:
+        str: Hex encoded SHA-256 digest
+    """
+    normalized = '%s\x00%s' % (
+        company_name.strip().lower(),
+        ' '.join(comment.lower().split()),
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def iter_records(stream):
+    """Stream records from NDJSON or a top-level JSON array.
+
+    The input is read incrementally, so arbitrarily large files never have
+    to be held in memory at once.
+
+    Args:
+        stream: Binary or text file-like object
+
+    Yields:
+        tuple: (record number, parsed value or None, error message or None)
+    """
+    def chunks():
+        # A multibyte character may straddle two reads
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while True:
+            data = stream.read(_READ_SIZE)
+            chunk = decoder.decode(data, final=not data) if isinstance(data, bytes) else data
+            if chunk:
+                yield chunk
+            if not data:
+                return
+
+    reader = chunks()
+    buffer = ''
+    for chunk in reader:
+        buffer += chunk
+        if buffer.strip():
+            break
+    buffer = buffer.lstrip()
+
+    if buffer.startswith('['):
+        yield from _iter_json_array(buffer[1:], reader)
+    else:
+        yield from _iter_ndjson(buffer, reader)
+
+
+def _iter_ndjson(buffer, reader):
+    """Yield records from newline-delimited JSON."""
+    number = 0
+    exhausted = False
+    while True:
+        newline = buffer.find('\n')
+        if newline == -1 and not exhausted:
+            chunk = next(reader, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffer += chunk
+            continue
+        if newline == -1:
+            line, buffer = buffer, ''
+        else:
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+        if line.strip():
+            number += 1
+            try:
+                yield number, json.loads(line), None
+            except ValueError as e:
+                yield number, None, 'Invalid JSON: %s' % e
+        if exhausted and not buffer:
+            return
+
+
+def _element_end(buffer):
+    """Find the ',' or ']' after a (possibly malformed) array element.
+
+    Returns:
+        int: Its index, or -1 if the buffer ends first
+    """
+    depth = 0
+    in_string = escaped = False
+    for index, char in enumerate(buffer):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            if depth == 0:
+                return index
+            depth -= 1
+        elif char == ',' and depth == 0:
+            return index
+    return -1
+
+
+def _is_malformed(buffer, error):
+    """Tell a syntax error from an element cut off at the end of the buffer."""
+    if len(buffer) > MAX_ELEMENT_SIZE:
+        return True
+    if error.msg.startswith('Unterminated string'):
+        return False
+    # Literals, numbers and escapes cut off at the end fail a few characters early
+    return error.pos < len(buffer.rstrip()) - 16
+
+
+def _iter_json_array(buffer, reader):
+    """Yield the elements of a JSON array without parsing it all at once.
+
+    A malformed element is reported and skipped; parsing resumes after the
+    next top-level comma.
+    """
+    decoder = json.JSONDecoder()
+    number = 0
+    exhausted = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except ValueError as e:
+            if not buffer and exhausted:
+                return
+            if exhausted or _is_malformed(buffer, e):
+                skip = _element_end(buffer)
+                if skip != -1 or exhausted or len(buffer) > MAX_ELEMENT_SIZE:
+                    number += 1
+                    if skip == -1:
+                        yield number, None, ('Invalid JSON: %s; the rest of the input '
+                                             'was not read' % e)
+                        return
+                    yield number, None, 'Invalid JSON: %s' % e
+                    buffer = buffer[skip:]
+                    continue
+            chunk = next(reader, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffer += chunk
+            continue
+        # A number at the end of the buffer may continue in the next chunk
+        if end == len(buffer) and not exhausted:
+            chunk = next(reader, None)
+            if chunk is not None:
+                buffer += chunk
+                continue
+            exhausted = True
+        number += 1
+        yield number, value, None
+        buffer = buffer[end:]
+
+
+class BulkIngestor:
+    """Batching loader that inserts feedback records into the database."""
+
+    def __init__(self, db, status='pending', batch_size=DEFAULT_BATCH_SIZE,
+                 user_id=None):
+        """Initialize the BulkIngestor.
+
+        Args:
+            db: Flask-SQLAlchemy extension bound to the app
+            status (str): Moderation status given to imported feedback
+            batch_size (int): Records written per transaction
+            user_id (int, optional): Owner recorded on imported feedback
+        """
+        if status not in VALID_STATUSES:
+            raise ValueError('Invalid status: %s' % status)
+        self.db = db
+        self.status = status
+        self.batch_size = batch_size
+        self.user_id = user_id
+        self.feedback_table = db.metadata.tables['feedback']
+        self.hash_table = db.metadata.tables['feedback_hash']
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+
+    def ingest(self, records):
+        """Ingest records produced by ``iter_records``.
+
+        Invalid records are reported and skipped; they never abort the
+        surrounding batch.
+
+        Args:
+            records: Iterable of (record number, value, error) tuples
+
+        Returns:
+            dict: Summary with inserted, duplicate and error counts
+        """
+        batch = []
+        for number, value, error in records:
+            if error is None:
+                row, error = self._prepare(value)
+            if error:
+                self._record_error(number, error)
+                continue
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        return self.report()
+
+    def report(self):
+        """Get the ingestion summary.
+
+        Returns:
+            dict: Inserted, duplicate and error counts plus error details
+        """
+        return {
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def _record_error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'record': number, 'error': message})
+
+    def _prepare(self, value):
+        """Validate one record and map it to feedback column values."""
+        if not isinstance(value, dict):
+            return None, 'Record must be a JSON object'
+        company = value.get('company', value.get('company_name'))
+        comment = value.get('comment')
+        if not isinstance(company, str) or not company.strip():
+            return None, 'Missing required field: company'
+        if not isinstance(comment, str) or not comment.strip():
+            return None, 'Missing required field: comment'
+
+        date_created = value.get('date_created')
+        if date_created is not None:
+            try:
+                date_created = parse_datetime(date_created)
+            except (TypeError, ValueError):
+                return None, 'Invalid date_created: %r' % (date_created,)
+        else:
+            date_created = datetime.utcnow()
+
+        company_name, logo = resolve_company(company)
+        return {
+            'user_id': self.user_id,
+            'company_name': company_name,
+            'company_logo': logo,
+            'comment': comment,
+            'status': self.status,
+            'date_created': date_created,
+            'content_hash': content_hash(company_name, comment),
+        }, None
+
+    def _existing_hashes(self, connection, hashes):
+        """Return the subset of hashes already stored in the database."""
+        found = set()
+        column = self.hash_table.c.content_hash
+        for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            chunk = hashes[start:start + LOOKUP_CHUNK_SIZE]
+            found.update(connection.execute(
+                select(column).where(column.in_(chunk))
+            ).scalars())
+        return found
+
+    def _flush(self, batch):
+        """Deduplicate, score and insert one batch, one transaction per shard."""
+        shards = current_shards()
+        if shards is None:
+            self._insert(batch)
+            return
+        placement = {}
+        groups = {}
+        for number, row in batch:
+            company = row['company_name']
+            if company not in placement:
+                placement[company] = shards.shard_for(company)
+            groups.setdefault(placement[company], []).append((number, row))
+        for shard, group in sorted(groups.items()):
+            with use_shard(shard):
+                self._insert(group, shards)
+
+    def _insert(self, batch, shards=None):
+        """Deduplicate, score and insert rows of one database in a single transaction."""
+        session = self.db.session
+        connection = session.connection()
+        attempted = []  # record numbers of the rows being inserted
+        try:
+            existing = self._existing_hashes(
+                connection, [row['content_hash'] for _, row in batch]
+            )
+            rows = []
+            for number, row in batch:
+                if row['content_hash'] in existing:
+                    self.duplicates += 1
+                    continue
+                existing.add(row['content_hash'])
+                rows.append(row)
+                attempted.append(number)
+            if not rows:
+                session.rollback()
+                return
+
+            sentiments = analyze_batch(row['comment'] for row in rows)
+            hashes = [row.pop('content_hash') for row in rows]
+            for row, sentiment in zip(rows, sentiments):
+                row['sentiment'] = sentiment
+            if shards is not None:
+                # IDs come from the main database so they are unique across shards
+                for row, feedback_id in zip(rows, shards.allocate_ids(
+                        [row['company_name'] for row in rows])):
+                    row['id'] = feedback_id
+
+            ids = connection.execute(
+                insert(self.feedback_table).returning(
+                    self.feedback_table.c.id, sort_by_parameter_order=True
+                ),
+                rows,
+            ).scalars().all()
+            connection.execute(
+                insert(self.hash_table),
+                [{'content_hash': h, 'feedback_id': feedback_id}
+                 for h, feedback_id in zip(hashes, ids)],
+            )
+            rollups.record_feedback_batch(connection, rows)
+            ranking.insert_batch(connection, ids, rows)
+            sync.touch(connection, *ids)
+            terms.index_batch(connection, [
+                (feedback_id, row['company_name'], row['date_created'],
+                 row['status'], row['comment'])
+                for feedback_id, row in zip(ids, rows)
+            ])
+            outbox.emit_many(connection, 'feedback.submitted', [
+                (feedback_id, row['user_id'], {'company': row['company_name'],
+                                               'status': row['status'],
+                                               'sentiment': row['sentiment']})
+                for feedback_id, row in zip(ids, rows)
+            ])
+            for feedback_id, row in zip(ids, rows):
+                dedupe.index_feedback(connection, feedback_id, row['comment'])
+            session.commit()
+            self.inserted += len(rows)
+        except Exception as e:
+            session.rollback()
+            # Duplicates were skipped, not attempted (unless the lookup failed)
+            for number in attempted or [number for number, _ in batch]:
+                self._record_error(number, 'Batch failed: %s' % e)
+
+
+def backfill_hashes(db, batch_size=DEFAULT_BATCH_SIZE):
+    """Record content hashes for feedback that predates deduplication.
+
+    Args:
+        db: Flask-SQLAlchemy extension bound to the app
+        batch_size (int): Rows hashed per transaction
+
+    Returns:
+        int: Number of hashes written
+    """
+    feedback = db.metadata.tables['feedback']
+    hashes = db.metadata.tables['feedback_hash']
+    written = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(feedback.c.id, feedback.c.company_name, feedback.c.comment)
+            .where(feedback.c.id > last_id)
+            .order_by(feedback.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return written
+        last_id = rows[-1].id
+        values = {}
+        for row in rows:
+            values.setdefault(
+                content_hash(row.company_name, row.comment), row.id
+            )
+        db.session.execute(
+            insert(hashes).prefix_with('OR IGNORE'),
+            [{'content_hash': h, 'feedback_id': feedback_id}
+             for h, feedback_id in values.items()],
+        )
+        db.session.commit()
+        written += len(values)
+
+
+def main(argv=None):
+    """Command line entry point for the offline loader."""
+    parser = argparse.ArgumentParser(description='Bulk load feedback')
+    parser.add_argument('path', nargs='?', default='-',
+                        help='NDJSON or JSON array file ("-" for stdin)')
+    parser.add_argument('--status', default='pending', choices=VALID_STATUSES)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--backfill-hashes', action='store_true',
+                        help='Hash existing feedback before loading')
+    args = parser.parse_args(argv)
+
+    from app import app, db, schedule_snapshot_publish
+
+    with app.app_context():
+        db.create_all()
+        if args.backfill_hashes:
+            print(f"✓ Hashed {backfill_hashes(db)} existing feedback rows")
+
+        ingestor = BulkIngestor(db, status=args.status,
+                                batch_size=args.batch_size)
+        if args.path == '-':
+            summary = ingestor.ingest(iter_records(sys.stdin.buffer))
+        else:
+            with open(args.path, 'rb') as f:
+                summary = ingestor.ingest(iter_records(f))
+        if args.status == 'approved' and summary['inserted']:
+            schedule_snapshot_publish(invalidate=True)
+            db.session.commit()
+
+    for error in summary['errors']:
+        print(f"✗ Record {error['record']}: {error['error']}")
+    print(f"✓ Inserted {summary['inserted']} feedback rows")
+    print(f"  - Duplicates skipped: {summary['duplicates']}")
+    print(f"  - Errors: {summary['error_count']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""Background Job Queue Module
+
+A lightweight in-process job queue for work that should not block the
+request thread (sentiment scoring, exports, index maintenance). Jobs are
+persisted in the ``job`` table so they survive restarts and are executed
+by a small pool of worker threads. Failed jobs are retried with
+exponential backoff until ``max_attempts`` is reached.
+
+Several queues may work on the same table (app workers, the debug
+reloader's second process, ``python jobs.py work``). A claimed job records
+its worker's ID and a lease that the worker renews while the job runs;
+``recover`` only requeues running jobs whose lease has expired, i.e. whose
+worker died mid-job.
+
+Usage:
+    python jobs.py work [--workers 2]   # run workers in the foreground
+    python jobs.py drain                # run everything due, then exit
+    python jobs.py stats                # print queue depth
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, event, func, insert, or_, select, update
+
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2  # seconds
+BACKOFF_MAX = 300  # seconds
+POLL_INTERVAL = 1.0  # seconds between idle polls
+FINISHED_RETENTION = timedelta(days=1)
+# Running jobs whose lease is not renewed for this long are requeued
+DEFAULT_LEASE = timedelta(seconds=60)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def backoff_delay(attempts):
+    """Get the retry delay after a failed attempt.
+
+    Args:
+        attempts (int): Number of attempts made so far
+
+    Returns:
+        timedelta: Time to wait before the next attempt
+    """
+    seconds = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return timedelta(seconds=seconds)
+
+
+class JobQueue:
+    """SQLite-backed job queue processed by worker threads."""
+
+    def __init__(self, app, db, workers=DEFAULT_WORKERS, lease=DEFAULT_LEASE):
+        """Initialize the JobQueue.
+
+        Args:
+            app: Flask application used to push an app context for jobs
+            db: Flask-SQLAlchemy extension bound to the app
+            workers (int): Number of worker threads started by ``start``
+            lease (timedelta): How long a claimed job stays reserved
+                without a heartbeat
+        """
+        self.app = app
+        self.db = db
+        self.workers = workers
+        self.lease = lease
+        self.handlers = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._held = set()  # IDs of jobs this process is running
+        self._held_lock = threading.Lock()
+        self._heartbeat = None
+        self._worker_pid = None
+        self._worker_id = None
+        self._next_recover = 0.0
+        event.listen(db.session, 'after_commit', self._after_commit)
+
+    @property
+    def worker_id(self):
+        """ID recorded on the jobs this process claims (new after a fork)."""
+        if self._worker_pid != os.getpid():
+            self._worker_pid = os.getpid()
+            self._worker_id = '%s:%d:%s' % (socket.gethostname(), self._worker_pid,
+                                            uuid.uuid4().hex[:8])
+            self._heartbeat = None
+        return self._worker_id
+
+    @property
+    def table(self):
+        return self.db.metadata.tables['job']
+
+    @contextmanager
+    def _transaction(self):
+        """Open a connection-level transaction outside the request session."""
+        with self.app.app_context():
+            with self.db.engine.begin() as connection:
+                yield connection
+
+    def handler(self, kind):
+        """Register a function as the handler for a job kind.
+
+        Args:
+            kind (str): Job kind name
+
+        Returns:
+            callable: Decorator registering the handler
+        """
+        def decorator(f):
+            self.handlers[kind] = f
+            return f
+        return decorator
+
+    def enqueue(self, kind, payload=None, delay=None,
+                max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Add a job to the current database transaction.
+
+        The job row is written through ``db.session`` and becomes visible
+        to workers only when the caller commits, so a job can never run
+        against data that was rolled back.
+
+        Args:
+            kind (str): Job kind; must have a registered handler
+            payload (dict, optional): JSON-serializable job arguments
+            delay (timedelta, optional): Earliest time to run the job
+            max_attempts (int): Attempts before the job is marked failed
+        """
+        if kind not in self.handlers:
+            raise ValueError('No handler registered for job kind: %s' % kind)
+        now = datetime.utcnow()
+        self.db.session.execute(insert(self.table).values(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=now + delay if delay else now,
+            created_at=now,
+            updated_at=now,
+        ))
+        self.db.session.info['jobs_enqueued'] = True
+
+    def _after_commit(self, session):
+        """Wake the workers once enqueued jobs have been committed."""
+        if session.info.pop('jobs_enqueued', False):
+            self._wakeup.set()
+
+    def _claim(self, connection):
+        """Atomically mark the next due job as running and return it."""
+        job = self.table
+        now = datetime.utcnow()
+        next_id = (
+            select(job.c.id)
+            .where(job.c.status == QUEUED, job.c.run_at <= now)
+            .order_by(job.c.run_at, job.c.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        return connection.execute(
+            update(job)
+            .where(job.c.id == next_id, job.c.status == QUEUED)
+            .values(status=RUNNING, attempts=job.c.attempts + 1,
+                    worker=self.worker_id, lease_expires_at=now + self.lease,
+                    updated_at=now)
+            .returning(job.c.id, job.c.kind, job.c.payload,
+                       job.c.attempts, job.c.max_attempts)
+        ).first()
+
+    def _finish(self, row, error=None):
+        """Record the outcome of a job attempt.
+
+        Nothing is recorded if the lease was lost and the job was requeued
+        meanwhile; its new attempt owns the row.
+        """
+        job = self.table
+        now = datetime.utcnow()
+        values = {'updated_at': now, 'lease_expires_at': None}
+        if error is None:
+            values.update(status=DONE, last_error=None)
+        elif row.attempts >= row.max_attempts:
+            values.update(status=FAILED, last_error=error)
+        else:
+            values.update(status=QUEUED, last_error=error,
+                          run_at=now + backoff_delay(row.attempts))
+        with self._transaction() as connection:
+            connection.execute(
+                update(job).where(job.c.id == row.id, job.c.status == RUNNING,
+                                  job.c.worker == self.worker_id).values(**values)
+            )
+
+    def _hold(self, job_id):
+        """Keep renewing a running job's lease until ``_release``."""
+        with self._held_lock:
+            self._held.add(job_id)
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._renew_leases, daemon=True,
+                                                   name='job-heartbeat')
+                self._heartbeat.start()
+
+    def _release(self, job_id):
+        with self._held_lock:
+            self._held.discard(job_id)
+
+    def _renew_leases(self):
+        """Heartbeat loop: extend the leases of the jobs this process runs."""
+        job = self.table
+        while True:
+            self._stopping.wait(self.lease.total_seconds() / 3)
+            with self._held_lock:
+                held = list(self._held)
+            if not held:
+                if self._stopping.is_set():
+                    return
+                continue
+            try:
+                with self._transaction() as connection:
+                    connection.execute(
+                        update(job).where(job.c.id.in_(held), job.c.status == RUNNING,
+                                          job.c.worker == self.worker_id)
+                        .values(lease_expires_at=datetime.utcnow() + self.lease)
+                    )
+            except Exception:
+                traceback.print_exc()
+
+    def run_one(self):
+        """Claim and execute a single due job.
+
+        Returns:
+            bool: True if a job was executed, False if none was due
+        """
+        with self._transaction() as connection:
+            row = self._claim(connection)
+        if row is None:
+            return False
+
+        error = None
+        self._hold(row.id)
+        try:
+            with self.app.app_context():
+                try:
+                    handler = self.handlers.get(row.kind)
+                    if handler is None:
+                        raise LookupError('No handler for job kind: %s' % row.kind)
+                    handler(**json.loads(row.payload))
+                except Exception:
+                    self.db.session.rollback()
+                    error = traceback.format_exc(limit=5)
+            self._finish(row, error)
+        finally:
+            self._release(row.id)
+        return True
+
+    def run_pending(self, limit=None):
+        """Execute due jobs in the calling thread until none remain.
+
+        Args:
+            limit (int, optional): Maximum number of jobs to run
+
+        Returns:
+            int: Number of jobs executed
+        """
+        count = 0
+        while limit is None or count < limit:
+            if not self.run_one():
+                break
+            count += 1
+        return count
+
+    def recover(self):
+        """Requeue jobs left running by a worker that died mid-job.
+
+        Only jobs whose lease has expired are requeued; jobs that other
+        live workers are running keep renewing theirs. Rows claimed before
+        leases existed count as expired once not updated for a lease.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        job = self.table
+        now = datetime.utcnow()
+        expired = or_(job.c.lease_expires_at < now,
+                      and_(job.c.lease_expires_at.is_(None), job.c.updated_at < now - self.lease))
+        with self._transaction() as connection:
+            return connection.execute(
+                update(job).where(job.c.status == RUNNING, expired)
+                .values(status=QUEUED, worker=None, lease_expires_at=None, updated_at=now)
+            ).rowcount
+
+    def purge_finished(self, older_than=FINISHED_RETENTION):
+        """Delete completed jobs older than the retention period.
+
+        Args:
+            older_than (timedelta): Age after which done jobs are removed
+
+        Returns:
+            int: Number of jobs deleted
+        """
+        job = self.table
+        cutoff = datetime.utcnow() - older_than
+        with self._transaction() as connection:
+            return connection.execute(
+                delete(job).where(job.c.status == DONE,
+                                  job.c.updated_at < cutoff)
+            ).rowcount
+
+    def stats(self):
+        """Get queue depth and health information.
+
+        Returns:
+            dict: Job counts per status, jobs due now and the age in
+            seconds of the oldest due job
+        """
+        job = self.table
+        now = datetime.utcnow()
+        with self._transaction() as connection:
+            counts = dict(connection.execute(
+                select(job.c.status, func.count()).group_by(job.c.status)
+            ).all())
+            due, oldest = connection.execute(
+                select(func.count(), func.min(job.c.run_at))
+                .where(job.c.status == QUEUED, job.c.run_at <= now)
+            ).one()
+        return {
+            'queued': counts.get(QUEUED, 0),
+            'running': counts.get(RUNNING, 0),
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'due': due,
+            'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0,
+        }
+
+    def start(self):
+        """Recover interrupted jobs and start the worker threads."""
+        self.recover()
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name='job-worker-%d' % i)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Signal the worker threads to exit and wait for them."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        """Worker loop: run due jobs, then sleep until woken or polled."""
+        while not self._stopping.is_set():
+            try:
+                # Pick up the jobs of workers that died while this one runs
+                if time.monotonic() >= self._next_recover:
+                    self._next_recover = time.monotonic() + self.lease.total_seconds()
+                    self.recover()
+                if self.run_one():
+                    continue
+            except Exception:
+                traceback.print_exc()
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+
+def main(argv=None):
+    """Command line entry point for running and inspecting the queue."""
+    parser = argparse.ArgumentParser(description='OpenFeed job queue')
+    parser.add_argument('command', choices=['work', 'drain', 'stats', 'purge'])
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    from app import app, db, job_queue
+
+    with app.app_context():
+        db.create_all()
+
+    if args.command == 'stats':
+        for key, value in job_queue.stats().items():
+            print(f"  - {key}: {value}")
+    elif args.command == 'purge':
+        print(f"✓ Purged {job_queue.purge_finished()} finished jobs")
+    elif args.command == 'drain':
+        job_queue.recover()
+        print(f"✓ Ran {job_queue.run_pending()} jobs")
+    else:
+        job_queue.workers = args.workers
+        job_queue.start()
+        print(f"✓ Started {args.workers} job workers (Ctrl+C to stop)")
+        try:
+            while True:
+                threading.Event().wait(3600)
+                job_queue.purge_finished()
+        except KeyboardInterrupt:
+            job_queue.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
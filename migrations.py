@@ -0,0 +1,851 @@
+"""Schema Migration Module
+
+Versioned, ordered schema migrations for the SQLite database. Applied
+versions are recorded in ``schema_version``; each migration's ``up`` step
+is idempotent, so it is safe to run against databases that were created
+by ``db.create_all()`` or the old one-off scripts.
+
+Large data copies run as backfills: the source table is walked in ID
+ranges of ``chunk_size`` rows, each range in its own short transaction
+followed by an optional pause, so the app keeps serving requests while a
+migration runs. Backfill progress is committed together with each chunk,
+so an interrupted migration resumes where it stopped.
+
+Usage:
+    python migrations.py status              # current and pending versions
+    python migrations.py plan                # SQL a migration run would execute
+    python migrations.py up [--target 5] [--chunk-size 1000] [--throttle 0.05]
+    python migrations.py up --create-admin   # also add the default admin
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_THROTTLE = 0.0
+BUSY_TIMEOUT_MS = 5000
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration's ``up(ctx)`` function.
+
+    Args:
+        version (int): Unique, increasing schema version
+        description (str): One-line summary shown by status and plan
+    """
+    def decorator(fn):
+        if any(m[0] == version for m in MIGRATIONS):
+            raise ValueError('Duplicate migration version: %d' % version)
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+class MigrationContext:
+    """Helpers passed to migration steps; honours dry-run mode."""
+
+    def __init__(self, conn, version, dry_run=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE, throttle=DEFAULT_THROTTLE,
+                 log=print):
+        """Initialize the MigrationContext.
+
+        Args:
+            conn: sqlite3 connection in autocommit mode
+            version (int): Version of the migration being applied
+            dry_run (bool): Print statements instead of executing them
+            chunk_size (int): Source rows per backfill transaction
+            throttle (float): Seconds to pause between backfill chunks
+            log: Function used for progress output
+        """
+        self.conn = conn
+        self.version = version
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.throttle = throttle
+        self.log = log
+
+    def table_exists(self, table):
+        """Check whether a table exists."""
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone() is not None
+
+    def columns(self, table):
+        """Get the column names of a table."""
+        return [row[1] for row in self.conn.execute('PRAGMA table_info(%s)' % table)]
+
+    def execute(self, sql, params=()):
+        """Run one DDL/DML statement in its own transaction."""
+        if self.dry_run:
+            self.log('    ' + ' '.join(sql.split()))
+            return
+        with self.conn:
+            self.conn.execute(sql, params)
+
+    def add_column(self, table, column, ddl):
+        """Add a column unless it already exists."""
+        if self.table_exists(table) and column not in self.columns(table):
+            self.execute('ALTER TABLE %s ADD COLUMN %s %s' % (table, column, ddl))
+
+    def create_table(self, table, ddl, *indexes):
+        """Create a table and its indexes unless the table already exists.
+
+        Migrations spell out their tables as they were at that version,
+        so a later model change needs a migration of its own instead of
+        rewriting what an old one creates.
+
+        Args:
+            table (str): Table name
+            ddl (str): CREATE TABLE statement
+            *indexes: CREATE INDEX statements
+        """
+        if self.table_exists(table):
+            return
+        self.execute(ddl)
+        for index in indexes:
+            self.execute(index)
+
+    def backfill(self, name, table, process, key='id'):
+        """Apply ``process`` to a table in ID-range chunks.
+
+        Each chunk and the backfill checkpoint are committed together, so
+        a resumed run continues after the last finished chunk.
+
+        Args:
+            name (str): Backfill name, unique within the migration
+            table (str): Source table to walk
+            process: Function (conn, low, high) handling ids in [low, high)
+            key (str): Integer key column of the source table
+
+        Returns:
+            int: Number of chunks processed
+        """
+        if not self.table_exists(table):
+            return 0
+        low, high = self.conn.execute(
+            'SELECT MIN(%s), MAX(%s) FROM %s' % (key, key, table)
+        ).fetchone()
+        if low is None:
+            return 0
+        position = self._checkpoint(name)
+        if position is not None:
+            low = position
+        chunks = max(0, (high - low) // self.chunk_size + 1)
+        if self.dry_run:
+            self.log(f'    backfill {name}: {table}.{key} {low}..{high} '
+                     f'in {chunks} chunks of {self.chunk_size}')
+            return chunks
+
+        started = time.monotonic()
+        for i, start in enumerate(range(low, high + 1, self.chunk_size), 1):
+            end = start + self.chunk_size
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                process(self.conn, start, end)
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO schema_backfill '
+                    '(version, name, position) VALUES (?, ?, ?)',
+                    (self.version, name, end)
+                )
+            if i % 50 == 0 or i == chunks:
+                rate = i * self.chunk_size / max(time.monotonic() - started, 1e-6)
+                self.log(f'    {name}: chunk {i}/{chunks} ({rate:.0f} ids/s)')
+            if self.throttle:
+                time.sleep(self.throttle)
+        return chunks
+
+    def _checkpoint(self, name):
+        row = self.conn.execute(
+            'SELECT position FROM schema_backfill WHERE version = ? AND name = ?',
+            (self.version, name)
+        ).fetchone()
+        return row[0] if row else None
+
+
+def connect(db_path):
+    """Open a connection suitable for running migrations alongside the app."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA busy_timeout = %d' % BUSY_TIMEOUT_MS)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL,
+            duration_ms INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_backfill (
+            version INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (version, name)
+        )
+    ''')
+    return conn
+
+
+def applied_versions(conn):
+    """Get the set of applied migration versions."""
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+
+def pending_migrations(conn, target=None):
+    """Get the migrations not yet applied, in order, up to ``target``."""
+    applied = applied_versions(conn)
+    return [m for m in MIGRATIONS
+            if m[0] not in applied and (target is None or m[0] <= target)]
+
+
+def migrate(conn, target=None, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE,
+            throttle=DEFAULT_THROTTLE, log=print):
+    """Apply pending migrations in order.
+
+    Args:
+        conn: Connection returned by ``connect``
+        target (int, optional): Highest version to apply
+        dry_run (bool): Only print what would be executed
+        chunk_size (int): Source rows per backfill transaction
+        throttle (float): Seconds to pause between backfill chunks
+        log: Function used for progress output
+
+    Returns:
+        list: Versions applied (or planned, in dry-run mode)
+    """
+    done = []
+    for version, description, up in pending_migrations(conn, target):
+        log(f'{"Plan" if dry_run else "Applying"} {version:04d}: {description}')
+        started = time.monotonic()
+        up(MigrationContext(conn, version, dry_run, chunk_size, throttle, log))
+        if not dry_run:
+            with conn:
+                conn.execute(
+                    'INSERT INTO schema_version '
+                    '(version, description, applied_at, duration_ms) '
+                    'VALUES (?, ?, ?, ?)',
+                    (version, description, datetime.utcnow().isoformat(' '),
+                     int((time.monotonic() - started) * 1000))
+                )
+                conn.execute('DELETE FROM schema_backfill WHERE version = ?',
+                             (version,))
+        done.append(version)
+    return done
+
+
+# Migrations -----------------------------------------------------------------
+
+@migration(1, 'Create users and feedback_new tables for the auth blueprint')
+def create_auth_tables(ctx):
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_admin BOOLEAN DEFAULT 0
+        )
+    ''')
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+@migration(2, 'Move legacy title/description feedback into feedback_new')
+def migrate_legacy_feedback(ctx):
+    # Only the pre-SQLAlchemy feedback table has title/description columns
+    if not ctx.table_exists('feedback') or 'title' not in ctx.columns('feedback'):
+        return
+    old_columns = ctx.columns('feedback')
+    copied = [col for col in ('title', 'description', 'category', 'status',
+                              'created_at') if col in old_columns]
+
+    def copy_chunk(conn, low, high):
+        conn.execute('''
+            INSERT OR IGNORE INTO feedback_new (id, user_id, %s)
+            SELECT id, NULL, %s FROM feedback WHERE id >= ? AND id < ?
+        ''' % (', '.join(copied), ', '.join(copied)), (low, high))
+
+    ctx.backfill('copy_feedback', 'feedback', copy_chunk)
+    ctx.execute('ALTER TABLE feedback RENAME TO feedback_old_backup')
+
+
+@migration(3, 'Create user, feedback and vote tables')
+def create_core_tables(ctx):
+    ctx.create_table('user', '''
+        CREATE TABLE user (
+            id INTEGER NOT NULL,
+            username VARCHAR(80) NOT NULL,
+            email VARCHAR(120) NOT NULL,
+            password_hash VARCHAR(200) NOT NULL,
+            created_at DATETIME,
+            is_admin BOOLEAN,
+            PRIMARY KEY (id),
+            UNIQUE (username),
+            UNIQUE (email)
+        )
+    ''')
+    ctx.create_table('feedback', '''
+        CREATE TABLE feedback (
+            id INTEGER NOT NULL,
+            user_id INTEGER,
+            company_name VARCHAR(100) NOT NULL,
+            company_logo VARCHAR(500),
+            comment TEXT NOT NULL,
+            sentiment VARCHAR(20) NOT NULL,
+            status VARCHAR(20),
+            date_created DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES user (id)
+        )
+    ''')
+    ctx.create_table('vote', '''
+        CREATE TABLE vote (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            vote_type VARCHAR(10) NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME,
+            PRIMARY KEY (id),
+            CONSTRAINT unique_user_feedback_vote UNIQUE (user_id, feedback_id),
+            FOREIGN KEY(user_id) REFERENCES user (id) ON DELETE CASCADE,
+            FOREIGN KEY(feedback_id) REFERENCES feedback (id) ON DELETE CASCADE
+        )
+    ''')
+
+
+@migration(4, 'Add vote.updated_at')
+def add_vote_updated_at(ctx):
+    # SQLite cannot ADD COLUMN with a non-constant default, so existing
+    # votes are backfilled from created_at instead
+    ctx.add_column('vote', 'updated_at', 'DATETIME')
+
+    def fill_chunk(conn, low, high):
+        conn.execute('''
+            UPDATE vote SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)
+            WHERE id >= ? AND id < ? AND updated_at IS NULL
+        ''', (low, high))
+
+    ctx.backfill('vote_updated_at', 'vote', fill_chunk)
+
+
+@migration(5, 'Create feedback_hash and hash existing feedback')
+def create_feedback_hash(ctx):
+    from ingest import content_hash
+
+    ctx.create_table('feedback_hash', '''
+        CREATE TABLE feedback_hash (
+            content_hash VARCHAR(64) NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            PRIMARY KEY (content_hash),
+            FOREIGN KEY(feedback_id) REFERENCES feedback (id) ON DELETE CASCADE
+        )
+    ''')
+
+    def hash_chunk(conn, low, high):
+        rows = conn.execute(
+            'SELECT id, company_name, comment FROM feedback '
+            'WHERE id >= ? AND id < ? ORDER BY id', (low, high)
+        ).fetchall()
+        conn.executemany(
+            'INSERT OR IGNORE INTO feedback_hash (content_hash, feedback_id) '
+            'VALUES (?, ?)',
+            [(content_hash(company, comment), feedback_id)
+             for feedback_id, company, comment in rows]
+        )
+
+    ctx.backfill('hash_feedback', 'feedback', hash_chunk)
+
+
+@migration(6, 'Create the background job table')
+def create_job_table(ctx):
+    ctx.create_table('job', '''
+        CREATE TABLE job (
+            id INTEGER NOT NULL,
+            kind VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            attempts INTEGER NOT NULL,
+            max_attempts INTEGER NOT NULL,
+            last_error TEXT,
+            run_at DATETIME NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    ''',
+        'CREATE INDEX ix_job_status_run_at ON job (status, run_at)')
+
+
+@migration(7, 'Create company_daily_stats and backfill rollups')
+def create_company_daily_stats(ctx):
+    # Chunks add to the totals, so only backfill into an empty table
+    # (or resume a backfill this migration started)
+    fresh = not ctx.table_exists('company_daily_stats')
+    ctx.create_table('company_daily_stats', '''
+        CREATE TABLE company_daily_stats (
+            company_name VARCHAR(100) NOT NULL,
+            day VARCHAR(10) NOT NULL,
+            sentiment VARCHAR(20) NOT NULL,
+            feedback_count INTEGER NOT NULL,
+            approved_count INTEGER NOT NULL,
+            upvotes INTEGER NOT NULL,
+            downvotes INTEGER NOT NULL,
+            PRIMARY KEY (company_name, day, sentiment)
+        )
+    ''')
+    if not fresh and ctx._checkpoint('rollups') is None and ctx.conn.execute(
+            'SELECT 1 FROM company_daily_stats LIMIT 1').fetchone():
+        return
+
+    def rollup_chunk(conn, low, high):
+        conn.execute('''
+            INSERT INTO company_daily_stats
+                (company_name, day, sentiment, feedback_count, approved_count,
+                 upvotes, downvotes)
+            SELECT f.company_name, date(f.date_created), f.sentiment, COUNT(*),
+                   SUM(f.status = 'approved'),
+                   COALESCE(SUM(v.upvotes), 0), COALESCE(SUM(v.downvotes), 0)
+            FROM feedback f
+            LEFT JOIN (
+                SELECT feedback_id,
+                       SUM(vote_type = 'upvote') AS upvotes,
+                       SUM(vote_type = 'downvote') AS downvotes
+                FROM vote WHERE feedback_id >= :low AND feedback_id < :high
+                GROUP BY feedback_id
+            ) v ON v.feedback_id = f.id
+            WHERE f.id >= :low AND f.id < :high
+            GROUP BY f.company_name, date(f.date_created), f.sentiment
+            ON CONFLICT (company_name, day, sentiment) DO UPDATE SET
+                feedback_count = feedback_count + excluded.feedback_count,
+                approved_count = approved_count + excluded.approved_count,
+                upvotes = upvotes + excluded.upvotes,
+                downvotes = downvotes + excluded.downvotes
+        ''', {'low': low, 'high': high})
+
+    ctx.backfill('rollups', 'feedback', rollup_chunk)
+
+
+@migration(8, 'Create feedback_rank and backfill ranking rows')
+def create_feedback_rank(ctx):
+    import ranking
+
+    ctx.create_table('feedback_rank', '''
+        CREATE TABLE feedback_rank (
+            feedback_id INTEGER NOT NULL,
+            company_name VARCHAR(100) NOT NULL,
+            sentiment VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            date_created DATETIME NOT NULL,
+            upvotes INTEGER NOT NULL,
+            downvotes INTEGER NOT NULL,
+            hot FLOAT NOT NULL,
+            best FLOAT NOT NULL,
+            PRIMARY KEY (feedback_id),
+            FOREIGN KEY(feedback_id) REFERENCES feedback (id) ON DELETE CASCADE
+        )
+    ''',
+        'CREATE INDEX ix_feedback_rank_company_best ON feedback_rank '
+        '(status, company_name, best, date_created)',
+        'CREATE INDEX ix_feedback_rank_company_hot ON feedback_rank '
+        '(status, company_name, hot, date_created)',
+        'CREATE INDEX ix_feedback_rank_sentiment_best ON feedback_rank '
+        '(status, sentiment, best, date_created)',
+        'CREATE INDEX ix_feedback_rank_sentiment_hot ON feedback_rank '
+        '(status, sentiment, hot, date_created)',
+        'CREATE INDEX ix_feedback_rank_status_best ON feedback_rank '
+        '(status, best, date_created)',
+        'CREATE INDEX ix_feedback_rank_status_hot ON feedback_rank '
+        '(status, hot, date_created)')
+
+    def rank_chunk(conn, low, high):
+        rows = conn.execute('''
+            SELECT f.id, f.company_name, f.sentiment, f.status, f.date_created,
+                   COALESCE(SUM(v.vote_type = 'upvote'), 0),
+                   COALESCE(SUM(v.vote_type = 'downvote'), 0)
+            FROM feedback f LEFT JOIN vote v ON v.feedback_id = f.id
+            WHERE f.id >= ? AND f.id < ? AND f.id NOT IN (
+                SELECT feedback_id FROM feedback_rank
+                WHERE feedback_id >= ? AND feedback_id < ?)
+            GROUP BY f.id
+        ''', (low, high, low, high)).fetchall()
+        params = []
+        for (feedback_id, company_name, sentiment, status, date_created,
+             upvotes, downvotes) in rows:
+            created = ranking._parse_datetime(date_created)
+            params.append((feedback_id, company_name, sentiment,
+                           status or 'pending', created.isoformat(' '),
+                           upvotes, downvotes,
+                           ranking.hot_score(upvotes, downvotes, created),
+                           ranking.wilson_score(upvotes, downvotes)))
+        conn.executemany('''
+            INSERT OR IGNORE INTO feedback_rank
+                (feedback_id, company_name, sentiment, status, date_created,
+                 upvotes, downvotes, hot, best)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', params)
+
+    ctx.backfill('rank_feedback', 'feedback', rank_chunk)
+
+
+@migration(9, 'Create feedback_change and assign delta-sync change tokens')
+def create_feedback_change(ctx):
+    ctx.create_table('feedback_change', '''
+        CREATE TABLE feedback_change (
+            version INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            feedback_id INTEGER NOT NULL,
+            UNIQUE (feedback_id)
+        )
+    ''')
+
+    def token_chunk(conn, low, high):
+        conn.execute('''
+            INSERT OR IGNORE INTO feedback_change (feedback_id)
+            SELECT id FROM feedback WHERE id >= ? AND id < ? ORDER BY id
+        ''', (low, high))
+
+    ctx.backfill('change_tokens', 'feedback', token_chunk)
+
+
+@migration(10, 'Create feedback_archive and vote_archive tables')
+def create_archive_tables(ctx):
+    ctx.create_table('feedback_archive', '''
+        CREATE TABLE feedback_archive (
+            id INTEGER NOT NULL,
+            user_id INTEGER,
+            company_name VARCHAR(100) NOT NULL,
+            company_logo VARCHAR(500),
+            comment TEXT NOT NULL,
+            sentiment VARCHAR(20) NOT NULL,
+            status VARCHAR(20),
+            date_created DATETIME,
+            archived_at DATETIME NOT NULL,
+            archive_reason VARCHAR(20) NOT NULL,
+            PRIMARY KEY (id)
+        )
+    ''')
+    ctx.create_table('vote_archive', '''
+        CREATE TABLE vote_archive (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            vote_type VARCHAR(10) NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    ''',
+        'CREATE INDEX ix_vote_archive_feedback_id ON vote_archive '
+        '(feedback_id)')
+
+
+@migration(11, 'Create the near-duplicate MinHash/LSH index')
+def create_dedupe_index(ctx):
+    import dedupe
+
+    ctx.create_table('feedback_minhash', '''
+        CREATE TABLE feedback_minhash (
+            feedback_id INTEGER NOT NULL,
+            signature BLOB NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            PRIMARY KEY (feedback_id)
+        )
+    ''',
+        'CREATE INDEX ix_feedback_minhash_cluster_id ON feedback_minhash '
+        '(cluster_id)')
+    ctx.create_table('feedback_lsh', '''
+        CREATE TABLE feedback_lsh (
+            bucket BIGINT NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, feedback_id)
+        )
+    ''')
+
+    def index_chunk(conn, low, high):
+        rows = conn.execute(
+            'SELECT id, comment FROM feedback WHERE id >= ? AND id < ? ORDER BY id',
+            (low, high)
+        ).fetchall()
+        for feedback_id, comment in rows:
+            _index_sqlite(conn, dedupe, feedback_id, comment)
+
+    ctx.backfill('minhash', 'feedback', index_chunk)
+
+
+@migration(12, 'Create user_activity and index feedback by author')
+def create_user_activity(ctx):
+    ctx.create_table('user_activity', '''
+        CREATE TABLE user_activity (
+            user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id)
+        )
+    ''')
+    ctx.execute('CREATE INDEX IF NOT EXISTS ix_feedback_user_created '
+                'ON feedback (user_id, date_created, id)')
+
+
+@migration(13, 'Create the term index and per-company daily term counts')
+def create_term_index(ctx):
+    import ranking
+    import terms
+
+    ctx.create_table('feedback_term', '''
+        CREATE TABLE feedback_term (
+            term VARCHAR(100) NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            PRIMARY KEY (term, feedback_id)
+        )
+    ''',
+        'CREATE INDEX ix_feedback_term_feedback_id ON feedback_term '
+        '(feedback_id)')
+    ctx.create_table('company_term_daily', '''
+        CREATE TABLE company_term_daily (
+            company_name VARCHAR(100) NOT NULL,
+            day VARCHAR(10) NOT NULL,
+            term VARCHAR(100) NOT NULL,
+            doc_count INTEGER NOT NULL,
+            PRIMARY KEY (company_name, day, term)
+        )
+    ''',
+        'CREATE INDEX ix_company_term_daily_term_day ON company_term_daily '
+        '(term, day)')
+
+    def term_chunk(conn, low, high):
+        # Items already indexed by the running app are skipped, not recounted
+        rows = conn.execute('''
+            SELECT f.id, f.company_name, f.date_created, f.status, f.comment
+            FROM feedback f
+            WHERE f.id >= ? AND f.id < ? AND NOT EXISTS (
+                SELECT 1 FROM feedback_term t WHERE t.feedback_id = f.id)
+        ''', (low, high)).fetchall()
+        postings, counts = terms.index_rows(
+            (feedback_id, company_name, ranking._parse_datetime(created), status, comment)
+            for feedback_id, company_name, created, status, comment in rows
+        )
+        conn.executemany(terms.POSTING_SQL, postings)
+        conn.executemany(terms.COUNT_SQL, counts)
+
+    ctx.backfill('term_index', 'feedback', term_chunk)
+
+
+@migration(14, 'Create the shard directory tables')
+def create_shard_directory(ctx):
+    # Only used when sharding is enabled; `python sharding.py split` fills them
+    ctx.create_table('feedback_directory', '''
+        CREATE TABLE feedback_directory (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            company_name VARCHAR(100) NOT NULL
+        )
+    ''')
+    ctx.create_table('company_shard', '''
+        CREATE TABLE company_shard (
+            company_name VARCHAR(100) NOT NULL,
+            shard INTEGER NOT NULL,
+            PRIMARY KEY (company_name)
+        )
+    ''')
+
+
+@migration(15, 'Create the outbox event log and consumer checkpoints')
+def create_outbox(ctx):
+    # The log starts empty; consumers bootstrap from the tables (see outbox.py)
+    ctx.create_table('outbox_event', '''
+        CREATE TABLE outbox_event (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            kind SMALLINT NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            user_id INTEGER,
+            data TEXT,
+            created_at BIGINT NOT NULL
+        )
+    ''')
+    ctx.create_table('outbox_checkpoint', '''
+        CREATE TABLE outbox_checkpoint (
+            consumer VARCHAR(100) NOT NULL,
+            "offset" INTEGER NOT NULL,
+            updated_at BIGINT NOT NULL,
+            PRIMARY KEY (consumer)
+        )
+    ''')
+
+
+@migration(16, 'Add job leases')
+def add_job_leases(ctx):
+    # Running jobs without a lease are requeued by age (see JobQueue.recover)
+    ctx.add_column('job', 'worker', 'VARCHAR(100)')
+    ctx.add_column('job', 'lease_expires_at', 'DATETIME')
+
+
+@migration(17, 'Store vote counts and scores of archived feedback')
+def add_archive_scores(ctx):
+    import ranking
+
+    ctx.add_column('feedback_archive', 'upvotes', 'INTEGER NOT NULL DEFAULT 0')
+    ctx.add_column('feedback_archive', 'downvotes', 'INTEGER NOT NULL DEFAULT 0')
+    ctx.add_column('feedback_archive', 'hot', 'FLOAT NOT NULL DEFAULT 0.0')
+    ctx.add_column('feedback_archive', 'best', 'FLOAT NOT NULL DEFAULT 0.0')
+
+    def score_chunk(conn, low, high):
+        rows = conn.execute('''
+            SELECT f.id, f.date_created,
+                   COALESCE(SUM(v.vote_type = 'upvote'), 0),
+                   COALESCE(SUM(v.vote_type = 'downvote'), 0)
+            FROM feedback_archive f LEFT JOIN vote_archive v ON v.feedback_id = f.id
+            WHERE f.id >= ? AND f.id < ?
+            GROUP BY f.id
+        ''', (low, high)).fetchall()
+        conn.executemany(
+            'UPDATE feedback_archive SET upvotes = ?, downvotes = ?, hot = ?, best = ? '
+            'WHERE id = ?',
+            [(up, down,
+              ranking.hot_score(up, down, ranking._parse_datetime(created)),
+              ranking.wilson_score(up, down), feedback_id)
+             for feedback_id, created, up, down in rows])
+
+    ctx.backfill('archive_scores', 'feedback_archive', score_chunk)
+
+
+@migration(18, 'Sum votes on approved feedback in the company rollups')
+def add_approved_vote_rollups(ctx):
+    ctx.add_column('company_daily_stats', 'approved_upvotes', 'INTEGER NOT NULL DEFAULT 0')
+    ctx.add_column('company_daily_stats', 'approved_downvotes', 'INTEGER NOT NULL DEFAULT 0')
+    if ctx.table_exists('company_daily_stats'):
+        ctx.execute('''
+            UPDATE company_daily_stats SET (approved_upvotes, approved_downvotes) = (
+                SELECT COALESCE(SUM(v.vote_type = 'upvote'), 0),
+                       COALESCE(SUM(v.vote_type = 'downvote'), 0)
+                FROM feedback f JOIN vote v ON v.feedback_id = f.id
+                WHERE f.company_name = company_daily_stats.company_name
+                  AND date(f.date_created) = company_daily_stats.day
+                  AND f.sentiment = company_daily_stats.sentiment
+                  AND f.status = 'approved')
+        ''')
+
+
+def _index_sqlite(conn, dedupe, feedback_id, comment):
+    """sqlite3 version of ``dedupe.index_feedback`` for backfills"""
+    sig = dedupe.signature(comment)
+    keys = dedupe.band_keys(sig)
+    rows = conn.execute(
+        'SELECT l.feedback_id, m.signature, m.cluster_id FROM feedback_lsh l '
+        'JOIN feedback_minhash m ON m.feedback_id = l.feedback_id '
+        'WHERE l.bucket IN (%s) LIMIT ?' % ','.join('?' * len(keys)),
+        keys + [dedupe.MAX_CANDIDATES]
+    ).fetchall()
+    clusters = {cluster_id for _, blob, cluster_id in rows
+                if dedupe.similarity(sig, dedupe.unpack(blob)) >= dedupe.SIMILARITY_THRESHOLD}
+    cluster_id = min(clusters | {feedback_id})
+    conn.execute('INSERT OR REPLACE INTO feedback_minhash (feedback_id, signature, cluster_id) '
+                 'VALUES (?, ?, ?)', (feedback_id, dedupe.pack(sig), cluster_id))
+    conn.executemany('INSERT OR IGNORE INTO feedback_lsh (bucket, feedback_id) VALUES (?, ?)',
+                     [(key, feedback_id) for key in keys])
+    merged = clusters - {cluster_id}
+    if merged:
+        conn.execute('UPDATE feedback_minhash SET cluster_id = ? WHERE cluster_id IN (%s)'
+                     % ','.join('?' * len(merged)), [cluster_id] + list(merged))
+
+
+# Command line ----------------------------------------------------------------
+
+def create_default_admin(conn):
+    """Add the default admin account to ``users`` if it does not exist.
+
+    Returns:
+        bool: True if the account was created
+    """
+    from werkzeug.security import generate_password_hash
+
+    with conn:
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO users (username, email, password_hash, is_admin) '
+            'VALUES (?, ?, ?, 1)',
+            ('admin', 'admin@example.com', generate_password_hash('admin123'))
+        )
+    return cursor.rowcount == 1
+
+
+def default_db_path():
+    """Get the app's SQLite database path."""
+    from app import app, db
+
+    with app.app_context():
+        return db.engine.url.database
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Run schema migrations')
+    parser.add_argument('command', choices=('status', 'plan', 'up'))
+    parser.add_argument('--db', default=None,
+                        help='SQLite database path (defaults to the app database)')
+    parser.add_argument('--target', type=int, default=None,
+                        help='Highest version to apply')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--throttle', type=float, default=DEFAULT_THROTTLE,
+                        help='Seconds to pause between backfill chunks')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Same as the plan command')
+    parser.add_argument('--create-admin', action='store_true',
+                        help='Create the default admin user (password admin123)')
+    args = parser.parse_args(argv)
+
+    db_path = args.db or default_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = connect(db_path)
+    try:
+        if args.command == 'status':
+            applied = applied_versions(conn)
+            for version, description, _ in MIGRATIONS:
+                mark = '✓' if version in applied else ' '
+                print(f"  [{mark}] {version:04d} {description}")
+            pending = len(pending_migrations(conn))
+            print(f"{len(applied)} applied, {pending} pending")
+            return 0
+
+        dry_run = args.dry_run or args.command == 'plan'
+        try:
+            done = migrate(conn, target=args.target, dry_run=dry_run,
+                           chunk_size=args.chunk_size, throttle=args.throttle)
+        except Exception as e:
+            print(f"✗ Migration failed: {e}")
+            print("  Fix the problem and run again; finished backfill chunks are kept")
+            return 1
+        if args.create_admin and not dry_run:
+            if create_default_admin(conn):
+                print("✓ Admin user created (username: admin, password: admin123)")
+                print("  IMPORTANT: Change the admin password after first login!")
+            else:
+                print("✓ Admin user already exists")
+    finally:
+        conn.close()
+
+    if not done:
+        print("✓ Database is up to date")
+    elif dry_run:
+        print(f"Dry run: {len(done)} migrations would be applied")
+    else:
+        print(f"✓ Applied {len(done)} migrations")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""Transactional Outbox Module
+
+Downstream jobs (warehouse export, search index, caches, notifications)
+learn about changes from an append-only event log instead of re-scanning
+the feedback and vote tables. Every write that submits, scores, moderates,
+archives or restores feedback, or casts or removes a vote, inserts its
+events into ``outbox_event`` in the same transaction, so an event exists
+exactly when its change was committed.
+
+An event's offset is the table's AUTOINCREMENT primary key. Writes are
+serialized by the database's single writer (see dbrouting.py), so offsets
+are committed in increasing order: a consumer that has seen offset N never
+misses an event numbered below N later. Events are stored compactly: a
+small integer kind and the kind's fields as a positional JSON array (vote
+types as +1/-1), decoded back to named fields when read.
+
+Consumers keep their position in ``outbox_checkpoint``. They read a batch
+after their checkpoint, process it, then acknowledge the last offset, so
+delivery is at-least-once: a consumer that crashes before acknowledging
+sees the batch again. Compaction deletes events every registered consumer
+has acknowledged; with no consumers registered nothing is deleted. A
+consumer reading after compacted events (a new consumer, or one dropped
+and re-added) is told it ``lost`` them and should rebuild its state from
+the tables.
+
+When the app is sharded, every shard has its own log and checkpoints;
+offsets of all shards are joined with dots into one token, as in
+``/api/sync``. Moving a company leaves its past events in the source
+shard's log. Drain the consumers of an unsharded database before
+splitting it: its log stays behind in the main database.
+
+Usage:
+    python outbox.py status
+    python outbox.py tail CONSUMER [--batch-size 500] [--follow]
+    python outbox.py compact
+    python outbox.py drop CONSUMER
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from sqlalchemy import bindparam, text
+
+from sharding import each_shard
+
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+DEFAULT_COMPACT_INTERVAL = 300  # seconds
+DEFAULT_COMPACT_BATCH = 5000
+FOLLOW_INTERVAL = 1.0  # seconds between polls of ``tail --follow``
+
+# Event kinds: (code, fields stored in this order)
+KINDS = {
+    'feedback.submitted': (1, ('company', 'status', 'sentiment')),
+    'feedback.scored': (2, ('sentiment', 'old_sentiment')),
+    'feedback.moderated': (3, ('status', 'old_status')),
+    'feedback.archived': (4, ('reason',)),
+    'feedback.restored': (5, ()),
+    'vote.cast': (6, ('vote', 'old_vote')),
+    'vote.removed': (7, ('old_vote',)),
+}
+NAMES = {code: (name, fields) for name, (code, fields) in KINDS.items()}
+VOTE_CODES = {'upvote': 1, 'downvote': -1}
+CODECS = {'vote': VOTE_CODES, 'old_vote': VOTE_CODES}
+DECODECS = {field: {code: value for value, code in codes.items()}
+            for field, codes in CODECS.items()}
+
+INSERT_SQL = text('''
+    INSERT INTO outbox_event (kind, feedback_id, user_id, data, created_at)
+    VALUES (:kind, :feedback_id, :user_id, :data, :created_at)
+''')
+INSERT_FOR_FEEDBACK_SQL = text('''
+    INSERT INTO outbox_event (kind, feedback_id, user_id, data, created_at)
+    SELECT :kind, id, user_id, :data, :created_at FROM feedback
+    WHERE id IN :ids ORDER BY id
+''').bindparams(bindparam('ids', expanding=True))
+READ_SQL = text('''
+    SELECT id, kind, feedback_id, user_id, data, created_at FROM outbox_event
+    WHERE id > :after ORDER BY id LIMIT :limit
+''')
+HEAD_SQL = text("SELECT seq FROM sqlite_sequence WHERE name = 'outbox_event'")
+OLDEST_SQL = text('SELECT MIN(id) FROM outbox_event')
+CHECKPOINT_SQL = text('SELECT "offset" FROM outbox_checkpoint WHERE consumer = :consumer')
+ACKNOWLEDGE_SQL = text('''
+    INSERT INTO outbox_checkpoint (consumer, "offset", updated_at)
+    VALUES (:consumer, :offset, :now)
+    ON CONFLICT (consumer) DO UPDATE SET
+        "offset" = MAX("offset", excluded."offset"),
+        updated_at = excluded.updated_at
+''')
+COMPACT_SQL = text('''
+    DELETE FROM outbox_event WHERE id IN (
+        SELECT id FROM outbox_event WHERE id <= :upto ORDER BY id LIMIT :limit)
+''')
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def encode(kind, fields):
+    """Encode an event's fields for storage.
+
+    Args:
+        kind (str): Event kind, a key of ``KINDS``
+        fields (dict): Field values by name; missing fields are null
+
+    Returns:
+        tuple: (kind code, JSON text or None when every field is null)
+    """
+    code, names = KINDS[kind]
+    values = [CODECS[name].get(fields.get(name), fields.get(name)) if name in CODECS
+              else fields.get(name) for name in names]
+    while values and values[-1] is None:
+        values.pop()
+    return code, json.dumps(values, separators=(',', ':')) if values else None
+
+
+def decode(row):
+    """Turn a stored event row into the dict handed to consumers."""
+    offset, code, feedback_id, user_id, data, created_at = row
+    name, names = NAMES[code]
+    values = json.loads(data) if data else []
+    fields = {}
+    for field, value in zip(names, values + [None] * (len(names) - len(values))):
+        fields[field] = DECODECS[field].get(value) if field in DECODECS else value
+    return {
+        'offset': offset,
+        'type': name,
+        'feedback_id': feedback_id,
+        'user_id': user_id,
+        'created_at': created_at,
+        'data': fields,
+    }
+
+
+def emit(session, kind, feedback_id, user_id=None, **fields):
+    """Record an event inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        kind (str): Event kind, a key of ``KINDS``
+        feedback_id (int): The feedback item the event is about
+        user_id (int, optional): The item's author for feedback events,
+            the voter for vote events
+        **fields: The kind's fields
+    """
+    emit_many(session, kind, [(feedback_id, user_id, fields)])
+
+
+def emit_many(session, kind, events):
+    """Record several events of one kind inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        kind (str): Event kind, a key of ``KINDS``
+        events: (feedback_id, user_id, fields dict) tuples, in order
+    """
+    now = _now()
+    rows = []
+    for feedback_id, user_id, fields in events:
+        code, data = encode(kind, fields)
+        rows.append({'kind': code, 'feedback_id': feedback_id, 'user_id': user_id,
+                     'data': data, 'created_at': now})
+    if rows:
+        session.execute(INSERT_SQL, rows)
+
+
+def emit_feedback(session, kind, ids, **fields):
+    """Record one event per existing feedback item, authored by its owner.
+
+    Runs as a single ``INSERT ... SELECT``, for batch operations that
+    already work on lists of IDs (archiving, restoring).
+    """
+    if ids:
+        code, data = encode(kind, fields)
+        session.execute(INSERT_FOR_FEEDBACK_SQL, {
+            'kind': code, 'data': data, 'created_at': _now(), 'ids': list(ids)})
+
+
+def head(session):
+    """Get the offset of the newest event ever recorded (0 if none)."""
+    return session.execute(HEAD_SQL).scalar() or 0
+
+
+def read(session, after=0, limit=DEFAULT_BATCH_SIZE):
+    """Read a batch of events after an offset.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        after (int): Last offset the consumer processed (0 for the start)
+        limit (int): Maximum number of events to return
+
+    Returns:
+        dict: ``events`` in offset order, ``offset`` to acknowledge once
+        they are processed, ``has_more`` and ``lost`` (events after
+        ``after`` were compacted, or the log was recreated, before they
+        were read)
+    """
+    newest = head(session)
+    lost = after > newest
+    if lost:
+        after = 0
+    rows = session.execute(READ_SQL, {'after': after, 'limit': limit + 1}).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    first = rows[0][0] if rows else newest + 1
+    return {
+        'events': [decode(row) for row in rows],
+        'offset': rows[-1][0] if rows else max(after, newest),
+        'has_more': has_more,
+        'lost': lost or first > after + 1,
+    }
+
+
+def checkpoint(session, consumer):
+    """Get a consumer's acknowledged offset (0 for a new consumer)."""
+    return session.execute(CHECKPOINT_SQL, {'consumer': consumer}).scalar() or 0
+
+
+def acknowledge(session, consumer, offset):
+    """Record that a consumer processed every event up to an offset.
+
+    Registers new consumers. Checkpoints never move backwards, so a stale
+    or repeated acknowledgement is harmless. The caller commits.
+    """
+    session.execute(ACKNOWLEDGE_SQL, {'consumer': consumer, 'offset': offset, 'now': _now()})
+
+
+def consume(session, consumer, handler, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Hand a consumer's pending events to a function, batch by batch.
+
+    Each batch is acknowledged and committed after ``handler`` returns; if
+    it raises, the batch is read again by the next call.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        consumer (str): Consumer name
+        handler: Called with each read() result (events, offset, lost)
+        batch_size (int): Events per batch
+        max_batches (int, optional): Stop after this many batches
+
+    Returns:
+        int: Number of events handled
+    """
+    handled = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        page = read(session, checkpoint(session, consumer), batch_size)
+        session.rollback()
+        if not page['events'] and not page['lost']:
+            break
+        handler(page)
+        acknowledge(session, consumer, page['offset'])
+        session.commit()
+        handled += len(page['events'])
+        batches += 1
+        if not page['has_more']:
+            break
+    return handled
+
+
+def compact(session, batch_size=DEFAULT_COMPACT_BATCH):
+    """Delete events every consumer acknowledged, one transaction per batch.
+
+    Returns:
+        int: Number of events deleted
+    """
+    upto = session.execute(text('SELECT MIN("offset") FROM outbox_checkpoint')).scalar()
+    session.rollback()
+    deleted = 0
+    while upto:
+        count = session.execute(COMPACT_SQL, {'upto': upto, 'limit': batch_size}).rowcount
+        session.commit()
+        deleted += count
+        if count < batch_size:
+            break
+    return deleted
+
+
+def drop(session, consumer):
+    """Unregister a consumer so compaction no longer waits for it.
+
+    Returns:
+        bool: Whether the consumer was registered
+    """
+    result = session.execute(text('DELETE FROM outbox_checkpoint WHERE consumer = :consumer'),
+                             {'consumer': consumer})
+    session.commit()
+    return result.rowcount > 0
+
+
+def status(session):
+    """Describe the log and its consumers.
+
+    Compaction only deletes the oldest events, so the retained events are
+    the contiguous range from the oldest offset to the head.
+
+    Returns:
+        dict: ``head`` offset, ``events`` retained and ``consumers`` with
+        their ``offset``, ``lag`` and ``updated_at`` (milliseconds)
+    """
+    newest = head(session)
+    oldest = session.execute(OLDEST_SQL).scalar()
+    consumers = [
+        {'consumer': consumer, 'offset': offset, 'lag': newest - offset,
+         'updated_at': updated_at}
+        for consumer, offset, updated_at in session.execute(text(
+            'SELECT consumer, "offset", updated_at FROM outbox_checkpoint ORDER BY consumer'))
+    ]
+    return {
+        'head': newest,
+        'events': newest - oldest + 1 if oldest is not None else 0,
+        'consumers': consumers,
+    }
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Read and maintain the outbox event log')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show the log size and consumer lag')
+    tail_parser = subparsers.add_parser(
+        'tail', help="Print a consumer's pending events as JSON lines and acknowledge them")
+    tail_parser.add_argument('consumer')
+    tail_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    tail_parser.add_argument('--follow', action='store_true',
+                             help='Keep polling for new events')
+    subparsers.add_parser('compact', help='Delete events every consumer acknowledged')
+    drop_parser = subparsers.add_parser('drop', help='Unregister a consumer')
+    drop_parser.add_argument('consumer')
+    args = parser.parse_args(argv)
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        if args.command == 'status':
+            for shard in each_shard():
+                info = status(db.session)
+                label = f"shard {shard}: " if shard is not None else ''
+                print(f"  {label}head {info['head']}, {info['events']} events retained")
+                for consumer in info['consumers']:
+                    print(f"  - {consumer['consumer']}: offset {consumer['offset']}, "
+                          f"{consumer['lag']} behind")
+        elif args.command == 'tail':
+            def print_events(page, shard):
+                if page['lost']:
+                    print(f"✗ Some events were compacted before {args.consumer} read them",
+                          file=sys.stderr)
+                for event in page['events']:
+                    if shard is not None:
+                        event['shard'] = shard
+                    print(json.dumps(event, separators=(',', ':')))
+                sys.stdout.flush()
+
+            while True:
+                for shard in each_shard():
+                    consume(db.session, args.consumer,
+                            lambda page: print_events(page, shard), args.batch_size)
+                if not args.follow:
+                    break
+                time.sleep(FOLLOW_INTERVAL)
+        elif args.command == 'compact':
+            deleted = sum(compact(db.session) for _ in each_shard())
+            print(f"✓ Deleted {deleted} acknowledged events")
+        else:
+            dropped = [drop(db.session, args.consumer) for _ in each_shard()]
+            if not any(dropped):
+                print(f"✗ Consumer {args.consumer} is not registered")
+                return 1
+            print(f"✓ Dropped consumer {args.consumer}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Password Hashing Module
+
+Runs password hashing off the request thread in a bounded worker pool and
+keeps stored hashes on the configured parameters. When
+``PASSWORD_HASH_METHOD`` changes (e.g. a higher scrypt cost), existing
+hashes keep working and are transparently re-hashed the next time their
+owner logs in. When the pool's queue is full, new hashing work is refused
+instead of letting a login storm pile up on every worker thread.
+
+hashlib's scrypt and PBKDF2 release the GIL, so a thread pool uses all
+cores without the pickling overhead of a process pool.
+
+Usage:
+    python passwords.py calibrate [--target-ms 250]   # suggest a cost
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Hash jobs allowed to wait per worker before new requests are refused
+DEFAULT_QUEUE_PER_WORKER = 8
+
+
+class HasherBusy(RuntimeError):
+    """Raised when the hashing pool has no capacity left."""
+
+
+@lru_cache(maxsize=None)
+def method_prefix(method):
+    """Get the canonical parameter prefix Werkzeug writes for a method.
+
+    ``scrypt`` and ``scrypt:32768:8:1`` produce the same prefix, so the
+    configured value can be given in either form.
+
+    Args:
+        method (str): Werkzeug hash method string
+
+    Returns:
+        str: Prefix before the first ``$`` of hashes made with the method
+    """
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(pwhash, method):
+    """Check whether a stored hash was made with other parameters.
+
+    Args:
+        pwhash (str): Stored password hash
+        method (str): Currently configured hash method
+
+    Returns:
+        bool: True if the hash should be replaced
+    """
+    return pwhash.split('$', 1)[0] != method_prefix(method)
+
+
+class PasswordHasher:
+    """Bounded worker pool for password hashing and verification."""
+
+    def __init__(self, method=DEFAULT_METHOD, workers=DEFAULT_WORKERS,
+                 max_pending=None, timeout=10.0):
+        """Initialize the PasswordHasher.
+
+        Args:
+            method (str): Werkzeug hash method for new hashes
+            workers (int): Number of hashing threads
+            max_pending (int, optional): Jobs allowed in flight (running
+                or queued) before ``HasherBusy`` is raised
+            timeout (float): Seconds to wait for a free slot
+        """
+        self.method = method
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(
+            max_pending or self.workers * DEFAULT_QUEUE_PER_WORKER
+        )
+        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix='password-hash')
+        method_prefix(method)  # fail fast on an invalid method
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy('Password hashing pool is saturated')
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with the configured method.
+
+        Raises:
+            HasherBusy: If the pool is saturated
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password and upgrade its hash if the method changed.
+
+        Args:
+            pwhash (str): Stored password hash
+            password (str): Password to check
+
+        Returns:
+            tuple: (matches, new hash to store or None)
+
+        Raises:
+            HasherBusy: If the pool is saturated
+        """
+        return self._run(self._verify, pwhash, password)
+
+    def _verify(self, pwhash, password):
+        if not check_password_hash(pwhash, password):
+            return False, None
+        if needs_rehash(pwhash, self.method):
+            return True, generate_password_hash(password, self.method)
+        return True, None
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        self._pool.shutdown(wait=True)
+
+
+def init_password_hasher(app):
+    """Create the app's password hasher from its config.
+
+    Reads ``PASSWORD_HASH_METHOD``, ``PASSWORD_HASH_WORKERS`` and
+    ``PASSWORD_HASH_MAX_PENDING``.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        PasswordHasher: The installed hasher
+    """
+    hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+    )
+    app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def time_method(method, rounds=3):
+    """Measure the average time of one hash in seconds."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        generate_password_hash('calibration-password', method=method)
+    return (time.perf_counter() - started) / rounds
+
+
+def calibrate(algorithm='scrypt', target_ms=250):
+    """Find the highest cost that hashes within a time budget.
+
+    Args:
+        algorithm (str): ``scrypt`` or ``pbkdf2``
+        target_ms (float): Time budget for one hash in milliseconds
+
+    Returns:
+        tuple: (method string, measured milliseconds)
+    """
+    if algorithm == 'scrypt':
+        candidates = ['scrypt:%d:8:1' % (2 ** exp) for exp in range(12, 21)]
+    else:
+        candidates = ['pbkdf2:sha256:%d' % iterations
+                      for iterations in (50000, 100000, 200000, 400000,
+                                         600000, 1000000, 2000000)]
+    best = (candidates[0], time_method(candidates[0]) * 1000)
+    for method in candidates[1:]:
+        elapsed = time_method(method) * 1000
+        if elapsed > target_ms:
+            break
+        best = (method, elapsed)
+    return best
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Password hashing tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    calibrate_parser = subparsers.add_parser(
+        'calibrate', help='Suggest PASSWORD_HASH_METHOD for a time budget')
+    calibrate_parser.add_argument('--algorithm', default='scrypt',
+                                  choices=('scrypt', 'pbkdf2'))
+    calibrate_parser.add_argument('--target-ms', type=float, default=250)
+    args = parser.parse_args(argv)
+
+    method, elapsed = calibrate(args.algorithm, args.target_ms)
+    print(f"✓ {method} takes {elapsed:.0f} ms per hash on this machine")
+    print(f"  Set OPENFEED_PASSWORD_HASH_METHOD={method}; existing users are "
+          f"re-hashed on their next login")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
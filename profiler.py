@@ -0,0 +1,195 @@
+"""Sampling Profiler Module
+
+This module provides an opt-in statistical profiler for request handlers.
+A background thread periodically captures the stacks of threads that are
+serving sampled requests and aggregates them per route, so hot endpoints
+can be inspected as flamegraph-compatible collapsed stacks.
+
+The profiler is disabled by default. When ``PROFILER_ENABLED`` is false no
+request hooks are installed, so unprofiled deployments pay nothing.
+"""
+
+import os
+import random
+import sys
+import threading
+from collections import Counter, defaultdict
+
+from flask import request, session
+
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+DEFAULT_MAX_DEPTH = 64
+PROFILE_HEADER = 'X-Profile'
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples the stacks of active requests."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, sample_rate=0.0,
+                 max_depth=DEFAULT_MAX_DEPTH):
+        """Initialize the SamplingProfiler.
+
+        Args:
+            interval (float): Seconds between two stack samples
+            sample_rate (float): Fraction of requests (0.0 - 1.0) to profile
+            max_depth (int): Maximum number of frames kept per stack
+        """
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.max_depth = max_depth
+        self._stacks = defaultdict(Counter)
+        self._active = {}  # thread ident -> route label
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def should_sample(self, forced=False):
+        """Decide whether the current request should be profiled.
+
+        Args:
+            forced (bool): True when the request explicitly asked for it
+
+        Returns:
+            bool: Whether to profile the request
+        """
+        return forced or (self.sample_rate > 0
+                          and random.random() < self.sample_rate)
+
+    def start_request(self, route):
+        """Begin sampling the calling thread under the given route label.
+
+        Args:
+            route (str): Route label the samples are aggregated under
+        """
+        with self._lock:
+            self._active[threading.get_ident()] = route
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='sampling-profiler', daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop_request(self):
+        """Stop sampling the calling thread."""
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        """Sampler loop; sleeps on an event while nothing is being profiled."""
+        while True:
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for ident, route in active.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._collapse(frame)
+                with self._lock:
+                    self._stacks[route][stack] += 1
+            del frames
+            self._wakeup.wait(self.interval)
+
+    def _collapse(self, frame):
+        """Render a frame chain as a root-to-leaf, semicolon separated stack.
+
+        Args:
+            frame: Innermost frame of the sampled thread
+
+        Returns:
+            str: Collapsed stack string
+        """
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append('%s (%s:%d)' % (
+                code.co_name,
+                os.path.basename(code.co_filename),
+                frame.f_lineno,
+            ))
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(name.replace(';', ':') for name in names)
+
+    def collapsed(self, route=None):
+        """Export aggregated samples in the collapsed-stack format.
+
+        Each line is ``route;frame;frame... count`` and can be fed
+        directly to flamegraph.pl or speedscope.
+
+        Args:
+            route (str, optional): Only export samples for this route
+
+        Returns:
+            str: Collapsed stacks, one per line
+        """
+        lines = []
+        with self._lock:
+            for label, stacks in sorted(self._stacks.items()):
+                if route and label != route:
+                    continue
+                for stack, count in stacks.most_common():
+                    lines.append('%s;%s %d' % (label, stack, count))
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def summary(self):
+        """Get the number of samples collected per route.
+
+        Returns:
+            dict: Mapping of route label to sample count
+        """
+        with self._lock:
+            return {route: sum(stacks.values())
+                    for route, stacks in self._stacks.items()}
+
+    def reset(self):
+        """Discard all collected samples."""
+        with self._lock:
+            self._stacks.clear()
+
+
+def init_profiler(app):
+    """Install the profiler request hooks if profiling is enabled.
+
+    Reads ``PROFILER_ENABLED``, ``PROFILER_SAMPLE_RATE`` and
+    ``PROFILER_INTERVAL`` from the app config. Admins can force profiling
+    of a single request by sending the ``X-Profile: 1`` header.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        SamplingProfiler: The installed profiler, or None when disabled
+    """
+    if not app.config.get('PROFILER_ENABLED', False):
+        return None
+
+    profiler = SamplingProfiler(
+        interval=app.config.get('PROFILER_INTERVAL', DEFAULT_INTERVAL),
+        sample_rate=app.config.get('PROFILER_SAMPLE_RATE', 0.0),
+    )
+    app.extensions['profiler'] = profiler
+
+    @app.before_request
+    def _start_profiling():
+        forced = (request.headers.get(PROFILE_HEADER) == '1'
+                  and session.get('is_admin'))
+        if not profiler.should_sample(forced):
+            return
+        route = request.url_rule.rule if request.url_rule else request.path
+        profiler.start_request(route)
+        request.environ['openfeed.profiled'] = True
+
+    @app.teardown_request
+    def _stop_profiling(exc=None):
+        if request.environ.get('openfeed.profiled'):
+            profiler.stop_request()
+
+    return profiler
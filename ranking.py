@@ -0,0 +1,231 @@
+"""Feedback Ranking Module
+
+Precomputed ranking scores for the ``hot`` and ``best`` sort modes. Each
+feedback item has a row in ``feedback_rank`` holding its vote counts, the
+filter columns (status, company, sentiment) and two indexed scores:
+
+- ``hot``: log-scaled vote score plus a creation-time term, so newer items
+  outrank older ones with the same votes. Because the time term is fixed
+  at creation the score never has to be decayed, and it only changes
+  when the item is voted on.
+- ``best``: lower bound of the Wilson score interval on the upvote ratio,
+  which ranks items by confidence rather than raw vote totals.
+
+Usage:
+    python ranking.py rebuild   # recompute all ranking rows
+"""
+
+import math
+import sys
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+
+
+# Offset and scale of the hot score time term: one order of magnitude of
+# votes is worth 12.5 hours of recency.
+HOT_EPOCH = datetime(2024, 1, 1)
+HOT_TIME_SCALE = 45000
+WILSON_Z = 1.96  # 95% confidence
+
+UPSERT_SQL = text('''
+    INSERT OR REPLACE INTO feedback_rank
+        (feedback_id, company_name, sentiment, status, date_created,
+         upvotes, downvotes, hot, best)
+    VALUES (:feedback_id, :company_name, :sentiment, :status, :date_created,
+            :upvotes, :downvotes, :hot, :best)
+''').bindparams(bindparam('date_created', type_=DateTime))
+
+
+def hot_score(upvotes, downvotes, date_created):
+    """Compute the time-weighted hot score.
+
+    Args:
+        upvotes (int): Number of upvotes
+        downvotes (int): Number of downvotes
+        date_created (datetime): Creation time of the feedback
+
+    Returns:
+        float: Hot score; higher ranks first
+    """
+    score = upvotes - downvotes
+    order = math.log10(max(abs(score), 1))
+    sign = 1 if score > 0 else -1 if score < 0 else 0
+    seconds = (date_created - HOT_EPOCH).total_seconds()
+    return round(sign * order + seconds / HOT_TIME_SCALE, 7)
+
+
+def wilson_score(upvotes, downvotes, z=WILSON_Z):
+    """Compute the lower bound of the Wilson score confidence interval.
+
+    Args:
+        upvotes (int): Number of upvotes
+        downvotes (int): Number of downvotes
+        z (float): Standard normal quantile for the confidence level
+
+    Returns:
+        float: Lower bound of the upvote ratio, between 0 and 1
+    """
+    n = upvotes + downvotes
+    if n == 0:
+        return 0.0
+    p = upvotes / n
+    denominator = 1 + z * z / n
+    centre = p + z * z / (2 * n)
+    margin = z * math.sqrt((p * (1 - p) + z * z / (4 * n)) / n)
+    return (centre - margin) / denominator
+
+
+def _row(feedback_id, company_name, sentiment, status, date_created,
+         upvotes=0, downvotes=0):
+    return {
+        'feedback_id': feedback_id,
+        'company_name': company_name,
+        'sentiment': sentiment,
+        'status': status,
+        'date_created': date_created,
+        'upvotes': upvotes,
+        'downvotes': downvotes,
+        'hot': hot_score(upvotes, downvotes, date_created),
+        'best': wilson_score(upvotes, downvotes),
+    }
+
+
+def insert_feedback(session, feedback):
+    """Create the ranking row for a newly submitted feedback item."""
+    session.execute(UPSERT_SQL, _row(
+        feedback.id, feedback.company_name, feedback.sentiment,
+        feedback.status, feedback.date_created
+    ))
+
+
+def insert_batch(session, ids, rows):
+    """Create ranking rows for bulk-inserted feedback with one executemany.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        ids (list): Feedback IDs in the same order as rows
+        rows (list): Dicts of feedback column values
+    """
+    if not ids:
+        return
+    session.execute(UPSERT_SQL, [
+        _row(feedback_id, row['company_name'], row['sentiment'],
+             row['status'], row['date_created'])
+        for feedback_id, row in zip(ids, rows)
+    ])
+
+
+def sync_feedback(session, feedback):
+    """Copy changed filter columns (status, sentiment) to the ranking row."""
+    session.execute(text('''
+        UPDATE feedback_rank SET status = :status, sentiment = :sentiment,
+            company_name = :company_name
+        WHERE feedback_id = :feedback_id
+    '''), {
+        'status': feedback.status,
+        'sentiment': feedback.sentiment,
+        'company_name': feedback.company_name,
+        'feedback_id': feedback.id,
+    })
+
+
+def record_vote(session, feedback, old_vote_type, new_vote_type):
+    """Update vote counts and both scores after a vote change.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        feedback: Feedback the vote belongs to
+        old_vote_type (str): Previous vote ('upvote'/'downvote') or None
+        new_vote_type (str): New vote ('upvote'/'downvote') or None
+    """
+    if old_vote_type == new_vote_type:
+        return
+    row = session.execute(text('''
+        UPDATE feedback_rank
+        SET upvotes = upvotes + :up, downvotes = downvotes + :down
+        WHERE feedback_id = :feedback_id
+        RETURNING upvotes, downvotes
+    '''), {
+        'up': int(new_vote_type == 'upvote') - int(old_vote_type == 'upvote'),
+        'down': int(new_vote_type == 'downvote') - int(old_vote_type == 'downvote'),
+        'feedback_id': feedback.id,
+    }).first()
+    if row is None:
+        return
+    upvotes, downvotes = row
+    session.execute(text('''
+        UPDATE feedback_rank SET hot = :hot, best = :best
+        WHERE feedback_id = :feedback_id
+    '''), {
+        'hot': hot_score(upvotes, downvotes, feedback.date_created),
+        'best': wilson_score(upvotes, downvotes),
+        'feedback_id': feedback.id,
+    })
+
+
+def rebuild(session, batch_size=5000):
+    """Recompute every ranking row from the feedback and vote tables.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        batch_size (int): Feedback rows per transaction
+
+    Returns:
+        int: Number of ranking rows written
+    """
+    session.execute(text(
+        'DELETE FROM feedback_rank '
+        'WHERE feedback_id NOT IN (SELECT id FROM feedback)'
+    ))
+    written = 0
+    last_id = 0
+    while True:
+        rows = session.execute(text('''
+            SELECT f.id, f.company_name, f.sentiment, f.status, f.date_created,
+                   COALESCE(SUM(v.vote_type = 'upvote'), 0),
+                   COALESCE(SUM(v.vote_type = 'downvote'), 0)
+            FROM feedback f LEFT JOIN vote v ON v.feedback_id = f.id
+            WHERE f.id > :last_id
+            GROUP BY f.id
+            ORDER BY f.id
+            LIMIT :limit
+        '''), {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            session.commit()
+            return written
+        last_id = rows[-1][0]
+        session.execute(UPSERT_SQL, [
+            _row(feedback_id, company_name, sentiment, status,
+                 _parse_datetime(date_created), upvotes, downvotes)
+            for (feedback_id, company_name, sentiment, status, date_created,
+                 upvotes, downvotes) in rows
+        ])
+        session.commit()
+        written += len(rows)
+
+
+def _parse_datetime(value):
+    """Convert a raw SQLite datetime column to a datetime."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value) if value else HOT_EPOCH
+
+
+def main(argv=None):
+    """Command line entry point."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ['rebuild']:
+        print("Usage: python ranking.py rebuild")
+        return 1
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        print(f"✓ Rebuilt {rebuild(db.session)} ranking rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
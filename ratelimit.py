@@ -0,0 +1,139 @@
+"""Rate Limiting Module
+
+In-memory token buckets used to reject brute-force login traffic before
+it costs a password hash. Buckets live in a ``ShardedBucketStore``: keys
+are spread over independently locked shards so concurrent requests for
+different keys rarely contend, and each shard evicts idle buckets once it
+grows past its size limit. Limiters with different rates may share a
+store, so each bucket keeps the rate and capacity it was filled with.
+The store only needs ``take()``, so it can be replaced by a shared
+backend when running several processes.
+"""
+
+import threading
+import time
+import zlib
+
+
+DEFAULT_SHARDS = 16
+DEFAULT_MAX_KEYS_PER_SHARD = 10000
+
+
+class ShardedBucketStore:
+    """Token bucket state partitioned over independently locked shards."""
+
+    def __init__(self, shards=DEFAULT_SHARDS,
+                 max_keys_per_shard=DEFAULT_MAX_KEYS_PER_SHARD,
+                 clock=time.monotonic):
+        """Initialize the ShardedBucketStore.
+
+        Args:
+            shards (int): Number of shards
+            max_keys_per_shard (int): Buckets kept per shard before idle
+                ones are evicted
+            clock: Function returning the current time in seconds
+        """
+        self.max_keys_per_shard = max_keys_per_shard
+        self.clock = clock
+        self._shards = [({}, threading.Lock()) for _ in range(max(1, shards))]
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(key.encode('utf-8')) % len(self._shards)]
+
+    def take(self, key, rate, capacity, cost=1):
+        """Take tokens from a bucket, refilling it for the elapsed time.
+
+        Args:
+            key (str): Bucket key
+            rate (float): Tokens added per second
+            capacity (float): Maximum tokens (burst size)
+            cost (float): Tokens required
+
+        Returns:
+            tuple: (allowed, seconds until enough tokens are available)
+        """
+        buckets, lock = self._shard(key)
+        now = self.clock()
+        with lock:
+            tokens, updated = buckets.get(key, (capacity, now))[:2]
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                buckets[key] = (tokens - cost, now, rate, capacity)
+                allowed, retry_after = True, 0.0
+            else:
+                buckets[key] = (tokens, now, rate, capacity)
+                allowed, retry_after = False, (cost - tokens) / rate
+            if len(buckets) > self.max_keys_per_shard:
+                self._evict(buckets, now)
+        return allowed, retry_after
+
+    def _evict(self, buckets, now):
+        """Drop buckets that have refilled completely (or the oldest half)."""
+        full = [key for key, (tokens, updated, rate, capacity)
+                in buckets.items()
+                if tokens + (now - updated) * rate >= capacity]
+        if len(full) < len(buckets) // 2:
+            by_age = sorted(buckets, key=lambda key: buckets[key][1])
+            full = by_age[:len(buckets) // 2]
+        for key in full:
+            del buckets[key]
+
+    def clear(self):
+        """Forget every bucket."""
+        for buckets, lock in self._shards:
+            with lock:
+                buckets.clear()
+
+
+class RateLimiter:
+    """Token-bucket limit for one kind of key (e.g. client IP)."""
+
+    def __init__(self, name, rate, capacity, store=None):
+        """Initialize the RateLimiter.
+
+        Args:
+            name (str): Namespace for this limiter's keys in the store
+            rate (float): Requests allowed per second on average
+            capacity (float): Burst size
+            store (ShardedBucketStore, optional): Shared bucket store
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store or ShardedBucketStore()
+
+    def hit(self, key, cost=1):
+        """Consume a token for the key.
+
+        Returns:
+            tuple: (allowed, seconds until the next request is allowed)
+        """
+        return self.store.take('%s:%s' % (self.name, key), self.rate,
+                               self.capacity, cost)
+
+
+def init_login_limits(app, store=None):
+    """Create the per-IP and per-account login limiters from the config.
+
+    Reads ``LOGIN_RATE_PER_IP``, ``LOGIN_RATE_PER_ACCOUNT`` and
+    ``AVAILABILITY_RATE_PER_IP`` (username/email checks) as (requests, per
+    seconds) pairs; the full request count may be used in one burst.
+
+    Args:
+        app: Flask application
+        store (ShardedBucketStore, optional): Bucket store to use
+
+    Returns:
+        dict: Limiters keyed by 'ip', 'account' and 'availability'
+    """
+    store = store or ShardedBucketStore()
+    limiters = {}
+    for kind, setting, default in (
+            ('ip', 'LOGIN_RATE_PER_IP', (30, 60)),
+            ('account', 'LOGIN_RATE_PER_ACCOUNT', (10, 300)),
+            ('availability', 'AVAILABILITY_RATE_PER_IP', (120, 60))):
+        requests, period = app.config.get(setting, default)
+        limiters[kind] = RateLimiter('login-%s' % kind, requests / period,
+                                     requests, store)
+    app.extensions['login_limits'] = limiters
+    return limiters
@@ -0,0 +1,287 @@
+"""Sentiment Re-scoring Script
+
+Re-run ``analyze_sentiment`` over the whole feedback table after the
+lexicon changes. Rows are read in ID-range shards by a pool of worker
+processes; the parent process is the only writer and applies the changed
+labels in batched UPDATEs, together with a ``feedback.scored`` outbox
+event and an activity cache invalidation per row. Finished shards are checkpointed so an
+interrupted run can resume where it stopped.
+
+Usage:
+    python rescore.py [--workers 4] [--shard-size 10000] [--dry-run]
+    python rescore.py --restart       # ignore an existing checkpoint
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from outbox import encode
+from rollups import REBUILD_SQL
+from sentiment import analyze_sentiment
+
+
+DEFAULT_SHARD_SIZE = 10000
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHECKPOINT = 'instance/rescore.checkpoint.json'
+
+EMIT_SQL = '''
+    INSERT INTO outbox_event (kind, feedback_id, user_id, data, created_at)
+    SELECT ?, id, user_id, ?, ? FROM feedback WHERE id = ?
+'''
+TOUCH_SQL = '''
+    INSERT INTO user_activity (user_id, version)
+    SELECT user_id, 1 FROM feedback WHERE id = ? AND user_id IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+'''
+
+
+def score_shard(db_path, low, high):
+    """Score every feedback row with low <= id < high.
+
+    Runs inside a worker process, so it opens its own read-only
+    connection.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        low (int): First feedback ID of the shard
+        high (int): End of the shard (exclusive)
+
+    Returns:
+        tuple: (low, list of (id, new label, old label) for changed rows,
+        Counter of (old label, new label) transitions)
+    """
+    conn = sqlite3.connect('file:%s?mode=ro' % db_path, uri=True)
+    try:
+        rows = conn.execute(
+            'SELECT id, comment, sentiment FROM feedback '
+            'WHERE id >= ? AND id < ?',
+            (low, high)
+        )
+        changes = []
+        transitions = Counter()
+        for feedback_id, comment, old in rows:
+            new = analyze_sentiment(comment)
+            transitions[(old, new)] += 1
+            if new != old:
+                changes.append((feedback_id, new, old))
+        return low, changes, transitions
+    finally:
+        conn.close()
+
+
+def load_checkpoint(path, shard_size):
+    """Load the set of finished shards from a previous run.
+
+    Args:
+        path (str): Checkpoint file path
+        shard_size (int): Shard size of the current run
+
+    Returns:
+        set: Starting IDs of shards that are already done
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('shard_size') != shard_size:
+        print("✗ Checkpoint was written with a different shard size, ignoring it")
+        return set()
+    return set(data.get('done', []))
+
+
+def save_checkpoint(path, shard_size, done):
+    """Atomically write the set of finished shards."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'shard_size': shard_size, 'done': sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+def apply_changes(conn, changes, batch_size=DEFAULT_BATCH_SIZE,
+                  sync_rank=False, sync_changes=False, sync_outbox=False,
+                  sync_activity=False):
+    """Write changed labels back in batched UPDATEs.
+
+    Args:
+        conn: sqlite3 connection used as the single writer
+        changes (list): (feedback id, new label, old label) tuples
+        batch_size (int): Rows per transaction
+        sync_rank (bool): Also update the feedback_rank filter column
+        sync_changes (bool): Also assign new delta-sync change tokens
+        sync_outbox (bool): Also emit ``feedback.scored`` events
+        sync_activity (bool): Also invalidate the authors' cached activity
+    """
+    for start in range(0, len(changes), batch_size):
+        batch = changes[start:start + batch_size]
+        params = [(label, feedback_id) for feedback_id, label, _ in batch]
+        with conn:
+            conn.executemany(
+                'UPDATE feedback SET sentiment = ? WHERE id = ?', params
+            )
+            if sync_rank:
+                conn.executemany(
+                    'UPDATE feedback_rank SET sentiment = ? '
+                    'WHERE feedback_id = ?', params
+                )
+            if sync_changes:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO feedback_change (feedback_id) '
+                    'VALUES (?)', [(feedback_id,) for _, feedback_id in params]
+                )
+            if sync_outbox:
+                now = int(time.time() * 1000)
+                conn.executemany(EMIT_SQL, [
+                    encode('feedback.scored', {'sentiment': new, 'old_sentiment': old})
+                    + (now, feedback_id) for feedback_id, new, old in batch
+                ])
+            if sync_activity:
+                conn.executemany(TOUCH_SQL, [(feedback_id,) for _, feedback_id in params])
+
+
+def _has_table(conn, name):
+    """Check whether a table exists in the database."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def print_distribution_diff(transitions):
+    """Print the label distribution before and after re-scoring."""
+    before = Counter()
+    after = Counter()
+    for (old, new), count in transitions.items():
+        before[old] += count
+        after[new] += count
+
+    print("\nLabel distribution:")
+    print(f"  {'label':<12}{'before':>10}{'after':>10}{'diff':>10}")
+    for label in sorted(set(before) | set(after)):
+        diff = after[label] - before[label]
+        print(f"  {label:<12}{before[label]:>10}{after[label]:>10}{diff:>+10}")
+
+    moved = [(k, v) for k, v in transitions.items() if k[0] != k[1]]
+    if moved:
+        print("\nChanged labels:")
+        for (old, new), count in sorted(moved, key=lambda item: -item[1]):
+            print(f"  - {old} -> {new}: {count}")
+
+
+def rescore(db_path, workers=None, shard_size=DEFAULT_SHARD_SIZE,
+            batch_size=DEFAULT_BATCH_SIZE, checkpoint=DEFAULT_CHECKPOINT,
+            dry_run=False):
+    """Re-score all feedback in parallel.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        workers (int, optional): Worker processes (defaults to CPU count)
+        shard_size (int): Feedback IDs per shard
+        batch_size (int): Rows per UPDATE transaction
+        checkpoint (str): Checkpoint file path, or None to disable
+        dry_run (bool): Report what would change without writing
+
+    Returns:
+        Counter: (old label, new label) transitions of the processed shards
+    """
+    conn = sqlite3.connect(db_path)
+    low, high = conn.execute('SELECT MIN(id), MAX(id) FROM feedback').fetchone()
+    if low is None:
+        conn.close()
+        print("✓ Feedback table is empty, nothing to do")
+        return Counter()
+
+    shards = list(range(low - low % shard_size, high + 1, shard_size))
+    done = set()
+    if checkpoint and not dry_run:
+        done = load_checkpoint(checkpoint, shard_size)
+    pending = [start for start in shards if start not in done]
+    # Shards finished before an interruption may have changed labels too
+    resumed = bool(done)
+    print(f"Scoring {len(pending)} of {len(shards)} shards "
+          f"(ids {low}..{high}, {shard_size} per shard)")
+
+    sync_rank = _has_table(conn, 'feedback_rank')
+    sync_changes = _has_table(conn, 'feedback_change')
+    sync_outbox = _has_table(conn, 'outbox_event')
+    sync_activity = _has_table(conn, 'user_activity')
+    transitions = Counter()
+    changed = 0
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(score_shard, db_path, start, start + shard_size)
+                for start in pending
+            ]
+            for i, future in enumerate(as_completed(futures), 1):
+                start, changes, shard_transitions = future.result()
+                transitions.update(shard_transitions)
+                changed += len(changes)
+                if not dry_run:
+                    apply_changes(conn, changes, batch_size, sync_rank,
+                                  sync_changes, sync_outbox, sync_activity)
+                    if checkpoint:
+                        done.add(start)
+                        save_checkpoint(checkpoint, shard_size, done)
+
+                rows = sum(transitions.values())
+                rate = rows / max(time.monotonic() - started, 1e-6)
+                print(f"  [{i}/{len(pending)}] {rows} rows scored, "
+                      f"{changed} changed ({rate:.0f} rows/s)")
+
+        if (changed or resumed) and not dry_run and _has_table(conn, 'company_daily_stats'):
+            print("Rebuilding company rollups...")
+            conn.executescript('BEGIN;' + REBUILD_SQL + 'COMMIT;')
+    finally:
+        conn.close()
+
+    if checkpoint and not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)  # run finished; next run starts fresh
+    return transitions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Re-score feedback sentiment')
+    parser.add_argument('--db', default=None,
+                        help='SQLite database path (defaults to the app database)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true',
+                        help='Discard an existing checkpoint')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only report the label distribution diff')
+    args = parser.parse_args(argv)
+
+    db_path = args.db
+    if db_path is None:
+        from app import app, db
+        with app.app_context():
+            db_path = db.engine.url.database
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    transitions = rescore(
+        db_path,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        batch_size=args.batch_size,
+        checkpoint=args.checkpoint,
+        dry_run=args.dry_run,
+    )
+    print_distribution_diff(transitions)
+    if args.dry_run:
+        print("\nDry run: no rows were updated")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
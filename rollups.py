@@ -0,0 +1,285 @@
+"""Company Analytics Rollups Module
+
+Maintains the ``company_daily_stats`` table: one row per
+``(company_name, day, sentiment)`` holding feedback counts and vote sums,
+of all submitted feedback and of approved feedback only (the public
+figures).
+The rows are adjusted incrementally in the same transaction as the write
+that changes them (submission, moderation, sentiment scoring, votes), so
+per-company dashboards read O(days) rows instead of scanning feedback.
+
+Usage:
+    python rollups.py rebuild   # recompute all rollups from scratch
+"""
+
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+
+UPSERT_SQL = text('''
+    INSERT INTO company_daily_stats
+        (company_name, day, sentiment, feedback_count, approved_count,
+         upvotes, downvotes, approved_upvotes, approved_downvotes)
+    VALUES (:company_name, :day, :sentiment, :feedback_count,
+            :approved_count, :upvotes, :downvotes, :approved_upvotes,
+            :approved_downvotes)
+    ON CONFLICT (company_name, day, sentiment) DO UPDATE SET
+        feedback_count = feedback_count + excluded.feedback_count,
+        approved_count = approved_count + excluded.approved_count,
+        upvotes = upvotes + excluded.upvotes,
+        downvotes = downvotes + excluded.downvotes,
+        approved_upvotes = approved_upvotes + excluded.approved_upvotes,
+        approved_downvotes = approved_downvotes + excluded.approved_downvotes
+''')
+VOTE_COUNTS_SQL = text('''
+    SELECT COALESCE(SUM(vote_type = 'upvote'), 0), COALESCE(SUM(vote_type = 'downvote'), 0)
+    FROM vote WHERE feedback_id = :feedback_id
+''')
+
+# Plain SQL so scripts using sqlite3 directly (e.g. rescore.py) can run it
+REBUILD_SQL = '''
+    DELETE FROM company_daily_stats;
+    INSERT INTO company_daily_stats
+        (company_name, day, sentiment, feedback_count, approved_count,
+         upvotes, downvotes, approved_upvotes, approved_downvotes)
+    SELECT f.company_name, date(f.date_created), f.sentiment, COUNT(*),
+           SUM(f.status = 'approved'),
+           COALESCE(SUM(v.upvotes), 0), COALESCE(SUM(v.downvotes), 0),
+           COALESCE(SUM(CASE WHEN f.status = 'approved' THEN v.upvotes END), 0),
+           COALESCE(SUM(CASE WHEN f.status = 'approved' THEN v.downvotes END), 0)
+    FROM feedback f
+    LEFT JOIN (
+        SELECT feedback_id,
+               SUM(vote_type = 'upvote') AS upvotes,
+               SUM(vote_type = 'downvote') AS downvotes
+        FROM vote GROUP BY feedback_id
+    ) v ON v.feedback_id = f.id
+    GROUP BY f.company_name, date(f.date_created), f.sentiment;
+'''
+
+SENTIMENT_VALUES = {'positive': 1, 'neutral': 0, 'negative': -1}
+DEFAULT_WINDOW_DAYS = 30
+
+
+def _day(value):
+    """Normalize a datetime/date to the ISO day string used as key."""
+    return value.date().isoformat() if hasattr(value, 'date') else value.isoformat()
+
+
+def adjust(session, company_name, day, sentiment, feedback_count=0,
+           approved_count=0, upvotes=0, downvotes=0, approved_upvotes=0,
+           approved_downvotes=0):
+    """Apply a delta to one rollup row inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        company_name (str): Company name
+        day: datetime or date the feedback was created
+        sentiment (str): Sentiment label of the feedback
+        feedback_count (int): Change in submitted feedback
+        approved_count (int): Change in approved feedback
+        upvotes (int): Change in upvotes
+        downvotes (int): Change in downvotes
+        approved_upvotes (int): Change in upvotes on approved feedback
+        approved_downvotes (int): Change in downvotes on approved feedback
+    """
+    session.execute(UPSERT_SQL, {
+        'company_name': company_name,
+        'day': _day(day),
+        'sentiment': sentiment,
+        'feedback_count': feedback_count,
+        'approved_count': approved_count,
+        'upvotes': upvotes,
+        'downvotes': downvotes,
+        'approved_upvotes': approved_upvotes,
+        'approved_downvotes': approved_downvotes,
+    })
+
+
+def record_feedback(session, feedback):
+    """Count a newly submitted feedback item."""
+    adjust(session, feedback.company_name, feedback.date_created,
+           feedback.sentiment, feedback_count=1,
+           approved_count=int(feedback.status == 'approved'))
+
+
+def record_feedback_batch(session, rows):
+    """Count many inserted feedback rows with one executemany.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        rows: Iterable of dicts with company_name, date_created,
+            sentiment and status keys
+    """
+    totals = Counter()
+    approved = Counter()
+    for row in rows:
+        key = (row['company_name'], _day(row['date_created']), row['sentiment'])
+        totals[key] += 1
+        approved[key] += int(row['status'] == 'approved')
+    if not totals:
+        return
+    session.execute(UPSERT_SQL, [{
+        'company_name': company_name,
+        'day': day,
+        'sentiment': sentiment,
+        'feedback_count': count,
+        'approved_count': approved[(company_name, day, sentiment)],
+        'upvotes': 0,
+        'downvotes': 0,
+        'approved_upvotes': 0,
+        'approved_downvotes': 0,
+    } for (company_name, day, sentiment), count in totals.items()])
+
+
+def record_status_change(session, feedback, old_status):
+    """Account for a moderation decision on a feedback item (and its votes)."""
+    delta = int(feedback.status == 'approved') - int(old_status == 'approved')
+    if delta:
+        upvotes, downvotes = session.execute(
+            VOTE_COUNTS_SQL, {'feedback_id': feedback.id}).one()
+        adjust(session, feedback.company_name, feedback.date_created,
+               feedback.sentiment, approved_count=delta,
+               approved_upvotes=delta * upvotes, approved_downvotes=delta * downvotes)
+
+
+def record_sentiment_change(session, feedback, old_sentiment, upvotes=0,
+                            downvotes=0):
+    """Move a feedback item (and its votes) to its new sentiment bucket."""
+    if feedback.sentiment == old_sentiment:
+        return
+    approved = int(feedback.status == 'approved')
+    adjust(session, feedback.company_name, feedback.date_created,
+           old_sentiment, feedback_count=-1, approved_count=-approved,
+           upvotes=-upvotes, downvotes=-downvotes,
+           approved_upvotes=-approved * upvotes, approved_downvotes=-approved * downvotes)
+    adjust(session, feedback.company_name, feedback.date_created,
+           feedback.sentiment, feedback_count=1, approved_count=approved,
+           upvotes=upvotes, downvotes=downvotes,
+           approved_upvotes=approved * upvotes, approved_downvotes=approved * downvotes)
+
+
+def record_vote(session, feedback, old_vote_type, new_vote_type):
+    """Account for a vote being cast, changed or removed.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        feedback: Feedback the vote belongs to
+        old_vote_type (str): Previous vote ('upvote'/'downvote') or None
+        new_vote_type (str): New vote ('upvote'/'downvote') or None
+    """
+    if old_vote_type == new_vote_type:
+        return
+    upvotes = int(new_vote_type == 'upvote') - int(old_vote_type == 'upvote')
+    downvotes = int(new_vote_type == 'downvote') - int(old_vote_type == 'downvote')
+    approved = int(feedback.status == 'approved')
+    adjust(session, feedback.company_name, feedback.date_created,
+           feedback.sentiment, upvotes=upvotes, downvotes=downvotes,
+           approved_upvotes=approved * upvotes, approved_downvotes=approved * downvotes)
+
+
+def company_stats(session, company_name, days=DEFAULT_WINDOW_DAYS,
+                  include_unapproved=False):
+    """Build the statistics for one company from the rollup table.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        company_name (str): Company name
+        days (int): Number of most recent days to include
+        include_unapproved (bool): Also report feedback (and votes) that
+            is not approved
+
+    Returns:
+        dict: Totals, sentiment breakdown and per-day series
+    """
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    rows = session.execute(text('''
+        SELECT day, sentiment, feedback_count, approved_count,
+               approved_upvotes, approved_downvotes, upvotes, downvotes
+        FROM company_daily_stats
+        WHERE company_name = :company_name AND day >= :since
+        ORDER BY day
+    '''), {'company_name': company_name, 'since': since}).all()
+
+    breakdown = Counter()
+    per_day = {}
+    upvotes = downvotes = submitted = submitted_upvotes = submitted_downvotes = 0
+    for day, sentiment, feedback_count, approved_count, up, down, all_up, all_down in rows:
+        breakdown[sentiment] += approved_count
+        upvotes += up
+        downvotes += down
+        submitted += feedback_count
+        submitted_upvotes += all_up
+        submitted_downvotes += all_down
+        entry = per_day.setdefault(day, {
+            'day': day, 'total': 0, 'positive': 0, 'neutral': 0,
+            'negative': 0, 'upvotes': 0, 'downvotes': 0,
+        })
+        entry['total'] += approved_count
+        if sentiment in SENTIMENT_VALUES:
+            entry[sentiment] += approved_count
+        entry['upvotes'] += up
+        entry['downvotes'] += down
+
+    scored = sum(breakdown[label] for label in SENTIMENT_VALUES)
+    average = sum(SENTIMENT_VALUES[label] * breakdown[label]
+                  for label in SENTIMENT_VALUES)
+    stats = {
+        'company': company_name,
+        'days': days,
+        'since': since,
+        'total': sum(breakdown.values()),
+        'positive': breakdown['positive'],
+        'neutral': breakdown['neutral'],
+        'negative': breakdown['negative'],
+        'average_sentiment': round(average / scored, 3) if scored else 0,
+        'upvotes': upvotes,
+        'downvotes': downvotes,
+        'vote_score': upvotes - downvotes,
+        'daily': list(per_day.values()),
+    }
+    if include_unapproved:
+        stats['submitted'] = submitted
+        stats['submitted_upvotes'] = submitted_upvotes
+        stats['submitted_downvotes'] = submitted_downvotes
+    return stats
+
+
+def rebuild(connection):
+    """Recompute every rollup row from the feedback and vote tables.
+
+    Args:
+        connection: sqlite3 connection to the database
+    """
+    connection.executescript('BEGIN;' + REBUILD_SQL + 'COMMIT;')
+
+
+def main(argv=None):
+    """Command line entry point."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ['rebuild']:
+        print("Usage: python rollups.py rebuild")
+        return 1
+
+    import sqlite3
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        db_path = db.engine.url.database
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rebuild(conn)
+        count = conn.execute('SELECT COUNT(*) FROM company_daily_stats').fetchone()[0]
+    finally:
+        conn.close()
+    print(f"✓ Rebuilt company rollups ({count} rows)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
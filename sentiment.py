@@ -0,0 +1,41 @@
+"""Sentiment Analysis Module
+
+Lexicon-based sentiment scoring used for feedback comments. Kept free of
+Flask and database imports so it can be used from CLI tools and worker
+processes.
+"""
+
+POSITIVE_WORDS = (
+    'great', 'excellent', 'amazing', 'love', 'perfect', 'awesome',
+    'good', 'fantastic'
+)
+NEGATIVE_WORDS = (
+    'bad', 'terrible', 'awful', 'hate', 'worst', 'poor',
+    'disappointing'
+)
+
+
+def analyze_sentiment(text):
+    """Simple sentiment analysis"""
+    text_lower = text.lower()
+    pos_score = sum(1 for word in POSITIVE_WORDS if word in text_lower)
+    neg_score = sum(1 for word in NEGATIVE_WORDS if word in text_lower)
+
+    if pos_score > neg_score:
+        return "positive"
+    elif neg_score > pos_score:
+        return "negative"
+    else:
+        return "neutral"
+
+
+def analyze_batch(texts):
+    """Analyze the sentiment of many comments at once.
+
+    Args:
+        texts: Iterable of comment strings
+
+    Returns:
+        list: Sentiment labels in the same order as the input
+    """
+    return [analyze_sentiment(text) for text in texts]
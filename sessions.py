@@ -0,0 +1,365 @@
+"""Server-Side Session Module
+
+Flask's default session lives in a signed cookie: every request decodes
+and verifies it, and a session stays valid until the cookie expires, so
+there was no way to log a user out elsewhere. This module keeps session
+data on the server instead (privileges are still checked against the
+users table on each admin request, see ``admin_required``):
+
+- The cookie holds only a random session ID (32 URL-safe characters).
+  The ``sessions`` table stores its SHA-256 digest, the user ID, the
+  serialized data and an expiry time. It lives in its own WAL-mode SQLite
+  file, so saving a session never waits for the app database's writer
+  (which a request may still hold while its response is saved).
+- An in-process LRU cache answers most requests without touching
+  SQLite. Entries are rechecked against the table after ``cache_ttl``
+  seconds, which bounds how long another worker process can keep serving
+  a revoked session. Revocations made in this process apply at once.
+- Rows are written only when the session changes, or to slide the expiry
+  forward once less than half of the lifetime is left.
+- ``revoke_user`` deletes every session of a user in one statement.
+  ``expire`` deletes expired rows in small batches, so the write lock is
+  never held for long. The ``expire_sessions`` job runs it periodically.
+
+Usage:
+    python sessions.py stats
+    python sessions.py expire
+    python sessions.py revoke USER_ID
+"""
+
+import argparse
+import hashlib
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+
+from flask.sessions import SecureCookieSession, SessionInterface, session_json_serializer
+
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 5  # seconds before a cached session is rechecked
+DEFAULT_EXPIRE_BATCH = 1000
+DEFAULT_EXPIRE_INTERVAL = 300  # seconds between background expiry runs
+DEFAULT_BUSY_TIMEOUT = 5000  # milliseconds
+ID_BYTES = 24
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_sessions_user_id ON sessions (user_id);
+    CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at);
+'''
+
+
+def _digest(sid):
+    return hashlib.sha256(sid.encode('ascii')).hexdigest()
+
+
+class ServerSession(SecureCookieSession):
+    """Session dict that remembers its server-side ID."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.rotate = False
+
+    def regenerate(self):
+        """Move the data to a new session ID when the response is saved.
+
+        Call on login and logout so an ID seen before authentication can't
+        be used after it.
+        """
+        self.rotate = True
+        self.modified = True
+
+
+class SessionStore:
+    """Session rows in SQLite behind an LRU cache."""
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                 busy_timeout=DEFAULT_BUSY_TIMEOUT, clock=time.time):
+        """Initialize the SessionStore.
+
+        Args:
+            path (str): SQLite database file for the ``sessions`` table
+            cache_size (int): Sessions kept in memory
+            cache_ttl (float): Seconds a cached session is trusted
+            busy_timeout (int): Milliseconds to wait for another writer
+            clock: Wall-clock time function
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.clock = clock
+        self.stats = Counter()
+        self._cache = OrderedDict()  # digest -> (data, user_id, expires_at, checked_at)
+        self._by_user = {}  # user_id -> digests cached for the user
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Get this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql, params=()):
+        """Run one statement in its own transaction.
+
+        Returns:
+            list: Result rows of a query, or the row count of other statements
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(sql, params)
+            return cursor.fetchall() if cursor.description else cursor.rowcount
+
+    def _remember(self, digest, data, user_id, expires_at):
+        with self._lock:
+            self._forget(digest)
+            self._cache[digest] = (data, user_id, expires_at, self.clock())
+            self._by_user.setdefault(user_id, set()).add(digest)
+            while len(self._cache) > self.cache_size:
+                self._forget(next(iter(self._cache)))
+
+    def _forget(self, digest):
+        entry = self._cache.pop(digest, None)
+        if entry is not None:
+            digests = self._by_user.get(entry[1])
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_user[entry[1]]
+
+    def load(self, sid):
+        """Load a session's serialized data.
+
+        Returns:
+            tuple: (data, expires_at), or None if the session does not
+            exist or has expired
+        """
+        digest = _digest(sid)
+        now = self.clock()
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                if entry[2] > now and now - entry[3] < self.cache_ttl:
+                    self._cache.move_to_end(digest)
+                    self.stats['hits'] += 1
+                    return entry[0], entry[2]
+                self._forget(digest)
+
+        self.stats['misses'] += 1
+        rows = self._execute('SELECT data, user_id, expires_at FROM sessions '
+                             'WHERE id = ? AND expires_at > ?', (digest, now))
+        if not rows:
+            return None
+        data, user_id, expires_at = rows[0]
+        self._remember(digest, data, user_id, expires_at)
+        return data, expires_at
+
+    def save(self, sid, data, user_id, expires_at):
+        """Insert or replace a session."""
+        digest = _digest(sid)
+        self._execute('INSERT OR REPLACE INTO sessions (id, user_id, data, expires_at) '
+                      'VALUES (?, ?, ?, ?)', (digest, user_id, data, expires_at))
+        self.stats['writes'] += 1
+        self._remember(digest, data, user_id, expires_at)
+
+    def extend(self, sid, expires_at):
+        """Move a session's expiry forward without rewriting its data."""
+        digest = _digest(sid)
+        self._execute('UPDATE sessions SET expires_at = ? WHERE id = ?', (expires_at, digest))
+        self.stats['writes'] += 1
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                self._cache[digest] = (entry[0], entry[1], expires_at, entry[3])
+
+    def delete(self, sid):
+        """Delete one session."""
+        digest = _digest(sid)
+        with self._lock:
+            self._forget(digest)
+        self._execute('DELETE FROM sessions WHERE id = ?', (digest,))
+
+    def revoke_user(self, user_id):
+        """Delete every session of a user.
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._forget(digest)
+        deleted = self._execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+        self.stats['revoked'] += deleted
+        return deleted
+
+    def expire(self, batch_size=DEFAULT_EXPIRE_BATCH):
+        """Delete expired sessions, one short transaction per batch.
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        now = self.clock()
+        with self._lock:
+            for digest in [d for d, entry in self._cache.items() if entry[2] <= now]:
+                self._forget(digest)
+        deleted = 0
+        while True:
+            count = self._execute('DELETE FROM sessions WHERE id IN ('
+                                  'SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?)',
+                                  (now, batch_size))
+            deleted += count
+            if count < batch_size:
+                break
+        self.stats['expired'] += deleted
+        return deleted
+
+    def count(self, user_id=None):
+        """Count stored sessions that have not expired, optionally of one user."""
+        if user_id is None:
+            rows = self._execute('SELECT COUNT(*) FROM sessions WHERE expires_at > ?',
+                                 (self.clock(),))
+        else:
+            rows = self._execute('SELECT COUNT(*) FROM sessions WHERE user_id = ? '
+                                 'AND expires_at > ?', (user_id, self.clock()))
+        return rows[0][0]
+
+    def clear_cache(self):
+        """Drop every cached session."""
+        with self._lock:
+            self._cache.clear()
+            self._by_user.clear()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by a SessionStore."""
+
+    serializer = session_json_serializer
+    session_class = ServerSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self.store.load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                return self.session_class(self.serializer.loads(data), sid=sid,
+                                          expires_at=expires_at)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = self.store.clock()
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.sid and (session.rotate or not session):
+            if session.modified or session.rotate:
+                self.store.delete(session.sid)
+            if not session:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       httponly=self.get_cookie_httponly(app),
+                                       samesite=self.get_cookie_samesite(app))
+                return
+            session.sid = None
+        if not session:
+            return
+
+        lifetime = self._lifetime(app)
+        if session.sid is None or session.modified:
+            session.sid = session.sid or secrets.token_urlsafe(ID_BYTES)
+            session.expires_at = now + lifetime
+            self.store.save(session.sid, self.serializer.dumps(dict(session)),
+                            session.get('user_id'), session.expires_at)
+        elif session.expires_at - now < lifetime / 2:
+            session.expires_at = now + lifetime
+            self.store.extend(session.sid, session.expires_at)
+        else:
+            return
+
+        expires = (datetime.fromtimestamp(session.expires_at, timezone.utc)
+                   if session.permanent else None)
+        response.set_cookie(name, session.sid, expires=expires, domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            httponly=self.get_cookie_httponly(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def init_sessions(app):
+    """Replace the app's cookie sessions with server-side sessions.
+
+    Reads ``SESSION_DATABASE`` (default ``instance/sessions.db``),
+    ``SESSION_CACHE_SIZE`` and ``SESSION_CACHE_TTL``; session lifetime is ``PERMANENT_SESSION_LIFETIME``.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        SessionStore: The installed store
+    """
+    store = SessionStore(
+        app.config.get('SESSION_DATABASE') or os.path.join(app.instance_path, 'sessions.db'),
+        cache_size=app.config.get('SESSION_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+        cache_ttl=app.config.get('SESSION_CACHE_TTL', DEFAULT_CACHE_TTL),
+    )
+    app.session_interface = ServerSessionInterface(store)
+    app.extensions['sessions'] = store
+    return store
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Server-side sessions')
+    parser.add_argument('command', choices=('stats', 'expire', 'revoke'))
+    parser.add_argument('user_id', nargs='?', type=int, help='User to revoke')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_EXPIRE_BATCH)
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    store = app.extensions['sessions']
+    with app.app_context():
+        if args.command == 'stats':
+            print(f"✓ {store.count()} active sessions")
+        elif args.command == 'expire':
+            print(f"✓ Deleted {store.expire(args.batch_size)} expired sessions")
+        else:
+            if args.user_id is None:
+                print("✗ revoke needs a user ID")
+                return 1
+            print(f"✓ Revoked {store.revoke_user(args.user_id)} sessions of user {args.user_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,735 @@
+"""Company Sharding Module
+
+Every write to the app's SQLite file queues for the same lock, so write
+throughput stops growing however many workers serve requests. With
+sharding enabled (``SHARD_COUNT`` > 0), each company's feedback, votes and
+derived tables (rollups, ranking, change tokens, archives, near-duplicate
+and term indexes, activity versions, outbox events) live in one of several
+shard databases, each with its own writer and readers, and writes for
+companies on different shards no longer wait for each other.
+
+The main database keeps the global tables: users, background jobs, and
+
+- ``feedback_directory``, which allocates every feedback ID (so IDs are
+  unique across shards) and records its company. This is how a request
+  for ``/api/feedback/<id>`` finds its shard.
+- ``company_shard``, which pins companies moved by ``move`` or
+  ``rebalance``. Other companies are placed by a hash of their name.
+
+``RoutingSession`` (dbrouting.py) asks the shard set for a bind. Requests
+select their shard from the URL (``feedback_id``, ``cluster_id`` or
+``company_name`` view arguments) or explicitly with ``select_shard`` and
+``use_shard``. Views that span companies run their query once per shard
+with ``each_shard`` and merge the sorted results with ``merge_sorted``.
+ORM queries on tenant tables with no shard selected raise
+``ShardNotSelected`` instead of reading the empty tenant tables of the
+main database.
+
+Moving a company copies its rows to the target shard and fences it on the
+source in the same transaction: triggers reject further writes to the
+company's feedback and votes on the source, so nothing written during the
+move is lost. Then the placement is switched in the main database and the
+source rows are deleted. A move interrupted after the copy leaves the
+company read-only until it is rerun. Run one move at a time. Placements
+are cached per process for ``DEFAULT_PLACEMENT_TTL`` seconds; the process
+that moves a company forgets its placement at once.
+
+Maintenance CLIs of the other modules (rollups, ranking, terms, dedupe,
+sync backfills) work on one database file; run them against each shard
+with ``OPENFEED_DATABASE_URI`` pointing at it and ``OPENFEED_SHARDS`` unset.
+
+Usage:
+    python sharding.py status
+    python sharding.py split                  # move an unsharded database into the shards
+    python sharding.py move COMPANY SHARD
+    python sharding.py rebalance [--dry-run] [--tolerance 0.2]
+"""
+
+import argparse
+import heapq
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import MetaData, event, insert, select
+from sqlalchemy.engine import make_url
+
+from dbrouting import (DEFAULT_BUSY_TIMEOUT, DEFAULT_POOL_TIMEOUT, DEFAULT_READERS,
+                       create_engines)
+
+
+GLOBAL_TABLES = frozenset({'user', 'job', 'feedback_directory', 'company_shard'})
+DEFAULT_DIRECTORY_CACHE = 65536
+DEFAULT_PLACEMENT_CACHE = 4096
+# Seconds a cached placement is trusted; other processes see a move
+# within this (the fence rejects their writes to the source meanwhile)
+DEFAULT_PLACEMENT_TTL = 5.0
+DEFAULT_TOLERANCE = 0.2
+# Each shard's vote IDs start at a multiple of this, so IDs stay unique
+# when votes are archived and their company is moved later
+VOTE_ID_STRIDE = 1 << 40
+# Columns given new values when rows are copied to another shard
+RENUMBERED = {'vote': 'id', 'feedback_change': 'version'}
+# Tenant tables that stay with their shard when a company moves
+SHARD_LOCAL_TABLES = frozenset({'user_activity', 'outbox_event', 'outbox_checkpoint'})
+
+FENCE_SQL = '''
+CREATE TABLE IF NOT EXISTS shard_fence (company_name TEXT PRIMARY KEY);
+CREATE TRIGGER IF NOT EXISTS shard_fence_feedback_insert BEFORE INSERT ON feedback
+WHEN EXISTS (SELECT 1 FROM shard_fence WHERE company_name = NEW.company_name)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+CREATE TRIGGER IF NOT EXISTS shard_fence_feedback_update BEFORE UPDATE ON feedback
+WHEN EXISTS (SELECT 1 FROM shard_fence WHERE company_name = OLD.company_name)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+CREATE TRIGGER IF NOT EXISTS shard_fence_feedback_delete BEFORE DELETE ON feedback
+WHEN EXISTS (SELECT 1 FROM shard_fence WHERE company_name = OLD.company_name)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+CREATE TRIGGER IF NOT EXISTS shard_fence_vote_insert BEFORE INSERT ON vote
+WHEN EXISTS (SELECT 1 FROM shard_fence s JOIN feedback f ON f.company_name = s.company_name
+             WHERE f.id = NEW.feedback_id)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+CREATE TRIGGER IF NOT EXISTS shard_fence_vote_update BEFORE UPDATE ON vote
+WHEN EXISTS (SELECT 1 FROM shard_fence s JOIN feedback f ON f.company_name = s.company_name
+             WHERE f.id = OLD.feedback_id)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+CREATE TRIGGER IF NOT EXISTS shard_fence_vote_delete BEFORE DELETE ON vote
+WHEN EXISTS (SELECT 1 FROM shard_fence s JOIN feedback f ON f.company_name = s.company_name
+             WHERE f.id = OLD.feedback_id)
+BEGIN SELECT RAISE(ABORT, 'company moved to another shard'); END;
+'''
+
+
+class ShardNotSelected(RuntimeError):
+    """A tenant table was queried with no shard selected."""
+
+
+def shard_tables(metadata):
+    """Copy the tenant tables of the app's metadata for creating shards.
+
+    Shard vote tables use AUTOINCREMENT so the per-shard ID ranges seeded
+    by ``ShardSet.create_all`` are never reused.
+
+    Returns:
+        list: Tables (in a copy of the metadata, so foreign keys to global
+        tables still resolve)
+    """
+    copied = MetaData()
+    tables = []
+    for table in metadata.sorted_tables:
+        copy = table.to_metadata(copied)
+        if table.name == 'vote':
+            copy.dialect_options['sqlite']['autoincrement'] = True
+        if table.name not in GLOBAL_TABLES:
+            tables.append(copy)
+    return tables
+
+
+class ShardSet:
+    """The shard databases of an app and the placement of companies."""
+
+    def __init__(self, main_url, paths, metadata, readers=DEFAULT_READERS,
+                 busy_timeout=DEFAULT_BUSY_TIMEOUT, pool_timeout=DEFAULT_POOL_TIMEOUT,
+                 directory_cache_size=DEFAULT_DIRECTORY_CACHE,
+                 placement_cache_size=DEFAULT_PLACEMENT_CACHE,
+                 placement_ttl=DEFAULT_PLACEMENT_TTL):
+        """Initialize the shard set.
+
+        Args:
+            main_url: SQLAlchemy URL of the main (file-backed SQLite) database
+            paths (list): Shard database files, in shard order
+            metadata: The app's MetaData (global and tenant tables)
+            readers (int): Reader pool size per shard
+            busy_timeout (int): Milliseconds to wait for a lock
+            pool_timeout (int): Seconds to wait for a pooled connection
+            directory_cache_size (int): Feedback IDs whose company is cached
+            placement_cache_size (int): Companies whose shard is cached
+            placement_ttl (float): Seconds a cached shard is trusted
+        """
+        self.main_path = make_url(main_url).database
+        self.paths = list(paths)
+        self.metadata = metadata
+        self.writers = []
+        self.readers = []
+        for path in self.paths:
+            writer, reader = create_engines('sqlite:///' + path, readers,
+                                            busy_timeout, pool_timeout)
+            self.writers.append(writer)
+            self.readers.append(reader)
+        # IDs are allocated in short transactions of their own, so the
+        # directory has its own connections to the main database
+        self.directory_writer, self.directory_reader = create_engines(
+            main_url, readers, busy_timeout, pool_timeout)
+        self.directory_cache_size = directory_cache_size
+        self.placement_cache_size = placement_cache_size
+        self.placement_ttl = placement_ttl
+        self._companies = OrderedDict()  # feedback_id -> company_name
+        self._placements = OrderedDict()  # company_name -> (shard, expires)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def create_all(self):
+        """Create the tenant tables, fences and vote ID ranges of every shard."""
+        tables = shard_tables(self.metadata)
+        for shard, (path, writer) in enumerate(zip(self.paths, self.writers)):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tables[0].metadata.create_all(writer, tables=tables)
+            with _connect(path) as conn:
+                conn.executescript(FENCE_SQL)
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT 'vote', ? "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'vote')",
+                    ((shard + 1) * VOTE_ID_STRIDE,)
+                )
+
+    def drop_all(self):
+        """Drop every tenant table of every shard."""
+        tables = shard_tables(self.metadata)
+        for path, writer in zip(self.paths, self.writers):
+            tables[0].metadata.drop_all(writer, tables=tables)
+            with _connect(path) as conn:
+                conn.execute('DROP TABLE IF EXISTS shard_fence')
+        self.clear_cache()
+
+    def dispose(self):
+        """Close the pooled connections of every engine."""
+        for engine in self.writers + self.readers + [self.directory_writer,
+                                                     self.directory_reader]:
+            engine.dispose()
+
+    def clear_cache(self):
+        with self._lock:
+            self._companies.clear()
+            self._placements.clear()
+
+    def forget_placement(self, company_name):
+        """Drop a company's cached shard, after it was moved."""
+        with self._lock:
+            self._placements.pop(company_name, None)
+
+    def get_bind(self, mapper, clause, read_only):
+        """Pick the engine for a statement (see ``RoutingSession``).
+
+        Returns:
+            Engine: The selected shard's reader or writer, or None for the
+            main database (global tables, and SQL text with no shard selected)
+
+        Raises:
+            ShardNotSelected: For tenant tables when no shard is selected
+        """
+        table = _table_name(mapper, clause)
+        if table in GLOBAL_TABLES:
+            return None
+        shard = g.get('shard')
+        if shard is None:
+            if table is not None:
+                raise ShardNotSelected('No shard selected for table %s' % table)
+            return None
+        return self.readers[shard] if read_only else self.writers[shard]
+
+    def shard_for(self, company_name):
+        """Get the shard a company lives on (cached).
+
+        Returns:
+            int: Pinned shard from ``company_shard``, else a hash bucket
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._placements.get(company_name)
+            if cached is not None and cached[1] > now:
+                self._placements.move_to_end(company_name)
+                return cached[0]
+        table = self.metadata.tables['company_shard']
+        with self.directory_reader.connect() as conn:
+            pinned = conn.execute(select(table.c.shard).where(
+                table.c.company_name == company_name)).scalar()
+        if pinned is not None and pinned < len(self):
+            shard = pinned
+        else:
+            shard = zlib.crc32(company_name.encode('utf-8')) % len(self)
+        with self._lock:
+            self._placements[company_name] = (shard, now + self.placement_ttl)
+            self._placements.move_to_end(company_name)
+            while len(self._placements) > self.placement_cache_size:
+                self._placements.popitem(last=False)
+        return shard
+
+    def company_of(self, feedback_id):
+        """Look up the company of a feedback ID in the directory (cached).
+
+        Returns:
+            str: Company name, or None for unknown IDs
+        """
+        with self._lock:
+            company = self._companies.get(feedback_id)
+            if company is not None:
+                self._companies.move_to_end(feedback_id)
+                return company
+        table = self.metadata.tables['feedback_directory']
+        with self.directory_reader.connect() as conn:
+            company = conn.execute(select(table.c.company_name).where(
+                table.c.id == feedback_id)).scalar()
+        if company is not None:
+            # An ID's company never changes, only the company's shard
+            with self._lock:
+                self._companies[feedback_id] = company
+                while len(self._companies) > self.directory_cache_size:
+                    self._companies.popitem(last=False)
+        return company
+
+    def shard_of(self, feedback_id):
+        """Get the shard of a feedback item (or near-duplicate cluster).
+
+        Unknown IDs map to shard 0, where they are not found either.
+        """
+        company = self.company_of(feedback_id)
+        return self.shard_for(company) if company is not None else 0
+
+    def allocate_ids(self, companies):
+        """Allocate feedback IDs in the directory, one per company name.
+
+        Commits at once, before the caller writes to the shard; IDs of
+        items that end up rolled back are simply never used.
+
+        Returns:
+            list: New feedback IDs, in order
+        """
+        if not companies:
+            return []
+        table = self.metadata.tables['feedback_directory']
+        with self.directory_writer.begin() as conn:
+            return conn.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                [{'company_name': company} for company in companies]
+            ).scalars().all()
+
+
+def _table_name(mapper, clause):
+    if mapper is not None:
+        return mapper.local_table.name
+    table = getattr(clause, 'table', None)  # Core insert/update/delete
+    return getattr(table, 'name', None)
+
+
+def current_shards():
+    """Get the app's ShardSet, or None when sharding is disabled."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('shards')
+
+
+def select_shard(shard):
+    """Route the rest of the request (or app context) to a shard."""
+    g.shard = shard
+
+
+@contextmanager
+def use_shard(shard):
+    """Route queries in a block to a shard; None keeps the current one."""
+    if shard is None:
+        yield shard
+        return
+    previous = g.get('shard')
+    g.shard = shard
+    try:
+        yield shard
+    finally:
+        g.shard = previous
+
+
+def each_shard():
+    """Run the body of a loop once per shard.
+
+    Yields each shard number with the shard selected, or None once when
+    sharding is disabled, so the same loop serves both layouts.
+    """
+    shards = current_shards()
+    if shards is None:
+        yield None
+        return
+    for shard in range(len(shards)):
+        with use_shard(shard):
+            yield shard
+
+
+def feedback_scope(feedback_id):
+    """Context manager selecting the shard of a feedback item."""
+    shards = current_shards()
+    return use_shard(shards.shard_of(feedback_id) if shards is not None else None)
+
+
+def group_by_shard(feedback_ids):
+    """Split feedback IDs by shard.
+
+    Returns:
+        list: (shard, IDs) pairs; a single (None, IDs) pair when sharding
+        is disabled
+    """
+    shards = current_shards()
+    if shards is None:
+        return [(None, list(feedback_ids))]
+    groups = defaultdict(list)
+    for feedback_id in feedback_ids:
+        groups[shards.shard_of(feedback_id)].append(feedback_id)
+    return sorted(groups.items())
+
+
+def merge_sorted(results, key, reverse=False):
+    """K-way merge per-shard results that are each sorted by ``key``."""
+    return heapq.merge(*results, key=key, reverse=reverse)
+
+
+def init_sharding(app, db):
+    """Attach the shard set and request routing to an app.
+
+    Reads ``SHARD_COUNT`` (0 disables sharding), ``SHARD_DIR`` and the
+    ``DB_*`` pool settings of dbrouting.py. The main database must be a
+    file-backed SQLite database and ``db`` must use ``RoutingSession``.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+
+    Returns:
+        ShardSet: The shard set, or None when sharding is disabled
+    """
+    count = app.config.get('SHARD_COUNT', 0)
+    app.extensions['shards'] = None
+
+    @app.before_request
+    def route_to_shard():
+        shards = app.extensions.get('shards')
+        if shards is None or not request.view_args:
+            return
+        args = request.view_args
+        for name in ('feedback_id', 'cluster_id'):
+            if name in args:
+                g.shard = shards.shard_of(args[name])
+                return
+        if 'company_name' in args:
+            g.shard = shards.shard_for(args['company_name'])
+
+    @app.teardown_request
+    def end_shard_routing(exc):
+        g.pop('shard', None)
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def tag_identities(state):
+        # Vote IDs repeat across shards; keep their objects apart in the
+        # session's identity map
+        if (state.is_select and app.extensions.get('shards') is not None
+                and g.get('shard') is not None and state.bind_mapper is not None
+                and state.bind_mapper.local_table.name not in GLOBAL_TABLES):
+            state.update_execution_options(identity_token=g.shard)
+
+    if not count:
+        return None
+    directory = app.config.get('SHARD_DIR') or os.path.join(app.instance_path, 'shards')
+    with app.app_context():
+        main_url = db.engine.url  # relative SQLite paths resolved by Flask-SQLAlchemy
+    shards = ShardSet(
+        main_url,
+        [os.path.join(directory, 'shard_%d.db' % shard) for shard in range(count)],
+        db.metadata,
+        readers=app.config.get('DB_READERS', DEFAULT_READERS),
+        busy_timeout=app.config.get('DB_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT),
+        pool_timeout=app.config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+    )
+    app.extensions['shards'] = shards
+    return shards
+
+
+# Moving companies between databases
+
+def _connect(path, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+    conn = sqlite3.connect(path, isolation_level=None, timeout=busy_timeout / 1000)
+    conn.execute('PRAGMA journal_mode = WAL')
+    return _Autoclose(conn)
+
+
+class _Autoclose:
+    """sqlite3 connection that closes (rather than commits) on exiting a with block."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+def _company_filter(table, schema):
+    """SQL condition selecting a company's rows of a tenant table."""
+    if 'company_name' in table.c:
+        return 'company_name = :company'
+    if 'feedback_id' in table.c:
+        return ('feedback_id IN (SELECT id FROM {0}.feedback WHERE company_name = :company '
+                'UNION ALL SELECT id FROM {0}.feedback_archive '
+                'WHERE company_name = :company)'.format(schema))
+    return None
+
+
+def _tenant_tables(metadata):
+    """Tenant tables, those keyed by feedback ID before those keyed by company."""
+    tables = [t for t in metadata.sorted_tables
+              if t.name not in GLOBAL_TABLES and t.name not in SHARD_LOCAL_TABLES]
+    for table in tables:
+        if _company_filter(table, 'main') is None:
+            raise ValueError('Cannot tell which company owns rows of %s' % table.name)
+    return sorted(tables, key=lambda t: 'company_name' in t.c)
+
+
+def _touch_activity(conn, schema, company):
+    conn.execute(f'''
+        INSERT INTO {schema}.user_activity (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM {schema}.feedback
+        WHERE company_name = :company AND user_id IS NOT NULL
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+    ''', {'company': company})
+
+
+def _delete_company(conn, tables, schema, company):
+    for table in tables:
+        if table.name == 'feedback_change':
+            continue
+        conn.execute(f'DELETE FROM {schema}."{table.name}" WHERE {_company_filter(table, schema)}',
+                     {'company': company})
+
+
+def copy_company(metadata, source_path, target_path, company):
+    """Copy a company's rows to another database and fence it on the source.
+
+    Leftovers of an earlier, interrupted copy are replaced. Vote IDs and
+    change tokens are renumbered in the target.
+
+    Returns:
+        int: Live and archived feedback items copied
+    """
+    tables = _tenant_tables(metadata)
+    with _connect(source_path) as conn:
+        conn.executescript(FENCE_SQL)
+        conn.execute('ATTACH DATABASE ? AS target', (target_path,))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            params = {'company': company}
+            conn.execute('DELETE FROM target.shard_fence WHERE company_name = :company', params)
+            conn.execute(f'''
+                DELETE FROM target.feedback_change WHERE {_company_filter(
+                    metadata.tables['feedback_change'], 'target')}
+            ''', params)
+            _delete_company(conn, tables, 'target', company)
+            for table in reversed(tables):
+                columns = ', '.join(f'"{c.name}"' for c in table.columns
+                                    if c.name != RENUMBERED.get(table.name))
+                conn.execute(f'''
+                    INSERT INTO target."{table.name}" ({columns})
+                    SELECT {columns} FROM main."{table.name}"
+                    WHERE {_company_filter(table, 'main')}
+                ''', params)
+            _touch_activity(conn, 'target', company)
+            copied = conn.execute('''
+                SELECT (SELECT COUNT(*) FROM target.feedback WHERE company_name = :company)
+                     + (SELECT COUNT(*) FROM target.feedback_archive WHERE company_name = :company)
+            ''', params).fetchone()[0]
+            conn.execute('INSERT OR IGNORE INTO main.shard_fence (company_name) VALUES (:company)',
+                         params)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    return copied
+
+
+def purge_company(metadata, path, company):
+    """Delete a copied company's rows from a database, keeping it fenced.
+
+    Its change tokens are bumped instead of deleted, so delta-sync clients
+    of this database see the items go.
+    """
+    tables = _tenant_tables(metadata)
+    with _connect(path) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            params = {'company': company}
+            conn.execute('DELETE FROM shard_fence WHERE company_name = :company', params)
+            _touch_activity(conn, 'main', company)
+            conn.execute(f'''
+                INSERT OR REPLACE INTO feedback_change (feedback_id)
+                SELECT feedback_id FROM feedback_change
+                WHERE {_company_filter(metadata.tables['feedback_change'], 'main')}
+            ''', params)
+            _delete_company(conn, tables, 'main', company)
+            conn.execute('INSERT INTO shard_fence (company_name) VALUES (:company)', params)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+def move_company(shards, company, target):
+    """Move a company to another shard (copy, fence, switch, purge).
+
+    Returns:
+        int: Feedback items moved (0 if the company is already there)
+    """
+    source = shards.shard_for(company)
+    if source == target:
+        return 0
+    moved = copy_company(shards.metadata, shards.paths[source], shards.paths[target], company)
+    with _connect(shards.main_path) as conn:
+        conn.execute('''
+            INSERT INTO company_shard (company_name, shard) VALUES (?, ?)
+            ON CONFLICT (company_name) DO UPDATE SET shard = excluded.shard
+        ''', (company, target))
+    shards.forget_placement(company)
+    purge_company(shards.metadata, shards.paths[source], company)
+    return moved
+
+
+def company_loads(path):
+    """Count feedback and votes (live and archived) per company of a database.
+
+    Returns:
+        dict: Company name -> rows
+    """
+    loads = defaultdict(int)
+    with _connect(path) as conn:
+        for feedback, votes in (('feedback', 'vote'), ('feedback_archive', 'vote_archive')):
+            for company, rows in conn.execute(f'''
+                SELECT f.company_name, COUNT(*) + COALESCE(SUM(v.votes), 0)
+                FROM {feedback} f
+                LEFT JOIN (SELECT feedback_id, COUNT(*) AS votes FROM {votes}
+                           GROUP BY feedback_id) v ON v.feedback_id = f.id
+                GROUP BY f.company_name
+            '''):
+                loads[company] += rows
+    return dict(loads)
+
+
+def plan_rebalance(loads, tolerance=DEFAULT_TOLERANCE):
+    """Plan company moves that even out shard sizes.
+
+    Repeatedly moves the largest company that narrows the gap from the
+    biggest shard to the smallest, until the gap is within ``tolerance``
+    of the average shard size.
+
+    Args:
+        loads (list): Per shard, a dict of company -> rows
+        tolerance (float): Acceptable gap as a fraction of the average
+
+    Returns:
+        list: (company, source shard, target shard) moves, in order
+    """
+    loads = [dict(companies) for companies in loads]
+    totals = [sum(companies.values()) for companies in loads]
+    average = sum(totals) / len(totals) if totals else 0
+    moves = []
+    while average:
+        high = max(range(len(totals)), key=totals.__getitem__)
+        low = min(range(len(totals)), key=totals.__getitem__)
+        gap = totals[high] - totals[low]
+        if gap <= tolerance * average:
+            break
+        candidates = [(rows, company) for company, rows in loads[high].items() if rows < gap]
+        if not candidates:
+            break
+        rows, company = max(candidates)
+        loads[low][company] = loads[high].pop(company)
+        totals[high] -= rows
+        totals[low] += rows
+        moves.append((company, high, low))
+    return moves
+
+
+def split(shards):
+    """Move every company of an unsharded main database into the shards.
+
+    Also records the existing feedback IDs in the directory, so new IDs
+    continue after them.
+
+    Returns:
+        dict: Shard -> feedback items moved there
+    """
+    metadata = shards.metadata
+    with _connect(shards.main_path) as conn:
+        conn.execute('''
+            INSERT OR IGNORE INTO feedback_directory (id, company_name)
+            SELECT id, company_name FROM feedback
+            UNION ALL SELECT id, company_name FROM feedback_archive
+        ''')
+        companies = sorted({row[0] for table in _tenant_tables(metadata)
+                            if 'company_name' in table.c
+                            for row in conn.execute(
+                                f'SELECT DISTINCT company_name FROM "{table.name}"')})
+    moved = defaultdict(int)
+    for company in companies:
+        shard = shards.shard_for(company)
+        moved[shard] += copy_company(metadata, shards.main_path, shards.paths[shard], company)
+        purge_company(metadata, shards.main_path, company)
+    return dict(moved)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Manage company shards')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show companies and rows per shard')
+    subparsers.add_parser('split', help='Move an unsharded database into the shards')
+    move_parser = subparsers.add_parser('move', help='Move a company to a shard')
+    move_parser.add_argument('company')
+    move_parser.add_argument('shard', type=int)
+    rebalance_parser = subparsers.add_parser('rebalance', help='Even out shard sizes')
+    rebalance_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    rebalance_parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    from app import app, db
+
+    shards = app.extensions['shards']
+    if shards is None:
+        print("✗ Sharding is disabled; set OPENFEED_SHARDS to the number of shards")
+        return 1
+    with app.app_context():
+        db.create_all()
+        shards.create_all()
+
+    if args.command == 'status':
+        for shard, path in enumerate(shards.paths):
+            loads = company_loads(path)
+            print(f"  shard {shard}: {len(loads)} companies, {sum(loads.values())} rows ({path})")
+    elif args.command == 'split':
+        moved = split(shards)
+        print(f"✓ Moved {sum(moved.values())} feedback items into {len(shards)} shards")
+        for shard, count in sorted(moved.items()):
+            print(f"  - shard {shard}: {count}")
+    elif args.command == 'move':
+        if not 0 <= args.shard < len(shards):
+            print(f"✗ Shard must be between 0 and {len(shards) - 1}")
+            return 1
+        moved = move_company(shards, args.company, args.shard)
+        print(f"✓ Moved {args.company} ({moved} feedback items) to shard {args.shard}")
+    else:
+        moves = plan_rebalance([company_loads(path) for path in shards.paths], args.tolerance)
+        verb = 'Would move' if args.dry_run else 'Moved'
+        for company, source, target in moves:
+            if not args.dry_run:
+                move_company(shards, company, target)
+            print(f"  - {company}: shard {source} -> {target}")
+        print(f"✓ {verb} {len(moves)} companies")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Request Coalescing Module
+
+Expensive listings (``/api/feedback/filter?sort=helpful`` aggregates every
+vote) are cached per normalized query. When the data changes, many
+requests for the same listing can miss at once and each run the same
+query. This module makes sure only one of them does:
+
+- ``SingleFlight`` runs one computation per key at a time. Threads that
+  ask for a key that is already being computed wait for it and share the
+  result (or the exception).
+- ``VersionedCache`` keeps results tagged with the data version they were
+  computed at (the delta-sync change token). A result for an older
+  version is stale: while another thread or worker is refreshing it,
+  readers get the stale copy straight away instead of waiting, as long as
+  it is younger than ``max_stale`` seconds.
+- With ``shared_dir`` set, the leader of each key also takes an exclusive
+  file lock and publishes its result next to it, so pre-forked workers
+  coalesce with each other too. File mode needs ``fcntl`` (POSIX).
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_STALE = 30  # seconds a stale result may still be served
+DEFAULT_TTL = 300  # seconds before a result is stale even without changes
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key across threads."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def in_flight(self, key):
+        """Check whether a computation for a key is running."""
+        return key in self._flights
+
+    def do(self, key, fn):
+        """Compute a key, or wait for the computation already running.
+
+        Args:
+            key: Hashable key
+            fn: Function computing the value
+
+        Returns:
+            The value computed by whichever caller ran ``fn``
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.stats['shared'] += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self.stats['led'] += 1
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class VersionedCache:
+    """LRU cache of version-tagged results with single-flight refreshes."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_stale=DEFAULT_MAX_STALE,
+                 ttl=DEFAULT_TTL, shared_dir=None, clock=time.monotonic):
+        """Initialize the VersionedCache.
+
+        Args:
+            max_entries (int): Results kept in this process
+            max_stale (float): Seconds a stale result may be served while
+                it is being refreshed
+            ttl (float): Seconds after which a result is treated as stale
+                even if the version did not change
+            shared_dir (str, optional): Directory for cross-process locks
+                and results; None coalesces within this process only
+            clock: Monotonic time function
+        """
+        if shared_dir is not None:
+            if fcntl is None:
+                raise RuntimeError('Shared coalescing needs fcntl (POSIX only)')
+            os.makedirs(shared_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.ttl = ttl
+        self.shared_dir = shared_dir
+        self.clock = clock
+        self.flight = SingleFlight()
+        self.stats = Counter()
+        self._entries = OrderedDict()  # key -> (version, value, stored at)
+        self._lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """Get the result for a key at a data version.
+
+        Args:
+            key: Hashable, normalized query key
+            version (int): Current data version
+            compute: Function computing the result from the database
+
+        Returns:
+            The cached, stale-but-refreshing or freshly computed result
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            cached_version, value, stored_at = entry
+            if cached_version == version and now - stored_at < self.ttl:
+                self.stats['hits'] += 1
+                return value
+            stale = value if now - stored_at < self.ttl + self.max_stale else None
+        else:
+            stale = None
+
+        # Someone is already refreshing this key: don't wait for them
+        if stale is not None and self.flight.in_flight((key, version)):
+            self.stats['stale'] += 1
+            return stale
+
+        return self.flight.do((key, version),
+                              lambda: self._load(key, version, compute, stale))
+
+    def _load(self, key, version, compute, stale):
+        """Compute a result (leader only) and store it."""
+        if self.shared_dir is None:
+            value = compute()
+            self.stats['computed'] += 1
+        else:
+            value, current = self._load_shared(key, version, compute, stale)
+            if not current:
+                return value
+        with self._lock:
+            self._entries[key] = (version, value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _load_shared(self, key, version, compute, stale):
+        """Coalesce with other processes through a per-key file lock.
+
+        Returns:
+            tuple: (value, whether it is current for ``version``)
+        """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        path = os.path.join(self.shared_dir, digest)
+        with open(path + '.lock', 'a+b') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is computing this key
+                if stale is not None:
+                    self.stats['stale'] += 1
+                    return stale, False
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._read_shared(path)
+                if (shared is not None and shared[0] == version
+                        and time.time() - shared[2] < self.ttl):
+                    self.stats['shared_file'] += 1
+                    return shared[1], True
+                value = compute()
+                self.stats['computed'] += 1
+                self._write_shared(path, version, value)
+                return value, True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_shared(path):
+        try:
+            with open(path + '.result', 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _write_shared(self, path, version, value):
+        # Write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((version, value, time.time()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path + '.result')
+
+    def clear(self):
+        """Drop every result cached in this process."""
+        with self._lock:
+            self._entries.clear()
+
+
+def init_listing_cache(app):
+    """Create the app's listing cache from its config.
+
+    Reads ``LISTING_CACHE_SIZE``, ``LISTING_CACHE_MAX_STALE``,
+    ``LISTING_CACHE_TTL`` and ``LISTING_CACHE_DIR`` (enables coalescing
+    across worker processes).
+
+    Args:
+        app: Flask application
+
+    Returns:
+        VersionedCache: The installed cache
+    """
+    cache = VersionedCache(
+        max_entries=app.config.get('LISTING_CACHE_SIZE', DEFAULT_MAX_ENTRIES),
+        max_stale=app.config.get('LISTING_CACHE_MAX_STALE', DEFAULT_MAX_STALE),
+        ttl=app.config.get('LISTING_CACHE_TTL', DEFAULT_TTL),
+        shared_dir=app.config.get('LISTING_CACHE_DIR'),
+    )
+    app.extensions['listing_cache'] = cache
+    return cache
@@ -0,0 +1,326 @@
+"""Feed Snapshot Module
+
+Anonymous visitors all see the same approved-feedback listing, yet every
+``/api/feedback/filter`` request went through SQLite, the ORM and the
+JSON encoder. The publisher here renders that listing ahead of time: for
+every sort, company and sentiment combination it writes the first pages
+exactly as the API would return them (``limit`` = page size, ``count=1``),
+plus a gzip copy of each, into a new generation directory::
+
+    <SNAPSHOT_DIR>/<generation>/<sort>/<company>/<sentiment>/<page>.json[.gz]
+
+A generation becomes live when the ``CURRENT`` pointer file is swapped to
+it with ``os.replace``, so readers in any worker process see either the
+old or the new generation, never a half-written one. The listing API
+serves matching requests straight from these files with ``send_file``;
+anything else (searches, admins, previews, archived items, deeper pages,
+snapshots older than ``max_age``) falls back to the live query.
+
+A new snapshot is published by the ``publish_snapshots`` job, queued when
+moderation, bulk imports or archiving change the visible set (those also
+drop the current pointer on commit, so the change shows at once), after
+every ``vote_threshold`` votes, and on a schedule by the ``watch`` command.
+
+Usage:
+    python snapshots.py publish               # publish once
+    python snapshots.py watch [--interval 60] # republish periodically
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote
+
+
+DEFAULT_PAGE_SIZE = 60  # page size requested by search-filter.js
+DEFAULT_MAX_PAGES = 10  # pages written per combination
+DEFAULT_MAX_AGE = 600  # seconds before a snapshot is no longer served
+DEFAULT_VOTE_THRESHOLD = 50  # votes that trigger a republish
+DEFAULT_KEEP = 2  # generations kept on disk, including the current one
+POINTER = 'CURRENT'
+GZIP_LEVEL = 6
+ALL = '_all'
+
+
+def _segment(value):
+    """Get the directory name of a company or sentiment filter value."""
+    return 'v-' + quote(value, safe='') if value else ALL
+
+
+class SnapshotStore:
+    """Pre-rendered listing pages on disk, swapped in atomically."""
+
+    def __init__(self, directory, page_size=DEFAULT_PAGE_SIZE, max_pages=DEFAULT_MAX_PAGES,
+                 max_age=DEFAULT_MAX_AGE, vote_threshold=DEFAULT_VOTE_THRESHOLD,
+                 clock=time.time):
+        """Initialize the SnapshotStore.
+
+        Args:
+            directory (str): Directory holding the generations
+            page_size (int): Items per snapshot page
+            max_pages (int): Pages written per sort/company/sentiment
+            max_age (float): Seconds a snapshot may be served after it
+                was built
+            vote_threshold (int): Votes counted before a republish is due
+            clock: Wall-clock time function (shared across processes)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.vote_threshold = vote_threshold
+        self.clock = clock
+        self.stats = Counter()
+        self._votes = 0
+        self._lock = threading.Lock()
+        self._pointer = None  # ((inode, mtime), parsed CURRENT)
+
+    @property
+    def pointer_path(self):
+        return os.path.join(self.directory, POINTER)
+
+    def current(self):
+        """Read the CURRENT pointer.
+
+        Returns:
+            dict: ``generation`` (None when invalidated), ``version`` and
+            ``started`` (when the generation's build began), or None if
+            nothing was published yet
+        """
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._pointer
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        try:
+            with open(self.pointer_path, encoding='utf-8') as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._pointer = (key, pointer)
+        return pointer
+
+    def _write_pointer(self, pointer):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.pointer-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+        os.replace(tmp_path, self.pointer_path)
+
+    def publish(self, listings, version, encode, started=None):
+        """Write a new generation and make it current.
+
+        Args:
+            listings (dict): Sort name -> every visible item in that order
+            version (int): Data version (change token) the listings were
+                read at
+            encode: Function turning a response dict into the exact body
+                bytes the live API sends
+            started (float, optional): When reading the listings began;
+                defaults to now
+
+        Returns:
+            str: The new generation, or None if a newer build or an
+            invalidation happened meanwhile and this one was discarded
+        """
+        started = self.clock() if started is None else started
+        generation = '%d-%d' % (version, int(started * 1000))
+        build_dir = tempfile.mkdtemp(dir=self.directory, prefix='.build-')
+        try:
+            for sort_by, items in listings.items():
+                self._write_sort(os.path.join(build_dir, sort_by), items, encode)
+            final_dir = os.path.join(self.directory, generation)
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.rename(build_dir, final_dir)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+        with self._lock:
+            current = self.current()
+            if current is not None and current['started'] > started:
+                shutil.rmtree(final_dir, ignore_errors=True)
+                self.stats['discarded'] += 1
+                return None
+            self._write_pointer({'generation': generation, 'version': version,
+                                 'started': started})
+            self._votes = 0
+        self.stats['published'] += 1
+        self.cleanup()
+        return generation
+
+    def _write_sort(self, sort_dir, items, encode):
+        # One pass groups items by every filter combination they match
+        limit = self.page_size * self.max_pages
+        groups = {}
+        for item in items:
+            for key in (('', ''), (item['company_name'], ''), ('', item['sentiment']),
+                        (item['company_name'], item['sentiment'])):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0, []]
+                group[0] += 1
+                if len(group[1]) < limit:
+                    group[1].append(item)
+        groups.setdefault(('', ''), [0, []])
+
+        for (company, sentiment), (matched, kept) in groups.items():
+            combo_dir = os.path.join(sort_dir, _segment(company), _segment(sentiment))
+            os.makedirs(combo_dir)
+            for page in range(max(1, -(-len(kept) // self.page_size))):
+                feedbacks = kept[page * self.page_size:(page + 1) * self.page_size]
+                body = encode({'success': True, 'feedbacks': feedbacks,
+                               'total': len(feedbacks), 'matched': matched})
+                path = os.path.join(combo_dir, '%d.json' % page)
+                with open(path, 'wb') as f:
+                    f.write(body)
+                with open(path + '.gz', 'wb') as f:
+                    f.write(gzip.compress(body, GZIP_LEVEL, mtime=0))
+
+    def invalidate(self):
+        """Stop serving the current generation until the next publish."""
+        with self._lock:
+            self._write_pointer({'generation': None, 'version': None,
+                                 'started': self.clock()})
+        self.stats['invalidated'] += 1
+
+    def count_votes(self, count=1):
+        """Count votes since the last publish.
+
+        Returns:
+            bool: True once ``vote_threshold`` is reached (the counter
+            restarts when the next snapshot is published)
+        """
+        with self._lock:
+            self._votes += count
+            due = self._votes >= self.vote_threshold
+            if due:
+                self._votes = 0
+        return due
+
+    def lookup(self, params, gzip_ok=False):
+        """Find the snapshot page answering a normalized listing request.
+
+        Args:
+            params (dict): Normalized ``/api/feedback/filter`` parameters
+            gzip_ok (bool): Whether the client accepts gzip
+
+        Returns:
+            tuple: (path, content encoding or None), or None when the
+            request must be answered by the live query
+        """
+        offset, limit = params['offset'], params['limit']
+        if (params['is_admin'] or params['search'] or params['include_archived']
+                or params['preview'] or not params['with_count']
+                or limit != self.page_size or offset % self.page_size
+                or offset // self.page_size >= self.max_pages):
+            return None
+        current = self.current()
+        if (current is None or current['generation'] is None
+                or self.clock() - current['started'] > self.max_age):
+            self.stats['missed'] += 1
+            return None
+        path = os.path.join(self.directory, current['generation'], params['sort_by'],
+                            _segment(params['company']), _segment(params['sentiment']),
+                            '%d.json' % (offset // self.page_size))
+        encoding = None
+        if gzip_ok:
+            path, encoding = path + '.gz', 'gzip'
+        if not os.path.exists(path):
+            self.stats['missed'] += 1
+            return None
+        self.stats['served'] += 1
+        return path, encoding
+
+    def cleanup(self, keep=DEFAULT_KEEP):
+        """Delete all but the newest ``keep`` generations.
+
+        The previous generation is kept for requests still reading it;
+        build directories left behind by crashed publishers are removed
+        once they are an hour old.
+        """
+        current = self.current()
+        current = current['generation'] if current else None
+        generations = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            if entry.name.startswith('.build-'):
+                if self.clock() - entry.stat().st_mtime > 3600:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name != current:
+                generations.append((entry.stat().st_mtime, entry.path))
+        generations.sort(reverse=True)
+        for _, path in generations[max(keep - 1, 0):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def create_store(config):
+    """Create a SnapshotStore from an app config.
+
+    Reads ``SNAPSHOT_DIR``, ``SNAPSHOT_PAGE_SIZE``, ``SNAPSHOT_MAX_PAGES``,
+    ``SNAPSHOT_MAX_AGE`` and ``SNAPSHOT_VOTE_THRESHOLD``.
+    """
+    return SnapshotStore(
+        config['SNAPSHOT_DIR'],
+        page_size=config.get('SNAPSHOT_PAGE_SIZE', DEFAULT_PAGE_SIZE),
+        max_pages=config.get('SNAPSHOT_MAX_PAGES', DEFAULT_MAX_PAGES),
+        max_age=config.get('SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE),
+        vote_threshold=config.get('SNAPSHOT_VOTE_THRESHOLD', DEFAULT_VOTE_THRESHOLD),
+    )
+
+
+def init_snapshots(app):
+    """Install the snapshot store if snapshots are enabled.
+
+    Args:
+        app: Flask application with ``SNAPSHOTS_ENABLED`` and the
+            settings read by ``create_store``
+
+    Returns:
+        SnapshotStore: The installed store, or None when disabled
+    """
+    if not app.config.get('SNAPSHOTS_ENABLED', False):
+        return None
+    store = create_store(app.config)
+    app.extensions['snapshots'] = store
+    return store
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Public feed snapshots')
+    parser.add_argument('command', choices=('publish', 'watch'))
+    parser.add_argument('--interval', type=float, default=60,
+                        help='Seconds between publishes in watch mode')
+    args = parser.parse_args(argv)
+
+    from app import app, db, publish_snapshots
+
+    store = app.extensions.get('snapshots') or create_store(app.config)
+    with app.app_context():
+        db.create_all()
+        while True:
+            generation = publish_snapshots(store)
+            db.session.remove()
+            if generation:
+                print(f"✓ Published snapshot {generation}")
+            else:
+                print("✗ Snapshot discarded, a newer one was published meanwhile")
+            if args.command == 'publish':
+                return 0
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
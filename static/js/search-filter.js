@@ -1,72 +1,100 @@
 /**
  * Openfeed - Search, Filter, and Sort Functionality
- * Handles real-time filtering and sorting of feedback cards
+ * Queries /api/feedback/filter as filters change and renders only the
+ * feedback cards near the viewport
  */
 
+// Quiet period after the last keystroke before a search is sent
+const FILTER_DEBOUNCE_MS = 250;
+// Feedback items requested per /api/feedback/filter call
+const FILTER_PAGE_SIZE = 60;
+// Recent result pages kept in memory, across queries
+const FILTER_CACHE_PAGES = 50;
+// Extra card rows rendered above and below the viewport
+const OVERSCAN_ROWS = 3;
+// Row height assumed until a rendered row can be measured
+const ESTIMATED_ROW_HEIGHT = 260;
+
+/**
+ * Small LRU cache: a Map keeps insertion order, so re-inserting on read
+ * moves an entry to the back and the first key is the least recently used
+ */
+class QueryCache {
+  constructor(maxEntries) {
+    this.maxEntries = maxEntries;
+    this.entries = new Map();
+  }
+
+  get(key) {
+    if (!this.entries.has(key)) {
+      return undefined;
+    }
+    const value = this.entries.get(key);
+    this.entries.delete(key);
+    this.entries.set(key, value);
+    return value;
+  }
+
+  set(key, value) {
+    this.entries.delete(key);
+    this.entries.set(key, value);
+    while (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value);
+    }
+  }
+
+  clear() {
+    this.entries.clear();
+  }
+}
+
 class FeedbackManager {
   constructor() {
-    this.feedbacks = [];
-    this.filteredFeedbacks = [];
+    this.grid = document.getElementById('hofGrid');
     this.currentFilters = {
       search: '',
       sentiment: '',
       company: '',
       sort: 'recent'
     };
-    
+
+    this.items = []; // Loaded results of the current query, by position (sparse)
+    this.matched = 0; // Total results of the current query on the server
+    this.localItems = []; // Submitted this session, shown ahead of the results
+    this.shownLocalItems = []; // localItems matching the current filters
+    this.total = parseInt(document.getElementById('resultsCount').dataset.total, 10) || 0;
+
+    this.cache = new QueryCache(FILTER_CACHE_PAGES);
+    this.inflight = new Map(); // query key -> pending fetch promise
+    this.controller = null; // AbortController of the current query
+    this.generation = 0; // Bumped per query so stale responses are dropped
+    this.searchTimer = null;
+
+    this.cards = new Map(); // feedback id -> rendered card element
+    this.rowHeight = ESTIMATED_ROW_HEIGHT;
+    this.columns = 1;
+    this.renderScheduled = false;
+    this.renderedRange = null;
+
     this.init();
   }
 
   init() {
-    // Get all feedback elements and store their data
-    this.loadFeedbackData();
-    
     // Set up event listeners
     this.setupEventListeners();
-    
-    // Initial display
-    this.applyFilters();
-  }
 
-  loadFeedbackData() {
-    const feedbackElements = document.querySelectorAll('.feedback-box');
-    this.feedbacks = Array.from(feedbackElements).map((element, index) => {
-      const companyName = element.querySelector('.feedback-company-name').textContent.trim();
-      const sentiment = element.querySelector('.sentiment-badge').textContent.trim().toLowerCase();
-      const comment = element.querySelector('.feedback-text').textContent.trim();
-      const dateElement = element.querySelector('.feedback-date');
-      
-      // Extract date from element or use index as fallback for sorting
-      let date = new Date();
-      if (dateElement) {
-        date = new Date(dateElement.textContent);
-      } else {
-        // Use reverse index to simulate recent first order
-        date = new Date(Date.now() - (index * 60000)); // Each feedback 1 minute apart
-      }
-
-      return {
-        element: element,
-        company: companyName,
-        sentiment: sentiment,
-        comment: comment,
-        date: date,
-        originalIndex: index,
-        helpful: Math.floor(Math.random() * 100) // Simulate helpful votes for sorting
-      };
-    });
-
-    this.filteredFeedbacks = [...this.feedbacks];
+    // Replace the server-rendered first page with the virtualized list
+    this.applyFilters();
   }
 
   setupEventListeners() {
     // Filter toggle button
     const toggleFiltersBtn = document.getElementById('toggleFilters');
     const filtersRow = document.getElementById('filtersRow');
-    
+
     toggleFiltersBtn.addEventListener('click', () => {
       const isVisible = filtersRow.style.display !== 'none';
-      
+
       if (isVisible) {
         // Hide filters
         filtersRow.classList.remove('show');
@@ -84,14 +112,15 @@ class FeedbackManager {
       }
     });
 
-    // Search input
+    // Search input: debounced so typing sends one request, not one per key
     const searchInput = document.getElementById('searchInput');
     const clearSearchBtn = document.getElementById('clearSearch');
-    
+
     searchInput.addEventListener('input', (e) => {
-      this.currentFilters.search = e.target.value.toLowerCase();
+      this.currentFilters.search = e.target.value.trim().toLowerCase();
       this.toggleClearSearchButton();
-      this.applyFilters();
+      clearTimeout(this.searchTimer);
+      this.searchTimer = setTimeout(() => this.applyFilters(), FILTER_DEBOUNCE_MS);
     });
 
     clearSearchBtn.addEventListener('click', () => {
@@ -121,12 +150,19 @@ class FeedbackManager {
     document.getElementById('clearFilters').addEventListener('click', () => {
       this.clearAllFilters();
     });
+
+    // Only the cards near the viewport exist; re-window on scroll/resize
+    window.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+    window.addEventListener('resize', () => {
+      this.renderedRange = null;
+      this.scheduleRender();
+    });
   }
 
   toggleClearSearchButton() {
     const clearBtn = document.getElementById('clearSearch');
     const searchInput = document.getElementById('searchInput');
-    
+
     if (searchInput.value.length > 0) {
       clearBtn.style.display = 'block';
     } else {
@@ -134,51 +170,109 @@ class FeedbackManager {
     }
   }
 
-  applyFilters() {
-    // Start with all feedbacks
-    let filtered = [...this.feedbacks];
-
-    // Apply search filter
-    if (this.currentFilters.search) {
-      filtered = filtered.filter(feedback => 
-        feedback.company.toLowerCase().includes(this.currentFilters.search) ||
-        feedback.comment.toLowerCase().includes(this.currentFilters.search)
-      );
-    }
+  /**
+   * Build the cache/de-duplication key (and URL) of one result page
+   */
+  queryKey(page) {
+    const params = new URLSearchParams({
+      sort: this.currentFilters.sort,
+      limit: FILTER_PAGE_SIZE,
+      offset: page * FILTER_PAGE_SIZE,
+      count: 1
+    });
+    ['search', 'sentiment', 'company'].forEach(name => {
+      if (this.currentFilters[name]) {
+        params.set(name, this.currentFilters[name]);
+      }
+    });
+    return `/api/feedback/filter?${params}`;
+  }
 
-    // Apply sentiment filter
-    if (this.currentFilters.sentiment) {
-      filtered = filtered.filter(feedback => 
-        feedback.sentiment === this.currentFilters.sentiment
-      );
+  /**
+   * Fetch one page of results, served from the LRU cache when possible.
+   * Concurrent requests for the same page share one fetch.
+   */
+  fetchPage(page) {
+    const key = this.queryKey(page);
+    const cached = this.cache.get(key);
+    if (cached) {
+      return Promise.resolve(cached);
     }
-
-    // Apply company filter
-    if (this.currentFilters.company) {
-      filtered = filtered.filter(feedback => 
-        feedback.company === this.currentFilters.company
-      );
+    if (this.inflight.has(key)) {
+      return this.inflight.get(key);
     }
 
-    // Apply sorting
-    this.sortFeedbacks(filtered);
+    const request = fetch(key, { signal: this.controller.signal })
+      .then(response => response.json())
+      .then(data => {
+        if (!data.success) {
+          throw new Error(data.error || 'Failed to load feedback');
+        }
+        const result = { feedbacks: data.feedbacks, matched: data.matched };
+        this.cache.set(key, result);
+        return result;
+      })
+      .finally(() => {
+        if (this.inflight.get(key) === request) {
+          this.inflight.delete(key);
+        }
+      });
+    this.inflight.set(key, request);
+    return request;
+  }
+
+  /**
+   * Start a new query for the current filters, cancelling the previous one
+   */
+  applyFilters() {
+    clearTimeout(this.searchTimer);
+    if (this.controller) {
+      this.controller.abort();
+    }
+    this.controller = new AbortController();
+    this.inflight.clear();
+    const generation = ++this.generation;
 
-    // Update display
-    this.updateDisplay(filtered);
-    this.updateResultsCount(filtered.length);
-    
-    // Update filter button indicator
+    this.filterLocalItems();
     this.updateFilterButtonState();
+    this.loadPage(0, generation).then(() => {
+      if (generation !== this.generation) return;
+      this.renderedRange = null;
+      window.scrollTo({ top: Math.min(window.scrollY, this.gridTop()) });
+      this.render();
+    });
+  }
+
+  /**
+   * Load a page of the current query into this.items
+   */
+  loadPage(page, generation) {
+    return this.fetchPage(page)
+      .then(result => {
+        if (generation !== this.generation) return;
+        if (page === 0) {
+          this.items = [];
+          this.matched = result.matched;
+        }
+        result.feedbacks.forEach((feedback, i) => {
+          this.items[page * FILTER_PAGE_SIZE + i] = feedback;
+        });
+      })
+      .catch(error => {
+        if (error.name !== 'AbortError') {
+          console.error('Error loading feedback:', error);
+        }
+      });
   }
 
   updateFilterButtonState() {
     const toggleBtn = document.getElementById('toggleFilters');
-    const hasActiveFilters = 
-      this.currentFilters.search || 
-      this.currentFilters.sentiment || 
+    const hasActiveFilters =
+      this.currentFilters.search ||
+      this.currentFilters.sentiment ||
       this.currentFilters.company ||
       this.currentFilters.sort !== 'recent';
-    
+
     if (hasActiveFilters) {
       toggleBtn.classList.add('has-active-filters');
     } else {
@@ -186,77 +280,161 @@ class FeedbackManager {
     }
   }
 
-  sortFeedbacks(feedbacks) {
-    switch (this.currentFilters.sort) {
-      case 'recent':
-        feedbacks.sort((a, b) => b.date - a.date);
-        break;
-      case 'oldest':
-        feedbacks.sort((a, b) => a.date - b.date);
-        break;
-      case 'helpful':
-        feedbacks.sort((a, b) => b.helpful - a.helpful);
-        break;
-      default:
-        feedbacks.sort((a, b) => b.date - a.date);
+  /**
+   * Items to display: local submissions first, then the query results
+   */
+  itemCount() {
+    return this.shownLocalItems.length + this.matched;
+  }
+
+  itemAt(index) {
+    if (index < this.shownLocalItems.length) {
+      return this.shownLocalItems[index];
     }
+    return this.items[index - this.shownLocalItems.length];
+  }
+
+  /**
+   * Apply the current filters to this session's submissions
+   */
+  filterLocalItems() {
+    const { search, sentiment, company } = this.currentFilters;
+    this.shownLocalItems = this.localItems.filter(feedback =>
+      (!search || feedback.company_name.toLowerCase().includes(search) ||
+        feedback.comment.toLowerCase().includes(search)) &&
+      (!sentiment || feedback.sentiment === sentiment) &&
+      (!company || feedback.company_name === company)
+    );
   }
 
-  updateDisplay(filteredFeedbacks) {
-    const feedbackGrid = document.getElementById('hofGrid');
-    
-    // Hide all feedback elements first
-    this.feedbacks.forEach(feedback => {
-      feedback.element.style.display = 'none';
+  gridTop() {
+    return this.grid.getBoundingClientRect().top + window.scrollY;
+  }
+
+  scheduleRender() {
+    if (this.renderScheduled) return;
+    this.renderScheduled = true;
+    requestAnimationFrame(() => {
+      this.renderScheduled = false;
+      this.render();
     });
+  }
 
-    // Show filtered feedbacks in order
-    if (filteredFeedbacks.length === 0) {
+  /**
+   * Render the rows overlapping the viewport. Rows above and below are
+   * replaced by grid padding sized from the measured row height.
+   */
+  render() {
+    const count = this.itemCount();
+    this.updateResultsCount(count);
+    if (count === 0) {
+      this.grid.style.paddingTop = '';
+      this.grid.style.paddingBottom = '';
+      this.grid.replaceChildren();
+      this.renderedRange = null;
       this.showNoResults();
-    } else {
-      this.hideNoResults();
-      filteredFeedbacks.forEach((feedback, index) => {
-        feedback.element.style.display = 'block';
-        feedback.element.style.order = index;
-        feedbackGrid.appendChild(feedback.element);
-      });
-      
-      // Refresh vote controls after reordering
-      if (window.voteManager) {
-        window.voteManager.refreshVoteControls();
+      return;
+    }
+
+    this.columns = Math.max(1, getComputedStyle(this.grid).gridTemplateColumns.split(' ').length);
+    const rows = Math.ceil(count / this.columns);
+    const offset = window.scrollY - this.gridTop();
+    const firstRow = Math.max(0, Math.floor(offset / this.rowHeight) - OVERSCAN_ROWS);
+    const lastRow = Math.min(
+      rows - 1,
+      Math.ceil((offset + window.innerHeight) / this.rowHeight) + OVERSCAN_ROWS
+    );
+    const start = firstRow * this.columns;
+    const end = Math.min(count, (lastRow + 1) * this.columns);
+
+    this.loadMissing(start, end);
+    if (this.renderedRange && this.renderedRange.start === start &&
+        this.renderedRange.end === end && this.renderedRange.complete) {
+      return;
+    }
+
+    const cards = [];
+    let complete = true;
+    for (let index = start; index < end; index++) {
+      const feedback = this.itemAt(index);
+      if (feedback) {
+        cards.push(this.cardFor(feedback));
+      } else {
+        complete = false;
       }
     }
+    this.grid.style.paddingTop = `${firstRow * this.rowHeight}px`;
+    this.grid.style.paddingBottom = `${Math.max(0, rows - lastRow - 1) * this.rowHeight}px`;
+    this.grid.replaceChildren(...cards);
+    this.renderedRange = { start, end, complete };
+
+    // Refine the row estimate from what is on screen
+    const renderedRows = Math.ceil(cards.length / this.columns);
+    if (renderedRows > 0) {
+      const styles = getComputedStyle(this.grid);
+      const contentHeight = this.grid.clientHeight
+        - parseFloat(styles.paddingTop) - parseFloat(styles.paddingBottom);
+      const gap = parseFloat(styles.rowGap) || 0;
+      this.rowHeight = Math.max(1, (contentHeight + gap) / renderedRows);
+    }
+
+    // Vote controls for cards that were just created
+    if (window.voteManager) {
+      window.voteManager.refreshVoteControls();
+    }
   }
 
-  showNoResults() {
-    let noResultsElement = document.getElementById('noResults');
-    
-    if (!noResultsElement) {
-      noResultsElement = document.createElement('div');
-      noResultsElement.id = 'noResults';
-      noResultsElement.className = 'no-results';
-      noResultsElement.innerHTML = `
-        <i class="fas fa-search"></i>
-        <h3>No feedback found</h3>
-        <p>Try adjusting your search terms or filters</p>
-      `;
-      document.getElementById('hofGrid').appendChild(noResultsElement);
+  /**
+   * Fetch any result pages missing for positions [start, end)
+   */
+  loadMissing(start, end) {
+    const local = this.shownLocalItems.length;
+    const first = Math.floor(Math.max(0, start - local) / FILTER_PAGE_SIZE);
+    const last = Math.floor(Math.max(0, end - 1 - local) / FILTER_PAGE_SIZE);
+    const generation = this.generation;
+    for (let page = first; page <= last; page++) {
+      if (this.items[page * FILTER_PAGE_SIZE] === undefined &&
+          page * FILTER_PAGE_SIZE < this.matched) {
+        this.loadPage(page, generation).then(() => {
+          if (generation !== this.generation) return;
+          this.renderedRange = null;
+          this.scheduleRender();
+        });
+      }
     }
-    
-    noResultsElement.style.display = 'block';
   }
 
-  hideNoResults() {
-    const noResultsElement = document.getElementById('noResults');
-    if (noResultsElement) {
-      noResultsElement.style.display = 'none';
+  /**
+   * Reuse card elements so scrolling back does not rebuild them
+   */
+  cardFor(feedback) {
+    let card = this.cards.get(feedback.id);
+    if (!card) {
+      card = this.createFeedbackElement(feedback);
+      this.cards.set(feedback.id, card);
+      if (this.cards.size > FILTER_CACHE_PAGES * FILTER_PAGE_SIZE) {
+        this.cards.delete(this.cards.keys().next().value);
+      }
     }
+    return card;
+  }
+
+  showNoResults() {
+    const noResultsElement = document.createElement('div');
+    noResultsElement.id = 'noResults';
+    noResultsElement.className = 'no-results';
+    noResultsElement.innerHTML = `
+      <i class="fas fa-search"></i>
+      <h3>No feedback found</h3>
+      <p>Try adjusting your search terms or filters</p>
+    `;
+    this.grid.appendChild(noResultsElement);
   }
 
   updateResultsCount(count) {
     const resultsCount = document.getElementById('resultsCount');
-    const total = this.feedbacks.length;
-    
+    const total = this.total + this.localItems.length;
+
     if (count === total) {
       resultsCount.textContent = `${total} feedback(s) found`;
     } else {
@@ -270,7 +448,7 @@ class FeedbackManager {
     document.getElementById('sentimentFilter').value = '';
     document.getElementById('companyFilter').value = '';
     document.getElementById('sortSelect').value = 'recent';
-    
+
     // Reset internal state
     this.currentFilters = {
       search: '',
@@ -278,52 +456,38 @@ class FeedbackManager {
       company: '',
       sort: 'recent'
     };
-    
+
     // Hide clear search button
     this.toggleClearSearchButton();
-    
+
     // Hide filters panel
     const filtersRow = document.getElementById('filtersRow');
     const toggleFiltersBtn = document.getElementById('toggleFilters');
-    
+
     filtersRow.classList.remove('show');
     toggleFiltersBtn.classList.remove('active');
     setTimeout(() => {
       filtersRow.style.display = 'none';
     }, 400);
-    
+
     // Apply filters (which will show all)
     this.applyFilters();
   }
 
   // Method to add new feedback (for when new feedback is submitted)
   addNewFeedback(feedbackData) {
-    const feedbackGrid = document.getElementById('hofGrid');
-    
-    // Create new feedback element
-    const feedbackElement = this.createFeedbackElement(feedbackData);
-    
-    // Add to feedbacks array
-    const newFeedback = {
-      element: feedbackElement,
-      company: feedbackData.company_name,
-      sentiment: feedbackData.sentiment,
-      comment: feedbackData.comment,
-      date: new Date(),
-      originalIndex: this.feedbacks.length,
-      helpful: 0
-    };
-    
-    this.feedbacks.unshift(newFeedback); // Add to beginning
-    
-    // Reapply filters to include new feedback
-    this.applyFilters();
+    // New feedback awaits moderation, so the server will not list it yet;
+    // keep it at the top locally and drop cached pages that predate it
+    this.localItems.unshift(feedbackData);
+    this.filterLocalItems();
+    this.cache.clear();
+    this.renderedRange = null;
+    this.render();
   }
 
   createFeedbackElement(feedback) {
     const feedbackCard = document.createElement('div');
     feedbackCard.className = 'feedback-box';
-    feedbackCard.style.animation = 'modalSlideIn 0.5s ease';
     feedbackCard.dataset.feedbackId = feedback.id || '';
     feedbackCard.dataset.userId = feedback.user_id || '';
 
@@ -331,26 +495,27 @@ class FeedbackManager {
     const authState = document.getElementById('auth-state');
     const currentUserId = authState ? parseInt(authState.dataset.userId) : null;
     const isOwnFeedback = currentUserId && feedback.user_id && currentUserId === feedback.user_id;
+    const companyName = escapeHtml(feedback.company_name);
 
     feedbackCard.innerHTML = `
       <div class="feedback-box-header">
         <div class="feedback-company">
           ${
             feedback.company_logo
-              ? `<img class="feedback-company-logo" src="${feedback.company_logo}" alt="${feedback.company_name} logo">`
+              ? `<img class="feedback-company-logo" src="${escapeHtml(feedback.company_logo)}" alt="${companyName} logo" loading="lazy">`
               : `<div class="feedback-company-logo" style="background-color: #4285f4; color: white; display: flex; align-items: center; justify-content: center; font-weight: bold;">
-                  ${feedback.company_name[0].toUpperCase()}
+                  ${escapeHtml(feedback.company_name[0].toUpperCase())}
                 </div>`
           }
-          <span class="feedback-company-name">${feedback.company_name}</span>
+          <span class="feedback-company-name">${companyName}</span>
           ${isOwnFeedback ? '<span class="you-badge"><i class="fas fa-user"></i> YOU</span>' : ''}
         </div>
-        <span class="sentiment-badge ${feedback.sentiment}">
-          ${feedback.sentiment.charAt(0).toUpperCase() + feedback.sentiment.slice(1)}
+        <span class="sentiment-badge ${escapeHtml(feedback.sentiment)}">
+          ${escapeHtml(feedback.sentiment.charAt(0).toUpperCase() + feedback.sentiment.slice(1))}
         </span>
       </div>
       <div class="feedback-box-content">
-        <p class="feedback-text">"${feedback.comment}"</p>
+        <p class="feedback-text">"${escapeHtml(feedback.comment)}"</p>
         <!-- Vote controls will be inserted here by JavaScript -->
       </div>
     `;
@@ -359,6 +524,18 @@ class FeedbackManager {
   }
 }
 
+/**
+ * Escape text for interpolation into card HTML
+ */
+function escapeHtml(value) {
+  return String(value)
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;');
+}
+
 // Initialize the feedback manager when DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
   // Wait a bit to ensure all other scripts have loaded
@@ -368,4 +545,4 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Export for use in other scripts
-window.FeedbackManager = FeedbackManager;
\ No newline at end of file
+window.FeedbackManager = FeedbackManager;
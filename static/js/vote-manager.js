@@ -3,11 +3,23 @@
  * Manages vote submission, removal, and display updates
  */
 
+// localStorage key for the delta-sync cache of vote states
+const VOTE_SYNC_CACHE_KEY = 'openfeed.voteSync.v1';
+// Quiet period before queued votes are sent to /api/votes/batch
+const VOTE_BATCH_DELAY_MS = 400;
+// Must not exceed votes.MAX_BATCH_SIZE on the server
+const VOTE_BATCH_MAX_SIZE = 100;
+
 class VoteManager {
   constructor() {
     this.votes = {}; // Cache of vote states by feedback_id
     this.currentUserId = null; // Will be set from session
     this.isAuthenticated = false;
+    this.isAdmin = false;
+    this.syncToken = '0'; // Change token of the last applied sync
+    this.pendingVotes = new Map(); // feedback_id -> queued vote_type (null removes)
+    this.confirmedVotes = new Map(); // feedback_id -> server state before queuing
+    this.flushTimer = null;
   }
 
   /**
@@ -36,27 +48,103 @@ class VoteManager {
     if (authState) {
       this.isAuthenticated = authState.dataset.loggedIn === 'true';
       this.currentUserId = authState.dataset.userId ? parseInt(authState.dataset.userId) : null;
+      this.isAdmin = authState.dataset.isAdmin === 'true';
     }
   }
 
   /**
    * Load vote data for all feedback items
+   * Starts from the localStorage cache and only fetches changes since
+   * the cached change token
    */
   async loadVotes() {
+    const cache = this.readSyncCache();
+    this.votes = cache.votes;
+    this.syncToken = cache.token;
+    
     try {
-      const response = await fetch('/api/feedback/votes');
-      const data = await response.json();
-      
-      if (data.success) {
-        this.votes = data.votes;
-      } else {
-        console.error('Failed to load votes:', data.error);
+      let hasMore = true;
+      while (hasMore) {
+        const response = await fetch(`/api/sync?since=${encodeURIComponent(this.syncToken)}`);
+        const data = await response.json();
+        
+        if (!data.success) {
+          console.error('Failed to load votes:', data.error);
+          return;
+        }
+        
+        this.applySyncDelta(data);
+        hasMore = data.has_more;
       }
+      
+      this.writeSyncCache();
     } catch (error) {
       console.error('Error loading votes:', error);
     }
   }
 
+  /**
+   * Apply one page of /api/sync changes to the vote cache
+   */
+  applySyncDelta(data) {
+    if (data.reset) {
+      this.votes = {};
+    }
+    
+    data.feedbacks.forEach(feedback => {
+      this.votes[feedback.id] = {
+        vote_score: feedback.vote_score,
+        upvotes: feedback.upvotes,
+        downvotes: feedback.downvotes,
+        user_vote: feedback.user_vote
+      };
+    });
+    
+    data.removed.forEach(feedbackId => {
+      delete this.votes[feedbackId];
+    });
+    
+    this.syncToken = data.token;
+  }
+
+  /**
+   * Cache identity: visible items and user_vote differ per user and role
+   */
+  syncCacheIdentity() {
+    return `${this.currentUserId || 'anonymous'}:${this.isAdmin ? 'admin' : 'user'}`;
+  }
+
+  /**
+   * Read the cached vote states, ignoring caches of another identity
+   */
+  readSyncCache() {
+    try {
+      const cache = JSON.parse(localStorage.getItem(VOTE_SYNC_CACHE_KEY));
+      if (cache && cache.identity === this.syncCacheIdentity()) {
+        return { token: cache.token, votes: cache.votes };
+      }
+    } catch (error) {
+      // Corrupt or unavailable storage: fall back to a full sync
+    }
+    return { token: '0', votes: {} };
+  }
+
+  /**
+   * Persist vote states and the change token for the next page load
+   */
+  writeSyncCache() {
+    try {
+      localStorage.setItem(VOTE_SYNC_CACHE_KEY, JSON.stringify({
+        identity: this.syncCacheIdentity(),
+        token: this.syncToken,
+        votes: this.votes
+      }));
+    } catch (error) {
+      // Storage full or disabled; the next load simply syncs from scratch
+      localStorage.removeItem(VOTE_SYNC_CACHE_KEY);
+    }
+  }
+
   /**
    * Render vote controls on all feedback cards
    */
@@ -162,107 +250,166 @@ class VoteManager {
         this.handleVote(voteBtn);
       }
     });
+    
+    // Don't lose votes still waiting for the debounce timer
+    window.addEventListener('pagehide', () => this.flushVotesOnUnload());
+  }
+
+  /**
+   * Send queued votes with sendBeacon, which survives page unload
+   */
+  flushVotesOnUnload() {
+    if (this.pendingVotes.size === 0 || !navigator.sendBeacon) return;
+    const operations = Array.from(this.pendingVotes.entries()).map(([feedbackId, voteType]) => ({
+      feedback_id: parseInt(feedbackId),
+      vote_type: voteType
+    }));
+    const body = new Blob([JSON.stringify({ operations })], { type: 'application/json' });
+    if (navigator.sendBeacon('/api/votes/batch', body)) {
+      this.pendingVotes.clear();
+      this.writeSyncCache();
+    }
   }
 
   /**
    * Handle vote button click
+   * The vote is shown immediately and queued; rapid clicks are debounced
+   * into a single /api/votes/batch request
    */
-  async handleVote(button) {
+  handleVote(button) {
     const controls = button.closest('.vote-controls');
     const feedbackId = controls.dataset.feedbackId;
     const voteType = button.dataset.voteType;
-    const currentVote = this.votes[feedbackId]?.user_vote;
-    
-    // Disable buttons during request
-    this.setButtonsLoading(controls, true);
+    const voteData = this.votes[feedbackId] || {
+      vote_score: 0,
+      upvotes: 0,
+      downvotes: 0,
+      user_vote: null
+    };
     
-    try {
-      if (currentVote === voteType) {
-        // Remove vote (toggle off)
-        await this.removeVote(feedbackId);
-      } else {
-        // Create or update vote
-        await this.submitVote(feedbackId, voteType);
-      }
-    } catch (error) {
-      this.showError('Failed to process vote. Please try again.');
-    } finally {
-      // Re-enable buttons
-      this.setButtonsLoading(controls, false);
+    if (!this.confirmedVotes.has(feedbackId)) {
+      this.confirmedVotes.set(feedbackId, { ...voteData });
     }
+    
+    // Toggle off when clicking the active vote, otherwise switch to it
+    const newVote = voteData.user_vote === voteType ? null : voteType;
+    this.votes[feedbackId] = this.applyOptimisticVote(voteData, newVote);
+    this.updateVoteDisplay(feedbackId);
+    
+    this.pendingVotes.set(feedbackId, newVote);
+    this.scheduleFlush();
   }
 
   /**
-   * Submit a vote (create or update)
+   * Compute the displayed counts for a vote change before the server confirms it
    */
-  async submitVote(feedbackId, voteType) {
-    const response = await fetch('/api/vote', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        feedback_id: parseInt(feedbackId),
-        vote_type: voteType
-      })
-    });
-    
-    const data = await response.json();
-    
-    if (data.success) {
-      // Update vote data
-      await this.updateVoteData(feedbackId, voteType, data.vote.vote_score);
-      
-      // Update display
-      this.updateVoteDisplay(feedbackId);
-    } else {
-      throw new Error(data.error || 'Failed to submit vote');
-    }
+  applyOptimisticVote(voteData, newVote) {
+    const oldVote = voteData.user_vote;
+    const upvotes = voteData.upvotes + (newVote === 'upvote') - (oldVote === 'upvote');
+    const downvotes = voteData.downvotes + (newVote === 'downvote') - (oldVote === 'downvote');
+    return {
+      vote_score: upvotes - downvotes,
+      upvotes: upvotes,
+      downvotes: downvotes,
+      user_vote: newVote
+    };
   }
 
   /**
-   * Remove a vote
+   * (Re)start the debounce timer for queued votes
    */
-  async removeVote(feedbackId) {
-    const response = await fetch(`/api/vote/${feedbackId}`, {
-      method: 'DELETE'
-    });
-    
-    const data = await response.json();
-    
-    if (data.success) {
-      // Update vote data
-      await this.updateVoteData(feedbackId, null, data.vote_score);
-      
-      // Update display
-      this.updateVoteDisplay(feedbackId);
+  scheduleFlush() {
+    clearTimeout(this.flushTimer);
+    if (this.pendingVotes.size >= VOTE_BATCH_MAX_SIZE) {
+      this.flushVotes();
     } else {
-      throw new Error(data.error || 'Failed to remove vote');
+      this.flushTimer = setTimeout(() => this.flushVotes(), VOTE_BATCH_DELAY_MS);
     }
   }
 
   /**
-   * Update cached vote data after a vote operation
+   * Send all queued votes in one batch request
    */
-  async updateVoteData(feedbackId, newVoteType, newScore) {
-    // Fetch fresh vote data for this feedback
+  async flushVotes() {
+    clearTimeout(this.flushTimer);
+    this.flushTimer = null;
+    if (this.pendingVotes.size === 0) return;
+    
+    const queued = Array.from(this.pendingVotes.entries());
+    const confirmed = new Map();
+    queued.forEach(([feedbackId]) => {
+      confirmed.set(feedbackId, this.confirmedVotes.get(feedbackId));
+      this.confirmedVotes.delete(feedbackId);
+    });
+    this.pendingVotes.clear();
+    
     try {
-      const response = await fetch(`/api/feedback/${feedbackId}/votes`);
+      const response = await fetch('/api/votes/batch', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+          operations: queued.map(([feedbackId, voteType]) => ({
+            feedback_id: parseInt(feedbackId),
+            vote_type: voteType
+          }))
+        })
+      });
+      
       const data = await response.json();
+      if (!data.success) {
+        throw new Error(data.error || 'Failed to submit votes');
+      }
+      
+      let failed = false;
+      data.results.forEach(result => {
+        const feedbackId = String(result.feedback_id);
+        if (result.error) {
+          failed = true;
+          this.revertVote(feedbackId, confirmed.get(feedbackId));
+        } else if (!this.pendingVotes.has(feedbackId)) {
+          // Newer clicks queued meanwhile keep their optimistic state
+          this.votes[feedbackId] = {
+            vote_score: result.vote_score,
+            upvotes: result.upvotes,
+            downvotes: result.downvotes,
+            user_vote: result.user_vote
+          };
+          this.updateVoteDisplay(feedbackId);
+        } else {
+          this.confirmedVotes.set(feedbackId, {
+            vote_score: result.vote_score,
+            upvotes: result.upvotes,
+            downvotes: result.downvotes,
+            user_vote: result.user_vote
+          });
+        }
+      });
       
-      if (data.success) {
-        this.votes[feedbackId] = {
-          vote_score: data.vote_score,
-          upvotes: data.upvotes,
-          downvotes: data.downvotes,
-          user_vote: data.user_vote
-        };
+      // The sync token is not advanced here, so the next load still
+      // replays these changes; the cache only saves the round trip now
+      this.writeSyncCache();
+      if (failed) {
+        this.showError('Some votes could not be saved.');
       }
     } catch (error) {
-      console.error('Error updating vote data:', error);
+      queued.forEach(([feedbackId]) => {
+        this.revertVote(feedbackId, confirmed.get(feedbackId));
+      });
+      this.showError('Failed to process vote. Please try again.');
     }
   }
 
+  /**
+   * Restore the last server-confirmed state of a vote that failed
+   */
+  revertVote(feedbackId, voteData) {
+    if (this.pendingVotes.has(feedbackId) || !voteData) return;
+    this.votes[feedbackId] = voteData;
+    this.updateVoteDisplay(feedbackId);
+  }
+
   /**
    * Update vote display in the DOM
    */
@@ -310,26 +457,6 @@ class VoteManager {
     }
   }
 
-  /**
-   * Set loading state on vote buttons
-   */
-  setButtonsLoading(controls, isLoading) {
-    const buttons = controls.querySelectorAll('.vote-btn');
-    buttons.forEach(btn => {
-      if (isLoading) {
-        btn.classList.add('loading');
-        btn.disabled = true;
-      } else {
-        btn.classList.remove('loading');
-        // Only re-enable if not permanently disabled
-        const feedbackCard = controls.closest('.feedback-box');
-        const feedbackUserId = feedbackCard.dataset.userId ? parseInt(feedbackCard.dataset.userId) : null;
-        const isOwnFeedback = this.currentUserId && this.currentUserId === feedbackUserId;
-        btn.disabled = !this.isAuthenticated || isOwnFeedback;
-      }
-    });
-  }
-
   /**
    * Show error message to user
    */
@@ -340,18 +467,15 @@ class VoteManager {
 
   /**
    * Refresh vote controls after filtering/sorting
-   * Called by FeedbackManager when feedback list is updated
+   * Called by FeedbackManager whenever it renders a new window of cards
    */
   refreshVoteControls() {
-    // Re-render vote controls for all visible feedback cards
-    const feedbackCards = document.querySelectorAll('.feedback-box[style*="display: block"], .feedback-box:not([style*="display: none"])');
+    // Cards created since the last render get their controls here
+    this.renderVoteControls();
     
-    feedbackCards.forEach(card => {
+    document.querySelectorAll('.feedback-box').forEach(card => {
       const feedbackId = card.dataset.feedbackId;
-      const existingControls = card.querySelector('.vote-controls');
-      
-      // Only refresh if controls already exist
-      if (existingControls && this.votes[feedbackId]) {
+      if (this.votes[feedbackId]) {
         this.updateVoteDisplay(feedbackId);
       }
     });
@@ -0,0 +1,165 @@
+"""Delta Sync Module
+
+Tracks which feedback items changed so clients can fetch only what is new
+since their last load. Every write that affects an item (submission,
+moderation, sentiment scoring, votes) re-inserts its row in
+``feedback_change``. The table's AUTOINCREMENT primary key serves as a
+monotonically increasing change token, and ``INSERT OR REPLACE`` on the
+unique ``feedback_id`` keeps one row per item, so the log never needs
+compaction.
+
+Usage:
+    python sync.py backfill   # give pre-existing feedback a change token
+"""
+
+import sys
+
+from sqlalchemy import bindparam, text
+
+
+TOUCH_SQL = text(
+    'INSERT OR REPLACE INTO feedback_change (feedback_id) VALUES (:feedback_id)'
+)
+USER_VOTES_SQL = text(
+    'SELECT feedback_id, vote_type FROM vote '
+    'WHERE user_id = :user_id AND feedback_id IN :ids'
+).bindparams(bindparam('ids', expanding=True))
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+# Keep IN (...) lists below SQLite's bound parameter limit
+_IN_CHUNK = 900
+
+
+def touch(session, *feedback_ids):
+    """Mark feedback items as changed inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        *feedback_ids: IDs of the changed feedback items
+    """
+    if feedback_ids:
+        session.execute(TOUCH_SQL, [{'feedback_id': feedback_id}
+                                    for feedback_id in feedback_ids])
+
+
+def current_token(session):
+    """Get the latest change token.
+
+    Returns:
+        int: Highest assigned change token, 0 if nothing changed yet
+    """
+    return session.execute(
+        text('SELECT COALESCE(MAX(version), 0) FROM feedback_change')
+    ).scalar()
+
+
+def changes_since(session, since, user_id=None, is_admin=False,
+                  limit=DEFAULT_PAGE_SIZE):
+    """Collect feedback items and vote scores changed after a token.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        since (int): Change token the client last saw (0 for everything)
+        user_id (int, optional): Requesting user, for their own votes
+        is_admin (bool): Whether unapproved feedback is visible
+        limit (int): Maximum number of changed items to return
+
+    Returns:
+        dict: ``token`` to resume from, ``feedbacks`` visible changed
+        items, ``removed`` IDs the client should drop, ``has_more`` and
+        ``reset`` (the client's token is unknown and its cache must be
+        discarded)
+    """
+    reset = since > current_token(session)
+    if reset:
+        since = 0
+    rows = session.execute(text('''
+        SELECT c.version, c.feedback_id, f.user_id, f.company_name,
+               f.company_logo, f.comment, f.sentiment, f.status,
+               f.date_created, COALESCE(r.upvotes, 0), COALESCE(r.downvotes, 0)
+        FROM feedback_change c
+        LEFT JOIN feedback f ON f.id = c.feedback_id
+        LEFT JOIN feedback_rank r ON r.feedback_id = c.feedback_id
+        WHERE c.version > :since
+        ORDER BY c.version
+        LIMIT :limit
+    '''), {'since': since, 'limit': limit + 1}).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    token = rows[-1][0] if rows else since
+
+    feedbacks = []
+    removed = []
+    for (_, feedback_id, owner_id, company_name, company_logo, comment,
+         sentiment, status, date_created, upvotes, downvotes) in rows:
+        if company_name is None or (status != 'approved' and not is_admin):
+            removed.append(feedback_id)
+            continue
+        feedbacks.append({
+            'id': feedback_id,
+            'user_id': owner_id,
+            'company_name': company_name,
+            'company_logo': company_logo,
+            'comment': comment,
+            'sentiment': sentiment,
+            'status': status,
+            'date_created': str(date_created).replace(' ', 'T') if date_created else None,
+            'upvotes': upvotes,
+            'downvotes': downvotes,
+            'vote_score': upvotes - downvotes,
+            'user_vote': None,
+        })
+
+    if user_id is not None and feedbacks:
+        by_id = {item['id']: item for item in feedbacks}
+        ids = list(by_id)
+        for start in range(0, len(ids), _IN_CHUNK):
+            for feedback_id, vote_type in session.execute(USER_VOTES_SQL, {
+                'user_id': user_id,
+                'ids': ids[start:start + _IN_CHUNK],
+            }):
+                by_id[feedback_id]['user_vote'] = vote_type
+
+    return {
+        'token': token,
+        'feedbacks': feedbacks,
+        'removed': removed,
+        'has_more': has_more,
+        'reset': reset,
+    }
+
+
+def backfill(session):
+    """Give every feedback item without a change token a new one.
+
+    Returns:
+        int: Number of items backfilled
+    """
+    result = session.execute(text('''
+        INSERT INTO feedback_change (feedback_id)
+        SELECT id FROM feedback
+        WHERE id NOT IN (SELECT feedback_id FROM feedback_change)
+        ORDER BY id
+    '''))
+    session.commit()
+    return result.rowcount
+
+
+def main(argv=None):
+    """Command line entry point."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ['backfill']:
+        print("Usage: python sync.py backfill")
+        return 1
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        print(f"✓ Assigned change tokens to {backfill(db.session)} feedback items")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
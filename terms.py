@@ -0,0 +1,433 @@
+"""Term Statistics Module
+
+Answers "what are people talking about at <company> this week?" without
+scanning comments. Every comment is tokenized once, on submit, into
+keywords and two-word phrases (stopwords and the company's own name are
+dropped), and two tables are kept up to date in the same transaction as
+the write:
+
+- ``feedback_term`` is the inverted index: one ``(term, feedback_id)``
+  posting per distinct term of a comment. Every comment also gets a
+  posting for the empty term, which stands for "any document".
+- ``company_term_daily`` counts approved comments per ``(company_name,
+  day, term)``, adjusted on submission, moderation, bulk import and
+  archiving. The empty term's row is the day's number of approved
+  comments.
+
+``trending`` ranks a company's terms over a recent window against a
+reference made of the company's preceding ``baseline_days`` and every
+other company in the window, either by Dunning's log-likelihood ratio
+(``llr``, terms that are over-represented) or by TF-IDF (``tfidf``,
+terms that are frequent here and rare overall). It reads only rollup
+rows: the company's window picks at most ``MAX_CANDIDATES`` terms, and
+their baseline and overall counts are index lookups. Results are cached
+per query for ``TRENDING_CACHE_TTL`` seconds (see ``init_trending_cache``),
+so the cost does not depend on the number of comments.
+
+Usage:
+    python terms.py backfill [--batch-size 1000]   # rebuild both tables
+    python terms.py trending COMPANY [--days 7] [--scoring llr]
+    python terms.py search TERM [--company COMPANY]
+"""
+
+import argparse
+import math
+import re
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+from sharding import each_shard
+
+from singleflight import VersionedCache
+
+
+DOCUMENTS = ''  # term every comment contains; its counts are document totals
+MIN_TOKEN_LENGTH = 3
+MAX_TERM_LENGTH = 40
+MAX_TERMS_PER_COMMENT = 100
+MAX_CANDIDATES = 500
+DEFAULT_WINDOW_DAYS = 7
+DEFAULT_BASELINE_DAYS = 28
+DEFAULT_LIMIT = 20
+DEFAULT_MIN_COUNT = 2
+SCORINGS = ('llr', 'tfidf')
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL = 60  # seconds a trending result is served without recomputing
+
+STOPWORDS = frozenset('''
+    a about above after again against all also am an and any are aren't as at
+    be because been before being below between both but by can can't cannot
+    could couldn't did didn't do does doesn't doing don't down during each
+    even ever every few for from further get gets getting got had hadn't has
+    hasn't have haven't having he her here hers herself him himself his how
+    i if in into is isn't it it's its itself just let's like made make many
+    me more most much must mustn't my myself never no nor not now of off on
+    once one only or other ought our ours ourselves out over own really same
+    she should shouldn't so some still such than that that's the their
+    theirs them themselves then there there's these they this those through
+    to too under until up upon us very was wasn't we well were weren't what
+    what's when where which while who whom why will with won't would
+    wouldn't yet you your yours yourself yourselves
+'''.split())
+
+_WORD = re.compile(r"[a-z][a-z0-9']*[a-z0-9]|[a-z]")
+
+# Plain SQL with named parameters, so migrations can run it through sqlite3
+POSTING_SQL = '''
+    INSERT OR IGNORE INTO feedback_term (term, feedback_id) VALUES (:term, :feedback_id)
+'''
+COUNT_SQL = '''
+    INSERT INTO company_term_daily (company_name, day, term, doc_count)
+    VALUES (:company_name, :day, :term, :doc_count)
+    ON CONFLICT (company_name, day, term) DO UPDATE SET
+        doc_count = doc_count + excluded.doc_count
+'''
+INDEXED_SQL = text(
+    'SELECT DISTINCT feedback_id FROM feedback_term WHERE feedback_id IN :ids'
+).bindparams(bindparam('ids', expanding=True))
+ITEMS_SQL = text('''
+    SELECT id, company_name, date_created, status, comment FROM feedback WHERE id IN :ids
+''').bindparams(bindparam('ids', expanding=True)).columns(date_created=DateTime)
+ITEM_TERMS_SQL = text('SELECT term FROM feedback_term WHERE feedback_id = :feedback_id')
+REMOVE_COUNTS_SQL = text(COUNT_SQL.replace('VALUES (:company_name, :day, :term, :doc_count)', '''
+    SELECT f.company_name, date(f.date_created), t.term, -COUNT(*)
+    FROM feedback_term t JOIN feedback f ON f.id = t.feedback_id
+    WHERE t.feedback_id IN :ids AND f.status = 'approved'
+    GROUP BY f.company_name, date(f.date_created), t.term
+''')).bindparams(bindparam('ids', expanding=True))
+WINDOW_TERMS_SQL = text('''
+    SELECT term, SUM(doc_count) AS count
+    FROM company_term_daily
+    WHERE company_name = :company_name AND day >= :since
+    GROUP BY term
+    HAVING count >= :min_count OR term = ''
+    ORDER BY count DESC
+    LIMIT :limit
+''')
+REFERENCE_SQL = text('''
+    SELECT term,
+           SUM(CASE WHEN company_name = :company_name AND day < :since
+                    THEN doc_count ELSE 0 END),
+           SUM(CASE WHEN day >= :since THEN doc_count ELSE 0 END),
+           SUM(doc_count)
+    FROM company_term_daily
+    WHERE term IN :terms AND day >= :baseline_since
+    GROUP BY term
+''').bindparams(bindparam('terms', expanding=True))
+
+
+def _day(value):
+    """Normalize a datetime/date to the ISO day string used as key."""
+    return value.date().isoformat() if hasattr(value, 'date') else value.isoformat()
+
+
+def tokenize(comment, company_name=None):
+    """Extract the distinct keywords and two-word phrases of a comment.
+
+    Words are lowercased; stopwords, short words, numbers and the words of
+    the company's name are dropped. A phrase is two kept words that are
+    adjacent in the comment.
+
+    Args:
+        comment (str): Feedback comment
+        company_name (str, optional): Company the comment is about
+
+    Returns:
+        list: Terms in order of first appearance
+    """
+    excluded = STOPWORDS | set(_WORD.findall((company_name or '').lower()))
+    terms = {}
+    previous = None
+    for word in _WORD.findall(comment.lower()):
+        if word.endswith("'s"):
+            word = word[:-2]
+        if (len(word) < MIN_TOKEN_LENGTH or word in excluded
+                or word.isdigit() or len(word) > MAX_TERM_LENGTH):
+            previous = None
+            continue
+        terms.setdefault(word, None)
+        if previous is not None:
+            terms.setdefault(previous + ' ' + word, None)
+        previous = word
+        if len(terms) >= MAX_TERMS_PER_COMMENT:
+            break
+    return list(terms)
+
+
+def index_rows(items):
+    """Build the postings and approved counts of feedback items.
+
+    Args:
+        items: Iterable of (feedback_id, company_name, date_created,
+            status, comment) tuples
+
+    Returns:
+        tuple: (posting parameter dicts, count parameter dicts)
+    """
+    postings = []
+    counts = Counter()
+    for feedback_id, company_name, date_created, status, comment in items:
+        day = _day(date_created)
+        for term in [DOCUMENTS] + tokenize(comment, company_name):
+            postings.append({'term': term, 'feedback_id': feedback_id})
+            if status == 'approved':
+                counts[(company_name, day, term)] += 1
+    return postings, [
+        {'company_name': company_name, 'day': day, 'term': term, 'doc_count': count}
+        for (company_name, day, term), count in counts.items()
+    ]
+
+
+def index_batch(session, items):
+    """Index feedback items inside the caller's transaction.
+
+    Items that already have postings are skipped, so re-indexing (e.g. a
+    backfill racing with new submissions) never counts a comment twice.
+
+    Args:
+        session: SQLAlchemy session (or connection) to execute on
+        items: List of (feedback_id, company_name, date_created, status,
+            comment) tuples
+    """
+    if not items:
+        return
+    indexed = set(session.execute(INDEXED_SQL, {'ids': [item[0] for item in items]}).scalars())
+    postings, counts = index_rows(item for item in items if item[0] not in indexed)
+    if postings:
+        session.execute(text(POSTING_SQL), postings)
+    if counts:
+        session.execute(text(COUNT_SQL), counts)
+
+
+def index_feedback(session, feedback):
+    """Index a newly submitted feedback item."""
+    index_batch(session, [(feedback.id, feedback.company_name, feedback.date_created,
+                           feedback.status, feedback.comment)])
+
+
+def index_ids(session, ids):
+    """Index live feedback items by ID (e.g. restored from the archive)."""
+    if ids:
+        index_batch(session, [tuple(row) for row in session.execute(ITEMS_SQL, {'ids': list(ids)})])
+
+
+def record_status_change(session, feedback, old_status):
+    """Count or uncount a feedback item's terms after moderation."""
+    delta = int(feedback.status == 'approved') - int(old_status == 'approved')
+    if not delta:
+        return
+    day = _day(feedback.date_created)
+    counts = [
+        {'company_name': feedback.company_name, 'day': day, 'term': term, 'doc_count': delta}
+        for term in session.execute(ITEM_TERMS_SQL, {'feedback_id': feedback.id}).scalars()
+    ]
+    if counts:
+        session.execute(text(COUNT_SQL), counts)
+
+
+def remove(session, ids):
+    """Uncount and unindex feedback items; call before they are deleted."""
+    if not ids:
+        return
+    session.execute(REMOVE_COUNTS_SQL, {'ids': list(ids)})
+    session.execute(text(
+        'DELETE FROM feedback_term WHERE feedback_id IN :ids'
+    ).bindparams(bindparam('ids', expanding=True)), {'ids': list(ids)})
+
+
+def log_likelihood(a, n1, b, n2):
+    """Dunning's G² for a term seen in a of n1 documents and b of n2."""
+    expected_a = n1 * (a + b) / (n1 + n2)
+    expected_b = n2 * (a + b) / (n1 + n2)
+    g2 = 0.0
+    if a:
+        g2 += a * math.log(a / expected_a)
+    if b:
+        g2 += b * math.log(b / expected_b)
+    return 2 * g2
+
+
+def trending(session, company_name, days=DEFAULT_WINDOW_DAYS,
+             baseline_days=DEFAULT_BASELINE_DAYS, scoring='llr',
+             limit=DEFAULT_LIMIT, min_count=DEFAULT_MIN_COUNT, today=None):
+    """Rank a company's most distinctive terms over a recent window.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        company_name (str): Company name
+        days (int): Number of most recent days in the window
+        baseline_days (int): Days before the window used as reference
+        scoring (str): 'llr' or 'tfidf'
+        limit (int): Maximum number of terms
+        min_count (int): Ignore terms in fewer approved comments
+        today (date, optional): Last day of the window
+
+    Returns:
+        dict: Window, document count and ranked terms with their count,
+        share of documents, baseline count and score
+    """
+    today = today or datetime.utcnow().date()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    baseline_since = (today - timedelta(days=days + baseline_days - 1)).isoformat()
+    result = {
+        'company': company_name,
+        'days': days,
+        'since': since,
+        'baseline_days': baseline_days,
+        'scoring': scoring,
+        'documents': 0,
+        'terms': [],
+    }
+
+    window = dict(session.execute(WINDOW_TERMS_SQL, {
+        'company_name': company_name, 'since': since,
+        'min_count': min_count, 'limit': MAX_CANDIDATES + 1,
+    }).all())
+    n1 = window.pop(DOCUMENTS, 0)
+    result['documents'] = n1
+    candidates = list(window)[:MAX_CANDIDATES]
+    if not n1 or not candidates:
+        return result
+
+    # Baseline and overall counts come from the (term, day) index, so only
+    # the candidates' rows are read; other companies may be on other shards
+    reference = {term: (0, 0, 0) for term in candidates + [DOCUMENTS]}
+    for _ in each_shard():
+        for term, *counts in session.execute(REFERENCE_SQL, {
+            'company_name': company_name, 'terms': candidates + [DOCUMENTS],
+            'since': since, 'baseline_since': baseline_since,
+        }):
+            reference[term] = tuple(map(sum, zip(reference[term], counts)))
+    n1_baseline, all_window, all_total = reference.pop(DOCUMENTS)
+    # Reference corpus: other companies in the window plus this company's baseline
+    n2 = all_window - n1 + n1_baseline
+
+    scored = []
+    for term in candidates:
+        a = window[term]
+        a_baseline, term_window, term_total = reference[term]
+        if scoring == 'tfidf':
+            score = a / n1 * (math.log((1 + all_total) / (1 + term_total)) + 1)
+        else:
+            b = term_window - a + a_baseline
+            if not n2 or a / n1 <= b / n2:
+                continue
+            score = log_likelihood(a, n1, b, n2)
+        scored.append((score, a, term, a_baseline))
+
+    scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    result['terms'] = [{
+        'term': term,
+        'count': count,
+        'share': round(count / n1, 4),
+        'baseline_count': baseline,
+        'score': round(score, 4),
+    } for score, count, term, baseline in scored[:limit]]
+    return result
+
+
+def search(session, term, company_name=None, limit=50):
+    """Find approved feedback containing a term through the inverted index.
+
+    Returns:
+        list: (feedback_id, company_name, comment) rows, newest ID first
+    """
+    sql = '''
+        SELECT f.id, f.company_name, f.comment
+        FROM feedback_term t JOIN feedback f ON f.id = t.feedback_id
+        WHERE t.term = :term AND f.status = 'approved'
+    '''
+    params = {'term': term.lower(), 'limit': limit}
+    if company_name:
+        sql += ' AND f.company_name = :company_name'
+        params['company_name'] = company_name
+    return session.execute(text(sql + ' ORDER BY t.feedback_id DESC LIMIT :limit'), params).all()
+
+
+def backfill(session, batch_size=1000):
+    """Rebuild the index and counts from the feedback table in ID order.
+
+    Returns:
+        int: Number of feedback items indexed
+    """
+    session.execute(text('DELETE FROM feedback_term'))
+    session.execute(text('DELETE FROM company_term_daily'))
+    session.commit()
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(session.execute(text(
+            'SELECT id FROM feedback WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).scalars())
+        if not ids:
+            return indexed
+        index_ids(session, ids)
+        session.commit()
+        last_id = ids[-1]
+        indexed += len(ids)
+
+
+def init_trending_cache(app):
+    """Create the app's trending results cache.
+
+    Results are keyed by query and versioned by day, so a new day starts
+    a new window; within a day they are recomputed after
+    ``TRENDING_CACHE_TTL`` seconds, one request at a time, while others
+    get the previous result. Reads ``TRENDING_CACHE_SIZE`` and
+    ``TRENDING_CACHE_TTL``.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        VersionedCache: The installed cache
+    """
+    ttl = app.config.get('TRENDING_CACHE_TTL', DEFAULT_CACHE_TTL)
+    cache = VersionedCache(
+        max_entries=app.config.get('TRENDING_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+        max_stale=ttl,
+        ttl=ttl,
+    )
+    app.extensions['trending_cache'] = cache
+    return cache
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Term statistics')
+    parser.add_argument('command', choices=('backfill', 'trending', 'search'))
+    parser.add_argument('value', nargs='?', help='Company (trending) or term (search)')
+    parser.add_argument('--company', help='Only search this company')
+    parser.add_argument('--days', type=int, default=DEFAULT_WINDOW_DAYS)
+    parser.add_argument('--scoring', choices=SCORINGS, default='llr')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+    if args.command != 'backfill' and not args.value:
+        print(f"✗ {args.command} needs a {'company' if args.command == 'trending' else 'term'}")
+        return 1
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        if args.command == 'backfill':
+            print(f"✓ Indexed {backfill(db.session, args.batch_size)} feedback items")
+        elif args.command == 'trending':
+            result = trending(db.session, args.value, days=args.days, scoring=args.scoring)
+            for item in result['terms']:
+                print(f"  {item['term']:<30} {item['count']:>6} {item['score']:>10.2f}")
+            print(f"✓ {len(result['terms'])} terms from {result['documents']} comments "
+                  f"since {result['since']}")
+        else:
+            rows = search(db.session, args.value, args.company)
+            for feedback_id, company_name, comment in rows:
+                print(f"  #{feedback_id} ({company_name}) {comment[:60]!r}")
+            print(f"✓ {len(rows)} matching feedback items")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, user_activity
+from auth import init_auth_db
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            init_auth_db()
+        yield client
+        with app.app_context():
+            db.drop_all()
+    app.config.pop('AUTH_DATABASE')
+
+
+def login(client, username, is_admin=False):
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    cursor = conn.execute(
+        'INSERT OR IGNORE INTO users (username, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
+        (username, f'{username}@example.com', 'x', int(is_admin))
+    )
+    conn.commit()
+    user_id = cursor.lastrowid or conn.execute(
+        'SELECT id FROM users WHERE username = ?', (username,)).fetchone()[0]
+    conn.close()
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess['user_id'] = user_id
+        sess['username'] = username
+        sess['is_admin'] = is_admin
+    return user_id
+
+
+def test_pages_walk_every_item_once(client):
+    login(client, 'author')
+    ids = [client.post('/submit_feedback', json={'company': 'Uber', 'comment': f'Ride {i}'})
+           .get_json()['feedback']['id'] for i in range(5)]
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/my-feedback?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        seen.extend(item['id'] for item in page['feedbacks'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+
+    assert client.get('/api/my-feedback?cursor=garbage').status_code == 400
+    assert client.get('/my-feedback').headers['Location'].endswith('/auth/profile')
+
+
+def test_overview_is_cached_until_the_authors_items_change(client):
+    author = login(client, 'author')
+    feedback_id = client.post('/submit_feedback', json={
+        'company': 'Uber', 'comment': 'Great drivers'}).get_json()['feedback']['id']
+
+    overview = client.get('/api/my-feedback').get_json()
+    assert overview['summary']['by_status'] == {'pending': 1, 'approved': 0, 'rejected': 0}
+    computed = user_activity.stats['computed']
+    client.get('/api/my-feedback')
+    assert user_activity.stats['computed'] == computed
+
+    login(client, 'admin', is_admin=True)
+    client.post(f'/admin/moderate/{feedback_id}/approve')
+    login(client, 'voter')
+    client.post('/api/vote', json={'feedback_id': feedback_id, 'vote_type': 'upvote'})
+
+    login(client, 'author')
+    overview = client.get('/api/my-feedback').get_json()
+    assert user_activity.stats['computed'] == computed + 1
+    assert overview['summary']['by_status']['approved'] == 1
+    assert overview['summary']['vote_score'] == 1
+    assert overview['feedbacks'][0]['upvotes'] == 1
+
+    # Other users' activity does not invalidate this author's entry
+    login(client, 'someone')
+    client.post('/submit_feedback', json={'company': 'Apple', 'comment': 'Nice phone'})
+    login(client, 'author')
+    client.get('/api/my-feedback')
+    assert user_activity.stats['computed'] == computed + 1
+
+    page = client.get('/auth/profile').get_data(as_text=True)
+    assert 'Great drivers' in page
+    assert '1</strong> approved' in page
@@ -144,4 +144,118 @@ def test_filter_feedback_api(client):
     json_data = response.get_json()
     assert json_data['success']
     assert len(json_data['feedbacks']) == 1
-    assert 'Great' in json_data['feedbacks'][0]['comment']
\ No newline at end of file
+    assert 'Great' in json_data['feedbacks'][0]['comment']
+
+def test_filter_feedback_hot_and_best_sorting(client):
+    from app import Feedback, FeedbackRank, User
+    from ranking import hot_score, wilson_score
+    from datetime import datetime, timedelta
+    from werkzeug.security import generate_password_hash
+
+    now = datetime.utcnow()
+    with app.app_context():
+        voter = User(username='voter', email='voter@example.com',
+                     password_hash=generate_password_hash('testpass'))
+        db.session.add(voter)
+        # (age in hours, upvotes, downvotes)
+        specs = [(48, 20, 0), (1, 0, 0), (2, 3, 1)]
+        for i, (age, up, down) in enumerate(specs):
+            created = now - timedelta(hours=age)
+            feedback = Feedback(company_name='Google', comment=f'item {i}',
+                                sentiment='positive', status='approved',
+                                date_created=created)
+            db.session.add(feedback)
+            db.session.flush()
+            db.session.add(FeedbackRank(
+                feedback_id=feedback.id, company_name='Google',
+                sentiment='positive', status='approved', date_created=created,
+                upvotes=up, downvotes=down,
+                hot=hot_score(up, down, created), best=wilson_score(up, down)))
+        db.session.commit()
+
+    response = client.get('/api/feedback/filter?sort=hot')
+    assert [f['comment'] for f in response.get_json()['feedbacks']] == ['item 2', 'item 1', 'item 0']
+
+    response = client.get('/api/feedback/filter?sort=best&company=Google&limit=2')
+    assert [f['comment'] for f in response.get_json()['feedbacks']] == ['item 0', 'item 2']
+
+    assert wilson_score(0, 0) == 0
+    assert wilson_score(100, 0) > wilson_score(5, 0) > wilson_score(5, 5)
+
+
+def test_filter_feedback_preview_and_detail(client):
+    from app import Feedback
+
+    with app.app_context():
+        db.session.add(Feedback(company_name='Google', comment='x' * 500,
+                                sentiment='neutral', status='approved'))
+        db.session.add(Feedback(company_name='Google', comment='hidden',
+                                sentiment='neutral', status='pending'))
+        db.session.commit()
+
+    response = client.get('/api/feedback/filter?preview=100')
+    item = response.get_json()['feedbacks'][0]
+    assert len(item['comment']) == 100
+    assert item['comment_truncated'] is True
+
+    response = client.get(f"/api/feedback/{item['id']}")
+    assert response.get_json()['feedback']['comment'] == 'x' * 500
+
+    response = client.get('/api/feedback/filter')
+    assert 'comment_truncated' not in response.get_json()['feedbacks'][0]
+
+    assert client.get('/api/feedback/2').status_code == 404
+
+
+def test_filter_feedback_pages_with_offset_and_count(client):
+    from app import Feedback, Vote, User
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        voter = User(username='voter', email='voter@example.com',
+                     password_hash=generate_password_hash('testpass'))
+        db.session.add(voter)
+        for i in range(7):
+            db.session.add(Feedback(company_name='Google', comment=f'item {i}',
+                                    sentiment='neutral', status='approved'))
+        db.session.flush()
+        db.session.add(Vote(user_id=voter.id, feedback_id=5, vote_type='upvote'))
+        db.session.commit()
+
+    pages = []
+    for offset in (0, 3, 6):
+        data = client.get(f'/api/feedback/filter?sort=helpful&limit=3&offset={offset}&count=1').get_json()
+        assert data['matched'] == 7
+        pages.extend(data['feedbacks'])
+    ids = [f['id'] for f in pages]
+    assert ids[0] == 5 and sorted(ids) == list(range(1, 8))
+    assert 'user_id' in pages[0]
+    assert 'matched' not in client.get('/api/feedback/filter').get_json()
+
+    # Out-of-range windows are refused or clamped instead of overflowing SQLite
+    assert client.get('/api/feedback/filter?offset=100000000000000000000').status_code == 400
+    assert client.get('/api/feedback/filter?preview=100000000000000000000').status_code == 400
+    data = client.get('/api/feedback/filter?limit=100000000000000000000').get_json()
+    assert len(data['feedbacks']) == 7
+
+    app.config['INDEX_PAGE_SIZE'] = 2
+    try:
+        html = client.get('/').get_data(as_text=True)
+    finally:
+        app.config['INDEX_PAGE_SIZE'] = 60
+    assert html.count('class="feedback-box"') == 2
+    assert 'data-total="7"' in html
+
+
+def test_json_providers_produce_same_payload():
+    from datetime import datetime
+    from flask import Flask
+    from json_provider import CompactJSONProvider, OrjsonProvider, orjson
+
+    payload = {'a': [1, 2.5, None, 'é'], 'when': datetime(2024, 1, 2, 3, 4, 5)}
+    compact = CompactJSONProvider(Flask(__name__))
+    expected = compact.loads(compact.dumps(payload))
+    assert expected['when'] == 'Tue, 02 Jan 2024 03:04:05 GMT'
+    if orjson is not None:
+        fast = OrjsonProvider(Flask(__name__))
+        assert fast.loads(fast.dumps(payload)) == expected
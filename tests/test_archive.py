@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from datetime import datetime, timedelta
+
+import pytest
+import archive
+from app import app, db, User, Vote, Feedback, FeedbackRank, CompanyDailyStats
+from ingest import BulkIngestor, iter_records
+from werkzeug.security import generate_password_hash
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def seed():
+    now = datetime.utcnow()
+    records = [
+        {'company': 'Uber', 'comment': 'Ancient but great', 'date_created': (now - timedelta(days=1000)).isoformat()},
+        {'company': 'Uber', 'comment': 'Spam spam', 'date_created': (now - timedelta(days=30)).isoformat()},
+        {'company': 'Uber', 'comment': 'Fresh and good', 'date_created': (now - timedelta(days=1)).isoformat()},
+        {'company': 'Uber', 'comment': 'Newest', 'date_created': now.isoformat()},
+    ]
+    body = '\n'.join(json.dumps(r) for r in records).encode()
+    BulkIngestor(db, status='approved').ingest(iter_records(io.BytesIO(body)))
+    db.session.get(Feedback, 2).status = 'rejected'
+    voter = User(username='voter', email='voter@example.com',
+                 password_hash=generate_password_hash('testpass'))
+    db.session.add(voter)
+    db.session.flush()
+    db.session.add(Vote(user_id=voter.id, feedback_id=1, vote_type='upvote'))
+    db.session.commit()
+
+
+def rollup_totals():
+    return db.session.query(db.func.sum(CompanyDailyStats.feedback_count)).scalar()
+
+
+def test_archive_and_restore_round_trip(client):
+    with app.app_context():
+        seed()
+        totals = rollup_totals()
+
+        assert archive.run(db.session, dry_run=True) == {'aged': 1, 'rejected': 1}
+        assert Feedback.query.count() == 4
+
+        archived = archive.run(db.session, batch_size=1)
+        assert archived == {'aged': 1, 'rejected': 1}
+        assert sorted(f.id for f in Feedback.query) == [3, 4]
+        assert Vote.query.count() == 0
+        assert db.session.get(FeedbackRank, 1) is None
+        assert rollup_totals() == totals - 2
+        assert archive.stats(db.session)['archived_by_reason'] == {'aged': 1, 'rejected': 1}
+
+    listing = client.get('/api/feedback/filter').get_json()
+    assert [f['id'] for f in listing['feedbacks']] == [4, 3]
+    listing = client.get('/api/feedback/filter?include_archived=1&sort=oldest').get_json()
+    # The rejected item stays hidden from non-admins
+    assert [(f['id'], f['archived']) for f in listing['feedbacks']] == [
+        (1, True), (3, False), (4, False)]
+    helpful = client.get('/api/feedback/filter?include_archived=1&sort=helpful').get_json()
+    assert helpful['feedbacks'][0]['id'] == 1
+    # Both sides are paged in SQL, then merged
+    best = client.get('/api/feedback/filter?include_archived=1&sort=best&limit=1&count=1')
+    assert [f['id'] for f in best.get_json()['feedbacks']] == [1]
+    assert best.get_json()['matched'] == 3
+    page = client.get('/api/feedback/filter?include_archived=1&sort=oldest&limit=1&offset=1')
+    assert [f['id'] for f in page.get_json()['feedbacks']] == [3]
+    assert client.get('/api/feedback/1').status_code == 404
+    assert client.get('/api/feedback/1?include_archived=1').get_json()['feedback']['archived']
+
+    with app.app_context():
+        assert archive.restore(db.session, [1, 99]) == [1]
+        assert db.session.get(FeedbackRank, 1).upvotes == 1
+        assert Vote.query.filter_by(feedback_id=1).count() == 1
+        assert rollup_totals() == totals - 1
+    assert client.get('/api/feedback/1').status_code == 200
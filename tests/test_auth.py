@@ -0,0 +1,149 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import sqlite3
+
+import pytest
+from app import app
+from auth import get_db_connection, init_auth_db
+from availability import BloomFilter, init_availability
+from passwords import PasswordHasher, needs_rehash
+from ratelimit import RateLimiter, ShardedBucketStore, init_login_limits
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    hasher = app.extensions['password_hasher']
+    limits = app.extensions['login_limits']
+    checker = app.extensions['availability']
+    app.extensions['password_hasher'] = PasswordHasher(FAST_METHOD, workers=2)
+    init_login_limits(app)
+    init_availability(app, get_db_connection)
+    with app.test_client() as client:
+        with app.app_context():
+            init_auth_db()
+        yield client
+    app.extensions['password_hasher'].shutdown()
+    app.extensions['password_hasher'] = hasher
+    app.extensions['login_limits'] = limits
+    app.extensions['availability'] = checker
+    app.config.pop('AUTH_DATABASE')
+
+
+def register(client, username='alice', password='Password1'):
+    return client.post('/auth/register', data={
+        'username': username, 'email': f'{username}@example.com',
+        'password': password, 'confirm_password': password,
+    })
+
+
+def stored_hash(username='alice'):
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    try:
+        return conn.execute('SELECT password_hash FROM users WHERE username = ?',
+                            (username,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_login_rehashes_when_method_changes(client):
+    assert register(client).status_code == 302
+    assert stored_hash().startswith('pbkdf2:sha256:1000$')
+
+    app.extensions['password_hasher'].shutdown()
+    app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:2000', workers=1)
+    response = client.post('/auth/login', data={'username': 'alice',
+                                                'password': 'Password1'})
+    assert response.status_code == 302
+    assert stored_hash().startswith('pbkdf2:sha256:2000$')
+    assert not needs_rehash(stored_hash(), 'pbkdf2:sha256:2000')
+
+
+def test_login_is_rate_limited_per_account(client):
+    register(client)
+    app.config['LOGIN_RATE_PER_ACCOUNT'] = (3, 300)
+    try:
+        init_login_limits(app)
+    finally:
+        app.config['LOGIN_RATE_PER_ACCOUNT'] = (10, 300)
+
+    for _ in range(3):
+        response = client.post('/auth/login', data={'username': 'alice',
+                                                    'password': 'wrong'})
+        assert response.status_code == 200
+    response = client.post('/auth/login', data={'username': 'ALICE',
+                                                'password': 'Password1'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+
+def test_token_bucket_refills():
+    now = [0.0]
+    limiter = RateLimiter('test', rate=1, capacity=2,
+                          store=ShardedBucketStore(shards=4, clock=lambda: now[0]))
+    assert limiter.hit('k')[0] and limiter.hit('k')[0]
+    allowed, retry_after = limiter.hit('k')
+    assert not allowed and retry_after == pytest.approx(1)
+    assert limiter.hit('other')[0]
+    now[0] = 1.0
+    assert limiter.hit('k')[0]
+
+
+def test_eviction_keeps_drained_buckets_of_slower_limiters():
+    now = [0.0]
+    store = ShardedBucketStore(shards=1, max_keys_per_shard=4, clock=lambda: now[0])
+    account = RateLimiter('account', rate=0.01, capacity=2, store=store)
+    availability = RateLimiter('availability', rate=10, capacity=100, store=store)
+    for i in range(3):
+        availability.hit(f'ip{i}')
+    now[0] = 1.0
+    account.hit('alice')
+    account.hit('alice')
+    now[0] = 20.0
+    availability.hit('ip3')
+    # Refilled at the availability rate the account bucket would look full
+    assert not account.hit('alice')[0]
+
+
+def test_check_availability_uses_bloom_filter(client):
+    register(client)
+    checker = app.extensions['availability']
+
+    data = client.get('/auth/check-availability?username=alice'
+                      '&email=bob@example.com').get_json()
+    assert data['username']['available'] is False
+    assert data['email']['available'] is True
+    assert client.get('/auth/check-availability?username=ab').get_json()[
+        'username']['valid'] is False
+    assert client.get('/auth/check-availability').status_code == 400
+
+    lookups = checker.stats['lookups']
+    for i in range(50):
+        assert client.get(f'/auth/check-availability?username=free{i}').get_json()[
+            'username']['available']
+    # Nearly every miss is answered by the filter without a query
+    assert checker.stats['lookups'] - lookups <= 3
+
+    register(client, 'bob')
+    assert client.get('/auth/check-availability?username=bob').get_json()[
+        'username']['available'] is False
+    response = register(client, 'bob')
+    assert response.status_code == 200
+    assert b'already exists' in response.data
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f'user{i}')
+    assert all(f'user{i}' in bloom for i in range(1000))
+    false_positives = sum(f'other{i}' in bloom for i in range(10000))
+    assert false_positives < 300
@@ -0,0 +1,115 @@
+import gzip
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from flask import Flask, Response
+from app import app, db, Feedback, listing_cache
+import sync
+from compression import conditional, init_compression
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            for i in range(30):
+                db.session.add(Feedback(company_name='Google', comment=f'Feedback number {i}',
+                                        sentiment='neutral', status='approved'))
+            db.session.commit()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def test_listing_is_compressed_when_accepted(client):
+    plain = client.get('/api/feedback/filter')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get('/api/feedback/filter', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+    # Small bodies are not worth compressing
+    small = client.get('/api/feedback/filter?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_unchanged_listing_returns_304_without_querying(client, monkeypatch):
+    first = client.get('/api/feedback/filter?sort=helpful', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    calls = []
+    original = listing_cache.get
+    monkeypatch.setattr(listing_cache, 'get', lambda *args: calls.append(1) or original(*args))
+
+    # Any encoding's variant of the current tag matches
+    for headers in ({'If-None-Match': etag},
+                    {'If-None-Match': etag, 'Accept-Encoding': 'gzip'},
+                    {'If-None-Match': etag.replace('-gzip', '')}):
+        response = client.get('/api/feedback/filter?sort=helpful', headers=headers)
+        assert response.status_code == 304
+        assert response.data == b''
+    assert calls == []
+
+    # Other queries and other users have their own tags
+    assert client.get('/api/feedback/filter?sort=recent',
+                      headers={'If-None-Match': etag}).status_code == 200
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    assert client.get('/api/feedback/filter?sort=helpful',
+                      headers={'If-None-Match': etag}).status_code == 200
+    with client.session_transaction() as sess:
+        sess.clear()
+
+    with app.app_context():
+        sync.touch(db.session, 1)
+        db.session.commit()
+    response = client.get('/api/feedback/filter?sort=helpful', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_index_page_is_conditional(client):
+    first = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    response = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_streamed_responses_are_compressed_per_chunk():
+    streaming = Flask(__name__)
+    init_compression(streaming)
+    versions = [1]
+
+    @streaming.route('/stream')
+    def stream():
+        return Response((f'line {i}\n' for i in range(1000)), mimetype='text/plain')
+
+    @streaming.route('/versioned')
+    @conditional(lambda: versions[0])
+    def versioned():
+        return 'x' * 1000
+
+    client = streaming.test_client()
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    chunks = list(response.response)
+    assert len(chunks) > 1
+    assert gzip.decompress(b''.join(chunks)) == ''.join(f'line {i}\n' for i in range(1000)).encode()
+
+    etag = client.get('/versioned').headers['ETag']
+    assert client.get('/versioned', headers={'If-None-Match': etag}).status_code == 304
+    versions[0] = 2
+    assert client.get('/versioned', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import app, db, Feedback
+from dbrouting import routing_enabled, writer_engine_options
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def test_routing_only_for_file_sqlite():
+    assert routing_enabled({'SQLALCHEMY_DATABASE_URI': 'sqlite:///openfeed.db'})
+    assert not routing_enabled({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    assert not routing_enabled({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    assert not routing_enabled({'SQLALCHEMY_DATABASE_URI': 'sqlite:///x.db', 'DB_READERS': 0})
+    assert writer_engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) == {}
+
+
+@pytest.mark.skipif(app.extensions['db_reader'] is None, reason='routing disabled')
+def test_read_requests_use_query_only_reader(client):
+    reader = app.extensions['db_reader']
+    with app.test_request_context('/api/feedback/filter'):
+        app.preprocess_request()
+        assert g.db_read_only
+        assert db.session.get_bind() is reader
+        with pytest.raises(OperationalError, match='readonly'):
+            db.session.execute(text("DELETE FROM feedback"))
+        db.session.rollback()
+
+        # ORM flushes still reach the writer
+        db.session.add(Feedback(company_name='Uber', comment='Fine', sentiment='neutral',
+                                status='approved'))
+        db.session.commit()
+
+    with app.test_request_context('/submit_feedback', method='POST'):
+        app.preprocess_request()
+        assert db.session.get_bind() is db.engine
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+    response = client.get('/api/feedback/filter')
+    assert [f['comment'] for f in response.get_json()['feedbacks']] == ['Fine']
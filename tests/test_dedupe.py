@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import sys
+import time
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+import dedupe
+from app import app, db, Feedback
+from auth import init_auth_db
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            init_auth_db()
+        yield client
+        with app.app_context():
+            db.drop_all()
+    app.config.pop('AUTH_DATABASE')
+
+
+def login_as_admin(client):
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    cursor = conn.execute(
+        'INSERT INTO users (username, email, password_hash, is_admin) VALUES (?, ?, ?, 1)',
+        ('admin', 'admin@example.com', 'x')
+    )
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user_id'] = cursor.lastrowid
+        sess['username'] = 'admin'
+        sess['is_admin'] = True
+
+
+def submit(client, comment, company='Uber'):
+    response = client.post('/submit_feedback', json={'company': company, 'comment': comment})
+    return response.get_json()['feedback']['id']
+
+
+SPAM = 'Worst ride ever, the driver took a huge detour and charged me double the fare!!'
+
+
+def test_signature_similarity():
+    a = dedupe.signature(SPAM)
+    b = dedupe.signature(SPAM.replace('Worst', 'The worst').replace('!!', '.'))
+    c = dedupe.signature('Friendly support team, refund arrived within a day.')
+    assert dedupe.similarity(a, a) == 1.0
+    assert dedupe.similarity(a, b) >= dedupe.SIMILARITY_THRESHOLD
+    assert dedupe.similarity(a, c) < 0.2
+    assert dedupe.unpack(dedupe.pack(a)) == a
+
+
+def test_near_duplicates_share_a_cluster_and_moderate_together(client):
+    login_as_admin(client)
+    first = submit(client, SPAM)
+    second = submit(client, SPAM.upper())
+    third = submit(client, SPAM.replace('double', 'twice'))
+    other = submit(client, 'Friendly support team, refund arrived within a day.')
+
+    response = client.get('/admin/moderate/clusters')
+    clusters = response.get_json()['clusters']
+    assert [(c['cluster_id'], c['size'], c['pending']) for c in clusters] == [(first, 3, 3)]
+
+    response = client.post(f'/admin/moderate/cluster/{first}/reject')
+    assert response.get_json()['feedback_ids'] == [first, second, third]
+    with app.app_context():
+        statuses = {f.id: f.status for f in Feedback.query.all()}
+    assert statuses == {first: 'rejected', second: 'rejected', third: 'rejected',
+                        other: 'pending'}
+    assert client.get('/admin/moderate/clusters').get_json()['clusters'] == []
+    assert client.post(f'/admin/moderate/cluster/{first}/approve').status_code == 404
+
+
+def test_rebuild_reproduces_clusters(client):
+    with app.app_context():
+        a = 'the app crashes every time I open the payment screen on android'
+        b = 'payment screen freezes and the whole thing closes, on my iphone today'
+        for comment in (a, b, a + ' ' + b):
+            feedback = Feedback(company_name='Uber', comment=comment, sentiment='neutral',
+                                status='pending')
+            db.session.add(feedback)
+            db.session.flush()
+            dedupe.index_feedback(db.session, feedback.id, comment)
+        db.session.commit()
+        before = dedupe.cluster_members(db.session, 1)
+
+        assert dedupe.rebuild(db.session) == 3
+        assert dedupe.cluster_members(db.session, 1) == before
+
+
+def test_lookup_cost_independent_of_corpus_size(client):
+    with app.app_context():
+        for i in range(2000):
+            feedback = Feedback(company_name='Uber', status='approved', sentiment='neutral',
+                                comment=f'Review number {i}: order {i * 7919} arrived {i % 13} days late')
+            db.session.add(feedback)
+            db.session.flush()
+            dedupe.index_feedback(db.session, feedback.id, feedback.comment)
+        db.session.commit()
+
+        sig = dedupe.signature(SPAM)
+        started = time.perf_counter()
+        for _ in range(50):
+            assert dedupe.find_similar(db.session, sig) == []
+        assert (time.perf_counter() - started) / 50 < 0.01
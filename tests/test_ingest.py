@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+import ranking
+from app import app, db, Feedback
+from ingest import BulkIngestor, iter_records
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def test_iter_records_ndjson_and_array():
+    ndjson = b'{"company": "Google", "comment": "a"}\n\nnot json\n{"company": "Uber", "comment": "b"}'
+    records = list(iter_records(io.BytesIO(ndjson)))
+    assert [r[0] for r in records] == [1, 2, 3]
+    assert records[0][1]['company'] == 'Google'
+    assert records[1][2].startswith('Invalid JSON')
+    assert records[2][1]['comment'] == 'b'
+
+    array = json.dumps([{'company': 'Google', 'comment': str(i)} for i in range(50)])
+    records = list(iter_records(io.StringIO(array)))
+    assert len(records) == 50
+    assert records[-1][1]['comment'] == '49'
+
+
+def test_iter_records_decodes_characters_split_across_reads():
+    # 'é' is two bytes; put them on either side of the first 64 KiB read
+    prefix = json.dumps({'company': 'Uber', 'comment': ''})[:-2]  # up to the opening quote
+    padding = 65535 - len(prefix)
+    line = json.dumps({'company': 'Uber', 'comment': 'x' * padding + 'é'}, ensure_ascii=False)
+    body = (line + '\n' + json.dumps({'company': 'Apple', 'comment': 'ok'})).encode('utf-8')
+    assert body.index('é'.encode('utf-8')) == 65535
+    records = list(iter_records(io.BytesIO(body)))
+    assert [r[2] for r in records] == [None, None]
+    assert records[0][1]['comment'].endswith('xé')
+
+    array = ('[' + line + ']').encode('utf-8')
+    assert list(iter_records(io.BytesIO(array)))[0][1]['comment'].endswith('xé')
+
+
+def test_iter_records_skips_a_malformed_array_element():
+    good = [json.dumps({'company': 'Uber', 'comment': 'x' * 1000 + str(i)}) for i in range(200)]
+    body = '[' + ', '.join(good[:3] + ['{"company": "Uber",, "comment": [1, "]"]}'] + good[3:]) + ']'
+    records = list(iter_records(io.BytesIO(body.encode())))
+    assert len(records) == 201
+    assert records[3][1] is None and records[3][2].startswith('Invalid JSON')
+    assert [r[1]['comment'][-3:] for r in records[-2:]] == ['198', '199']
+
+    truncated = list(iter_records(io.StringIO('[{"a": 1}, {"b": ')))
+    assert truncated[-1][2].endswith('the rest of the input was not read')
+
+
+def test_bulk_ingest_dedupes_and_reports_errors(client):
+    lines = [
+        {'company': 'google', 'comment': 'Great search results'},
+        {'company': 'Google', 'comment': '  great   SEARCH results '},
+        {'company': 'Uber', 'comment': 'Terrible wait times'},
+        {'company': 'Uber'},
+        {'company': 'Apple', 'comment': 'Fine', 'date_created': 'yesterday'},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines).encode()
+
+    with app.app_context():
+        ingestor = BulkIngestor(db, status='approved', batch_size=2)
+        summary = ingestor.ingest(iter_records(io.BytesIO(body)))
+
+        assert summary['inserted'] == 2
+        assert summary['duplicates'] == 1
+        assert summary['error_count'] == 2
+        assert [e['record'] for e in summary['errors']] == [4, 5]
+
+        rows = Feedback.query.order_by(Feedback.id).all()
+        assert [(f.company_name, f.sentiment, f.status) for f in rows] == [
+            ('Google', 'positive', 'approved'),
+            ('Uber', 'negative', 'approved'),
+        ]
+
+        # Re-importing the same file inserts nothing new
+        summary = BulkIngestor(db).ingest(iter_records(io.BytesIO(body)))
+        assert summary['inserted'] == 0
+        assert summary['duplicates'] == 3
+
+
+def test_bulk_ingest_stores_offset_timestamps_as_naive_utc(client):
+    lines = [
+        {'company': 'Uber', 'comment': 'Late again', 'date_created': '2024-01-01T00:00:00Z'},
+        {'company': 'Uber', 'comment': 'On time', 'date_created': '2024-01-01T02:30:00+02:00'},
+        {'company': 'Uber', 'comment': 'Fine', 'date_created': '2024-01-01T01:00:00'},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines).encode()
+    with app.app_context():
+        summary = BulkIngestor(db).ingest(iter_records(io.BytesIO(body)))
+        assert (summary['inserted'], summary['error_count']) == (3, 0)
+        assert [f.date_created for f in Feedback.query.order_by(Feedback.id)] == [
+            datetime(2024, 1, 1, 0, 0), datetime(2024, 1, 1, 0, 30), datetime(2024, 1, 1, 1, 0)]
+
+
+def test_failed_batch_reports_only_the_rows_it_attempted(client, monkeypatch):
+    with app.app_context():
+        BulkIngestor(db).ingest(iter_records(io.BytesIO(json.dumps(
+            {'company': 'Uber', 'comment': 'Old news'}).encode())))
+
+    def fail(*args):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(ranking, 'insert_batch', fail)
+    lines = [{'company': 'Uber', 'comment': comment}
+             for comment in ('Old news', 'New one', 'old  NEWS', 'Another')]
+    body = '\n'.join(json.dumps(line) for line in lines).encode()
+    with app.app_context():
+        summary = BulkIngestor(db).ingest(iter_records(io.BytesIO(body)))
+        assert (summary['inserted'], summary['duplicates'], summary['error_count']) == (0, 2, 2)
+        assert [e['record'] for e in summary['errors']] == [2, 4]
+        assert Feedback.query.count() == 1
@@ -0,0 +1,128 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from datetime import datetime, timedelta
+
+import pytest
+from app import app, db, Feedback, Job, User, job_queue
+from werkzeug.security import generate_password_hash
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def login(client):
+    with app.app_context():
+        user = User(
+            username='testuser',
+            email='test@example.com',
+            password_hash=generate_password_hash('testpass'),
+        )
+        db.session.add(user)
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+            sess['username'] = user.username
+            sess['is_admin'] = False
+
+
+def test_submit_feedback_scores_sentiment_in_background(client):
+    login(client)
+    response = client.post('/submit_feedback',
+                           json={'company': 'Google', 'comment': 'Great product!'})
+    json_data = response.get_json()
+    assert json_data['feedback']['sentiment'] == 'pending'
+
+    assert job_queue.stats()['due'] == 1
+    assert job_queue.run_pending() == 1
+
+    with app.app_context():
+        feedback = db.session.get(Feedback, json_data['feedback']['id'])
+        assert feedback.sentiment == 'positive'
+    stats = job_queue.stats()
+    assert stats['due'] == 0
+    assert stats['done'] == 1
+
+
+def test_failed_job_is_retried_with_backoff(client):
+    calls = []
+
+    @job_queue.handler('flaky')
+    def flaky(value):
+        calls.append(value)
+        raise RuntimeError('boom')
+
+    try:
+        with app.app_context():
+            job_queue.enqueue('flaky', {'value': 1}, max_attempts=2)
+            db.session.commit()
+
+        assert job_queue.run_pending() == 1
+        assert calls == [1]
+        with app.app_context():
+            job = Job.query.one()
+            assert job.status == 'queued'
+            assert job.attempts == 1
+            assert 'boom' in job.last_error
+            assert job.run_at > job.updated_at
+
+            # Make the retry due immediately; the second failure is final
+            job.run_at = job.updated_at
+            db.session.commit()
+        assert job_queue.run_pending() == 1
+        with app.app_context():
+            assert Job.query.one().status == 'failed'
+        assert job_queue.stats()['failed'] == 1
+    finally:
+        job_queue.handlers.pop('flaky')
+
+
+def test_recover_requeues_only_jobs_with_expired_leases(client):
+    seen = []
+
+    @job_queue.handler('lease')
+    def lease(value):
+        with app.app_context():
+            job = db.session.get(Job, value)
+            seen.append((job.id, job.worker, job.lease_expires_at))
+
+    try:
+        now = datetime.utcnow()
+        with app.app_context():
+            for lease_expires_at in (now + timedelta(minutes=1), now - timedelta(seconds=1)):
+                db.session.add(Job(kind='lease', payload='{"value": 0}', status='running',
+                                   worker='other-host:1:abc', lease_expires_at=lease_expires_at))
+            db.session.commit()
+
+        # Only the job whose worker stopped renewing its lease is requeued
+        assert job_queue.recover() == 1
+        with app.app_context():
+            live, dead = Job.query.order_by(Job.id).all()
+            assert (live.status, live.worker) == ('running', 'other-host:1:abc')
+            assert (dead.status, dead.worker, dead.lease_expires_at) == ('queued', None, None)
+            dead.payload = '{"value": %d}' % dead.id
+            db.session.commit()
+            live_id, dead_id = live.id, dead.id
+
+        # The claiming worker records itself and a lease while the job runs
+        assert job_queue.run_pending() == 1
+        assert seen == [(dead_id, job_queue.worker_id, seen[0][2])] and seen[0][2] > now
+        with app.app_context():
+            dead = db.session.get(Job, dead_id)
+            assert dead.status == 'done' and dead.lease_expires_at is None
+            assert db.session.get(Job, live_id).status == 'running'
+    finally:
+        job_queue.handlers.pop('lease')
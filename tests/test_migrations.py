@@ -0,0 +1,122 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from migrations import MIGRATIONS, applied_versions, connect, migrate
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'migrate.db'))
+    yield conn
+    conn.close()
+
+
+def seed_pre_versioning_schema(conn):
+    """Tables as db.create_all() made them before feedback_hash existed"""
+    conn.executescript('''
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80),
+            email VARCHAR(120), password_hash VARCHAR(200),
+            created_at DATETIME, is_admin BOOLEAN);
+        CREATE TABLE feedback (id INTEGER PRIMARY KEY, user_id INTEGER,
+            company_name VARCHAR(100) NOT NULL, company_logo VARCHAR(500),
+            comment TEXT NOT NULL, sentiment VARCHAR(20) NOT NULL,
+            status VARCHAR(20), date_created DATETIME);
+        CREATE TABLE vote (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,
+            feedback_id INTEGER NOT NULL, vote_type VARCHAR(10) NOT NULL,
+            created_at DATETIME, UNIQUE (user_id, feedback_id));
+    ''')
+    conn.executemany(
+        'INSERT INTO feedback (company_name, comment, sentiment, status, date_created) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [('Uber', f'Comment {i}', 'positive', 'approved' if i % 2 else 'pending',
+          '2025-01-0%d 12:00:00' % (1 + i % 3)) for i in range(7)]
+    )
+    conn.executemany('INSERT INTO vote (user_id, feedback_id, vote_type) VALUES (?, ?, ?)',
+                     [(1, 1, 'upvote'), (2, 1, 'upvote'), (1, 2, 'downvote')])
+
+
+def test_migrate_upgrades_existing_database_in_chunks(conn):
+    seed_pre_versioning_schema(conn)
+    logs = []
+
+    planned = migrate(conn, dry_run=True, chunk_size=3, log=logs.append)
+    assert planned == [m[0] for m in MIGRATIONS]
+    assert applied_versions(conn) == set()
+    assert 'updated_at' not in [r[1] for r in conn.execute('PRAGMA table_info(vote)')]
+    assert any('backfill rank_feedback' in line for line in logs)
+
+    migrate(conn, chunk_size=3, log=logs.append)
+    assert applied_versions(conn) == {m[0] for m in MIGRATIONS}
+    assert 'updated_at' in [r[1] for r in conn.execute('PRAGMA table_info(vote)')]
+    count = lambda table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    assert count('feedback_hash') == count('feedback_rank') == count('feedback_change') == 7
+    assert conn.execute('SELECT upvotes, downvotes FROM feedback_rank WHERE feedback_id = 1'
+                        ).fetchone() == (2, 0)
+    assert conn.execute('SELECT SUM(feedback_count), SUM(approved_count), SUM(upvotes) '
+                        'FROM company_daily_stats').fetchone() == (7, 3, 2)
+    assert count('feedback_term') == 14  # the document posting and 'comment'
+    assert conn.execute("SELECT SUM(doc_count) FROM company_term_daily WHERE term = 'comment'"
+                        ).fetchone() == (3,)
+    assert count('schema_backfill') == 0
+
+    # Everything is applied; a second run is a no-op
+    assert migrate(conn, log=logs.append) == []
+
+
+def test_backfill_resumes_after_failure(conn):
+    seed_pre_versioning_schema(conn)
+    migrate(conn, target=7, log=lambda line: None)
+
+    import ranking
+    real_hot_score = ranking.hot_score
+    calls = []
+
+    def failing_hot_score(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError('interrupted')
+        return real_hot_score(*args)
+
+    ranking.hot_score = failing_hot_score
+    try:
+        with pytest.raises(RuntimeError):
+            migrate(conn, chunk_size=2, log=lambda line: None)
+    finally:
+        ranking.hot_score = real_hot_score
+
+    # The first chunk was committed with its checkpoint, the failed one was not
+    assert conn.execute('SELECT COUNT(*) FROM feedback_rank').fetchone()[0] == 2
+    assert conn.execute('SELECT position FROM schema_backfill').fetchone() == (3,)
+    assert 8 not in applied_versions(conn)
+
+    migrate(conn, chunk_size=2, log=lambda line: None)
+    assert conn.execute('SELECT COUNT(*) FROM feedback_rank').fetchone()[0] == 7
+
+
+def test_legacy_feedback_table_is_moved(conn):
+    conn.executescript('''
+        CREATE TABLE feedback (id INTEGER PRIMARY KEY, title TEXT NOT NULL,
+            description TEXT NOT NULL, category TEXT);
+        INSERT INTO feedback (title, description, category) VALUES
+            ('Slow', 'The app is slow', 'bug'), ('Nice', 'Great app', NULL);
+    ''')
+    migrate(conn, chunk_size=1, log=lambda line: None)
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert 'feedback_old_backup' in tables
+    assert conn.execute('SELECT title, description FROM feedback_new ORDER BY id').fetchall() == [
+        ('Slow', 'The app is slow'), ('Nice', 'Great app')]
+    assert 'company_name' in [r[1] for r in conn.execute('PRAGMA table_info(feedback)')]
+
+
+def test_fresh_database_matches_the_models(conn):
+    from app import db
+
+    migrate(conn, log=lambda line: None)
+    for table in db.metadata.sorted_tables:
+        columns = {r[1] for r in conn.execute(f'PRAGMA table_info("{table.name}")')}
+        assert columns == set(table.columns.keys()), table.name
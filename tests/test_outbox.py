@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+import archive
+import outbox
+from app import app, db, job_queue
+from auth import init_auth_db
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            init_auth_db()
+        yield client
+        with app.app_context():
+            db.drop_all()
+    app.config.pop('AUTH_DATABASE')
+
+
+def login(client, user_id, is_admin=False):
+    # Admin routes check the flag in the users table
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    conn.execute('INSERT OR REPLACE INTO users (id, username, email, password_hash, is_admin) '
+                 'VALUES (?, ?, ?, ?, ?)',
+                 (user_id, f'user{user_id}', f'user{user_id}@example.com', '', int(is_admin)))
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = f'user{user_id}'
+        sess['is_admin'] = is_admin
+
+
+def test_writes_emit_events_that_consumers_read_and_acknowledge(client):
+    login(client, 1)
+    feedback_id = client.post('/submit_feedback', json={
+        'company': 'Uber', 'comment': 'Great rides'}).get_json()['feedback']['id']
+    job_queue.run_pending()
+    login(client, 2, is_admin=True)
+    client.post(f'/admin/moderate/{feedback_id}/approve')
+    login(client, 3)
+    client.post('/api/vote', json={'feedback_id': feedback_id, 'vote_type': 'upvote'})
+    client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': feedback_id, 'vote_type': 'downvote'}]})
+    client.delete(f'/api/vote/{feedback_id}')
+    client.post('/api/vote', json={'feedback_id': feedback_id, 'vote_type': 'bogus'})
+
+    login(client, 2, is_admin=True)
+    page = client.get('/admin/outbox/warehouse?limit=4').get_json()
+    assert [event['type'] for event in page['events']] == [
+        'feedback.submitted', 'feedback.scored', 'feedback.moderated', 'vote.cast']
+    submitted, scored, moderated, cast = page['events']
+    assert submitted['data'] == {'company': 'Uber', 'status': 'pending', 'sentiment': 'pending'}
+    assert submitted['user_id'] == scored['user_id'] == moderated['user_id'] == 1
+    assert moderated['data'] == {'status': 'approved', 'old_status': 'pending'}
+    assert cast['data'] == {'vote': 'upvote', 'old_vote': None} and cast['user_id'] == 3
+    assert page['token'] == '4' and page['has_more'] and not page['lost']
+
+    # Reading does not move the checkpoint; acknowledging does, and only forwards
+    assert client.get('/admin/outbox/warehouse').get_json()['events'][0]['offset'] == 1
+    assert client.post('/admin/outbox/warehouse/ack', json={'token': '4'}).get_json()['token'] == '4'
+    assert client.post('/admin/outbox/warehouse/ack', json={'token': '2'}).get_json()['token'] == '4'
+    assert client.post('/admin/outbox/warehouse/ack', json={'token': '1.2'}).status_code == 400
+    rest = client.get('/admin/outbox/warehouse').get_json()
+    assert [(event['type'], event['data']) for event in rest['events']] == [
+        ('vote.cast', {'vote': 'downvote', 'old_vote': 'upvote'}),
+        ('vote.removed', {'old_vote': 'downvote'}),
+    ]
+    assert rest['token'] == '6' and not rest['has_more']
+
+    status = client.get('/admin/outbox').get_json()
+    assert status['head'] == '6' and status['events'] == 6
+    assert status['consumers'] == [{'consumer': 'warehouse', 'token': '4', 'lag': 2}]
+
+
+def test_compaction_keeps_events_until_every_consumer_acknowledged(client):
+    with app.app_context():
+        for i in range(1, 6):
+            outbox.emit(db.session, 'vote.cast', i, 7, vote='upvote')
+        db.session.commit()
+        assert outbox.compact(db.session) == 0  # no consumers yet
+
+        handled = []
+        assert outbox.consume(db.session, 'search', handled.append, batch_size=2) == 5
+        assert [len(page['events']) for page in handled] == [2, 2, 1]
+        outbox.acknowledge(db.session, 'mailer', 3)
+        db.session.commit()
+
+        assert outbox.compact(db.session, batch_size=2) == 3
+        assert outbox.status(db.session)['events'] == 2
+        assert outbox.consume(db.session, 'search', handled.append) == 0
+        assert outbox.read(db.session, 3)['lost'] is False
+
+        # A consumer that starts after compaction is told what it missed
+        late = outbox.read(db.session, 0)
+        assert late['lost'] and [e['offset'] for e in late['events']] == [4, 5]
+        assert outbox.drop(db.session, 'mailer')
+        assert outbox.compact(db.session) == 2
+        assert outbox.read(db.session, 0) == {
+            'events': [], 'offset': 5, 'has_more': False, 'lost': True}
+        assert outbox.read(db.session, 5)['lost'] is False
+
+
+def test_archive_and_restore_emit_events_for_the_authors(client):
+    login(client, 1)
+    ids = [client.post('/submit_feedback', json={'company': 'Uber', 'comment': f'Comment {i}'}
+                       ).get_json()['feedback']['id'] for i in range(2)]
+    with app.app_context():
+        after = outbox.head(db.session)
+        archive.archive_batch(db.session, ids, {ids[0]: 'manual', ids[1]: 'aged'})
+        archive.restore(db.session, [ids[1]])
+        events = outbox.read(db.session, after)['events']
+    assert [(e['type'], e['feedback_id'], e['user_id'], e['data']) for e in events] == [
+        ('feedback.archived', ids[0], 1, {'reason': 'manual'}),
+        ('feedback.archived', ids[1], 1, {'reason': 'aged'}),
+        ('feedback.restored', ids[1], 1, {}),
+    ]
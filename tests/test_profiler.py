@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from profiler import SamplingProfiler
+
+
+def busy_handler(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    stop = threading.Event()
+
+    def worker():
+        profiler.start_request('/api/feedback/filter')
+        busy_handler(stop)
+        profiler.stop_request()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.1)
+    stop.set()
+    thread.join()
+
+    output = profiler.collapsed()
+    assert output
+    line = output.splitlines()[0]
+    assert line.startswith('/api/feedback/filter;')
+    assert 'busy_handler' in output
+    assert int(line.rsplit(' ', 1)[1]) > 0
+    assert profiler.summary()['/api/feedback/filter'] > 0
+
+    profiler.reset()
+    assert profiler.collapsed() == ''
+
+
+def test_profiler_disabled_by_default():
+    from app import app
+    assert 'profiler' not in app.extensions
+    assert not SamplingProfiler().should_sample()
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from rescore import rescore, save_checkpoint
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE feedback (id INTEGER PRIMARY KEY, comment TEXT, sentiment TEXT)')
+    conn.executemany('INSERT INTO feedback (id, comment, sentiment) VALUES (?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def sentiments(path):
+    conn = sqlite3.connect(path)
+    result = dict(conn.execute('SELECT id, sentiment FROM feedback'))
+    conn.close()
+    return result
+
+
+def test_rescore_updates_changed_rows_and_dry_run(tmp_path):
+    db_path = str(tmp_path / 'feedback.db')
+    make_db(db_path, [
+        (i, 'great' if i % 2 else 'awful', 'neutral') for i in range(1, 26)
+    ])
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    transitions = rescore(db_path, workers=2, shard_size=10,
+                          checkpoint=checkpoint, dry_run=True)
+    assert transitions[('neutral', 'positive')] == 13
+    assert transitions[('neutral', 'negative')] == 12
+    assert set(sentiments(db_path).values()) == {'neutral'}
+
+    rescore(db_path, workers=2, shard_size=10, batch_size=4,
+            checkpoint=checkpoint)
+    result = sentiments(db_path)
+    assert result[1] == 'positive'
+    assert result[2] == 'negative'
+    assert not os.path.exists(checkpoint)
+
+
+def test_rescore_resumes_from_checkpoint(tmp_path):
+    db_path = str(tmp_path / 'feedback.db')
+    make_db(db_path, [(i, 'great', 'neutral') for i in range(1, 30)])
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    save_checkpoint(checkpoint, 10, {0, 10})
+
+    transitions = rescore(db_path, workers=1, shard_size=10,
+                          checkpoint=checkpoint)
+    assert sum(transitions.values()) == 10
+    result = sentiments(db_path)
+    assert result[5] == 'neutral'
+    assert result[25] == 'positive'
+
+
+def test_resumed_rescore_rebuilds_rollups_changed_before_the_interruption(tmp_path):
+    db_path = str(tmp_path / 'feedback.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE feedback (id INTEGER PRIMARY KEY, comment TEXT, sentiment TEXT,
+                               company_name TEXT, date_created TEXT, status TEXT);
+        CREATE TABLE vote (feedback_id INTEGER, vote_type TEXT);
+        CREATE TABLE company_daily_stats (company_name TEXT, day TEXT, sentiment TEXT,
+                                          feedback_count INTEGER, approved_count INTEGER,
+                                          upvotes INTEGER, downvotes INTEGER,
+                                          approved_upvotes INTEGER, approved_downvotes INTEGER);
+        INSERT INTO company_daily_stats VALUES ('Uber', '2024-01-01', 'neutral', 19, 0, 0, 0, 0, 0);
+    ''')
+    # The interrupted run already relabelled the first shard
+    conn.executemany('INSERT INTO feedback VALUES (?, ?, ?, ?, ?, ?)', [
+        (i, 'great', 'positive', 'Uber', '2024-01-01 10:00:00', 'pending') for i in range(1, 20)])
+    conn.commit()
+    conn.close()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    save_checkpoint(checkpoint, 10, {0})
+
+    rescore(db_path, workers=1, shard_size=10, checkpoint=checkpoint)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT sentiment, feedback_count FROM company_daily_stats').fetchall() == [
+        ('positive', 19)]
+    conn.close()
+
+
+def test_rescore_emits_scored_events_and_touches_activity(tmp_path):
+    db_path = str(tmp_path / 'feedback.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE feedback (id INTEGER PRIMARY KEY, comment TEXT, sentiment TEXT,
+                               user_id INTEGER);
+        CREATE TABLE outbox_event (id INTEGER PRIMARY KEY AUTOINCREMENT, kind INTEGER,
+                                   feedback_id INTEGER, user_id INTEGER, data TEXT,
+                                   created_at INTEGER);
+        CREATE TABLE user_activity (user_id INTEGER PRIMARY KEY, version INTEGER);
+        INSERT INTO feedback VALUES (1, 'great', 'neutral', 7), (2, 'awful', 'negative', 8),
+                                    (3, 'awful', 'positive', NULL);
+    ''')
+    conn.commit()
+    conn.close()
+
+    rescore(db_path, workers=1, shard_size=10, checkpoint=None)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT kind, feedback_id, user_id, data FROM outbox_event '
+                        'ORDER BY id').fetchall() == [
+        (2, 1, 7, '["positive","neutral"]'), (2, 3, None, '["negative","positive"]')]
+    assert conn.execute('SELECT user_id, version FROM user_activity').fetchall() == [(7, 1)]
+    conn.close()
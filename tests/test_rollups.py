@@ -0,0 +1,127 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, CompanyDailyStats, User, job_queue
+from rollups import rebuild
+from werkzeug.security import generate_password_hash
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def login_as(client, username, is_admin=False):
+    with app.app_context():
+        user = User(
+            username=username,
+            email=f'{username}@example.com',
+            password_hash=generate_password_hash('testpass'),
+            is_admin=is_admin
+        )
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = username
+        sess['is_admin'] = is_admin
+
+
+def snapshot():
+    with app.app_context():
+        return sorted(
+            (r.company_name, r.day, r.sentiment, r.feedback_count,
+             r.approved_count, r.upvotes, r.downvotes, r.approved_upvotes,
+             r.approved_downvotes)
+            for r in CompanyDailyStats.query.all()
+            if r.feedback_count or r.approved_count or r.upvotes or r.downvotes
+        )
+
+
+def test_rollups_follow_submit_moderation_and_votes(client):
+    login_as(client, 'author')
+    for comment in ('Great app', 'Awful support', 'Love it'):
+        client.post('/submit_feedback', json={'company': 'Uber', 'comment': comment})
+    job_queue.run_pending()
+
+    with app.app_context():
+        from app import Feedback
+        for feedback in Feedback.query.all():
+            feedback.status = 'approved' if feedback.sentiment == 'positive' else 'pending'
+        db.session.commit()
+        # Direct status edits bypass the hooks; resync to the source of truth
+        with db.engine.connect() as conn:
+            rebuild(conn.connection.dbapi_connection)
+
+    login_as(client, 'voter')
+    client.post('/api/vote', json={'feedback_id': 1, 'vote_type': 'upvote'})
+    client.post('/api/vote', json={'feedback_id': 3, 'vote_type': 'downvote'})
+    client.post('/api/vote', json={'feedback_id': 3, 'vote_type': 'upvote'})
+    client.delete('/api/vote/1')
+
+    response = client.get('/api/companies/Uber/stats?days=7')
+    stats = response.get_json()['stats']
+    assert stats['total'] == 2
+    assert stats['positive'] == 2
+    assert stats['negative'] == 0
+    assert stats['upvotes'] == 1
+    assert stats['downvotes'] == 0
+    assert stats['average_sentiment'] == 1
+    assert len(stats['daily']) == 1
+    assert 'submitted' not in stats
+
+    incremental = snapshot()
+    with app.app_context():
+        with db.engine.connect() as conn:
+            rebuild(conn.connection.dbapi_connection)
+    assert snapshot() == incremental
+
+
+def test_public_stats_count_only_votes_on_approved_feedback(client):
+    from app import Feedback, apply_moderation
+
+    login_as(client, 'author')
+    for comment in ('Great app', 'Awful support'):
+        client.post('/submit_feedback', json={'company': 'Uber', 'comment': comment})
+    job_queue.run_pending()
+    with app.app_context():
+        apply_moderation(db.session.get(Feedback, 1), 'approve')
+        db.session.commit()
+
+    login_as(client, 'voter')
+    client.post('/api/vote', json={'feedback_id': 1, 'vote_type': 'upvote'})
+    client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': 2, 'vote_type': 'downvote'}]})
+    stats = client.get('/api/companies/Uber/stats').get_json()['stats']
+    assert (stats['total'], stats['upvotes'], stats['downvotes']) == (1, 1, 0)
+    assert 'submitted_downvotes' not in stats
+
+    login_as(client, 'admin', is_admin=True)
+    stats = client.get('/api/companies/Uber/stats').get_json()['stats']
+    assert (stats['downvotes'], stats['submitted_downvotes']) == (0, 1)
+
+    # Approving an item makes its votes public
+    with app.app_context():
+        apply_moderation(db.session.get(Feedback, 2), 'approve')
+        db.session.commit()
+    stats = client.get('/api/companies/Uber/stats').get_json()['stats']
+    assert (stats['total'], stats['upvotes'], stats['downvotes']) == (2, 1, 1)
+
+    incremental = snapshot()
+    with app.app_context():
+        with db.engine.connect() as conn:
+            rebuild(conn.connection.dbapi_connection)
+    assert snapshot() == incremental
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from flask import Flask, session
+from werkzeug.security import generate_password_hash
+from app import app, db, session_store
+from auth import init_auth_db
+from sessions import init_sessions
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            init_auth_db()
+        yield client
+        with app.app_context():
+            db.drop_all()
+    app.config.pop('AUTH_DATABASE')
+
+
+def create_user(username, is_admin=False):
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    cursor = conn.execute(
+        'INSERT INTO users (username, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
+        (username, f'{username}@example.com', generate_password_hash('Password1'), int(is_admin))
+    )
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def session_cookie(client):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return cookie.value if cookie else None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clocked_app(tmp_path):
+    clock = FakeClock()
+    test_app = Flask(__name__)
+    test_app.config['PERMANENT_SESSION_LIFETIME'] = 100
+    test_app.config['SESSION_DATABASE'] = str(tmp_path / 'sessions.db')
+    store = init_sessions(test_app)
+    store.clock = clock
+
+    @test_app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        session['user_id'] = 7
+        return ''
+
+    @test_app.route('/get')
+    def get_value():
+        return session.get('value', '')
+
+    return test_app, store, clock
+
+
+def test_cookie_holds_only_an_id_and_reads_hit_the_cache(clocked_app):
+    test_app, store, clock = clocked_app
+    client = test_app.test_client()
+    client.get('/set/hello')
+    sid = client.get_cookie('session').value
+    assert len(sid) == 32 and 'hello' not in sid
+
+    assert client.get('/get').data == b'hello'
+    assert store.stats['hits'] == 1 and store.stats['misses'] == 0
+    writes = store.stats['writes']
+
+    # Unchanged sessions are not rewritten until half the lifetime is gone
+    clock.now += 30
+    client.get('/get')
+    assert store.stats['writes'] == writes
+    clock.now += 30
+    client.get('/get')
+    assert store.stats['writes'] == writes + 1
+    assert store.stats['misses'] == 2  # the cached entry is rechecked after its TTL
+
+    store.clear_cache()
+    assert client.get('/get').data == b'hello'
+
+    # Sessions past their expiry are gone even if the cookie is replayed
+    clock.now += 200
+    assert client.get('/get').data == b''
+
+
+def test_expire_deletes_in_batches(clocked_app):
+    _, store, clock = clocked_app
+    for i in range(25):
+        store.save(f'sid-{i}', '{}', i, clock.now + (10 if i < 20 else 500))
+    clock.now += 50
+
+    batches = []
+    original = store._execute
+    store._execute = lambda sql, params=(): batches.append(sql) or original(sql, params)
+    assert store.expire(batch_size=8) == 20
+    assert len(batches) == 3
+    assert store.count() == 5
+    assert store.load('sid-0') is None
+
+
+def test_login_regenerates_and_logout_deletes_the_session(client):
+    create_user('alice')
+    client.get('/auth/login')
+    before = session_cookie(client)
+
+    client.post('/auth/login', data={'username': 'alice', 'password': 'Password1'})
+    after = session_cookie(client)
+    assert after and after != before
+    if before:
+        assert session_store.load(before) is None
+
+    client.get('/auth/logout')
+    assert session_store.load(after) is None
+
+
+def test_revoking_a_user_logs_out_every_session(client):
+    create_user('admin', is_admin=True)
+    user_id = create_user('bob')
+    others = [app.test_client() for _ in range(2)]
+    for other in others + [client]:
+        username = 'bob' if other is not client else 'admin'
+        other.post('/auth/login', data={'username': username, 'password': 'Password1'})
+
+    for other in others:
+        assert other.get('/auth/profile').status_code == 200
+
+    active = session_store.count(user_id)
+    assert active >= 2
+    response = client.post(f'/admin/users/{user_id}/revoke-sessions')
+    assert response.get_json() == {'success': True, 'revoked': active}
+    assert session_store.count(user_id) == 0
+    for other in others:
+        assert other.get('/auth/profile').status_code == 302
+
+    # Non-admins are turned away
+    others[0].post('/auth/login', data={'username': 'bob', 'password': 'Password1'})
+    assert others[0].post(f'/admin/users/{user_id}/revoke-sessions').status_code == 302
+
+
+def test_demoted_admin_is_refused_without_logging_out(client):
+    user_id = create_user('admin', is_admin=True)
+    client.post('/auth/login', data={'username': 'admin', 'password': 'Password1'})
+    assert client.get('/admin/outbox').status_code == 200
+
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    conn.execute('UPDATE users SET is_admin = 0 WHERE id = ?', (user_id,))
+    conn.commit()
+    conn.close()
+    # The session is still valid, but no longer grants admin rights
+    assert client.get('/auth/profile').status_code == 200
+    assert client.get('/admin/outbox').status_code == 302
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+import app as app_module
+from app import app, db, Feedback, job_queue
+from auth import init_auth_db
+from sharding import (ShardNotSelected, ShardSet, move_company, plan_rebalance, split,
+                      use_shard)
+
+
+@pytest.fixture
+def shard_set(tmp_path, monkeypatch):
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    with app.app_context():
+        main_url = db.engine.url
+    shards = ShardSet(main_url, [str(tmp_path / f'shard_{i}.db') for i in range(3)],
+                      db.metadata)
+    monkeypatch.setattr(app_module, 'shards', shards)
+    monkeypatch.setitem(app.extensions, 'shards', shards)
+    with app.app_context():
+        db.create_all()
+        init_auth_db()
+        shards.create_all()
+    yield shards
+    with app.app_context():
+        db.drop_all()
+    shards.dispose()
+    app.config.pop('AUTH_DATABASE')
+
+
+@pytest.fixture
+def client(shard_set):
+    with app.test_client() as client:
+        yield client
+
+
+def login(client, user_id, is_admin=False):
+    # Admin routes check the flag in the users table
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    conn.execute('INSERT OR REPLACE INTO users (id, username, email, password_hash, is_admin) '
+                 'VALUES (?, ?, ?, ?, ?)',
+                 (user_id, f'user{user_id}', f'user{user_id}@example.com', '', int(is_admin)))
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = f'user{user_id}'
+        sess['is_admin'] = is_admin
+
+
+def companies_on_distinct_shards(shards):
+    """Pick one company name per shard."""
+    picked = {}
+    for i in range(100):
+        picked.setdefault(shards.shard_for(f'Company {i}'), f'Company {i}')
+    return [picked[shard] for shard in range(len(shards))]
+
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def submit(client, company, comment):
+    return client.post('/submit_feedback', json={'company': company, 'comment': comment}
+                       ).get_json()['feedback']['id']
+
+
+def test_writes_land_on_the_company_shard_and_listings_merge(client, shard_set):
+    companies = companies_on_distinct_shards(shard_set)
+    login(client, 1)
+    ids = [submit(client, company, f'Review {i} of {company}')
+           for i, company in enumerate(companies * 2)]
+    assert ids == sorted(set(ids))  # unique across shards, in submission order
+    job_queue.run_pending()
+
+    login(client, 2, is_admin=True)
+    for feedback_id in ids:
+        assert client.post(f'/admin/moderate/{feedback_id}/approve').status_code == 200
+    login(client, 3)
+    client.post('/api/vote', json={'feedback_id': ids[1], 'vote_type': 'upvote'})
+    response = client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': ids[4], 'vote_type': 'upvote'},
+        {'feedback_id': ids[2], 'vote_type': 'downvote'},
+        {'feedback_id': 10 ** 6, 'vote_type': 'upvote'},
+    ]}).get_json()
+    assert [r['feedback_id'] for r in response['results']] == [ids[4], ids[2], 10 ** 6]
+    assert response['results'][2]['error'] == 'Feedback not found'
+
+    for shard, company in enumerate(companies):
+        path = shard_set.paths[shard]
+        assert rows(path, 'SELECT DISTINCT company_name FROM feedback') == [(company,)]
+        assert rows(path, "SELECT COUNT(*) FROM feedback WHERE sentiment != 'pending'") == [(2,)]
+    assert rows(shard_set.main_path, 'SELECT COUNT(*) FROM feedback') == [(0,)]
+
+    recent = client.get('/api/feedback/filter?limit=4&offset=1&count=1').get_json()
+    assert [item['id'] for item in recent['feedbacks']] == ids[::-1][1:5]
+    assert recent['matched'] == 6
+    helpful = client.get('/api/feedback/filter?sort=helpful&limit=3').get_json()
+    assert [item['id'] for item in helpful['feedbacks']] == [ids[4], ids[1], ids[2]]
+    company = client.get(f'/api/feedback/filter?company={companies[1]}').get_json()
+    assert {item['id'] for item in company['feedbacks']} == {ids[1], ids[4]}
+    assert client.get(f'/api/feedback/{ids[2]}').get_json()['feedback']['comment'] \
+        == f'Review 2 of {companies[2]}'
+    assert client.get(f'/api/companies/{companies[1]}/stats').get_json()['success']
+
+    changes = client.get('/api/sync').get_json()
+    assert len(changes['feedbacks']) == 6 and changes['token'].count('.') == 2
+    assert client.get(f"/api/sync?since={changes['token']}").get_json()['feedbacks'] == []
+
+    login(client, 1)
+    overview = client.get('/api/my-feedback?limit=4').get_json()
+    assert [item['id'] for item in overview['feedbacks']] == ids[::-1][:4]
+    rest = client.get(f"/api/my-feedback?cursor={overview['next_cursor']}").get_json()
+    assert [item['id'] for item in rest['feedbacks']] == ids[::-1][4:]
+
+
+def test_tenant_queries_need_a_shard(shard_set):
+    with app.app_context():
+        with pytest.raises(ShardNotSelected):
+            Feedback.query.count()
+        with use_shard(1):
+            assert Feedback.query.count() == 0
+
+
+def test_move_copies_fences_and_switches_the_company(client, shard_set):
+    company = companies_on_distinct_shards(shard_set)[0]
+    login(client, 1)
+    ids = [submit(client, company, f'Comment {i}') for i in range(3)]
+    login(client, 2)
+    client.post('/api/vote', json={'feedback_id': ids[0], 'vote_type': 'upvote'})
+
+    assert shard_set.shard_for(company) == 0
+    assert move_company(shard_set, company, 2) == 3
+    # The cached placement is dropped by the move
+    assert shard_set.shard_for(company) == 2
+    source, target = shard_set.paths[0], shard_set.paths[2]
+    assert rows(source, 'SELECT COUNT(*) FROM feedback') == [(0,)]
+    assert rows(target, 'SELECT COUNT(*) FROM vote') == [(1,)]
+    with pytest.raises(sqlite3.IntegrityError, match='moved'):
+        rows(source, f"INSERT INTO feedback (company_name, comment, sentiment) "
+                     f"VALUES ('{company}', 'late write', 'neutral')")
+
+    # The same IDs keep working from the new shard
+    response = client.post('/api/vote', json={'feedback_id': ids[1], 'vote_type': 'upvote'})
+    assert response.get_json()['vote']['vote_score'] == 1
+    assert client.get(f'/api/feedback/{ids[0]}/votes').get_json()['upvotes'] == 1
+    vote_ids = rows(target, 'SELECT id FROM vote')
+    assert all(vote_id > 3 << 40 for vote_id, in vote_ids)
+    # Past events stay in the source shard's log
+    assert rows(source, 'SELECT COUNT(*) FROM outbox_event') == [(4,)]
+    assert rows(target, 'SELECT COUNT(*) FROM outbox_event') == [(1,)]
+
+
+def test_placements_are_cached_until_they_expire(shard_set):
+    company = companies_on_distinct_shards(shard_set)[0]
+    with sqlite3.connect(shard_set.main_path) as conn:
+        conn.execute('INSERT INTO company_shard (company_name, shard) VALUES (?, 1)', (company,))
+    # Another process pinned the company; this one still trusts its cache
+    assert shard_set.shard_for(company) == 0
+    shard_set.forget_placement(company)
+    shard_set.placement_ttl = 0
+    assert shard_set.shard_for(company) == 1
+    # Expired placements are looked up again
+    with sqlite3.connect(shard_set.main_path) as conn:
+        conn.execute('UPDATE company_shard SET shard = 2 WHERE company_name = ?', (company,))
+    assert shard_set.shard_for(company) == 2
+
+
+def test_split_moves_an_unsharded_database(shard_set):
+    conn = sqlite3.connect(shard_set.main_path)
+    conn.executemany("INSERT INTO feedback (company_name, comment, sentiment, status) "
+                     "VALUES (?, 'Old comment', 'neutral', 'approved')",
+                     [('Uber',), ('Apple',), ('Uber',)])
+    conn.commit()
+    conn.close()
+
+    moved = split(shard_set)
+    assert sum(moved.values()) == 3
+    assert rows(shard_set.main_path, 'SELECT COUNT(*) FROM feedback') == [(0,)]
+    assert rows(shard_set.main_path, 'SELECT COUNT(*) FROM feedback_directory') == [(3,)]
+    with app.app_context():
+        with use_shard(shard_set.shard_for('Uber')):
+            assert Feedback.query.filter_by(company_name='Uber').count() == 2
+
+
+def test_plan_rebalance_evens_out_shards():
+    loads = [{'a': 50, 'b': 30, 'c': 20}, {'d': 10}, {}]
+    moves = plan_rebalance(loads, tolerance=0.5)
+    assert moves == [('a', 0, 2), ('b', 0, 1)]
+    assert plan_rebalance([{'a': 10}, {'b': 10}]) == []
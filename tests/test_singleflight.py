@@ -0,0 +1,140 @@
+import fcntl
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, Feedback, listing_cache
+import sync
+from singleflight import SingleFlight, VersionedCache
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def run_threads(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight_runs_once_and_shares_result():
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'rows': [1, 2, 3]}
+
+    results = run_threads(8, lambda: flight.do('helpful', compute))
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats == {'led': 1, 'shared': 7}
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('broken', fail)
+        except ValueError as e:
+            return str(e)
+
+    assert run_threads(4, call) == ['boom'] * 4
+    assert not flight.in_flight('broken')
+
+
+def test_stale_result_served_while_refreshing():
+    cache = VersionedCache()
+    assert cache.get('k', 1, lambda: 'v1') == 'v1'
+    assert cache.get('k', 1, lambda: 'unused') == 'v1'
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_refresh():
+        started.set()
+        release.wait()
+        return 'v2'
+
+    refresher = threading.Thread(target=lambda: cache.get('k', 2, slow_refresh))
+    refresher.start()
+    started.wait()
+    # The refresh is running: other readers get v1 without blocking
+    assert cache.get('k', 2, lambda: 'unused') == 'v1'
+    release.set()
+    refresher.join()
+    assert cache.get('k', 2, lambda: 'unused') == 'v2'
+    assert cache.stats == {'hits': 2, 'computed': 2, 'stale': 1}
+
+
+def test_shared_mode_coalesces_across_caches(tmp_path):
+    # Two caches on one directory stand in for two worker processes
+    first = VersionedCache(shared_dir=str(tmp_path))
+    second = VersionedCache(shared_dir=str(tmp_path))
+    assert first.get('k', 1, lambda: 'v1') == 'v1'
+    assert second.get('k', 1, lambda: 'recomputed') == 'v1'
+    assert second.stats['shared_file'] == 1
+
+    # While another worker holds the key's lock, a stale copy is served
+    lock_path = next(p for p in tmp_path.iterdir() if p.suffix == '.lock')
+    with open(lock_path, 'a+b') as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX)
+        assert second.get('k', 2, lambda: 'v2') == 'v1'
+        fcntl.flock(other_worker, fcntl.LOCK_UN)
+    assert second.get('k', 2, lambda: 'v2') == 'v2'
+
+
+def test_concurrent_listing_requests_query_once(client):
+    with app.app_context():
+        for i in range(20):
+            db.session.add(Feedback(company_name='Google', comment=f'item {i}',
+                                    sentiment='neutral', status='approved'))
+        db.session.commit()
+    listing_cache.clear()
+    computed = listing_cache.stats['computed']
+
+    def fetch():
+        with app.test_client() as other:
+            return other.get('/api/feedback/filter?sort=helpful&limit=5').get_json()
+
+    results = run_threads(8, fetch)
+    assert listing_cache.stats['computed'] == computed + 1
+    assert all(result == results[0] for result in results)
+    assert len(results[0]['feedbacks']) == 5
+
+    # Parameter order does not change the cache key
+    client.get('/api/feedback/filter?limit=5&sort=helpful')
+    assert listing_cache.stats['computed'] == computed + 1
+
+    # A write bumps the change token, so the next request recomputes
+    with app.app_context():
+        sync.touch(db.session, 1)
+        db.session.commit()
+    client.get('/api/feedback/filter?sort=helpful&limit=5')
+    assert listing_cache.stats['computed'] == computed + 2
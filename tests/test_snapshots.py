@@ -0,0 +1,172 @@
+import gzip
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+import app as app_module
+import archive
+import ingest
+import ranking
+from app import app, db, Feedback, job_queue, publish_snapshots
+from auth import init_auth_db
+from snapshots import SnapshotStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app.config['TESTING'] = True
+    app.config['AUTH_DATABASE'] = str(tmp_path / 'auth.db')
+    store = SnapshotStore(str(tmp_path / 'snapshots'), page_size=2, max_pages=2)
+    monkeypatch.setattr(app_module, 'snapshot_store', store)
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            init_auth_db()
+        client.store = store
+        yield client
+        with app.app_context():
+            db.drop_all()
+    app.config.pop('AUTH_DATABASE')
+
+
+def login_as_admin(client):
+    conn = sqlite3.connect(app.config['AUTH_DATABASE'])
+    cursor = conn.execute(
+        'INSERT INTO users (username, email, password_hash, is_admin) VALUES (?, ?, ?, 1)',
+        ('admin', 'admin@example.com', 'x')
+    )
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user_id'] = cursor.lastrowid
+        sess['is_admin'] = True
+
+
+def seed():
+    for i, (company, sentiment) in enumerate([('Uber', 'positive'), ('Uber', 'negative'),
+                                              ('Apple', 'positive'), ('Apple/TV', 'neutral'),
+                                              ('Uber', 'positive')]):
+        db.session.add(Feedback(company_name=company, comment=f'item {i}',
+                                sentiment=sentiment, status='approved'))
+    db.session.add(Feedback(company_name='Uber', comment='pending item',
+                            sentiment='neutral', status='pending'))
+    db.session.flush()
+    for feedback in Feedback.query.all():
+        ranking.insert_feedback(db.session, feedback)
+    db.session.commit()
+
+
+def live(client, url):
+    store = app_module.snapshot_store
+    app_module.snapshot_store = None
+    try:
+        return client.get(url).data
+    finally:
+        app_module.snapshot_store = store
+
+
+URLS = [
+    '/api/feedback/filter?limit=2&count=1',
+    '/api/feedback/filter?limit=2&offset=2&count=1&sort=oldest',
+    '/api/feedback/filter?limit=2&count=1&company=Uber&sentiment=positive&sort=helpful',
+    '/api/feedback/filter?limit=2&count=1&company=Apple%2FTV&sort=hot',
+    '/api/feedback/filter?limit=2&count=1&sentiment=neutral&sort=best',
+]
+
+
+def test_snapshot_pages_match_live_responses(client):
+    with app.app_context():
+        seed()
+        assert publish_snapshots(client.store)
+
+    for url in URLS:
+        served = client.store.stats['served']
+        response = client.get(url)
+        assert client.store.stats['served'] == served + 1
+        assert response.data == live(client, url)
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == live(client, url)
+
+    # Searches, other page sizes and pages past max_pages stay live
+    served = client.store.stats['served']
+    for url in ('/api/feedback/filter?limit=2&count=1&search=item',
+                '/api/feedback/filter?limit=5&count=1',
+                '/api/feedback/filter?limit=2&offset=4&count=1'):
+        assert client.get(url).data == live(client, url)
+    assert client.store.stats['served'] == served
+
+
+def test_moderation_invalidates_until_republished(client):
+    login_as_admin(client)
+    with app.app_context():
+        seed()
+        publish_snapshots(client.store)
+        pending = Feedback.query.filter_by(status='pending').one().id
+    url = '/api/feedback/filter?limit=2&count=1&sentiment=neutral'
+
+    client.post(f'/admin/moderate/{pending}/approve')
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert client.store.current()['generation'] is None
+    assert client.get(url).get_json()['matched'] == 2
+
+    with app.app_context():
+        assert job_queue.run_pending() == 1
+    served = client.store.stats['served']
+    assert client.get(url).get_json()['matched'] == 2
+    assert client.store.stats['served'] == served + 1
+
+
+def test_offline_loaders_invalidate_until_republished(client, tmp_path):
+    with app.app_context():
+        seed()
+        publish_snapshots(client.store)
+    path = tmp_path / 'feedback.ndjson'
+    path.write_text('{"company": "Uber", "comment": "loaded offline"}\n')
+
+    assert ingest.main([str(path), '--status', 'approved']) == 0
+    assert client.store.current()['generation'] is None
+
+    with app.app_context():
+        assert job_queue.run_pending() == 1
+        loaded = Feedback.query.filter_by(comment='loaded offline').one().id
+        archive.archive_batch(db.session, [loaded], {loaded: 'rejected'})
+    assert client.store.current()['generation'] is not None
+    assert archive.main(['restore', str(loaded)]) == 0
+    assert client.store.current()['generation'] is None
+
+
+def test_older_build_does_not_replace_newer(tmp_path):
+    now = [100.0]
+    store = SnapshotStore(str(tmp_path), page_size=2, clock=lambda: now[0])
+    encode = lambda result: repr(result).encode()
+    assert store.publish({'recent': []}, version=1, encode=encode, started=90)
+
+    # Invalidated after the build started: the build is discarded
+    store.invalidate()
+    assert store.publish({'recent': []}, version=2, encode=encode, started=95) is None
+    generation = store.publish({'recent': []}, version=3, encode=encode, started=100)
+    assert store.current() == {'generation': generation, 'version': 3, 'started': 100}
+
+    # Only the current and previous generations stay on disk
+    now[0] = 110.0
+    store.publish({'recent': []}, version=4, encode=encode)
+    assert sorted(name for name in os.listdir(tmp_path) if not name.startswith('.')) == [
+        '3-100000', '4-110000', 'CURRENT'
+    ]
+
+    # Snapshots past max_age are not served
+    params = {'is_admin': False, 'search': '', 'include_archived': False, 'preview': None,
+              'with_count': True, 'limit': 2, 'offset': 0, 'sort_by': 'recent',
+              'company': '', 'sentiment': ''}
+    assert store.lookup(params) is not None
+    now[0] += store.max_age + 1
+    assert store.lookup(params) is None
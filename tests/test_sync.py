@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, User
+from ingest import BulkIngestor, iter_records
+from werkzeug.security import generate_password_hash
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def test_sync_returns_only_changes_since_token(client):
+    body = '\n'.join(json.dumps({'company': 'Uber', 'comment': c})
+                     for c in ('Great rides', 'Bad app', 'Okay')).encode()
+    with app.app_context():
+        BulkIngestor(db, status='approved').ingest(iter_records(io.BytesIO(body)))
+        voter = User(username='voter', email='voter@example.com',
+                     password_hash=generate_password_hash('testpass'))
+        db.session.add(voter)
+        db.session.commit()
+        voter_id = voter.id
+
+    data = client.get('/api/sync').get_json()
+    assert len(data['feedbacks']) == 3
+    assert data['has_more'] is False
+
+    page = client.get('/api/sync?limit=2').get_json()
+    assert page['has_more'] is True
+    rest = client.get(f"/api/sync?since={page['token']}").get_json()
+    assert [f['id'] for f in page['feedbacks'] + rest['feedbacks']] == [1, 2, 3]
+    assert rest['token'] == data['token']
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = voter_id
+        sess['username'] = 'voter'
+        sess['is_admin'] = False
+    client.post('/api/vote', json={'feedback_id': 2, 'vote_type': 'upvote'})
+
+    delta = client.get(f"/api/sync?since={data['token']}").get_json()
+    assert [f['id'] for f in delta['feedbacks']] == [2]
+    assert delta['feedbacks'][0]['vote_score'] == 1
+    assert delta['feedbacks'][0]['user_vote'] == 'upvote'
+    assert int(delta['token']) > int(data['token'])
+
+    unchanged = client.get(f"/api/sync?since={delta['token']}").get_json()
+    assert unchanged['feedbacks'] == [] and unchanged['removed'] == []
+    assert unchanged['token'] == delta['token']
+
+    assert client.get('/api/sync?since=999').get_json()['reset'] is True
@@ -0,0 +1,103 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, apply_moderation, trending_cache, Feedback, CompanyTermDaily
+import archive
+import terms
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def add(company, comment, days_ago=0, status='approved'):
+    """Insert a feedback item and index it the way the write paths do."""
+    feedback = Feedback(company_name=company, comment=comment, sentiment='neutral',
+                        status=status, date_created=datetime.utcnow() - timedelta(days=days_ago))
+    db.session.add(feedback)
+    db.session.flush()
+    terms.index_feedback(db.session, feedback)
+    return feedback
+
+
+def counts():
+    return {(row.company_name, row.day, row.term): row.doc_count
+            for row in CompanyTermDaily.query.filter(CompanyTermDaily.doc_count != 0)}
+
+
+def test_tokenize_keeps_keywords_and_adjacent_phrases():
+    assert terms.tokenize("The Uber driver's car was late, late again!", 'Uber') == [
+        'driver', 'car', 'driver car', 'late', 'late late']
+    assert terms.tokenize('I do not like it at all 2024') == []
+
+
+def test_trending_ranks_the_companys_distinctive_terms(client):
+    with app.app_context():
+        for i in range(6):
+            add('Uber', f'Surge pricing is too expensive tonight {i}')
+        for i in range(3):
+            add('Uber', 'The app keeps crashing', days_ago=1)
+            add('Uber', 'The app keeps crashing', days_ago=20)
+            add('Lyft', 'The app keeps crashing on login')
+        add('Uber', 'Surge pricing scam', status='pending')
+        db.session.commit()
+
+    response = client.get('/api/companies/Uber/trending?days=7')
+    trending = response.get_json()['trending']
+    assert trending['documents'] == 9
+    # Crashes are as common elsewhere and before; pending feedback is not counted
+    surge_terms = {'surge', 'pricing', 'surge pricing', 'expensive', 'tonight',
+                   'expensive tonight'}
+    assert {item['term'] for item in trending['terms']} == surge_terms
+    assert all(item['count'] == 6 and item['baseline_count'] == 0 for item in trending['terms'])
+    hits = trending_cache.stats['hits']
+    assert client.get('/api/companies/Uber/trending?days=7').get_json()['trending'] == trending
+    assert trending_cache.stats['hits'] == hits + 1
+
+    tfidf = client.get('/api/companies/Uber/trending?scoring=tfidf').get_json()['trending']
+    assert {item['term'] for item in tfidf['terms'][:6]} == surge_terms
+    assert 'app' in [item['term'] for item in tfidf['terms']]
+
+    assert client.get('/api/companies/Uber/trending?scoring=bm25').status_code == 400
+    assert client.get('/api/companies/Uber/trending?days=week').status_code == 400
+    assert client.get('/api/companies/Nobody/trending').get_json()['trending']['terms'] == []
+
+
+def test_counts_follow_moderation_archiving_and_backfill(client):
+    with app.app_context():
+        feedback = add('Uber', 'Driver cancelled twice', status='pending')
+        db.session.commit()
+        assert counts() == {}
+        feedback_id = feedback.id
+
+    with app.app_context():
+        feedback = db.session.get(Feedback, feedback_id)
+        apply_moderation(feedback, 'approve')
+        db.session.commit()
+        day = feedback.date_created.date().isoformat()
+        incremental = counts()
+        assert incremental[('Uber', day, 'driver cancelled')] == 1
+        assert incremental[('Uber', day, terms.DOCUMENTS)] == 1
+        assert [row[0] for row in terms.search(db.session, 'Cancelled')] == [feedback_id]
+
+        assert terms.backfill(db.session, batch_size=1) == 1
+        assert counts() == incremental
+
+        archive.archive_batch(db.session, [feedback_id], {feedback_id: 'manual'})
+        assert counts() == {}
+        assert terms.search(db.session, 'cancelled') == []
+        archive.restore(db.session, [feedback_id])
+        assert counts() == incremental
@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from app import app, db, User, Vote, FeedbackRank
+from ingest import BulkIngestor, iter_records
+from werkzeug.security import generate_password_hash
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def login(client, username):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com',
+                    password_hash=generate_password_hash('testpass'))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = username
+        sess['is_admin'] = False
+    return user_id
+
+
+def seed_feedback(owner_id=None):
+    body = '\n'.join(json.dumps({'company': 'Uber', 'comment': c})
+                     for c in ('Great rides', 'Bad app', 'Okay')).encode()
+    with app.app_context():
+        BulkIngestor(db, status='approved', user_id=owner_id).ingest(
+            iter_records(io.BytesIO(body)))
+
+
+def test_batch_applies_final_state_per_item(client):
+    seed_feedback()
+    user_id = login(client, 'voter')
+    client.post('/api/vote', json={'feedback_id': 3, 'vote_type': 'upvote'})
+
+    response = client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': 1, 'vote_type': 'upvote'},
+        {'feedback_id': 2, 'vote_type': 'upvote'},
+        {'feedback_id': 1, 'vote_type': 'downvote'},
+        {'feedback_id': 3, 'vote_type': None},
+        {'feedback_id': 99, 'vote_type': 'upvote'},
+    ]})
+    data = response.get_json()
+    assert response.status_code == 200
+    results = {r['feedback_id']: r for r in data['results']}
+    assert results[1]['user_vote'] == 'downvote'
+    assert results[1]['vote_score'] == -1
+    assert results[2]['vote_score'] == 1
+    assert results[3]['user_vote'] is None
+    assert results[3]['vote_score'] == 0
+    assert results[99]['error'] == 'Feedback not found'
+
+    with app.app_context():
+        stored = {v.feedback_id: v.vote_type
+                  for v in Vote.query.filter_by(user_id=user_id)}
+        assert stored == {1: 'downvote', 2: 'upvote'}
+        rank = db.session.get(FeedbackRank, 1)
+        assert (rank.upvotes, rank.downvotes) == (0, 1)
+
+
+def test_batch_rejects_own_feedback_and_bad_input(client):
+    user_id = login(client, 'owner')
+    seed_feedback(owner_id=user_id)
+
+    data = client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': 1, 'vote_type': 'upvote'},
+    ]}).get_json()
+    assert data['results'][0]['error'] == 'Cannot vote on your own feedback'
+
+    response = client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': 1, 'vote_type': 'sideways'},
+    ]})
+    assert response.status_code == 400
+    response = client.post('/api/votes/batch', json={'operations': [
+        {'feedback_id': i, 'vote_type': 'upvote'} for i in range(101)
+    ]})
+    assert response.status_code == 400
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+
+# Add the parent directory to sys.path to allow importing app module
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+import pytest
+from jinja2.utils import LRUCache
+from sqlalchemy import create_engine
+import app as app_module
+from app import app, db, listing_cache
+from warmup import Warmup, prime_sqlite, use_bytecode_cache
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    # A fresh warmup with the app's steps, and templates not yet compiled
+    warmup = Warmup(app)
+    warmup.steps = list(app_module.warmup.steps)
+    monkeypatch.setattr(app_module, 'warmup', warmup)
+    monkeypatch.setattr(app.jinja_env, 'bytecode_cache', None)
+    monkeypatch.setattr(app.jinja_env, 'cache', LRUCache(400))
+    use_bytecode_cache(app, str(tmp_path / 'jinja_cache'))
+    listing_cache.clear()
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.drop_all()
+
+
+def test_ready_only_after_warmup(client, tmp_path):
+    assert client.get('/healthz/ready').status_code == 503
+
+    lines = []
+    report = app_module.warmup.run(log=lines.append)
+    assert [name for name, _, _ in report] == ['templates', 'companies', 'database pages',
+                                               'listings']
+    assert lines[-1].startswith('✓ Warmup finished in')
+    assert not any(line.lstrip().startswith('✗') for line in lines)
+
+    response = client.get('/healthz/ready')
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status['ready'] and status['steps'][0]['summary'] == '4 templates'
+    assert len(os.listdir(tmp_path / 'jinja_cache')) == 4
+
+    # The first listing page a visitor loads is already cached
+    hits = listing_cache.stats['hits']
+    client.get('/api/feedback/filter?sort=hot&limit=60&offset=0&count=1')
+    assert listing_cache.stats['hits'] == hits + 1
+
+
+def test_prime_sqlite_scans_tables_and_indexes(tmp_path):
+    path = str(tmp_path / 'prime.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE vote (id INTEGER PRIMARY KEY, user_id INTEGER, feedback_id INTEGER,
+                           UNIQUE (user_id, feedback_id));
+        CREATE INDEX ix_vote_feedback_id ON vote (feedback_id);
+    ''')
+    conn.close()
+    engine = create_engine('sqlite:///' + path, pool_size=3, max_overflow=0)
+    # The table, its unique and its feedback_id index, through each pooled connection
+    assert prime_sqlite(engine, ('vote', 'missing')) == 9
+    engine.dispose()
@@ -0,0 +1,182 @@
+"""Batched Voting Module
+
+Applies many vote and unvote operations from one user in a single
+transaction. The client queues rapid clicks and sends them together to
+``/api/votes/batch``; existence, ownership and the user's current votes
+are checked with one ``IN`` query, the vote rows are written with one
+upsert and one delete, and the new scores come back from one aggregate
+query.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+
+import activity
+import outbox
+import ranking
+import rollups
+import sync
+
+
+MAX_BATCH_SIZE = 100
+VOTE_TYPES = ('upvote', 'downvote')
+
+LOOKUP_SQL = text('''
+    SELECT f.id, f.user_id, f.company_name, f.sentiment, f.status, f.date_created,
+           v.vote_type
+    FROM feedback f
+    LEFT JOIN vote v ON v.feedback_id = f.id AND v.user_id = :user_id
+    WHERE f.id IN :ids
+''').bindparams(bindparam('ids', expanding=True)).columns(
+    date_created=DateTime
+)
+UPSERT_SQL = text('''
+    INSERT INTO vote (user_id, feedback_id, vote_type, created_at, updated_at)
+    VALUES (:user_id, :feedback_id, :vote_type, :now, :now)
+    ON CONFLICT (user_id, feedback_id) DO UPDATE SET
+        vote_type = excluded.vote_type,
+        updated_at = excluded.updated_at
+''').bindparams(bindparam('now', type_=DateTime))
+DELETE_SQL = text(
+    'DELETE FROM vote WHERE user_id = :user_id AND feedback_id IN :ids'
+).bindparams(bindparam('ids', expanding=True))
+SCORES_SQL = text('''
+    SELECT feedback_id,
+           COALESCE(SUM(vote_type = 'upvote'), 0),
+           COALESCE(SUM(vote_type = 'downvote'), 0)
+    FROM vote WHERE feedback_id IN :ids
+    GROUP BY feedback_id
+''').bindparams(bindparam('ids', expanding=True))
+
+
+class BatchError(ValueError):
+    """Raised when a batch request is malformed as a whole."""
+
+
+def parse_operations(payload, max_size=MAX_BATCH_SIZE):
+    """Validate a batch request body.
+
+    Each operation is ``{"feedback_id": int, "vote_type": "upvote" |
+    "downvote" | null}``; a null vote_type removes the vote. When an item
+    appears more than once the last operation wins, so toggles queued on
+    the client collapse to their final state.
+
+    Args:
+        payload: Decoded JSON request body
+        max_size (int): Maximum number of operations accepted
+
+    Returns:
+        dict: Final vote_type (or None) by feedback ID, in request order
+
+    Raises:
+        BatchError: If the body or any operation is malformed
+    """
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('Missing required field: operations')
+    if len(operations) > max_size:
+        raise BatchError(f'Too many operations (max {max_size})')
+
+    final = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise BatchError(f'Operation {index} must be an object')
+        feedback_id = operation.get('feedback_id')
+        vote_type = operation.get('vote_type')
+        if not isinstance(feedback_id, int) or isinstance(feedback_id, bool):
+            raise BatchError(f'Operation {index}: invalid feedback_id')
+        if vote_type is not None and vote_type not in VOTE_TYPES:
+            raise BatchError(
+                f'Operation {index}: vote_type must be "upvote", "downvote" or null'
+            )
+        final.pop(feedback_id, None)
+        final[feedback_id] = vote_type
+    return final
+
+
+def apply_batch(session, user_id, operations):
+    """Apply the final vote state of each item in one transaction.
+
+    Items that do not exist or belong to the voter are reported and
+    skipped; they never abort the rest of the batch.
+
+    Args:
+        session: SQLAlchemy session to execute on
+        user_id (int): ID of the voting user
+        operations (dict): Final vote_type (or None) by feedback ID, as
+            returned by ``parse_operations``
+
+    Returns:
+        list: One result dict per item with feedback_id and either
+        user_vote, upvotes, downvotes and vote_score, or an error
+    """
+    ids = list(operations)
+    found = {row.id: row for row in session.execute(
+        LOOKUP_SQL, {'user_id': user_id, 'ids': ids}
+    )}
+
+    errors = {}
+    upserts = []
+    removals = []
+    changed = []
+    cast = []
+    removed = []
+    for feedback_id, vote_type in operations.items():
+        feedback = found.get(feedback_id)
+        if feedback is None:
+            errors[feedback_id] = 'Feedback not found'
+            continue
+        if feedback.user_id == user_id:
+            errors[feedback_id] = 'Cannot vote on your own feedback'
+            continue
+        old_vote_type = feedback.vote_type
+        if old_vote_type == vote_type:
+            continue
+        if vote_type is None:
+            removals.append(feedback_id)
+            removed.append((feedback_id, user_id, {'old_vote': old_vote_type}))
+        else:
+            upserts.append({'user_id': user_id, 'feedback_id': feedback_id,
+                            'vote_type': vote_type})
+            cast.append((feedback_id, user_id, {'vote': vote_type, 'old_vote': old_vote_type}))
+        rollups.record_vote(session, feedback, old_vote_type, vote_type)
+        ranking.record_vote(session, feedback, old_vote_type, vote_type)
+        changed.append(feedback_id)
+
+    try:
+        if upserts:
+            now = datetime.utcnow()
+            session.execute(UPSERT_SQL, [dict(row, now=now) for row in upserts])
+        if removals:
+            session.execute(DELETE_SQL, {'user_id': user_id, 'ids': removals})
+        sync.touch(session, *changed)
+        activity.touch(session, *changed)
+        outbox.emit_many(session, 'vote.cast', cast)
+        outbox.emit_many(session, 'vote.removed', removed)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    valid = [feedback_id for feedback_id in ids if feedback_id not in errors]
+    scores = {}
+    if valid:
+        scores = {feedback_id: (upvotes, downvotes) for feedback_id, upvotes, downvotes
+                  in session.execute(SCORES_SQL, {'ids': valid})}
+
+    results = []
+    for feedback_id, vote_type in operations.items():
+        if feedback_id in errors:
+            results.append({'feedback_id': feedback_id,
+                            'error': errors[feedback_id]})
+            continue
+        upvotes, downvotes = scores.get(feedback_id, (0, 0))
+        results.append({
+            'feedback_id': feedback_id,
+            'user_vote': vote_type,
+            'upvotes': upvotes,
+            'downvotes': downvotes,
+            'vote_score': upvotes - downvotes,
+        })
+    return results
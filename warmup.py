@@ -0,0 +1,219 @@
+"""Startup Warmup Module
+
+After a deploy or restart, the first requests of a worker pay for work
+that every later request gets for free: Jinja compiles ``index.html`` on
+first use, SQLite reads index pages from a cold disk, and the listing and
+company caches start empty. The warmup here does that work before the
+worker takes traffic:
+
+- Templates are compiled ahead of time into a persistent bytecode cache
+  (``TEMPLATE_CACHE_DIR``), so restarts also skip Jinja's compiler.
+- Every index of the hot tables (``WARMUP_TABLES``), and the tables
+  themselves, are read once through each pooled connection. This loads
+  the pages into the OS page cache and into each connection's own SQLite
+  page cache, as far as it holds them.
+- The company registry lookups are resolved, and the app's own steps fill
+  the listing cache with the pages visitors load first.
+
+Steps run in registration order; each is timed, and a failing step is
+logged and skipped, since warmup only saves time. Until the warmup has
+finished, ``/healthz/ready`` answers 503, so a load balancer or
+orchestrator can hold traffic back. ``python app.py`` runs the warmup
+before serving; under another server, call ``warmup.run()`` from the
+worker start hook (or ``warmup.start()`` to warm up in the background
+while the readiness check reports 503).
+"""
+
+import logging
+import os
+import threading
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+from companies import COMPANIES, get_company_logo, resolve_company
+
+
+DEFAULT_TABLES = ('feedback', 'feedback_rank', 'vote', 'feedback_change',
+                  'company_daily_stats')
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Named startup steps, their timings and the readiness flag."""
+
+    def __init__(self, app):
+        """Initialize the Warmup.
+
+        Args:
+            app: Flask application the steps run in
+        """
+        self.app = app
+        self.steps = []
+        self.report = []
+        self.elapsed = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        """Whether the warmup has finished."""
+        return self._ready.is_set()
+
+    def step(self, name):
+        """Decorator registering a warmup step.
+
+        The step runs in an app context; it may return a short summary of
+        what it warmed for the report.
+        """
+        def decorator(f):
+            self.steps.append((name, f))
+            return f
+        return decorator
+
+    def run(self, log=None):
+        """Run every step once, then mark the worker ready.
+
+        Args:
+            log: Called with a line per step and a summary line
+
+        Returns:
+            list: (step name, seconds, summary or error) tuples
+        """
+        log = log or logger.info
+        report = []
+        started = time.perf_counter()
+        with self.app.app_context():
+            for name, f in self.steps:
+                step_started = time.perf_counter()
+                try:
+                    summary, ok = f(), True
+                except Exception as e:
+                    logger.exception('Warmup step %s failed', name)
+                    summary, ok = f'failed: {e}', False
+                seconds = time.perf_counter() - step_started
+                report.append((name, seconds, summary))
+                line = f"{name} in {seconds * 1000:.0f} ms"
+                log(f"  {'✓' if ok else '✗'} {line}" + (f" ({summary})" if summary else ''))
+        self.report = report
+        self.elapsed = time.perf_counter() - started
+        log(f"✓ Warmup finished in {self.elapsed:.2f} s")
+        self._ready.set()
+        return report
+
+    def start(self, log=None):
+        """Run the warmup in a background thread."""
+        thread = threading.Thread(target=self.run, args=(log,), name='warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        """Readiness and step timings, as served by ``/healthz/ready``."""
+        status = {'ready': self.ready}
+        if self.ready:
+            status['warmup_seconds'] = round(self.elapsed, 3)
+            status['steps'] = [{'name': name, 'seconds': round(seconds, 3), 'summary': summary}
+                               for name, seconds, summary in self.report]
+        return status
+
+
+def use_bytecode_cache(app, directory):
+    """Keep compiled templates in a directory that survives restarts."""
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def precompile_templates(app):
+    """Compile every template (into the bytecode cache, if enabled).
+
+    Returns:
+        int: Number of templates compiled
+    """
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_company_registry():
+    """Resolve every registered company, caching its name and logo lookups.
+
+    Returns:
+        int: Number of companies resolved
+    """
+    for company in COMPANIES:
+        resolve_company(company['name'])
+        get_company_logo(company['name'])
+    return len(COMPANIES)
+
+
+def _pool_size(engine):
+    size = getattr(engine.pool, 'size', None)
+    return size() if callable(size) else 1
+
+
+def prime_sqlite(engine, tables=DEFAULT_TABLES):
+    """Read every page of some tables and their indexes through each pooled connection.
+
+    Reads run outside transactions, so priming the writer never holds the
+    write lock.
+
+    Args:
+        engine: Engine of a SQLite database
+        tables: Names of the tables to prime; missing tables are skipped
+
+    Returns:
+        int: Tables and indexes scanned, summed over connections
+    """
+    connections = [engine.raw_connection() for _ in range(_pool_size(engine))]
+    scanned = 0
+    try:
+        for connection in connections:
+            cursor = connection.cursor()
+            placeholders = ', '.join('?' * len(tables))
+            indexes = cursor.execute(
+                f"SELECT tbl_name, name FROM sqlite_master WHERE type = 'index' "
+                f"AND tbl_name IN ({placeholders})", tuple(tables)).fetchall()
+            existing = {table for table, in cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'table' "
+                f"AND name IN ({placeholders})", tuple(tables))}
+            # Counting through an index reads all of its pages, and with
+            # NOT INDEXED all of the table's
+            scans = [f'SELECT COUNT(*) FROM "{table}" NOT INDEXED' for table in tables
+                     if table in existing]
+            scans += [f'SELECT COUNT(*) FROM "{table}" INDEXED BY "{index}"'
+                      for table, index in indexes]
+            for sql in scans:
+                try:
+                    cursor.execute(sql).fetchall()
+                except Exception:  # an index the planner cannot scan whole
+                    continue
+                scanned += 1
+            cursor.close()
+    finally:
+        for connection in connections:
+            connection.close()
+    return scanned
+
+
+def init_warmup(app):
+    """Create the app's warmup with the template and company steps.
+
+    Reads ``TEMPLATE_CACHE_DIR`` (persistent bytecode cache; None keeps
+    compiled templates in memory only). The app adds its own steps with
+    ``@warmup.step(name)``.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        Warmup: The installed warmup
+    """
+    warmup = Warmup(app)
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if directory:
+        use_bytecode_cache(app, directory)
+    warmup.step('templates')(lambda: f'{precompile_templates(app)} templates')
+    warmup.step('companies')(lambda: f'{warm_company_registry()} companies')
+    app.extensions['warmup'] = warmup
+    return warmup